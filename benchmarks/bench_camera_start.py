@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""
+Hot-plug-to-streaming benchmark for the uvc_handler start paths.
+
+Compares the time from a (simulated) hot-plug event until uvc_handler reports that the
+device is streaming, for the three start modes used by DeviceConnectionManager:
+
+    cold        spawn `uvc_handler.py --start-uvc` (interpreter + depthai import per start)
+    standby     attach a pre-spawned `uvc_handler.py --standby` worker
+    forkserver  fork from a server that preloaded src.uvc_handler
+
+Standby/forkserver preparation happens before the clock starts, as it does in the app.
+Requires a connected OAK-D Lite, or OAKD_DEPTHAI_BACKEND=sim for simulated devices (src/sim_depthai.py).
+
+Usage:
+    python3 benchmarks/bench_camera_start.py --iterations 5 --modes cold standby
+"""
+import argparse
+import json
+import os
+import signal
+import statistics
+import subprocess
+import sys
+import time
+from multiprocessing import Pipe
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from src import uvc_launcher
+
+READY_MARKER = "uvc_handler.py: Device started"
+STANDBY_READY_MARKER = "uvc_handler.py: Standby ready"
+
+# Unbuffered child output so the markers arrive as soon as they are printed
+CHILD_ENV = dict(os.environ, PYTHONUNBUFFERED="1")
+
+
+def _wait_for_line(process, marker, timeout):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        line = process.stdout.readline()
+        if not line:
+            raise RuntimeError(f"uvc_handler exited (code {process.poll()}) before printing {marker!r}")
+        if line.startswith(marker):
+            return
+    raise TimeoutError(f"Timed out after {timeout}s waiting for {marker!r}")
+
+
+def _stop(process, timeout=15):
+    try:
+        process.send_signal(signal.SIGINT)
+        process.wait(timeout=timeout)
+    except subprocess.TimeoutExpired:
+        process.kill()
+        process.wait()
+
+
+def measure_cold(timeout):
+    t0 = time.monotonic()
+    process = uvc_launcher.spawn_cold(stdout=subprocess.PIPE, text=True, env=CHILD_ENV)
+    try:
+        _wait_for_line(process, READY_MARKER, timeout)
+        return time.monotonic() - t0
+    finally:
+        _stop(process)
+
+
+def measure_standby(timeout):
+    worker = uvc_launcher.StandbyWorker(stdout=subprocess.PIPE, env=CHILD_ENV)
+    process = worker.spawn()
+    try:
+        _wait_for_line(process, STANDBY_READY_MARKER, timeout) # Not timed: the app does this ahead of time
+        t0 = time.monotonic()
+        process = worker.attach()
+        _wait_for_line(process, READY_MARKER, timeout)
+        return time.monotonic() - t0
+    finally:
+        _stop(process)
+
+
+def measure_forkserver(timeout, launcher):
+    receiver, sender = Pipe(duplex=False)
+    t0 = time.monotonic()
+    process = launcher.start_camera(ready_conn=sender)
+    try:
+        if not receiver.poll(timeout):
+            raise TimeoutError(f"Timed out after {timeout}s waiting for the forked camera to start")
+        receiver.recv()
+        return time.monotonic() - t0
+    finally:
+        _stop(process)
+        receiver.close()
+        sender.close()
+
+
+def summarize(samples):
+    return {
+        "n": len(samples),
+        "min_ms": round(min(samples) * 1000, 1),
+        "median_ms": round(statistics.median(samples) * 1000, 1),
+        "mean_ms": round(statistics.mean(samples) * 1000, 1),
+        "max_ms": round(max(samples) * 1000, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--iterations', type=int, default=3)
+    parser.add_argument('--modes', nargs='+', choices=uvc_launcher.START_MODES, default=list(uvc_launcher.START_MODES))
+    parser.add_argument('--timeout', type=float, default=30.0, help="Seconds to wait for each start")
+    parser.add_argument('--settle', type=float, default=2.0, help="Seconds to let the device re-enumerate between runs")
+    parser.add_argument('--json', dest='json_path', help="Also write the results to this JSON file")
+    args = parser.parse_args()
+
+    launcher = None
+    if uvc_launcher.START_MODE_FORKSERVER in args.modes:
+        launcher = uvc_launcher.ForkserverLauncher()
+        launcher.warm_up()
+
+    results = {}
+    for mode in args.modes:
+        samples = []
+        for i in range(args.iterations):
+            if mode == uvc_launcher.START_MODE_COLD:
+                elapsed = measure_cold(args.timeout)
+            elif mode == uvc_launcher.START_MODE_STANDBY:
+                elapsed = measure_standby(args.timeout)
+            else:
+                elapsed = measure_forkserver(args.timeout, launcher)
+            samples.append(elapsed)
+            print(f"[{mode}] run {i + 1}/{args.iterations}: {elapsed * 1000:.1f} ms")
+            time.sleep(args.settle)
+        results[mode] = summarize(samples)
+
+    print("\nHot-plug-to-streaming time:")
+    for mode, stats in results.items():
+        print(f"  {mode:<10} median {stats['median_ms']:>8.1f} ms  "
+              f"(min {stats['min_ms']:.1f}, max {stats['max_ms']:.1f}, n={stats['n']})")
+
+    if args.json_path:
+        with open(args.json_path, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,372 @@
+#!/usr/bin/env python3
+"""
+Hot-plug storm benchmark for DeviceConnectionManager.
+
+Replays synthetic USB event streams into the manager's USBEventHandler, the way the IOKit (or uevent)
+callback delivers them, with a stub camera backend and no USB monitor:
+
+    steady       one device plugged, booted (re-enumerating as PID f63b) and unplugged at a fixed rate
+    burst        contact bounce: a burst of connect/disconnect events before every plug
+    interleaved  several devices (multi-device mode) cycling with random phases, events interleaved
+
+Per scenario it reports the handler call latency percentiles (what the event thread pays), camera
+starts/stops against the expected ones (the excess is spurious), peak threads and file descriptors,
+and memory growth. Runs anywhere (no device, no compiled iokit_wrapper).
+
+Usage:
+    python3 benchmarks/bench_hotplug_storm.py --events 5000
+    python3 benchmarks/bench_hotplug_storm.py --scenarios burst --settle-ms 50 --json storm.json
+"""
+import argparse
+import contextlib
+import gc
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import threading
+import time
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from src import camera_backends
+from src import camera_supervisor
+from src import device_connection_manager
+from src import start_metrics
+from src import usb_monitors
+
+VENDOR_ID = device_connection_manager.OAK_D_LITE_VENDOR_ID
+PID_UNBOOTED = 0x2485
+PID_BOOTED = 0xf63b
+SCENARIOS = ("steady", "burst", "interleaved")
+SAMPLE_INTERVAL = 0.005
+DRAIN_TIMEOUT = 30
+
+
+class StubCameraBackend(camera_backends.CameraBackend):
+    """Camera backend that only counts starts and stops (optionally taking some time for each)."""
+    name = "stub"
+
+    def __init__(self, counters, start_delay=0.0, stop_delay=0.0):
+        self.counters = counters
+        self.start_delay = start_delay
+        self.stop_delay = stop_delay
+        self._active = False
+
+    def start(self, start_trace=None):
+        time.sleep(self.start_delay)
+        self._active = True
+        self.counters.add("starts")
+
+    def stop(self):
+        time.sleep(self.stop_delay)
+        self._active = False
+        self.counters.add("stops")
+        return True
+
+    def is_active(self):
+        return self._active
+
+
+class NullUSBMonitor(usb_monitors.USBMonitor):
+    """No real monitoring: the benchmark calls the event handler itself."""
+    name = "null"
+    description = "null"
+
+    def start(self, handler, vendor_id, product_id):
+        return 0
+
+    def stop(self):
+        pass
+
+    def scan(self, handler, vendor_id, product_id):
+        return 0
+
+
+class Counters:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.values = {"starts": 0, "stops": 0}
+
+    def add(self, name):
+        with self._lock:
+            self.values[name] += 1
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self.values)
+
+
+# --- Event generators ---
+# Each returns the events as (time offset s, connected, device index, product id) and the expected
+# camera starts/stops, with "hold_s": how long a device stays plugged (and unplugged). A settle window
+# longer than that rightly coalesces whole cycles away, so the counts are only compared below it.
+def _cycle(t, device, boot_delay, dwell):
+    """One plug/boot/unplug cycle of a device starting at t."""
+    return [(t, True, device, PID_UNBOOTED),
+            (t + boot_delay, False, device, PID_UNBOOTED), # depthai boots the device, it re-enumerates
+            (t + boot_delay + 0.0005, True, device, PID_BOOTED),
+            (t + dwell, False, device, PID_BOOTED)]
+
+
+def steady_events(count, rate, boot_delay):
+    period = 4 / rate
+    events, expected = [], {"starts": 0, "stops": 0, "hold_s": period / 2}
+    for i in range(max(1, count // 4)):
+        events += _cycle(i * period, 0, min(boot_delay, period / 4), period / 2)
+        expected["starts"] += 1
+        expected["stops"] += 1
+    return events, expected
+
+
+def burst_events(count, rate, boot_delay, burst_size=8, rng=None):
+    rng = rng or random.Random(0)
+    per_cycle = 4 + 2 * burst_size
+    period = per_cycle / rate
+    events, expected = [], {"starts": 0, "stops": 0, "hold_s": period / 2 - burst_size * 0.0002 - 0.001}
+    for i in range(max(1, count // per_cycle)):
+        t = i * period
+        for j in range(burst_size): # bouncing contacts before the plug settles
+            t_bounce = t + j * 0.0002 + rng.uniform(0, 0.0001)
+            events += [(t_bounce, True, 0, PID_UNBOOTED), (t_bounce + 0.0001, False, 0, PID_UNBOOTED)]
+        events += _cycle(t + burst_size * 0.0002 + 0.001, 0, min(boot_delay, period / 4), period / 2)
+        expected["starts"] += 1
+        expected["stops"] += 1
+    return events, expected
+
+
+def interleaved_events(count, rate, boot_delay, devices=4, rng=None):
+    rng = rng or random.Random(0)
+    cycles = max(1, count // (4 * devices))
+    period = 4 * devices / rate
+    events, expected = [], {"starts": 0, "stops": 0, "hold_s": period / 2}
+    for device in range(devices):
+        phase = rng.uniform(0, period / 2)
+        for i in range(cycles):
+            events += _cycle(i * period + phase, device, min(boot_delay, period / 4), period / 2)
+            expected["starts"] += 1
+            expected["stops"] += 1
+    return events, expected
+
+
+# --- Measurement ---
+def percentiles(values, points=(50, 90, 99)):
+    """Nearest-rank percentiles of values (and their max), in the values' unit."""
+    if not values:
+        return {}
+    ordered = sorted(values)
+    result = {f"p{p}": ordered[min(len(ordered) - 1, max(0, int(round(p / 100 * len(ordered))) - 1))] for p in points}
+    result["max"] = ordered[-1]
+    return result
+
+
+def _open_fds():
+    for fd_dir in ("/proc/self/fd", "/dev/fd"):
+        try:
+            return len(os.listdir(fd_dir))
+        except OSError:
+            continue
+    return None
+
+
+def _rss_kb():
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") // 1024
+    except (OSError, ValueError):
+        import resource
+        maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return maxrss // 1024 if sys.platform == "darwin" else maxrss # bytes on macOS, KiB elsewhere
+
+
+class ResourceSampler:
+    """Samples thread and file descriptor counts on a thread of its own while a scenario runs."""
+    def __init__(self, interval=SAMPLE_INTERVAL):
+        self.interval = interval
+        self.peak_threads = threading.active_count()
+        self.peak_fds = _open_fds()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="storm-sampler", daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.sample()
+
+    def sample(self):
+        self.peak_threads = max(self.peak_threads, threading.active_count() - 1) # not counting the sampler
+        fds = _open_fds()
+        if fds is not None:
+            self.peak_fds = max(self.peak_fds or 0, fds)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.sample()
+
+
+def _drain(manager, counters, settle_window):
+    # Waits until the coalescer's pending bursts, the supervisor queue and the boot scheduler have gone quiet
+    deadline = time.monotonic() + DRAIN_TIMEOUT
+    previous = None
+    while time.monotonic() < deadline:
+        time.sleep(max(settle_window * 2, 0.02))
+        manager.supervisor.submit(lambda: None).result(timeout=DRAIN_TIMEOUT)
+        current = counters.snapshot()
+        if current == previous:
+            return
+        previous = current
+
+
+def run_scenario(name, events, expected, settle_window=0.0, supervisor="actor", start_delay=0.0,
+                 stop_delay=0.0, realtime=True, verbose=False):
+    counters = Counters()
+    multi_device = name == "interleaved"
+    events = sorted(events, key=lambda e: e[0])
+    gc.collect()
+    baseline_threads, baseline_fds, rss_before = threading.active_count(), _open_fds(), _rss_kb()
+
+    history = tempfile.NamedTemporaryFile(prefix="storm-history-", suffix=".jsonl", delete=False)
+    history.close()
+    saved_history_path = start_metrics.DEFAULT_HISTORY_PATH
+    start_metrics.DEFAULT_HISTORY_PATH = history.name
+    quiet = contextlib.nullcontext() if verbose else contextlib.redirect_stdout(open(os.devnull, "w"))
+    latencies = []
+    try:
+        with quiet, ResourceSampler() as sampler:
+            manager = device_connection_manager.DeviceConnectionManager(
+                lambda *a: None, lambda *a: None, lambda *a: None, lambda *a: None,
+                camera_backend=StubCameraBackend(counters, start_delay, stop_delay),
+                camera_backend_factory=lambda device_id: StubCameraBackend(counters, start_delay, stop_delay),
+                hotplug_settle_window=settle_window, multi_device=multi_device,
+                supervisor=camera_supervisor.CameraSupervisor() if supervisor == "actor" else None,
+                device_rescan_interval=0, usb_monitor=NullUSBMonitor())
+            handler = manager._event_handler
+            started = time.perf_counter()
+            for offset, connected, device, product_id in events:
+                if realtime:
+                    wait = started + offset - time.perf_counter()
+                    if wait > 0:
+                        time.sleep(wait)
+                callback = handler.on_device_connected if connected else handler.on_device_disconnected
+                serial = f"1844301{device:03d}" if product_id == PID_BOOTED else "N/A"
+                t0 = time.perf_counter()
+                callback(VENDOR_ID, product_id, serial, 1000 + len(latencies), 0x01100000 + (device << 16))
+                latencies.append((time.perf_counter() - t0) * 1e6)
+            replay_time = time.perf_counter() - started
+            _drain(manager, counters, settle_window)
+            settle_time = time.perf_counter() - started - replay_time
+            tracked = len(manager.device_states.devices) # device state entries left behind (leak indicator)
+            registered = len(manager.device_registry)
+            manager.cleanup_on_quit()
+    finally:
+        start_metrics.DEFAULT_HISTORY_PATH = saved_history_path
+        os.unlink(history.name)
+    gc.collect()
+
+    actual = counters.snapshot()
+    comparable = expected["hold_s"] > settle_window
+    def excess(a, b):
+        return max(0, a - b) if comparable else None
+    return {
+        "scenario": name,
+        "events": len(events),
+        "replay_s": round(replay_time, 4),
+        "events_per_s": round(len(events) / replay_time, 1) if replay_time else None,
+        "drain_s": round(settle_time, 4),
+        "callback_latency_us": {k: round(v, 1) for k, v in percentiles(latencies).items()},
+        "starts": actual["starts"],
+        "stops": actual["stops"],
+        "expected_starts": expected["starts"] if comparable else None, # None: hold time within the settle window
+        "expected_stops": expected["stops"] if comparable else None,
+        "spurious_starts": excess(actual["starts"], expected["starts"]),
+        "spurious_stops": excess(actual["stops"], expected["stops"]),
+        "missed_starts": excess(expected["starts"], actual["starts"]),
+        "baseline_threads": baseline_threads,
+        "peak_threads": sampler.peak_threads,
+        "baseline_fds": baseline_fds,
+        "peak_fds": sampler.peak_fds,
+        "rss_growth_kb": _rss_kb() - rss_before,
+        "tracked_devices_after": tracked,
+        "registered_devices_after": registered,
+    }
+
+
+def build_events(name, count, rate, boot_delay, devices, seed):
+    rng = random.Random(seed)
+    if name == "steady":
+        return steady_events(count, rate, boot_delay)
+    if name == "burst":
+        return burst_events(count, rate, boot_delay, rng=rng)
+    if name == "interleaved":
+        return interleaved_events(count, rate, boot_delay, devices=devices, rng=rng)
+    raise ValueError(f"Unknown scenario '{name}'. Available: {', '.join(SCENARIOS)}")
+
+
+def format_results(results):
+    lines = [f"{'scenario':12} {'events':>7} {'ev/s':>8} {'p50 us':>8} {'p99 us':>8} {'max us':>9} "
+             f"{'starts':>11} {'stops':>11} {'spurious':>9} {'threads':>7} {'fds':>5} {'rss kB':>7}"]
+    for r in results:
+        latency = r["callback_latency_us"]
+        comparable = r["expected_starts"] is not None
+        expected_starts = r["expected_starts"] if comparable else "-"
+        expected_stops = r["expected_stops"] if comparable else "-"
+        spurious = r["spurious_starts"] + r["spurious_stops"] if comparable else "-"
+        lines.append(
+            f"{r['scenario']:12} {r['events']:7d} {r['events_per_s'] or 0:8.0f} {latency.get('p50', 0):8.1f} "
+            f"{latency.get('p99', 0):8.1f} {latency.get('max', 0):9.1f} "
+            f"{r['starts']:5d}/{expected_starts:<5} {r['stops']:5d}/{expected_stops:<5} "
+            f"{spurious:>9} {r['peak_threads']:7d} {r['peak_fds'] or 0:5d} {r['rss_growth_kb']:7d}")
+    if any(r["expected_starts"] is None for r in results):
+        lines.append("-: devices are held for less than the settle window, so cycles coalesce away; lower --rate")
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--scenarios', nargs='+', default=list(SCENARIOS), choices=SCENARIOS)
+    parser.add_argument('--events', type=int, default=2000, help="Approximate events per scenario")
+    parser.add_argument('--rate', type=float, default=1000, help="Events per second (replay rate)")
+    parser.add_argument('--boot-delay-ms', type=float, default=50, help="Plug -> boot re-enumeration delay")
+    parser.add_argument('--devices', type=int, default=4, help="Devices in the interleaved scenario")
+    parser.add_argument('--settle-ms', type=float, default=0, help="Hot-plug settle window (OAKD_HOTPLUG_SETTLE_MS)")
+    parser.add_argument('--supervisor', choices=("actor", "inline"), default="actor",
+                        help="actor: CameraSupervisor as in the menu bar app, inline: the manager's default")
+    parser.add_argument('--start-delay-ms', type=float, default=0, help="Stub camera start time")
+    parser.add_argument('--stop-delay-ms', type=float, default=0, help="Stub camera stop time")
+    parser.add_argument('--as-fast-as-possible', action="store_true", help="Ignore event timestamps")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--verbose', action="store_true", help="Keep the manager's log output")
+    parser.add_argument('--json', dest='json_path', help="Also write the results to this JSON file")
+    args = parser.parse_args()
+
+    results = []
+    for name in args.scenarios:
+        events, expected = build_events(name, args.events, args.rate, args.boot_delay_ms / 1000, args.devices, args.seed)
+        results.append(run_scenario(name, events, expected, settle_window=args.settle_ms / 1000,
+                                    supervisor=args.supervisor, start_delay=args.start_delay_ms / 1000,
+                                    stop_delay=args.stop_delay_ms / 1000, realtime=not args.as_fast_as_possible,
+                                    verbose=args.verbose))
+    print(format_results(results))
+
+    if args.json_path:
+        report = {
+            "benchmark": "hotplug_storm",
+            "config": vars(args),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "results": results,
+        }
+        with open(args.json_path, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""
+Import-time / startup benchmark for uvc_handler.py.
+
+Runs each scenario under `python -X importtime`, parses the per-module report and prints
+the slowest modules (by cumulative import time) together with the scenario's total.
+Each scenario has a budget: a maximum total import time and modules that must not be
+imported at all (depthai on paths that do not talk to the device). The budget is enforced
+by tests/system/test_import_time.py and by `--check` here.
+
+Usage:
+    python3 benchmarks/bench_import_time.py --runs 5 --top 15
+    python3 benchmarks/bench_import_time.py --check --json import_time.json
+"""
+import argparse
+import json
+import os
+import re
+import subprocess
+import sys
+import time
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+UVC_HANDLER = os.path.join(project_root, 'src', 'uvc_handler.py')
+
+# scenario name -> (uvc_handler.py arguments, budget)
+SCENARIOS = {
+    "help": (["--help"], {"max_import_ms": 250, "forbidden_modules": ["depthai"]}),
+    "list-profiles": (["--list-profiles"], {"max_import_ms": 250, "forbidden_modules": ["depthai"]}),
+    "bad-argument": (["--profile", "no-such-profile"], {"max_import_ms": 250, "forbidden_modules": ["depthai"]}),
+}
+
+_LINE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \| ( *)(\S+)\s*$")
+
+
+def parse_importtime(stderr_text):
+    """
+    Parses `-X importtime` output into [{"module", "self_us", "cumulative_us", "depth"}, ...]
+    in the order the imports finished. depth 0 entries are imported directly by the script.
+    """
+    entries = []
+    for line in stderr_text.splitlines():
+        match = _LINE.match(line)
+        if match is None:
+            continue # header line or regular stderr output
+        self_us, cumulative_us, indent, module = match.groups()
+        entries.append({
+            "module": module,
+            "self_us": int(self_us),
+            "cumulative_us": int(cumulative_us),
+            "depth": len(indent) // 2,
+        })
+    return entries
+
+
+def total_import_us(entries):
+    return sum(e["cumulative_us"] for e in entries if e["depth"] == 0)
+
+
+def run_scenario(args, python=sys.executable):
+    """Runs uvc_handler.py with the given arguments; returns (parsed entries, wall-clock seconds)."""
+    start = time.monotonic()
+    result = subprocess.run([python, "-X", "importtime", UVC_HANDLER, *args],
+                            capture_output=True, text=True, cwd=project_root, timeout=120)
+    wall = time.monotonic() - start
+    return parse_importtime(result.stderr), wall
+
+
+def measure(name, runs=3):
+    """Best-of-N measurement of one scenario (the minimum is the least noisy figure)."""
+    args, budget = SCENARIOS[name]
+    best_entries, best_wall = None, None
+    for _ in range(runs):
+        entries, wall = run_scenario(args)
+        if best_entries is None or total_import_us(entries) < total_import_us(best_entries):
+            best_entries = entries
+        best_wall = wall if best_wall is None else min(best_wall, wall)
+    return {
+        "scenario": name,
+        "args": args,
+        "import_ms": round(total_import_us(best_entries) / 1000, 1),
+        "wall_ms": round(best_wall * 1000, 1),
+        "modules": len(best_entries),
+        "entries": best_entries,
+        "budget": budget,
+    }
+
+
+def check_budget(report):
+    """Returns a list of budget violations (empty if the scenario is within budget)."""
+    budget = report["budget"]
+    imported = {e["module"] for e in report["entries"]}
+    violations = []
+    for module in budget.get("forbidden_modules", []):
+        if module in imported:
+            violations.append(f"{report['scenario']}: imports forbidden module '{module}'")
+    if report["import_ms"] > budget["max_import_ms"]:
+        violations.append(f"{report['scenario']}: import time {report['import_ms']} ms "
+                          f"exceeds budget {budget['max_import_ms']} ms")
+    return violations
+
+
+def format_report(report, top=10):
+    lines = [f"[{report['scenario']}] uvc_handler.py {' '.join(report['args'])}: "
+             f"imports {report['import_ms']} ms (budget {report['budget']['max_import_ms']} ms), "
+             f"wall {report['wall_ms']} ms, {report['modules']} modules"]
+    slowest = sorted(report["entries"], key=lambda e: e["cumulative_us"], reverse=True)[:top]
+    for e in slowest:
+        lines.append(f"    {e['cumulative_us'] / 1000:8.1f} ms cumulative {e['self_us'] / 1000:8.1f} ms self  "
+                     f"{'  ' * e['depth']}{e['module']}")
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--scenarios', nargs='+', choices=list(SCENARIOS), default=list(SCENARIOS))
+    parser.add_argument('--runs', type=int, default=3)
+    parser.add_argument('--top', type=int, default=10, help="Number of slowest modules to list per scenario")
+    parser.add_argument('--check', action='store_true', help="Exit with status 1 if a scenario is over budget")
+    parser.add_argument('--json', dest='json_path', help="Also write the results to this JSON file")
+    args = parser.parse_args()
+
+    reports = [measure(name, args.runs) for name in args.scenarios]
+    violations = []
+    for report in reports:
+        print(format_report(report, args.top))
+        violations += check_budget(report)
+
+    if args.json_path:
+        with open(args.json_path, "w") as f:
+            json.dump(reports, f, indent=2)
+
+    for violation in violations:
+        print(f"OVER BUDGET: {violation}")
+    if args.check and violations:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+
+# Devices booting at the same time (firmware upload saturates a shared USB bus beyond this)
+DEFAULT_MAX_CONCURRENT_BOOTS = 2
+
+
+@dataclass(frozen=True)
+class BootRecord:
+    key: str
+    queued_ms: float    # time spent waiting for a free boot slot
+    boot_ms: float      # time spent in the boot itself (start + wait until booted)
+    ok: bool
+    error: str = None
+
+    def describe(self):
+        result = "ok" if self.ok else f"failed ({self.error})"
+        return f"{self.key}: {result}, boot {self.boot_ms:.0f} ms (queued {self.queued_ms:.0f} ms)"
+
+
+class BootScheduler:
+    """
+    Runs device boots in parallel on worker threads, at most max_concurrent at a time.
+    Each boot is a callable that returns once the device is up (True) or has failed (False / raises).
+    Per-device BootRecords are kept for the current batch, a batch being the boots submitted while
+    the scheduler was busy, so a hub full of devices plugged in together is reported as one.
+    """
+    def __init__(self, max_concurrent=DEFAULT_MAX_CONCURRENT_BOOTS, on_batch_done=None, clock=time.monotonic):
+        if max_concurrent < 1:
+            raise ValueError("max_concurrent must be at least 1")
+        self.max_concurrent = max_concurrent
+        self.on_batch_done = on_batch_done # called with the batch summary once no boot is queued or running
+        self.clock = clock
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrent, thread_name_prefix="oakd-boot")
+        self._lock = threading.Lock()
+        self._outstanding = 0
+        self._batch_start = None
+        self._batch = []
+        self.last_batch = None
+
+    def submit(self, key, boot):
+        """Queues boot() for the device; returns a Future resolving to its BootRecord."""
+        queued_at = self.clock()
+        with self._lock:
+            if self._outstanding == 0:
+                self._batch_start = queued_at
+                self._batch = []
+            self._outstanding += 1
+        future = self._executor.submit(self._run, key, boot, queued_at)
+        future.add_done_callback(self._boot_finished)
+        return future
+
+    def _run(self, key, boot, queued_at):
+        started_at = self.clock()
+        ok, error = False, None
+        try:
+            ok = bool(boot())
+            if not ok:
+                error = "device did not come up"
+        except Exception as e:
+            error = str(e)
+        record = BootRecord(key, round((started_at - queued_at) * 1000, 1),
+                            round((self.clock() - started_at) * 1000, 1), ok, error)
+        with self._lock:
+            self._batch.append(record)
+        return record
+
+    def _boot_finished(self, future):
+        with self._lock:
+            self._outstanding -= 1
+            if self._outstanding > 0:
+                return
+            summary = self.last_batch = {
+                "devices": len(self._batch),
+                "ok": sum(1 for r in self._batch if r.ok),
+                "wall_ms": round((self.clock() - self._batch_start) * 1000, 1),
+                "max_concurrent": self.max_concurrent,
+                "records": list(self._batch),
+            }
+        if self.on_batch_done is not None:
+            self.on_batch_done(summary)
+
+    def busy(self):
+        with self._lock:
+            return self._outstanding > 0
+
+    def shutdown(self, wait=True):
+        self._executor.shutdown(wait=wait, cancel_futures=True)
+
+
+def format_batch(summary):
+    lines = [f"Booted {summary['ok']}/{summary['devices']} device(s) in {summary['wall_ms'] / 1000:.2f} s "
+             f"(max {summary['max_concurrent']} concurrent)"]
+    lines += [f"  {record.describe()}" for record in summary["records"]]
+    return "\n".join(lines)
@@ -0,0 +1,372 @@
+import os
+import signal
+import subprocess
+import threading
+import time
+
+from src import uvc_launcher
+from src import control_socket
+from src.phase_timer import PhaseTimer
+from src import start_metrics
+from src import child_watcher
+
+# Backend names accepted by DeviceConnectionManager (or the OAKD_CAMERA_BACKEND environment variable)
+BACKEND_SUBPROCESS = "subprocess"
+BACKEND_INPROCESS = "inprocess"
+
+# Graceful stop first, then forced termination (seconds)
+STOP_GRACE_TIMEOUT = 10
+STOP_FORCE_TIMEOUT = 5
+# How long wait_until_booted() waits for a started camera to come up, and how often it checks (seconds)
+BOOT_WAIT_TIMEOUT = 30
+BOOT_POLL_INTERVAL = 0.1
+
+
+class CameraBackend:
+    """
+    Interface DeviceConnectionManager uses to run the UVC camera.
+    Implementations must be safe to start() again after stop().
+    """
+    name = None
+    last_stop_timing = None # PhaseTimer of the most recent stop()
+    control_socket_path = None # Control socket of the running camera, if the backend provides one
+    # on_exit(child_watcher.ChildExit): called on the watcher thread when the camera ends on its own (a
+    # crash), not after stop(). It should hand the exit to the thread that starts and stops the camera,
+    # which then calls handle_exit(). Without on_exit the backend handles the exit itself.
+    on_exit = None
+    last_exit = None # ChildExit of the most recent unexpected exit
+
+    def handle_exit(self, exit_info):
+        """Records an unexpected exit; returns False if it is stale (stopped or restarted since)."""
+        return False
+
+    def prepare(self):
+        """Optional warm-up before the first start (pre-spawn, pre-import, ...)."""
+        pass
+
+    def start(self, start_trace=None):
+        """Starts the camera. start_trace: optional start_metrics.StartTrace to continue through the start."""
+        raise NotImplementedError
+
+    def stop(self):
+        """Stops the camera. Returns True on a graceful stop, False if it had to be forced."""
+        raise NotImplementedError
+
+    def is_active(self):
+        """True while the backend holds a camera that has not been stopped."""
+        raise NotImplementedError
+
+    def wait_until_booted(self, timeout=BOOT_WAIT_TIMEOUT):
+        """
+        Blocks until the camera started by start() has booted the device (True) or failed (False).
+        Used to hold a boot slot while several devices boot; backends that cannot tell return True.
+        """
+        return self.is_active()
+
+    def close(self):
+        """Releases everything, including warm-up resources. No further starts are expected."""
+        pass
+
+
+class SubprocessCameraBackend(CameraBackend):
+    """Runs uvc_handler.py in a child process and stops it with SIGINT (the original behaviour)."""
+    name = BACKEND_SUBPROCESS
+
+    def __init__(self, start_mode=uvc_launcher.START_MODE_COLD, profile_name=None,
+                 control_socket_path=control_socket.DEFAULT_CONTROL_SOCKET, device_id=None, exit_watcher=None):
+        if start_mode not in uvc_launcher.START_MODES:
+            print(f"[CameraBackend] Unknown start mode '{start_mode}', falling back to '{uvc_launcher.START_MODE_COLD}'.")
+            start_mode = uvc_launcher.START_MODE_COLD
+        self.start_mode = start_mode
+        self.profile_name = profile_name
+        self.control_socket_path = control_socket_path # Where the running uvc_handler serves runtime controls
+        self.device_id = device_id # MX ID the camera is bound to (None: any available device)
+        self.handler_args = ('--profile', profile_name) if profile_name else ()
+        if control_socket_path:
+            self.handler_args += ('--control-socket', control_socket_path)
+        if device_id:
+            self.handler_args += ('--device', device_id)
+        self.process = None
+        # Learns about the camera process exiting at once (pidfd/kqueue), shared by every backend by default
+        self.exit_watcher = exit_watcher or child_watcher.default_watcher()
+        self._standby_worker = None
+        self._forkserver_launcher = None
+        self._closed = False
+        self._lock = threading.RLock() # Guards self.process and the standby worker across start/stop/exit
+
+    def prepare(self):
+        # Get the warm path ready before the first device event arrives.
+        if self._closed:
+            return
+        try:
+            if self.start_mode == uvc_launcher.START_MODE_STANDBY:
+                if self._standby_worker is None:
+                    self._standby_worker = uvc_launcher.StandbyWorker(extra_args=self.handler_args)
+                self._standby_worker.spawn()
+                print("[CameraBackend] Standby uvc_handler worker spawned.")
+            elif self.start_mode == uvc_launcher.START_MODE_FORKSERVER:
+                if self._forkserver_launcher is None:
+                    self._forkserver_launcher = uvc_launcher.ForkserverLauncher()
+                self._forkserver_launcher.warm_up()
+                print("[CameraBackend] uvc_handler forkserver is running.")
+        except Exception as e:
+            print(f"[CameraBackend] Failed to prepare '{self.start_mode}' start path, cold spawn will be used: {e}")
+
+    def start(self, start_trace=None):
+        # Uses the warm path when it is ready, otherwise falls back to a cold spawn.
+        with self._lock:
+            self._start(start_trace)
+
+    def _start(self, start_trace):
+        if self.start_mode == uvc_launcher.START_MODE_STANDBY and \
+           self._standby_worker is not None and self._standby_worker.is_alive():
+            start_path = uvc_launcher.START_MODE_STANDBY
+        elif self.start_mode == uvc_launcher.START_MODE_FORKSERVER and self._forkserver_launcher is not None:
+            start_path = uvc_launcher.START_MODE_FORKSERVER
+        else:
+            start_path = uvc_launcher.START_MODE_COLD
+
+        trace_payload = None
+        if start_trace is not None:
+            start_trace.info.update(backend=self.name, start_mode=start_path)
+            start_trace.mark("spawn")
+            trace_payload = start_trace.serialize()
+
+        if start_path == uvc_launcher.START_MODE_STANDBY:
+            print("[CameraBackend] Attaching standby uvc_handler worker...")
+            self.process = self._standby_worker.attach(start_trace=trace_payload)
+        elif start_path == uvc_launcher.START_MODE_FORKSERVER:
+            print("[CameraBackend] Forking uvc_handler from forkserver...")
+            self.process = self._forkserver_launcher.start_camera(profile_name=self.profile_name,
+                                                                  control_socket_path=self.control_socket_path,
+                                                                  start_trace=trace_payload,
+                                                                  device_id=self.device_id)
+        else:
+            env = dict(os.environ, **{start_metrics.ENV_START_TRACE: trace_payload}) if trace_payload else None
+            self.process = uvc_launcher.spawn_cold(extra_args=self.handler_args, env=env)
+        try:
+            self.exit_watcher.watch(self.process, self._process_exited, label="uvc_handler")
+        except Exception as e:
+            print(f"[CameraBackend] Cannot watch the uvc_handler process for exits: {e}")
+
+    def _process_exited(self, exit_info):
+        # Watcher thread: the camera process ended without stop() (stop() unwatches it first).
+        # Only hand it on; handle_exit() runs where the camera is started and stopped.
+        if self.on_exit is not None:
+            self.on_exit(exit_info)
+        else:
+            self.handle_exit(exit_info)
+
+    def handle_exit(self, exit_info):
+        with self._lock:
+            process = self.process
+            if process is None or process.pid != exit_info.pid:
+                return False
+            self.process = None
+            self.last_exit = exit_info
+            print(f"[CameraBackend] {exit_info.describe()}")
+            if self.start_mode == uvc_launcher.START_MODE_STANDBY and not self._closed:
+                self.prepare() # As after stop(): the next start finds a standby worker ready
+        return True
+
+    def stop(self):
+        with self._lock:
+            process, self.process = self.process, None # Ours from here on: a late exit report is stale
+            if process is None:
+                return True
+            self.exit_watcher.unwatch(process) # Exiting is expected from here on
+        graceful = True
+        timing = PhaseTimer("[CameraBackend] Stop")
+        try:
+            print("[CameraBackend] Sending SIGINT to uvc_handler process...")
+            process.send_signal(signal.SIGINT)
+            timing.mark("sigint")
+            process.wait(timeout=STOP_GRACE_TIMEOUT) # Wait for graceful shutdown
+            timing.mark("graceful exit")
+        except subprocess.TimeoutExpired:
+            graceful = False
+            timing.mark("grace timeout")
+            print("[CameraBackend] uvc_handler process timed out. Terminating...")
+            process.terminate()
+            try:
+                process.wait(timeout=STOP_FORCE_TIMEOUT) # Wait for forced termination
+            except Exception as e_term:
+                print(f"[CameraBackend] Error during forced termination: {e_term}")
+            timing.mark("forced exit")
+        finally:
+            self.last_stop_timing = timing
+            # The standby worker was consumed by this camera; have a fresh one ready for the next start.
+            # (Respawning here rather than on attach keeps at most one spare interpreter around.)
+            if self.start_mode == uvc_launcher.START_MODE_STANDBY:
+                with self._lock, timing.phase("standby respawn"):
+                    self.prepare()
+        return graceful
+
+    def is_active(self):
+        return self.process is not None
+
+    def wait_until_booted(self, timeout=BOOT_WAIT_TIMEOUT):
+        # uvc_handler opens its control socket once the device is up; the process exiting means the start failed
+        if not self.control_socket_path:
+            return self.is_active()
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            process = self.process
+            if process is None or process.poll() is not None:
+                return False
+            try:
+                if control_socket.send_request(self.control_socket_path, "ping", timeout=1.0).get("ok"):
+                    return True
+            except (OSError, ValueError):
+                pass
+            time.sleep(BOOT_POLL_INTERVAL)
+        return False
+
+    def close(self):
+        self._closed = True # No more standby respawns from here on
+        if self.process is not None:
+            self.stop()
+        if self._standby_worker is not None:
+            print("[CameraBackend] Closing standby uvc_handler worker...")
+            self._standby_worker.close()
+            self._standby_worker = None
+
+
+def _default_inprocess_camera_factory(profile_name=None, device_id=None):
+    # Imported lazily: depthai is only needed once the camera actually starts.
+    from src import uvc_handler
+    from src import camera_profiles
+    profile = camera_profiles.get_profile(profile_name or camera_profiles.DEFAULT_PROFILE_NAME)
+    return uvc_handler.UVCCamera(profile=profile, device_id=device_id)
+
+
+class InProcessCameraBackend(CameraBackend):
+    """
+    Runs UVCCamera on a dedicated thread inside the manager process.
+    Avoids a second interpreter (and its depthai import) and the SIGINT/wait round-trips.
+    """
+    name = BACKEND_INPROCESS
+
+    def __init__(self, camera_factory=None, start_timeout=STOP_GRACE_TIMEOUT, profile_name=None, device_id=None):
+        self.profile_name = profile_name
+        self.device_id = device_id
+        if camera_factory is None:
+            self.camera_factory = lambda: _default_inprocess_camera_factory(profile_name, device_id)
+            self._default_factory = True
+        else:
+            self.camera_factory = camera_factory
+            self._default_factory = False
+        self.start_timeout = start_timeout
+        self.camera = None
+        self.error = None
+        self._thread = None
+        self._started = threading.Event()
+        self._stop_requested = threading.Event()
+
+    def prepare(self):
+        if self._default_factory:
+            try:
+                from src import uvc_handler
+                uvc_handler._load_depthai() # Pay the depthai import before the first hot-plug
+            except Exception as e:
+                print(f"[CameraBackend] Failed to pre-import uvc_handler: {e}")
+
+    def start(self, start_trace=None):
+        if self.is_active():
+            return
+        self.error = None
+        self._started.clear()
+        self._stop_requested.clear()
+        if start_trace is not None:
+            start_trace.info.update(backend=self.name, start_mode="thread")
+            start_trace.mark("spawn")
+        self._thread = threading.Thread(target=self._run_camera, args=(start_trace,),
+                                        name=f"uvc-camera-{self.device_id}" if self.device_id else "uvc-camera", daemon=True)
+        self._thread.start()
+        # Wait for the device to come up (or fail) so errors surface to the caller like a failed spawn would.
+        self._started.wait(timeout=self.start_timeout)
+        if self.error is not None:
+            error, self.error = self.error, None
+            self._thread.join(timeout=STOP_FORCE_TIMEOUT)
+            self._thread = None
+            raise error
+
+    def _run_camera(self, start_trace=None):
+        if start_trace is not None:
+            start_trace.mark("process_start")
+        try:
+            self.camera = self.camera_factory()
+            self.camera.start_trace = start_trace
+            self.camera.start()
+            print("[CameraBackend] In-process camera started.")
+        except Exception as e:
+            self.error = e
+            if start_trace is not None:
+                start_metrics.append_record(start_trace.record(ok=False, error=str(e)))
+        finally:
+            self._started.set()
+        try:
+            if self.error is None:
+                if start_trace is not None:
+                    # Awaited on its own thread so a stop request is never held up by it
+                    threading.Thread(target=self._finish_start_trace, args=(self.camera, start_trace),
+                                     name="start-metrics", daemon=True).start()
+                self._stop_requested.wait()
+        finally:
+            try:
+                if self.camera is not None:
+                    self.camera.stop()
+            except Exception as e_stop:
+                print(f"[CameraBackend] Error during camera.stop(): {e_stop}")
+            self.camera = None
+
+    def _finish_start_trace(self, camera, start_trace):
+        camera.start_trace = None
+        first_frame = camera.wait_for_first_frame()
+        ok = isinstance(first_frame, float)
+        if ok:
+            start_trace.mark("first_frame", first_frame)
+        print(f"[CameraBackend] {start_trace.describe()}")
+        start_metrics.append_record(start_trace.record(ok=ok, error=None if ok else "no first frame"))
+
+    def stop(self):
+        if self._thread is None:
+            return True
+        timing = PhaseTimer("[CameraBackend] Stop")
+        self._stop_requested.set()
+        self._thread.join(timeout=STOP_GRACE_TIMEOUT)
+        graceful = not self._thread.is_alive()
+        timing.mark("camera thread exit" if graceful else "grace timeout")
+        self.last_stop_timing = timing
+        if not graceful:
+            print("[CameraBackend] In-process camera thread did not exit in time; abandoning it.")
+        self._thread = None
+        return graceful
+
+    def is_active(self):
+        return self._thread is not None
+
+    def close(self):
+        self.stop()
+
+
+CAMERA_BACKENDS = {
+    BACKEND_SUBPROCESS: SubprocessCameraBackend,
+    BACKEND_INPROCESS: InProcessCameraBackend,
+}
+
+
+def create_camera_backend(name, **options):
+    """
+    Creates a backend by name. Options not understood by the backend are ignored.
+    device_id binds the backend to one device and gives it a control socket of its own.
+    """
+    device_id = options.get("device_id")
+    if name == BACKEND_SUBPROCESS:
+        socket_path = control_socket.socket_path_for_device(device_id) if device_id else control_socket.DEFAULT_CONTROL_SOCKET
+        return SubprocessCameraBackend(start_mode=options.get("start_mode") or uvc_launcher.START_MODE_COLD,
+                                       profile_name=options.get("profile_name"),
+                                       control_socket_path=socket_path, device_id=device_id)
+    if name == BACKEND_INPROCESS:
+        return InProcessCameraBackend(profile_name=options.get("profile_name"), device_id=device_id)
+    raise ValueError(f"Unknown camera backend '{name}'. Available: {', '.join(CAMERA_BACKENDS)}")
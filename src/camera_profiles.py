@@ -0,0 +1,189 @@
+from dataclasses import dataclass, replace
+
+try:
+    from src.pipeline_factory import CameraProfile, ENCODING_MJPEG, ENCODINGS
+except ImportError:
+    from pipeline_factory import CameraProfile, ENCODING_MJPEG, ENCODINGS # Run as a script (python3 src/uvc_handler.py)
+
+# Named profiles selectable from the uvc_handler.py CLI (--profile) and DeviceConnectionManager
+PROFILES = {
+    "720p60": CameraProfile(
+        sensor_resolution="THE_1080_P",
+        isp_scale=(2, 3), # 1920x1080 -> 1280x720
+        fps=60,
+        uvc_width=1280,
+        uvc_height=720,
+        camera_name="MinimalUVCCam_720p60",
+    ),
+    "1080p30": CameraProfile(
+        sensor_resolution="THE_1080_P",
+        fps=30,
+        camera_name="MinimalUVCCam_1080p",
+    ),
+    "4k-downscaled": CameraProfile(
+        sensor_resolution="THE_4_K",
+        isp_scale=(1, 2), # 4K downscaled to 1080p
+        fps=30,
+        camera_name="FlashedCam_1080p_NV12",
+    ),
+    "1080p30-mjpeg": CameraProfile(
+        sensor_resolution="THE_1080_P",
+        fps=30,
+        camera_name="MinimalUVCCam_1080p_MJPEG",
+        encoding=ENCODING_MJPEG,
+    ),
+    "720p60-mjpeg": CameraProfile(
+        sensor_resolution="THE_1080_P",
+        isp_scale=(2, 3),
+        fps=60,
+        uvc_width=1280,
+        uvc_height=720,
+        camera_name="MinimalUVCCam_720p60_MJPEG",
+        encoding=ENCODING_MJPEG,
+    ),
+}
+DEFAULT_PROFILE_NAME = "1080p30"
+
+# Bytes per pixel of the uncompressed UVC frame types
+BYTES_PER_PIXEL = {
+    "NV12": 1.5,
+    "YUV420p": 1.5,
+    "RGB888i": 3.0,
+}
+
+# Approximate MJPEG size (bytes per pixel) at a few quality settings; interpolated in between.
+# Real sizes depend on scene detail, so treat these as typical-case figures.
+MJPEG_BYTES_PER_PIXEL = (
+    (1, 0.02),
+    (50, 0.08),
+    (80, 0.15),
+    (95, 0.30),
+    (100, 0.60),
+)
+
+# Usable payload bandwidth per link type (bytes/s). These are practical UVC figures, not signalling rates:
+# USB2 high-speed isochronous tops out at 3 x 1024 bytes per 125 us microframe (~24.5 MB/s),
+# USB3 Gen1 is 5 Gbit/s on the wire but ~350 MB/s is a realistic sustained payload.
+LINK_CAPACITY = {
+    "usb2": 24_576_000,
+    "usb3": 350_000_000,
+}
+# Keep this much of the link free for other traffic (control transfers, other devices on the hub)
+LINK_HEADROOM = 0.8
+
+# Rough single-core host throughput (megapixels/s) for turning a frame into something displayable.
+# Raw NV12 only needs a color conversion; MJPEG needs a real decode on the host.
+HOST_MEGAPIXELS_PER_CORE = {
+    "NV12": 1500.0,
+    "YUV420p": 1500.0,
+    "RGB888i": 3000.0,
+    "MJPEG": 150.0,
+}
+
+
+@dataclass(frozen=True)
+class BandwidthEstimate:
+    profile_name: str
+    link: str
+    bytes_per_frame: int
+    bytes_per_second: float
+    link_capacity: float
+    utilization: float           # fraction of the usable link capacity
+    fits: bool                   # utilization within LINK_HEADROOM
+    host_megapixels_per_second: float
+    host_cpu_cores: float        # estimated cores busy converting/decoding on the host
+
+    def describe(self):
+        verdict = "fits" if self.fits else "does NOT fit"
+        return (f"{self.profile_name}: {self.bytes_per_second / 1e6:.1f} MB/s on {self.link} "
+                f"({self.utilization * 100:.0f}% of {self.link_capacity / 1e6:.1f} MB/s, {verdict}); "
+                f"host ~{self.host_cpu_cores:.2f} cores for {self.host_megapixels_per_second:.0f} MP/s")
+
+
+def list_profiles():
+    return list(PROFILES)
+
+
+def get_profile(name):
+    try:
+        return PROFILES[name]
+    except KeyError:
+        raise ValueError(f"Unknown camera profile '{name}'. Available: {', '.join(PROFILES)}") from None
+
+
+def profile_name_of(profile):
+    for name, registered in PROFILES.items():
+        if registered == profile:
+            return name
+    return profile.camera_name
+
+
+def with_encoding(profile, encoding=None, mjpeg_quality=None, bitrate_kbps=None):
+    """Returns the profile with its output encoding settings overridden (None keeps the profile's value)."""
+    changes = {}
+    if encoding is not None:
+        if encoding not in ENCODINGS:
+            raise ValueError(f"Unknown encoding '{encoding}'. Available: {', '.join(ENCODINGS)}")
+        changes["encoding"] = encoding
+    if mjpeg_quality is not None:
+        if not 1 <= mjpeg_quality <= 100:
+            raise ValueError(f"MJPEG quality must be between 1 and 100, got {mjpeg_quality}")
+        changes["mjpeg_quality"] = mjpeg_quality
+    if bitrate_kbps is not None:
+        changes["bitrate_kbps"] = bitrate_kbps or None # 0 turns the bitrate target off
+    return replace(profile, **changes) if changes else profile
+
+
+def _mjpeg_bytes_per_pixel(quality):
+    for (q0, b0), (q1, b1) in zip(MJPEG_BYTES_PER_PIXEL, MJPEG_BYTES_PER_PIXEL[1:]):
+        if quality <= q1:
+            return b0 + (b1 - b0) * (max(quality, q0) - q0) / (q1 - q0)
+    return MJPEG_BYTES_PER_PIXEL[-1][1]
+
+
+def frame_bytes(profile):
+    """Payload size of one UVC frame in bytes (typical size for compressed output)."""
+    pixels = profile.uvc_width * profile.uvc_height
+    if profile.encoding == ENCODING_MJPEG:
+        if profile.bitrate_kbps:
+            return int(profile.bitrate_kbps * 1000 / 8 / profile.fps)
+        return int(pixels * _mjpeg_bytes_per_pixel(profile.mjpeg_quality))
+    return int(pixels * BYTES_PER_PIXEL[profile.frame_type])
+
+
+def estimate_bandwidth(profile, link="usb3"):
+    """Estimates the USB bandwidth and host cost of streaming a profile over the given link type."""
+    if isinstance(profile, str):
+        name, profile = profile, get_profile(profile)
+    else:
+        name = profile_name_of(profile)
+    if link not in LINK_CAPACITY:
+        raise ValueError(f"Unknown link type '{link}'. Available: {', '.join(LINK_CAPACITY)}")
+
+    per_frame = frame_bytes(profile)
+    per_second = per_frame * profile.fps
+    capacity = LINK_CAPACITY[link]
+    utilization = per_second / capacity
+    megapixels = profile.uvc_width * profile.uvc_height * profile.fps / 1e6
+    return BandwidthEstimate(
+        profile_name=name,
+        link=link,
+        bytes_per_frame=per_frame,
+        bytes_per_second=per_second,
+        link_capacity=capacity,
+        utilization=utilization,
+        fits=utilization <= LINK_HEADROOM,
+        host_megapixels_per_second=megapixels,
+        host_cpu_cores=megapixels / HOST_MEGAPIXELS_PER_CORE[
+            "MJPEG" if profile.encoding == ENCODING_MJPEG else profile.frame_type],
+    )
+
+
+def estimate_shared_link(profiles, link="usb3"):
+    """
+    Estimates several cameras sharing one link (e.g. one hub / root port).
+    Returns (per-camera estimates, total bytes/s, fits).
+    """
+    estimates = [estimate_bandwidth(profile, link) for profile in profiles]
+    total = sum(e.bytes_per_second for e in estimates)
+    return estimates, total, total <= LINK_CAPACITY[link] * LINK_HEADROOM
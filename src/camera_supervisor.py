@@ -0,0 +1,89 @@
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+# Tasks running longer than this are logged (a slow stop delays the events queued behind it)
+SLOW_TASK_WARNING = 1.0
+
+
+def _task_name(fn):
+    return getattr(fn, "__qualname__", None) or getattr(fn, "__name__", None) or repr(fn)
+
+
+class InlineSupervisor:
+    """
+    Runs every task immediately on the caller's thread. Same interface as CameraSupervisor, for callers
+    (tests, scripts) that want DeviceConnectionManager to act synchronously.
+    """
+    def submit(self, fn, *args, **kwargs):
+        future = Future()
+        _execute(future, fn, args, kwargs, queued_at=None)
+        return future
+
+    def is_supervisor_thread(self):
+        return True
+
+    def close(self, timeout=None):
+        pass
+
+
+class CameraSupervisor:
+    """
+    Actor thread that owns DeviceConnectionManager's state. USB events, menu actions and boot completions
+    are queued as tasks and run one at a time in submission order, so a camera stop that waits seconds
+    for uvc_handler to exit never blocks the IOKit callback or the menu bar. submit() returns a Future.
+    A task submitted from the supervisor thread itself runs inline, in the order the code reads.
+    """
+    def __init__(self, name="camera-supervisor"):
+        self._queue = queue.SimpleQueue()
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self._thread.start()
+
+    def submit(self, fn, *args, **kwargs):
+        future = Future()
+        if self.is_supervisor_thread():
+            _execute(future, fn, args, kwargs, queued_at=None)
+        elif self._closed:
+            future.set_exception(RuntimeError("Camera supervisor is closed"))
+        else:
+            self._queue.put((future, fn, args, kwargs, time.monotonic()))
+        return future
+
+    def is_supervisor_thread(self):
+        return threading.current_thread() is self._thread
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                break
+            future, fn, args, kwargs, queued_at = item
+            _execute(future, fn, args, kwargs, queued_at)
+
+    def close(self, timeout=None):
+        """Runs the tasks already queued, then stops the thread."""
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(None)
+        if not self.is_supervisor_thread():
+            self._thread.join(timeout)
+
+
+def _execute(future, fn, args, kwargs, queued_at):
+    if not future.set_running_or_notify_cancel():
+        return
+    started_at = time.monotonic()
+    try:
+        result = fn(*args, **kwargs)
+    except BaseException as e:
+        print(f"[CameraSupervisor] Task {_task_name(fn)} failed: {e!r}")
+        future.set_exception(e)
+    else:
+        future.set_result(result)
+    elapsed = time.monotonic() - started_at
+    if elapsed >= SLOW_TASK_WARNING:
+        waited = f", queued {started_at - queued_at:.2f} s" if queued_at is not None else ""
+        print(f"[CameraSupervisor] Task {_task_name(fn)} took {elapsed:.2f} s{waited}")
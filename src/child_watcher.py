@@ -0,0 +1,250 @@
+import os
+import select
+import selectors
+import signal
+import threading
+import time
+
+try:
+    from src import tracing
+except ImportError:
+    import tracing # Run as a script
+
+# How a process exit is noticed, in order of preference. None of them polls.
+METHOD_SENTINEL = "sentinel"  # multiprocessing.Process.sentinel (forkserver children), readable at exit
+METHOD_PIDFD = "pidfd"        # Linux 5.3+: os.pidfd_open(), readable once the process exits
+METHOD_KQUEUE = "kqueue"      # macOS/BSD: EVFILT_PROC with NOTE_EXIT
+METHOD_WAIT = "wait"          # Fallback: a thread blocked in process.wait()
+METHOD_EXITED = "exited"      # Not watched: it had already exited, and was reported from watch() itself
+REAP_TIMEOUT = 1.0            # The exit is signalled before the kernel hands out the status; wait at most this
+
+
+def describe_returncode(returncode):
+    """Cause of an exit from a Popen-style return code (negative: killed by that signal)."""
+    if returncode is None:
+        return "exited (status unknown)"
+    if returncode < 0:
+        try:
+            return f"killed by {signal.Signals(-returncode).name}"
+        except ValueError:
+            return f"killed by signal {-returncode}"
+    if returncode == 0:
+        return "exited normally"
+    return f"exited with status {returncode}"
+
+
+class ChildExit:
+    """Exit of a watched process: return code, runtime and cause."""
+    def __init__(self, pid, returncode, started_at, exited_at, label=None, method=None):
+        self.pid = pid
+        self.returncode = returncode
+        self.started_at = started_at
+        self.exited_at = exited_at
+        self.label = label or "process"
+        self.method = method  # how the exit was noticed (METHOD_*)
+
+    @property
+    def runtime(self):
+        return self.exited_at - self.started_at
+
+    @property
+    def cause(self):
+        return describe_returncode(self.returncode)
+
+    def describe(self):
+        return f"{self.label} (pid {self.pid}) {self.cause} after {self.runtime:.1f} s"
+
+    def to_dict(self):
+        return {"pid": self.pid, "label": self.label, "returncode": self.returncode, "cause": self.cause,
+                "runtime_s": round(self.runtime, 3), "method": self.method}
+
+
+class _Watch:
+    def __init__(self, process, callback, label, started_at, method):
+        self.process = process
+        self.callback = callback
+        self.label = label
+        self.started_at = started_at
+        self.method = method
+        self.fd = None  # pidfd this watcher owns (closed on removal)
+
+
+class ChildWatcher:
+    """
+    Reports the exit of child processes (Popen, or the forkserver's ForkedCameraProcess) as soon as it
+    happens, on one thread that sleeps in select() until a process ends: a pidfd on Linux, a kqueue
+    NOTE_EXIT filter on macOS, or a multiprocessing sentinel. callback(ChildExit) runs on that thread
+    once the process has been reaped. Processes that stop being interesting (a stop was requested)
+    are unwatched first, so only unexpected exits are reported.
+    """
+    def __init__(self, clock=time.monotonic):
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._watches = {}  # pid -> _Watch
+        self._selector = None
+        self._kqueue = None
+        self._thread = None
+        self._wake_r = self._wake_w = None
+        self._closed = False
+
+    def watch(self, process, callback, label=None):
+        """
+        Starts watching process; returns the method used (METHOD_*), None if it has no pid to watch.
+        A process already watched under the same pid (a stale handle) is replaced.
+        """
+        if not isinstance(getattr(process, "pid", None), int):
+            return None
+        watch = _Watch(process, callback, label, self.clock(), None)
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("ChildWatcher is closed")
+            self._ensure_thread()
+            previous = self._watches.pop(process.pid, None)
+            if previous is not None:
+                self._unregister(previous)
+            self._watches[process.pid] = watch
+            try:
+                watch.method = self._register(watch)
+            except ProcessLookupError:
+                watch.method = METHOD_EXITED # Already gone: reported below, outside the lock
+            except Exception:
+                del self._watches[process.pid]
+                raise
+        if watch.method == METHOD_EXITED:
+            self._exited(process.pid)
+        return watch.method
+
+    def unwatch(self, process):
+        """Stops watching process (no callback). Returns False if it was not watched (or has already exited)."""
+        with self._lock:
+            watch = self._watches.pop(process.pid, None)
+            if watch is None or watch.process is not process:
+                if watch is not None:
+                    self._watches[process.pid] = watch
+                return False
+            self._unregister(watch)
+        return True
+
+    def watched(self):
+        with self._lock:
+            return {pid: watch.method for pid, watch in self._watches.items()}
+
+    def close(self):
+        with self._lock:
+            self._closed = True
+            for watch in self._watches.values():
+                self._unregister(watch)
+            self._watches.clear()
+            thread = self._thread
+            if self._wake_w is not None:
+                os.write(self._wake_w, b"\0")
+        if thread is not None:
+            thread.join(timeout=REAP_TIMEOUT)
+
+    # --- Registration (called with the lock held) ---
+    def _ensure_thread(self):
+        if self._thread is not None:
+            return
+        self._selector = selectors.DefaultSelector()
+        self._wake_r, self._wake_w = os.pipe()
+        self._selector.register(self._wake_r, selectors.EVENT_READ, None)
+        if not hasattr(os, "pidfd_open") and hasattr(select, "kqueue"):
+            self._kqueue = select.kqueue() # Its fd turns readable when a process event is pending
+            self._selector.register(self._kqueue.fileno(), selectors.EVENT_READ, METHOD_KQUEUE)
+        self._thread = threading.Thread(target=self._run, name="child-watcher", daemon=True)
+        self._thread.start()
+
+    def _register(self, watch):
+        pid = watch.process.pid
+        sentinel = getattr(watch.process, "sentinel", None)
+        if isinstance(sentinel, int):
+            self._selector.register(sentinel, selectors.EVENT_READ, pid)
+            return METHOD_SENTINEL
+        if hasattr(os, "pidfd_open"):
+            try:
+                watch.fd = os.pidfd_open(pid)
+            except ProcessLookupError:
+                raise
+            except OSError: # Kernel without pidfd_open (ENOSYS)
+                watch.fd = None
+            if watch.fd is not None:
+                self._selector.register(watch.fd, selectors.EVENT_READ, pid)
+                return METHOD_PIDFD
+        if self._kqueue is not None:
+            event = select.kevent(pid, filter=select.KQ_FILTER_PROC,
+                                  flags=select.KQ_EV_ADD | select.KQ_EV_ONESHOT, fflags=select.KQ_NOTE_EXIT)
+            self._kqueue.control([event], 0, 0) # ProcessLookupError if it has already exited
+            return METHOD_KQUEUE
+        threading.Thread(target=self._wait_for_exit, args=(watch.process,), name=f"child-wait-{pid}",
+                         daemon=True).start()
+        return METHOD_WAIT
+
+    def _unregister(self, watch):
+        if watch.method == METHOD_SENTINEL:
+            self._selector.unregister(watch.process.sentinel)
+        elif watch.method == METHOD_PIDFD:
+            self._selector.unregister(watch.fd)
+            os.close(watch.fd)
+            watch.fd = None
+        # A kqueue filter is one-shot and goes away with the process; a waiting thread simply finds
+        # the process unwatched.
+
+    # --- Watcher thread ---
+    def _run(self):
+        while True:
+            for key, _ in self._selector.select():
+                if key.fd == self._wake_r:
+                    os.read(self._wake_r, 512)
+                elif key.data == METHOD_KQUEUE:
+                    for event in self._kqueue.control(None, 64, 0):
+                        self._exited(event.ident)
+                else:
+                    self._exited(key.data)
+            with self._lock:
+                if self._closed:
+                    self._selector.close()
+                    os.close(self._wake_r)
+                    os.close(self._wake_w)
+                    if self._kqueue is not None:
+                        self._kqueue.close()
+                    return
+
+    def _wait_for_exit(self, process):
+        try:
+            process.wait()
+        except Exception:
+            pass
+        self._exited(process.pid)
+
+    def _exited(self, pid):
+        exited_at = self.clock()
+        with self._lock:
+            watch = self._watches.pop(pid, None)
+            if watch is None:
+                return # Unwatched in the meantime (a stop was requested)
+            self._unregister(watch)
+        returncode = watch.process.poll()
+        if returncode is None:
+            try:
+                returncode = watch.process.wait(timeout=REAP_TIMEOUT)
+            except Exception:
+                returncode = None
+        exit_info = ChildExit(pid, returncode, watch.started_at, exited_at, watch.label, watch.method)
+        tracing.info("child_watcher", "%s", exit_info.describe(), method=watch.method)
+        try:
+            watch.callback(exit_info)
+        except Exception as e:
+            tracing.error("child_watcher", "Exception in exit callback of pid %d: %r", pid, e)
+
+
+_default_watcher = None
+_default_watcher_lock = threading.Lock()
+
+
+def default_watcher():
+    """The process-wide watcher the camera backends share (one thread for every camera process)."""
+    global _default_watcher
+    with _default_watcher_lock:
+        if _default_watcher is None:
+            _default_watcher = ChildWatcher()
+        return _default_watcher
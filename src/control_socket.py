@@ -0,0 +1,154 @@
+import json
+import os
+import socket
+import socketserver
+import tempfile
+import threading
+
+# Default socket path of a uvc_handler.py process (override with --control-socket or OAKD_CONTROL_SOCKET)
+DEFAULT_CONTROL_SOCKET = os.environ.get("OAKD_CONTROL_SOCKET",
+                                        os.path.join(tempfile.gettempdir(), "oakd-uvc-control.sock"))
+MAX_REQUEST_BYTES = 64 * 1024
+# serve_forever() poll interval; also bounds how long stop() waits for the server thread (seconds)
+SERVER_POLL_INTERVAL = 0.05
+
+# Protocol: one JSON object per line in each direction.
+#   request:  {"command": "ping" | "status" | "restart_pipeline" | "set_controls", ...parameters}
+#   response: {"ok": true, ...result} or {"ok": false, "error": "..."}
+
+
+class ControlError(Exception):
+    """Raised by command handlers for a request that cannot be carried out (reported as ok=false)."""
+    pass
+
+
+class ControlSocketInUse(OSError):
+    """Raised by ControlServer.start() when another process is still serving the socket path."""
+    pass
+
+
+class _ControlRequestHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        # Several requests may be sent over one connection
+        while True:
+            line = self.rfile.readline(MAX_REQUEST_BYTES)
+            if not line:
+                return
+            if not line.strip():
+                continue
+            response = self.server.control_server.dispatch(line)
+            self.wfile.write(json.dumps(response).encode("utf-8") + b"\n")
+            self.wfile.flush()
+
+
+class _UnixServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+class ControlServer:
+    """
+    Local Unix-domain control socket for a running camera.
+    `handlers` maps command names to callables taking the request dict and returning a result dict.
+    Requests are served on a background thread; handlers must be thread-safe.
+    """
+    def __init__(self, socket_path, handlers):
+        self.socket_path = socket_path
+        self.handlers = dict(handlers)
+        self.handlers.setdefault("ping", lambda request: {"pong": True})
+        self._server = None
+        self._thread = None
+
+    def start(self):
+        self._remove_stale_socket()
+        self._server = _UnixServer(self.socket_path, _ControlRequestHandler)
+        self._server.control_server = self
+        os.chmod(self.socket_path, 0o600) # Only the current user may control the camera
+        self._thread = threading.Thread(target=self._server.serve_forever, args=(SERVER_POLL_INTERVAL,),
+                                        name="uvc-control", daemon=True)
+        self._thread.start()
+
+    def _remove_stale_socket(self):
+        # Only a socket nobody accepts on is left over from a process that did not clean up;
+        # unlinking a live one would silently take the control endpoint away from its camera.
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as probe:
+            try:
+                probe.connect(self.socket_path)
+            except FileNotFoundError:
+                return
+            except ConnectionRefusedError:
+                os.unlink(self.socket_path)
+                return
+        raise ControlSocketInUse(f"Control socket {self.socket_path} is in use by another uvc_handler "
+                                 "(use --control-socket to choose another path)")
+
+    def dispatch(self, line):
+        try:
+            request = json.loads(line)
+            if not isinstance(request, dict):
+                raise ControlError("Request must be a JSON object")
+            command = request.get("command")
+            handler = self.handlers.get(command)
+            if handler is None:
+                raise ControlError(f"Unknown command '{command}'. Available: {', '.join(sorted(self.handlers))}")
+            result = handler(request) or {}
+            return {"ok": True, **result}
+        except (ControlError, ValueError) as e:
+            return {"ok": False, "error": str(e)}
+        except Exception as e:
+            return {"ok": False, "error": f"{type(e).__name__}: {e}"}
+
+    def stop(self):
+        if self._server is None:
+            return
+        self._server.shutdown()
+        self._server.server_close()
+        self._server = None
+        self._thread = None
+        try:
+            os.unlink(self.socket_path)
+        except FileNotFoundError:
+            pass
+
+
+def socket_path_for_device(device_id, base_path=DEFAULT_CONTROL_SOCKET):
+    """Control socket path of the camera bound to one device, when several run on one host."""
+    root, ext = os.path.splitext(base_path)
+    safe_id = "".join(c if c.isalnum() else "_" for c in device_id)
+    return f"{root}-{safe_id}{ext}"
+
+
+def send_request(socket_path, command, timeout=5.0, **params):
+    """Sends one request to a uvc_handler control socket and returns the decoded response."""
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.settimeout(timeout)
+        sock.connect(socket_path)
+        sock.sendall(json.dumps({"command": command, **params}).encode("utf-8") + b"\n")
+        with sock.makefile("rb") as stream:
+            line = stream.readline(MAX_REQUEST_BYTES)
+    if not line:
+        raise ConnectionError(f"No response from control socket {socket_path}")
+    return json.loads(line)
+
+
+def main():
+    # Small command line client, e.g.:
+    #   python3 src/control_socket.py status
+    #   python3 src/control_socket.py set_controls '{"exposure_us": 10000, "iso": 400}'
+    import argparse
+    parser = argparse.ArgumentParser(description="Send a command to a running uvc_handler.py")
+    parser.add_argument('command', help="ping, status, restart_pipeline or set_controls")
+    parser.add_argument('controls', nargs='?', help="JSON object of camera controls (for set_controls)")
+    parser.add_argument('--socket', default=None, help=f"Control socket path (default: {DEFAULT_CONTROL_SOCKET})")
+    parser.add_argument('--device', default=None, metavar="MXID", help="Talk to the camera of this device (multi-device mode)")
+    parser.add_argument('--timeout', type=float, default=35.0)
+    args = parser.parse_args()
+
+    params = {"controls": json.loads(args.controls)} if args.controls else {}
+    socket_path = args.socket or (socket_path_for_device(args.device) if args.device else DEFAULT_CONTROL_SOCKET)
+    response = send_request(socket_path, args.command, timeout=args.timeout, **params)
+    print(json.dumps(response, indent=2))
+    raise SystemExit(0 if response.get("ok") else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,122 +1,423 @@
-import subprocess
+import collections
 import os
-import signal
 import threading
 import time # For testing/demonstration if needed
 
 # Import the Cython wrapper
-from src import iokit_wrapper # Assuming iokit_wrapper.pyx is compiled into src package
+try:
+    from src import iokit_wrapper # Assuming iokit_wrapper.pyx is compiled into src package
+except ImportError:
+    iokit_wrapper = None # Not built (Linux hosts); the uevent monitor in usb_monitors is used instead
+from src import uvc_launcher
+from src import camera_backends
+from src import camera_profiles
+from src import control_socket
+from src import start_metrics
+from src import event_coalescer
+from src import device_state
+from src import boot_scheduler
+from src import camera_supervisor
+from src import registry_index
+from src import device_registry
+from src import usb_monitors
+from src import tracing
 
 # Define OAK-D Lite's Vendor ID and Product ID
 OAK_D_LITE_VENDOR_ID = 0x03e7
-OAK_D_LITE_PRODUCT_ID = 0x2485
+OAK_D_LITE_PRODUCT_ID = device_state.PID_UNBOOTED
+# The monitor matches every OAK product ID, so a device can be followed through its boot
+MONITOR_ANY_PRODUCT_ID = 0
 
 class USBEventHandler:
     """
-    Handles callbacks from the Cython IOKit wrapper when USB events occur.
+    Handles callbacks from the USB monitor (IOKit notifications, or kernel uevents on Linux) when USB events occur.
+    Events for the target device go through an EventCoalescer, so a burst of connect/disconnect
+    events (re-enumeration while the device boots, a flaky cable) becomes one net transition.
+    Transitions are handed to the manager's supervisor, so the monitor thread never waits on a camera.
     """
-    def __init__(self, manager_ref):
+    def __init__(self, manager_ref, settle_window=0.0):
         self.manager = manager_ref # Reference to DeviceConnectionManager instance
-
-    def on_device_connected(self, vendor_id, product_id, serial_number, service_id):
-        # This method is called from the Cython layer (IOKit event thread)
-        print(f"[DCM - USBEventHandler] on_device_connected: Start. VID={vendor_id:04x}, PID={product_id:04x}, SN='{serial_number}', ServiceID={service_id}")
-        
-        # Check if it's the OAK-D Lite device we are interested in
-        if vendor_id == OAK_D_LITE_VENDOR_ID and product_id == OAK_D_LITE_PRODUCT_ID:
-            self.manager.connected_target_device_info = {
+        self.coalescer = event_coalescer.EventCoalescer(
+            settle_window,
+            lambda event: self.manager.supervisor.submit(self._apply_transition, event),
+            lambda event: self.manager.supervisor.submit(self._apply_refresh, event),
+            clock=start_metrics.now)
+
+    @staticmethod
+    def device_key(serial_number, service_id, location_id=None):
+        return device_state.device_key(serial_number, service_id, location_id)
+
+    @staticmethod
+    def is_target_device(vendor_id, product_id):
+        return vendor_id == OAK_D_LITE_VENDOR_ID and product_id in device_state.OAK_PRODUCT_IDS
+
+    def on_device_connected(self, vendor_id, product_id, serial_number, service_id, location_id=None,
+                            event_time=None):
+        # Called from the USB monitor's event thread (for IOKit: the worker behind the callback's event queue).
+        # event_time is when the IOKit callback saw the device; start timing runs from there.
+        if event_time is None:
+            event_time = start_metrics.now() # Earliest point the manager knows about the device (start timing)
+        tracing.debug("DCM - USBEventHandler", "on_device_connected: Start. VID=%04x, PID=%04x, SN='%s', ServiceID=%s",
+                      vendor_id, product_id, serial_number, service_id)
+
+        # Check if it's the OAK-D Lite device we are interested in (in any of its boot states)
+        if self.is_target_device(vendor_id, product_id):
+            device_info = {
                 'vendor_id': vendor_id,
                 'product_id': product_id,
                 'serial_number': serial_number,
-                'service_id': service_id
+                'service_id': service_id,
+                'location_id': location_id
             }
-            print(f"DCM: Target device connected. Stored info: {self.manager.connected_target_device_info}")
-            self.manager.notify_ui_callback("OAK-D Status", "Device Connected", f"OAK-D Lite (SN: {serial_number}) detected.")
-            if self.manager.auto_mode_enabled and not self.manager.camera_running:
-                self.manager.notify_ui_callback("OAK-D Auto Control", "Starting Camera", "Device connected, auto-starting camera.")
-                self.manager.start_camera_action() # Call manager's method
-            elif not self.manager.camera_running:
-                print("DCM: Device connected, auto mode is off, camera not started by auto-mode.")
-            self.manager._update_status_label_based_on_state()
+            self.coalescer.submit(self.device_key(serial_number, service_id, location_id), True, device_info, event_time)
         else:
-            print(f"DCM: Connected device (VID:{vendor_id:04x}, PID:{product_id:04x}) is not the target OAK-D Lite.")
-        print(f"[DCM - USBEventHandler] on_device_connected: End. VID={vendor_id:04x}, PID={product_id:04x}")
-
-
-    def on_device_disconnected(self, vendor_id, product_id, serial_number, service_id):
-        # This method is called from the Cython layer (IOKit event thread)
-        print(f"[PY EVENT HANDLER] Device Disconnected: VID={vendor_id:04x}, PID={product_id:04x}, SN='{serial_number}', ServiceID={service_id}")
-
-        if vendor_id == OAK_D_LITE_VENDOR_ID and product_id == OAK_D_LITE_PRODUCT_ID:
-            # Clear the stored device info if the target device is disconnected
-            if self.manager.connected_target_device_info and \
-               self.manager.connected_target_device_info.get('service_id') == service_id:
-                print(f"DCM: Target device disconnected. Clearing stored info for ServiceID: {service_id}")
-                self.manager.connected_target_device_info = None
-            
-            self.manager.notify_ui_callback("OAK-D Status", "Device Disconnected", f"OAK-D Lite (SN: {serial_number}) disconnected.")
-            if self.manager.camera_running:
-                # Regardless of auto_mode, if camera is running for this device, stop it.
-                self.manager.notify_ui_callback("OAK-D Control", "Stopping Camera", "Device disconnected, stopping camera.")
-                self.manager.stop_camera_action() # Call manager's method
-            else:
-                print("DCM: Device disconnected, camera was not running.")
+            tracing.debug("DCM", "Connected device (VID:%04x, PID:%04x) is not the target OAK-D Lite.",
+                          vendor_id, product_id)
+        tracing.debug("DCM - USBEventHandler", "on_device_connected: End. VID=%04x, PID=%04x", vendor_id, product_id)
+
+
+    def on_device_disconnected(self, vendor_id, product_id, serial_number, service_id, location_id=None,
+                               event_time=None):
+        # Called from the USB monitor's event thread (for IOKit: the worker behind the callback's event queue)
+        tracing.debug("DCM - USBEventHandler", "on_device_disconnected: VID=%04x, PID=%04x, SN='%s', ServiceID=%s",
+                      vendor_id, product_id, serial_number, service_id)
+        if not self.is_target_device(vendor_id, product_id):
+            # The monitor may report a device it never saw connect by its service ID alone (VID/PID -1)
+            device = self.manager.device_registry.by_service_id(service_id)
+            if device is not None:
+                vendor_id, product_id = device.info['vendor_id'], device.info['product_id']
+                serial_number, location_id = device.info['serial_number'], device.info['location_id']
+
+        if self.is_target_device(vendor_id, product_id):
+            device_info = {
+                'vendor_id': vendor_id,
+                'product_id': product_id,
+                'serial_number': serial_number,
+                'service_id': service_id,
+                'location_id': location_id
+            }
+            self.coalescer.submit(self.device_key(serial_number, service_id, location_id), False, device_info,
+                                  event_time)
+        else:
+            tracing.debug("DCM", "Disconnected device (VID:%04x, PID:%04x) is not the target OAK-D Lite.",
+                          vendor_id, product_id)
+
+    def on_events_dropped(self, count):
+        # The USB monitor's event queue overflowed: rescan, so missed connects/disconnects are reconciled
+        tracing.warning("DCM", "The USB monitor dropped %d event(s); rescanning devices.", count)
+        self.manager.supervisor.submit(self.manager.reconcile_devices)
+
+    def _apply_transition(self, event):
+        # Called once per net transition (immediately when coalescing is off, else after the settle window)
+        if event.events > 1:
+            tracing.info("DCM", "Coalesced hot-plug burst %s", event) # describe() runs only if dumped
+        if event.state:
+            self._device_connected(event.key, event.payload, event.first_time)
+        else:
+            self._device_disconnected(event.key, event.payload)
+
+    def _apply_refresh(self, event):
+        # A burst that ended in the state it started from (e.g. unbooted -> booted re-enumeration):
+        # no start/stop, no notifications, but the device may now have another PID and service ID
+        tracing.info("DCM", "Hot-plug burst settled without a state change (%s).", event)
+        if event.state:
+            device, previous = self.manager.device_states.device_appeared(
+                event.key, event.payload['product_id'], event.payload['service_id'], event.payload['serial_number'])
+            self.manager.device_registry.connected(event.key, event.payload, current=False)
+            if device.state != previous:
+                tracing.info("DCM", "Device %s: %s -> %s", event.key, previous, device.state)
+
+    def _device_connected(self, key, device_info, event_time):
+        serial_number = device_info['serial_number']
+        device, previous = self.manager.device_states.device_appeared(
+            key, device_info['product_id'], device_info['service_id'], serial_number)
+        tracing.info("DCM", "Device %s: %s -> %s (PID %04x)", key, previous, device.state, device_info['product_id'])
+        self.manager.device_registry.connected(key, device_info)
+        if device.state == device_state.STATE_STREAMING:
+            # The device re-enumerated with the booted PID after our camera booted it: nothing to do
+            tracing.info("DCM", "Camera boot completed; device is streaming.")
             self.manager._update_status_label_based_on_state()
+            return
+        tracing.info("DCM", "Target device connected. Stored info: %s", device_info)
+        self.manager.notify_ui_callback("OAK-D Status", "Device Connected", f"OAK-D Lite (SN: {serial_number}) detected.")
+        if self.manager.multi_device:
+            # Every device gets its own session; boots are queued on the boot scheduler
+            self.manager.add_device_session(key, device_info)
+            if self.manager.auto_mode_enabled:
+                start_trace = start_metrics.StartTrace()
+                start_trace.mark("event_received", event_time)
+                self.manager.start_device_session(key, start_trace)
+        elif not self.manager.device_states.can_start(key):
+            # Booted by another process, flash-booted or in the bootloader: a start would fail to open it
+            tracing.info("DCM", "Device is %s; not starting the camera.", device.state)
+        elif self.manager.auto_mode_enabled and not self.manager.camera_running:
+            self.manager.notify_ui_callback("OAK-D Auto Control", "Starting Camera", "Device connected, auto-starting camera.")
+            start_trace = start_metrics.StartTrace()
+            start_trace.mark("event_received", event_time)
+            self.manager._pending_start_trace = start_trace
+            self.manager.start_camera_action() # Call manager's method
+        elif not self.manager.camera_running:
+            tracing.info("DCM", "Device connected, auto mode is off, camera not started by auto-mode.")
+        self.manager._update_status_label_based_on_state()
+
+    def _device_disconnected(self, key, device_info):
+        serial_number, service_id = device_info['serial_number'], device_info['service_id']
+        device, previous = self.manager.device_states.device_gone(key, device_info['product_id'])
+        if device is not None and device.state != device_state.STATE_GONE:
+            # The unbooted PID leaving while our camera boots the device (or a stale PID): not a disconnect
+            tracing.info("DCM", "Device %s left PID %04x while %s; ignoring.", key, device_info['product_id'], device.state)
+            return
+        tracing.info("DCM", "Device %s: %s -> %s", key, previous, device_state.STATE_GONE)
+        if self.manager.device_registry.disconnected(key) is not None:
+            tracing.info("DCM", "Target device disconnected. Removed %s (ServiceID: %s) from the device registry.",
+                         key, service_id)
+        
+        self.manager.notify_ui_callback("OAK-D Status", "Device Disconnected", f"OAK-D Lite (SN: {serial_number}) disconnected.")
+        if self.manager.multi_device:
+            self.manager.remove_device_session(key)
+        elif self.manager.camera_running and self.manager._camera_device_key not in (None, key):
+            tracing.info("DCM", "Camera is running on %s; keeping it.", self.manager._camera_device_key)
+        elif self.manager.camera_running:
+            # Regardless of auto_mode, if camera is running for this device, stop it.
+            self.manager.notify_ui_callback("OAK-D Control", "Stopping Camera", "Device disconnected, stopping camera.")
+            self.manager.stop_camera_action() # Call manager's method
         else:
-            print(f"DCM: Disconnected device (VID:{vendor_id:04x}, PID:{product_id:04x}) is not the target OAK-D Lite.")
+            tracing.info("DCM", "Device disconnected, camera was not running.")
+        self.manager._update_status_label_based_on_state()
+
+
+class _ScanCollector:
+    """Collects the devices reported by USBMonitor.scan (a full rescan)."""
+    def __init__(self):
+        self.devices = []
+
+    def on_device_connected(self, vendor_id, product_id, serial_number, service_id, location_id=None):
+        self.devices.append({
+            'vendor_id': vendor_id,
+            'product_id': product_id,
+            'serial_number': serial_number,
+            'service_id': service_id,
+            'location_id': location_id
+        })
+
+
+class DeviceSession:
+    """One device supervised in multi-device mode, with a camera backend bound to its serial number (MX ID)."""
+    def __init__(self, key, device_info, camera_backend):
+        self.key = key
+        self.device_info = device_info
+        self.camera_backend = camera_backend
+        self.camera_running = False
+        self.boot_future = None     # Future of the queued/running boot (None when idle)
+        self.boot_record = None     # boot_scheduler.BootRecord of the last boot
+        self.stop_requested = False
+        self.lock = threading.Lock()
+
+    @property
+    def device_id(self):
+        serial_number = self.device_info.get('serial_number')
+        return serial_number if serial_number and serial_number != "N/A" else None
+
+    def describe(self):
+        state = "running" if self.camera_running else ("booting" if self.boot_future is not None else "stopped")
+        return f"{self.key} (MX ID {self.device_id or 'any'}): {state}"
 
 
 class DeviceConnectionManager:
-    def __init__(self, notify_ui_callback, alert_ui_callback, update_menu_callback, update_status_label_callback):
-        self.uvc_process = None
+    def __init__(self, notify_ui_callback, alert_ui_callback, update_menu_callback, update_status_label_callback,
+                 start_mode=None, camera_backend=None, camera_profile=None, usb_link=None, hotplug_settle_window=None,
+                 multi_device=None, max_concurrent_boots=None, camera_backend_factory=None, supervisor=None,
+                 device_rescan_interval=None, usb_monitor=None):
         self.camera_running = False
         self.auto_mode_enabled = True
 
+        # supervisor: runs USB transitions, camera starts/stops and boot completions one at a time.
+        # A camera_supervisor.CameraSupervisor (actor thread) keeps the IOKit callback and the menu from
+        # blocking on a camera stop; the default InlineSupervisor runs everything on the caller's thread.
+        self.supervisor = supervisor or camera_supervisor.InlineSupervisor()
+
+        # camera_profile: a camera_profiles.PROFILES name (OAKD_CAMERA_PROFILE), usb_link: "usb3" or "usb2" (OAKD_USB_LINK)
+        self.camera_profile = camera_profile or os.environ.get("OAKD_CAMERA_PROFILE", camera_profiles.DEFAULT_PROFILE_NAME)
+        if self.camera_profile not in camera_profiles.PROFILES:
+            print(f"DCM: Unknown camera profile '{self.camera_profile}'. Falling back to '{camera_profiles.DEFAULT_PROFILE_NAME}'.")
+            self.camera_profile = camera_profiles.DEFAULT_PROFILE_NAME
+        self.usb_link = usb_link or os.environ.get("OAKD_USB_LINK", "usb3")
+
+        # camera_backend: a CameraBackend instance or a backend name ("subprocess" (default) or "inprocess").
+        # start_mode: how the subprocess backend starts uvc_handler ("cold" (default), "standby" or "forkserver").
+        # Both can also be selected with the OAKD_CAMERA_BACKEND / OAKD_UVC_START_MODE environment variables.
+        start_mode = start_mode or os.environ.get("OAKD_UVC_START_MODE", uvc_launcher.START_MODE_COLD)
+        if camera_backend is None or isinstance(camera_backend, str):
+            backend_name = camera_backend or os.environ.get("OAKD_CAMERA_BACKEND", camera_backends.BACKEND_SUBPROCESS)
+            try:
+                camera_backend = camera_backends.create_camera_backend(
+                    backend_name,
+                    start_mode=start_mode,
+                    profile_name=self.camera_profile
+                )
+            except ValueError as e:
+                print(f"DCM: {e}. Falling back to '{camera_backends.BACKEND_SUBPROCESS}'.")
+                camera_backend = camera_backends.SubprocessCameraBackend(profile_name=self.camera_profile)
+        self.camera_backend = camera_backend
+        # Unexpected camera process exits (child_watcher.ChildExit, most recent last), reported by the
+        # backend as soon as they happen and handled on the supervisor
+        self.camera_exits = collections.deque(maxlen=20)
+        self.camera_backend.on_exit = lambda exit_info: self.supervisor.submit(self._camera_exited, exit_info)
+
+        # multi_device: supervise every connected OAK device with its own camera (OAKD_MULTI_DEVICE=1).
+        # Each device session gets a backend of the same kind from camera_backend_factory(device_id), bound to
+        # the device's MX ID, and boots run on a scheduler at most max_concurrent_boots at a time
+        # (OAKD_MAX_CONCURRENT_BOOTS) so parallel firmware uploads do not saturate the bus.
+        if multi_device is None:
+            multi_device = os.environ.get("OAKD_MULTI_DEVICE", "0") not in ("", "0", "false", "no")
+        self.multi_device = multi_device
+        if camera_backend_factory is None:
+            camera_backend_factory = lambda device_id: camera_backends.create_camera_backend(
+                self.camera_backend.name, start_mode=start_mode, profile_name=self.camera_profile, device_id=device_id)
+        self.camera_backend_factory = camera_backend_factory
+        self.sessions = {} # device key -> DeviceSession (multi-device mode)
+        self._sessions_lock = threading.Lock()
+        self.boot_scheduler = None
+        if self.multi_device:
+            if max_concurrent_boots is None:
+                max_concurrent_boots = int(os.environ.get("OAKD_MAX_CONCURRENT_BOOTS",
+                                                          boot_scheduler.DEFAULT_MAX_CONCURRENT_BOOTS))
+            self.boot_scheduler = boot_scheduler.BootScheduler(
+                max_concurrent_boots, on_batch_done=lambda summary: self.supervisor.submit(self._boot_batch_done, summary))
+
         self.notify_ui_callback = notify_ui_callback
         self.alert_ui_callback = alert_ui_callback
         self.update_menu_callback = update_menu_callback
         self.update_status_label_callback = update_status_label_callback
 
-        self._event_handler = USBEventHandler(self) # Pass self reference
+        # hotplug_settle_window: seconds a device must stay quiet before its connect/disconnect burst is
+        # acted on (OAKD_HOTPLUG_SETTLE_MS). 0 (default) acts on every event immediately.
+        if hotplug_settle_window is None:
+            hotplug_settle_window = float(os.environ.get("OAKD_HOTPLUG_SETTLE_MS", "0")) / 1000
+        self._event_handler = USBEventHandler(self, hotplug_settle_window) # Pass self reference
+        self.device_states = device_state.DeviceStateMachine() # Follows each device across its PID changes
+        # IORegistry entries of the monitored devices, kept current by the IOKit notifications; other
+        # classes are scanned once on first query (diagnostics) instead of on every call
+        # usb_monitor: a usb_monitors.USBMonitor or a monitor name ("iokit" or "linux", OAKD_USB_MONITOR).
+        # By default IOKit, or the netlink uevent monitor on Linux hosts without the compiled iokit_wrapper.
+        if usb_monitor is None or isinstance(usb_monitor, str):
+            try:
+                usb_monitor = usb_monitors.create_usb_monitor(usb_monitor, iokit_module=iokit_wrapper)
+            except ValueError as e:
+                default_name = usb_monitors.default_monitor_name(iokit_wrapper)
+                print(f"DCM: {e}. Falling back to '{default_name}'.")
+                usb_monitor = usb_monitors.create_usb_monitor(default_name, iokit_module=iokit_wrapper)
+        self.usb_monitor = usb_monitor
+        self.registry_index = registry_index.RegistryIndex(scanner=self.usb_monitor.registry_snapshot)
+        # Connected target devices, updated from the USB events. device_rescan_interval: seconds between
+        # full rescans reconciling it with IOKit in case an event was missed (OAKD_DEVICE_RESCAN_INTERVAL).
+        # 0 (default) disables the rescan.
+        self.device_registry = device_registry.DeviceRegistry(clock=start_metrics.now)
+        if device_rescan_interval is None:
+            device_rescan_interval = float(os.environ.get("OAKD_DEVICE_RESCAN_INTERVAL", "0"))
+        self.device_rescan_interval = device_rescan_interval
+        self._rescan_stop = threading.Event()
+        self._rescan_thread = None
         # self._iokit_monitoring_thread = None # No longer managing a separate thread here
         self._run_loop_source_addr = 0 # To store the address of the CFRunLoopSourceRef
-        self.connected_target_device_info = None # Store info of the connected OAK-D Lite
+        self._usb_monitoring = False
+        self._pending_start_trace = None # StartTrace begun by the latest connect event, consumed by the next start
+        self._camera_device_key = None # Device the running camera was started for (None if none was connected)
         
         self._update_status_label_based_on_state()
-        self._start_iokit_monitoring()
-        print("[DCM] DeviceConnectionManager initialized.")
-
-
-    def _start_iokit_monitoring(self):
-        # if self._iokit_monitoring_thread is not None and self._iokit_monitoring_thread.is_alive():
-        #     print("DCM: IOKit monitoring thread is already running.") # Obsolete check
-        #     return
-
+        if not self.multi_device:
+            self.camera_backend.prepare() # Device sessions bring their own backends
+        self._start_usb_monitoring()
+        if self.device_rescan_interval > 0 and self._usb_monitoring:
+            self._rescan_thread = threading.Thread(target=self._device_rescan_loop, name="oakd-device-rescan", daemon=True)
+            self._rescan_thread.start()
+        print(f"[DCM] DeviceConnectionManager initialized (camera backend: {self.camera_backend.name}"
+              f"{', multi-device' if self.multi_device else ''}).")
+
+    @property
+    def connected_target_device_info(self):
+        # Info of the targeted OAK-D Lite (the one connected most recently), or None
+        device = self.device_registry.current()
+        return device.info if device is not None else None
+
+    @property
+    def uvc_process(self):
+        # Process handle of the subprocess backend (None for the in-process backend)
+        return getattr(self.camera_backend, 'process', None)
+
+
+    def _start_usb_monitoring(self):
         try:
-            # Initialize IOKit monitoring in the Cython module, passing the event handler
-            # and the VID/PID of the device to monitor.
-            # This will now return the address of the CFRunLoopSourceRef.
-            print("DCM: Calling iokit_wrapper.init_usb_monitoring...")
-            run_loop_source_addr = iokit_wrapper.init_usb_monitoring(
-                self._event_handler, 
-                OAK_D_LITE_VENDOR_ID, 
-                OAK_D_LITE_PRODUCT_ID
-            )
-            
-            if run_loop_source_addr == 0 or run_loop_source_addr is None: # Check for null pointer / error
-                raise Exception("Failed to get a valid run_loop_source_addr from iokit_wrapper.")
-
-            self._run_loop_source_addr = run_loop_source_addr
-            print(f"DCM: Obtained run_loop_source_addr: {self._run_loop_source_addr}")
-            # Thread creation and start is removed.
-            # The run loop source will be added to the main run loop by MenuBarApp.
+            # Start the USB monitor, passing the event handler and the VID/PID of the device to monitor.
+            # The IOKit monitor returns the address of the CFRunLoopSourceRef, which MenuBarApp adds to
+            # the main run loop; the Linux monitor reads uevents on a thread of its own and returns 0.
+            self.usb_monitor.set_registry_observer(self.registry_index)
+            self._run_loop_source_addr = self.usb_monitor.start(
+                self._event_handler,
+                OAK_D_LITE_VENDOR_ID,
+                MONITOR_ANY_PRODUCT_ID
+            ) or 0
+            self._usb_monitoring = True
+            print(f"DCM: {self.usb_monitor.description} monitoring started (run_loop_source_addr: {self._run_loop_source_addr})")
 
         except Exception as e:
-            error_message = f"DCM: Failed to initialize Cython IOKit monitoring: {e}"
+            error_message = f"DCM: Failed to initialize {self.usb_monitor.description} monitoring: {e}"
             print(error_message)
-            self.alert_ui_callback("IOKit Initialization Error", error_message)
+            self.alert_ui_callback(self.usb_monitor.error_title, error_message)
             self._run_loop_source_addr = 0 # Ensure it's zeroed on error
 
+    def _check_profile_bandwidth(self):
+        # Warns (but still starts) when the selected profile will not fit the USB link
+        try:
+            estimate = camera_profiles.estimate_bandwidth(self.camera_profile, self.usb_link)
+        except ValueError as e:
+            print(f"DCM: Skipping bandwidth check: {e}")
+            return
+        print(f"DCM: Bandwidth estimate: {estimate.describe()}")
+        if not estimate.fits:
+            self.notify_ui_callback("OAK-D Camera", "Bandwidth Warning",
+                                    f"Profile '{self.camera_profile}' needs {estimate.bytes_per_second / 1e6:.1f} MB/s, "
+                                    f"more than {self.usb_link} can carry. Frames may be dropped.")
+
+    def _device_rescan_loop(self):
+        while not self._rescan_stop.wait(self.device_rescan_interval):
+            try:
+                self.supervisor.submit(self.reconcile_devices).result()
+            except Exception as e:
+                print(f"DCM: Device rescan failed: {e}")
+
+    def reconcile_devices(self):
+        """
+        Rescans the connected target devices and reconciles the device registry with the result.
+        Devices the USB events missed are fed back as connect/disconnect events; a PID or service ID
+        that changed without an event is recorded as a refresh. Returns (appeared, vanished, changed).
+        """
+        collector = _ScanCollector()
+        self.usb_monitor.scan(collector, OAK_D_LITE_VENDOR_ID, MONITOR_ANY_PRODUCT_ID)
+        scanned = {
+            USBEventHandler.device_key(info['serial_number'], info['service_id'], info['location_id']): info
+            for info in collector.devices if USBEventHandler.is_target_device(info['vendor_id'], info['product_id'])
+        }
+        appeared, vanished, changed = self.device_registry.diff(scanned)
+        for key, info in changed:
+            tracing.info("DCM", "Rescan: device %s is now PID %04x, ServiceID %s.", key, info['product_id'],
+                         info['service_id'])
+            self.device_states.device_appeared(key, info['product_id'], info['service_id'], info['serial_number'])
+            self.device_registry.connected(key, info, current=False)
+        for key, info in vanished:
+            tracing.warning("DCM", "Rescan: device %s is gone without a disconnect event.", key)
+            self._event_handler.on_device_disconnected(info['vendor_id'], info['product_id'], info['serial_number'],
+                                                       info['service_id'], info['location_id'])
+        for key, info in appeared:
+            tracing.warning("DCM", "Rescan: device %s is connected without a connect event.", key)
+            self._event_handler.on_device_connected(info['vendor_id'], info['product_id'], info['serial_number'],
+                                                    info['service_id'], info['location_id'])
+        return appeared, vanished, changed
+
+    def connected_oak_devices(self):
+        """Registry records of the OAK devices currently connected (any boot state), from the index."""
+        return self.registry_index.find(OAK_D_LITE_VENDOR_ID)
+
     def get_run_loop_source_address(self):
         return self._run_loop_source_addr
 
@@ -140,7 +441,7 @@ class DeviceConnectionManager:
         if self.auto_mode_enabled:
             print("DCM: Auto mode enabled.")
             # Check if the target device is already connected and camera is not running
-            if self.connected_target_device_info is not None and not self.camera_running:
+            if self.connected_target_device_info is not None and (self.multi_device or not self.camera_running):
                 print("DCM: Target device is connected and camera is not running. Starting camera due to auto_mode enabling.")
                 self.notify_ui_callback("OAK-D Auto Control", "Starting Camera", "Device already connected, auto-starting camera.")
                 self.start_camera_action()
@@ -155,6 +456,20 @@ class DeviceConnectionManager:
         self._update_status_label_based_on_state()
 
 
+    # --- Non-blocking entry points (run on the supervisor; each returns a concurrent.futures.Future) ---
+    def request_start_camera(self):
+        return self.supervisor.submit(lambda: self.start_camera_action())
+
+    def request_stop_camera(self):
+        return self.supervisor.submit(lambda: self.stop_camera_action())
+
+    def request_toggle_auto_mode(self):
+        return self.supervisor.submit(lambda: self.toggle_auto_mode())
+
+    def request_disconnect_camera(self):
+        return self.supervisor.submit(lambda: self.disconnect_camera_explicitly())
+
+
     def disconnect_camera_explicitly(self):
         if self.camera_running:
             # If auto_mode is on, user is manually disconnecting, so disable auto_mode.
@@ -170,56 +485,271 @@ class DeviceConnectionManager:
         self._update_status_label_based_on_state()
 
 
+    def _connected_device_key(self):
+        device = self.device_registry.current()
+        return device.key if device is not None else None
+
     def start_camera_action(self):
+        if self.multi_device:
+            # Start every connected device that is not running yet
+            with self._sessions_lock:
+                keys = list(self.sessions)
+            for key in keys:
+                self.start_device_session(key)
+            return
         if not self.camera_running:
+            device_key = self._connected_device_key()
+            if device_key is not None and not self.device_states.can_start(device_key):
+                # e.g. a boot is still in flight: a second start would only fail to open the device
+                print(f"DCM: Not starting camera: device {device_key} is {self.device_states.state_of(device_key)}.")
+                self._pending_start_trace = None
+                return
             try:
-                current_dir = os.path.dirname(os.path.abspath(__file__))
-                script_path = os.path.join(current_dir, 'uvc_handler.py')
-
-                if not os.path.exists(script_path):
-                    self.alert_ui_callback("Error", f"uvc_handler.py not found at {script_path}")
+                if self.camera_backend.name == camera_backends.BACKEND_SUBPROCESS and \
+                   not os.path.exists(uvc_launcher.UVC_HANDLER_PATH):
+                    self.alert_ui_callback("Error", f"uvc_handler.py not found at {uvc_launcher.UVC_HANDLER_PATH}")
                     return
 
-                self.uvc_process = subprocess.Popen(['python3', script_path, '--start-uvc'])
+                self._check_profile_bandwidth()
+                start_trace, self._pending_start_trace = self._pending_start_trace, None
+                if start_trace is None:
+                    start_trace = start_metrics.StartTrace() # Manual start: no connect event to time from
+                start_trace.info["profile"] = self.camera_profile
+                self.camera_backend.start(start_trace=start_trace)
                 self.camera_running = True
+                self._camera_device_key = device_key
+                if device_key is not None:
+                    self.device_states.mark_booting(device_key)
                 self.notify_ui_callback("OAK-D Camera", "Status", "Camera starting...")
             except Exception as e:
                 self.alert_ui_callback("Error Starting Camera", str(e))
                 self.camera_running = False
-                self.uvc_process = None # Ensure process handle is cleared on error
             finally:
                 self._update_status_label_based_on_state()
 
 
     def stop_camera_action(self):
-        if self.camera_running and self.uvc_process:
+        if self.multi_device:
+            with self._sessions_lock:
+                sessions = list(self.sessions.values())
+            for session in sessions:
+                self.stop_device_session(session.key)
+            self._update_status_label_based_on_state()
+            return
+        if self.camera_running and self.camera_backend.is_active():
             try:
-                print("DCM: Sending SIGINT to uvc_handler process...")
-                self.uvc_process.send_signal(signal.SIGINT)
-                self.uvc_process.wait(timeout=10) # Wait for graceful shutdown
-                self.notify_ui_callback("OAK-D Camera", "Status", "Camera stopped.")
-            except subprocess.TimeoutExpired:
-                self.alert_ui_callback("Stopping camera timed out.", "Forcing termination.")
-                print("DCM: uvc_handler process timed out. Terminating...")
-                self.uvc_process.terminate()
-                try:
-                    self.uvc_process.wait(timeout=5) # Wait for forced termination
-                except Exception as e_term:
-                    print(f"DCM: Error during forced termination: {e_term}")
+                graceful = self.camera_backend.stop()
+                if self.camera_backend.last_stop_timing is not None:
+                    print(f"DCM: {self.camera_backend.last_stop_timing.summary()}")
+                if graceful:
+                    self.notify_ui_callback("OAK-D Camera", "Status", "Camera stopped.")
+                else:
+                    self.alert_ui_callback("Stopping camera timed out.", "Forcing termination.")
             except Exception as e:
                 self.alert_ui_callback("Error Stopping Camera", str(e))
                 print(f"DCM: Error stopping camera: {e}")
             finally:
-                self.uvc_process = None
                 self.camera_running = False
-        elif self.camera_running and not self.uvc_process:
-            # Camera was marked as running, but no process handle. Reset state.
-            print("DCM: Camera marked as running, but no uvc_process handle. Resetting state.")
+                device_key, self._camera_device_key = self._camera_device_key, None
+                if device_key is not None:
+                    self.device_states.mark_stopped(device_key)
+        elif self.camera_running:
+            # Camera was marked as running, but the backend holds no camera. Reset state.
+            print("DCM: Camera marked as running, but the camera backend is not active. Resetting state.")
             self.camera_running = False
+            self._camera_device_key = None
         
         self._update_status_label_based_on_state()
 
 
+    def _camera_exited(self, exit_info):
+        # The camera process ended without a stop (a crash): update the state and the UI at once
+        if not self.camera_backend.handle_exit(exit_info):
+            return # Already stopped, or restarted since the exit
+        self.camera_exits.append(exit_info)
+        print(f"DCM: Camera process {exit_info.describe()}.")
+        if not self.camera_running:
+            return
+        self.camera_running = False
+        device_key, self._camera_device_key = self._camera_device_key, None
+        if device_key is not None:
+            self.device_states.mark_exited(device_key)
+        self._update_status_label_based_on_state()
+        self.notify_ui_callback("OAK-D Camera", "Camera Stopped",
+                                f"The camera process {exit_info.cause} after {exit_info.runtime:.1f} s.")
+
+    # --- Multi-device sessions ---
+    def add_device_session(self, key, device_info):
+        with self._sessions_lock:
+            session = self.sessions.get(key)
+            if session is None:
+                session = DeviceSession(key, device_info, None)
+                session.camera_backend = self.camera_backend_factory(session.device_id)
+                session.camera_backend.on_exit = \
+                    lambda exit_info, session=session: self.supervisor.submit(self._session_camera_exited,
+                                                                              session, exit_info)
+                self.sessions[key] = session
+                print(f"DCM: Added device session {session.describe()}")
+            else:
+                session.device_info = device_info
+        return session
+
+    def remove_device_session(self, key):
+        self.stop_device_session(key)
+        with self._sessions_lock:
+            session = self.sessions.pop(key, None)
+        if session is not None and session.boot_future is None:
+            self._close_session(session)
+        # A session still booting is closed once its boot finishes (see _session_boot_done)
+
+    def start_device_session(self, key, start_trace=None):
+        """Queues the boot of one device on the boot scheduler (multi-device mode)."""
+        with self._sessions_lock:
+            session = self.sessions.get(key)
+        if session is None:
+            return None
+        with session.lock:
+            if session.camera_running or session.boot_future is not None:
+                return session.boot_future
+            if not self.device_states.can_start(key):
+                print(f"DCM: Not starting camera: device {key} is {self.device_states.state_of(key)}.")
+                return None
+            session.stop_requested = False
+            if start_trace is None:
+                start_trace = start_metrics.StartTrace() # Manual start: no connect event to time from
+            start_trace.info.update(profile=self.camera_profile, device_id=session.device_id)
+            session.boot_future = self.boot_scheduler.submit(key, lambda: self._boot_session(session, start_trace))
+        session.boot_future.add_done_callback(
+            lambda future: self.supervisor.submit(self._session_boot_done, session, future))
+        return session.boot_future
+
+    def _boot_session(self, session, start_trace):
+        # Runs on a boot scheduler thread, holding one of the boot slots until the device is up
+        if session.stop_requested:
+            return False
+        session.camera_backend.start(start_trace=start_trace)
+        with session.lock:
+            session.camera_running = True
+        self.supervisor.submit(self._session_started, session) # State changes belong to the supervisor
+        return session.camera_backend.wait_until_booted()
+
+    def _session_started(self, session):
+        self.device_states.mark_booting(session.key)
+        self._update_session_running_state()
+
+    def _session_boot_done(self, session, future):
+        with session.lock:
+            session.boot_future = None
+        if future.cancelled():
+            print(f"DCM: Boot of {session.key} cancelled before it started.")
+        else:
+            session.boot_record = future.result()
+            print(f"DCM: Boot {session.boot_record.describe()}")
+            if not session.boot_record.ok:
+                self.alert_ui_callback("Error Starting Camera", f"OAK-D Lite {session.device_id or session.key}: "
+                                                                f"{session.boot_record.error}")
+                self._stop_session_camera(session)
+        with self._sessions_lock:
+            removed = self.sessions.get(session.key) is not session
+        if session.stop_requested or removed:
+            self._stop_session_camera(session)
+        if removed:
+            self._close_session(session)
+        self._update_session_running_state()
+
+    def stop_device_session(self, key):
+        with self._sessions_lock:
+            session = self.sessions.get(key)
+        if session is None:
+            return
+        session.stop_requested = True
+        future = session.boot_future
+        if future is not None and not future.done():
+            # A queued boot never starts; a running one is stopped by _session_boot_done when it returns
+            future.cancel()
+            return
+        self._stop_session_camera(session)
+
+    def _stop_session_camera(self, session):
+        with session.lock:
+            if not session.camera_running:
+                return
+            session.camera_running = False
+        try:
+            graceful = session.camera_backend.stop()
+            if session.camera_backend.last_stop_timing is not None:
+                print(f"DCM: {session.key}: {session.camera_backend.last_stop_timing.summary()}")
+            if not graceful:
+                print(f"DCM: Stopping camera of {session.key} timed out; it was terminated.")
+        except Exception as e:
+            print(f"DCM: Error stopping camera of {session.key}: {e}")
+        self.device_states.mark_stopped(session.key)
+        self._update_session_running_state()
+
+    def _session_camera_exited(self, session, exit_info):
+        if not session.camera_backend.handle_exit(exit_info):
+            return
+        self.camera_exits.append(exit_info)
+        print(f"DCM: Camera process of {session.key} {exit_info.describe()}.")
+        with session.lock:
+            if not session.camera_running:
+                return
+            session.camera_running = False
+        self.device_states.mark_exited(session.key)
+        self._update_session_running_state()
+        self.notify_ui_callback("OAK-D Camera", "Camera Stopped",
+                                f"OAK-D Lite {session.device_id or session.key}: the camera process "
+                                f"{exit_info.cause} after {exit_info.runtime:.1f} s.")
+
+    def _close_session(self, session):
+        try:
+            session.camera_backend.close()
+        except Exception as e:
+            print(f"DCM: Error closing camera backend of {session.key}: {e}")
+
+    def _update_session_running_state(self):
+        with self._sessions_lock:
+            self.camera_running = any(session.camera_running for session in self.sessions.values())
+        self._update_status_label_based_on_state()
+
+    def _boot_batch_done(self, summary):
+        # Aggregate and per-device boot times of the devices that were booted together
+        print(f"DCM: {boot_scheduler.format_batch(summary)}")
+        if summary["devices"] > 1:
+            self.notify_ui_callback("OAK-D Camera", "Cameras Started",
+                                    f"{summary['ok']}/{summary['devices']} devices started in {summary['wall_ms'] / 1000:.1f} s.")
+
+    def _running_camera_backend(self, device=None):
+        # The backend to address: the single camera, or in multi-device mode the session matching
+        # device (key or MX ID), or the only running session when device is None
+        if not self.multi_device:
+            return self.camera_backend if self.camera_running else None
+        with self._sessions_lock:
+            running = [s for s in self.sessions.values() if s.camera_running]
+        if device is not None:
+            running = [s for s in running if device in (s.key, s.device_id)]
+        return running[0].camera_backend if len(running) == 1 else None
+
+    def send_camera_command(self, command, device=None, **params):
+        """
+        Sends a control socket command ("status", "set_controls", "restart_pipeline", ...) to the running camera.
+        device: in multi-device mode, the device key or MX ID of the camera (needed when several are running).
+        Returns the response dict, or None if the camera cannot be controlled right now.
+        """
+        backend = self._running_camera_backend(device)
+        path = backend.control_socket_path if backend is not None else None
+        if not path:
+            print(f"DCM: Cannot send '{command}': camera not running or backend has no control socket.")
+            return None
+        try:
+            response = control_socket.send_request(path, command, **params)
+        except (OSError, ValueError) as e:
+            print(f"DCM: Control socket request '{command}' failed: {e}")
+            return None
+        if not response.get("ok"):
+            print(f"DCM: Camera rejected '{command}': {response.get('error')}")
+        return response
+
     def get_camera_running_status(self):
         return self.camera_running
 
@@ -228,15 +758,17 @@ class DeviceConnectionManager:
 
     def cleanup_on_quit(self):
         print("DCM: Cleanup initiated on quit...")
+        self._rescan_stop.set()
 
-        # 1. Stop Cython IOKit event monitoring
+        # 1. Stop USB event monitoring
         try:
-            print("DCM: Stopping Cython IOKit USB monitoring (resources)...")
-            # This will now primarily release port and iterators.
+            print(f"DCM: Stopping {self.usb_monitor.description} USB monitoring (resources)...")
+            # For IOKit this releases the port and iterators.
             # RunLoopSource removal from main loop needs to be handled by MenuBarApp or a new Cython helper.
-            iokit_wrapper.stop_usb_monitoring() 
+            self.usb_monitor.stop()
+            tracing.info("DCM", "USB event queue at quit: %s", self.usb_monitor.stats())
         except Exception as e:
-            print(f"DCM: Error calling stop_usb_monitoring: {e}")
+            print(f"DCM: Error stopping USB monitoring: {e}")
 
         # 2. Join the IOKit monitoring thread - REMOVED as thread is no longer managed here
         # if self._iokit_monitoring_thread and self._iokit_monitoring_thread.is_alive():
@@ -248,9 +780,36 @@ class DeviceConnectionManager:
         #         print("DCM: IOKit event loop thread successfully joined.")
         # self._iokit_monitoring_thread = None
 
-        # 3. Stop the UVC handler subprocess (if running)
-        if self.camera_running and self.uvc_process:
-            print("DCM: Stopping camera (uvc_process) before quitting...")
-            self.stop_camera_action() # Use existing method for consistency
-        
+        # Drop hot-plug bursts still inside their settle window, so nothing starts while quitting
+        dropped = self._event_handler.coalescer.cancel()
+        if dropped:
+            print(f"DCM: Dropped {dropped} pending hot-plug burst(s).")
+
+        # Stop the cameras on the supervisor, behind the transitions already queued, and wait for it
+        try:
+            self.supervisor.submit(self._stop_cameras_on_quit).result()
+        except Exception as e:
+            print(f"DCM: Error stopping cameras: {e}")
+        self.supervisor.close()
         print("DCM: Cleanup finished.")
+
+    def _stop_cameras_on_quit(self):
+        # Multi-device mode: drop queued boots, then stop and release every device session
+        if self.boot_scheduler is not None:
+            self.boot_scheduler.shutdown(wait=False)
+            with self._sessions_lock:
+                sessions = list(self.sessions.values())
+                self.sessions.clear()
+            for session in sessions:
+                session.stop_requested = True
+                self._stop_session_camera(session)
+                self._close_session(session)
+
+        # 3. Stop the camera (if running) and release the backend (standby worker, ...)
+        if self.camera_running and self.camera_backend.is_active():
+            print("DCM: Stopping camera before quitting...")
+        try:
+            self.camera_backend.close() # Also stops a running camera, without re-arming the warm path
+        except Exception as e:
+            print(f"DCM: Error closing camera backend: {e}")
+        self.camera_running = False
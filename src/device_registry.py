@@ -0,0 +1,158 @@
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+
+# Disconnected devices remembered for their timestamps (the oldest are dropped first)
+MAX_DISCONNECTED_HISTORY = 32
+
+
+@dataclass
+class ConnectedDevice:
+    key: str                      # device_state.device_key() of the device
+    info: dict                    # latest event payload: vendor_id, product_id, serial_number, service_id, location_id
+    connected_at: float
+    last_seen: float              # last connect event, refresh or rescan that saw the device
+    disconnected_at: float = None
+
+    @property
+    def service_id(self):
+        return self.info.get('service_id')
+
+    @property
+    def serial_number(self):
+        serial_number = self.info.get('serial_number')
+        return serial_number if serial_number and serial_number != "N/A" else None
+
+    @property
+    def location_id(self):
+        return self.info.get('location_id')
+
+    def describe(self):
+        return (f"{self.key}: PID {self.info.get('product_id', 0):04x}, SN {self.serial_number or 'N/A'}, "
+                f"ServiceID {self.service_id}")
+
+
+class DeviceRegistry:
+    """
+    The target devices currently connected, with O(1) lookup by device key, service ID, serial number
+    and USB location. Updated from the USB events as they are applied, and reconciled against a full
+    rescan now and then (see diff()) in case an event was missed.
+    """
+    def __init__(self, clock=time.monotonic):
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._devices = {}           # key -> ConnectedDevice
+        self._by_service_id = {}     # service ID -> key
+        self._by_serial = {}         # serial number -> key
+        self._by_location = {}       # location ID -> key
+        self._disconnected = OrderedDict() # key -> ConnectedDevice, most recent last
+        self._current_key = None     # the device connected most recently
+
+    def __len__(self):
+        with self._lock:
+            return len(self._devices)
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._devices
+
+    def _unindex(self, device):
+        for index, value in ((self._by_service_id, device.service_id), (self._by_serial, device.serial_number),
+                             (self._by_location, device.location_id)):
+            if value is not None and index.get(value) == device.key:
+                del index[value]
+
+    def _index(self, device):
+        for index, value in ((self._by_service_id, device.service_id), (self._by_serial, device.serial_number),
+                             (self._by_location, device.location_id)):
+            if value is not None:
+                index[value] = device.key
+
+    def connected(self, key, info, current=True):
+        """
+        Records a connect (or a refresh with a new PID/service ID) of the device; returns it.
+        current=False keeps the device that is currently targeted (used for refreshes and rescans).
+        """
+        now = self.clock()
+        with self._lock:
+            device = self._devices.get(key)
+            if device is None:
+                device = self._devices[key] = ConnectedDevice(key, dict(info), now, now)
+                self._disconnected.pop(key, None)
+            else:
+                self._unindex(device)
+                device.info = dict(info)
+                device.last_seen = now
+            self._index(device)
+            if current or self._current_key is None:
+                self._current_key = key
+            return device
+
+    def disconnected(self, key):
+        """Records a disconnect; returns the device (None if it was not connected)."""
+        with self._lock:
+            device = self._devices.pop(key, None)
+            if device is None:
+                return None
+            self._unindex(device)
+            device.disconnected_at = self.clock()
+            self._disconnected[key] = device
+            while len(self._disconnected) > MAX_DISCONNECTED_HISTORY:
+                self._disconnected.popitem(last=False)
+            if self._current_key == key:
+                # Fall back to the most recently connected device still present
+                remaining = sorted(self._devices.values(), key=lambda d: d.connected_at)
+                self._current_key = remaining[-1].key if remaining else None
+            return device
+
+    def current(self):
+        """The device the single-camera mode targets: the one connected most recently."""
+        with self._lock:
+            return self._devices.get(self._current_key) if self._current_key is not None else None
+
+    def get(self, key):
+        with self._lock:
+            return self._devices.get(key)
+
+    def by_service_id(self, service_id):
+        with self._lock:
+            return self._devices.get(self._by_service_id.get(service_id))
+
+    def by_serial(self, serial_number):
+        with self._lock:
+            return self._devices.get(self._by_serial.get(serial_number))
+
+    def by_location(self, location_id):
+        with self._lock:
+            return self._devices.get(self._by_location.get(location_id))
+
+    def devices(self):
+        with self._lock:
+            return sorted(self._devices.values(), key=lambda d: d.connected_at)
+
+    def last_disconnected(self, key):
+        """The device as it was when it last disconnected (for its timestamps), or None."""
+        with self._lock:
+            return self._disconnected.get(key)
+
+    def diff(self, scanned):
+        """
+        Compares a full rescan ({key: info}) with the registry. Returns (appeared, vanished, changed):
+        devices the registry missed, devices it still holds that are gone, and devices whose
+        PID/service ID changed without an event. Nothing is applied; the caller feeds them back as events.
+        """
+        now = self.clock()
+        with self._lock:
+            appeared = [(key, info) for key, info in scanned.items() if key not in self._devices]
+            vanished = [(key, device.info) for key, device in self._devices.items() if key not in scanned]
+            changed = []
+            for key, info in scanned.items():
+                device = self._devices.get(key)
+                if device is None:
+                    continue
+                device.last_seen = now
+                if (info.get('product_id'), info.get('service_id')) != \
+                   (device.info.get('product_id'), device.info.get('service_id')):
+                    changed.append((key, info))
+            return appeared, vanished, changed
@@ -0,0 +1,153 @@
+import time
+from dataclasses import dataclass, field
+
+# USB product IDs an OAK device (VID 0x03e7) goes through. depthai boots an unbooted device by
+# uploading firmware, after which it re-enumerates with the booted PID.
+PID_UNBOOTED = 0x2485       # Myriad X USB boot ROM, waiting for firmware
+PID_BOOTED = 0xf63b         # running depthai firmware (XLink)
+PID_BOOTLOADER = 0xf63c     # running the depthai bootloader (e.g. while flashing)
+PID_FLASH_BOOTED = 0xf63d   # booted from its own flash (standalone / flashed UVC mode)
+OAK_PRODUCT_IDS = (PID_UNBOOTED, PID_BOOTED, PID_BOOTLOADER, PID_FLASH_BOOTED)
+
+# Device states
+STATE_UNBOOTED = "unbooted"     # can be started
+STATE_BOOTING = "booting"       # our camera is booting it; the unbooted PID going away is expected
+STATE_BOOTED = "booted"         # running firmware we did not start (another process, flash-booted)
+STATE_STREAMING = "streaming"   # booted by our camera
+STATE_BOOTLOADER = "bootloader"
+STATE_GONE = "gone"
+
+# A boot that has not produced the booted PID after this many seconds is treated as failed
+BOOT_TIMEOUT = 30.0
+
+
+def state_for_product(product_id):
+    if product_id == PID_UNBOOTED:
+        return STATE_UNBOOTED
+    if product_id == PID_BOOTLOADER:
+        return STATE_BOOTLOADER
+    return STATE_BOOTED
+
+
+def device_key(serial_number, service_id, location_id=None):
+    """
+    Identity of a physical device across re-enumeration. The USB location (port path) does not change
+    when the PID does; the serial number may (an unbooted device reports none), and the IOKit
+    service ID always does.
+    """
+    if location_id is not None:
+        return f"location:{location_id:08x}"
+    if serial_number and serial_number != "N/A":
+        return serial_number
+    return f"service:{service_id}"
+
+
+@dataclass
+class TrackedDevice:
+    key: str
+    state: str
+    product_id: int
+    service_id: int = None
+    serial_number: str = None
+    since: float = 0.0                            # when the current state was entered
+    history: list = field(default_factory=list)   # [(state, timestamp), ...]
+
+    def enter(self, state, now):
+        if state != self.state:
+            self.state = state
+            self.since = now
+            self.history.append((state, now))
+
+
+class DeviceStateMachine:
+    """
+    Per-device state (unbooted, booting, streaming/booted, bootloader, gone), followed across the PID
+    changes of one physical device. DeviceConnectionManager feeds it USB events and marks the boots
+    it starts; the resulting state decides whether a camera start or stop is warranted.
+    """
+    def __init__(self, boot_timeout=BOOT_TIMEOUT, clock=time.monotonic):
+        self.boot_timeout = boot_timeout
+        self.clock = clock
+        self.devices = {}
+
+    def get(self, key):
+        return self.devices.get(key)
+
+    def state_of(self, key):
+        device = self.devices.get(key)
+        return device.state if device is not None else STATE_GONE
+
+    def device_appeared(self, key, product_id, service_id=None, serial_number=None):
+        """Records a connect event; returns (device, previous state)."""
+        now = self.clock()
+        device = self.devices.get(key)
+        previous = device.state if device is not None else STATE_GONE
+        if device is None:
+            device = self.devices[key] = TrackedDevice(key, None, product_id, since=now)
+
+        state = state_for_product(product_id)
+        if state == STATE_BOOTED and previous in (STATE_BOOTING, STATE_STREAMING):
+            state = STATE_STREAMING # the boot our camera started has completed
+        device.product_id = product_id
+        device.service_id = service_id
+        if serial_number and serial_number != "N/A":
+            device.serial_number = serial_number
+        device.enter(state, now)
+        return device, previous
+
+    def device_gone(self, key, product_id=None):
+        """
+        Records a disconnect event; returns (device, previous state), device None if it was not tracked.
+        While our boot is in flight the unbooted PID leaving is part of the boot, and a disconnect for a
+        PID the device has already left behind is stale; neither changes the state.
+        """
+        device = self.devices.get(key)
+        if device is None:
+            return None, STATE_GONE
+        previous = device.state
+        if product_id is not None and product_id != device.product_id:
+            return device, previous
+        if previous == STATE_BOOTING and product_id in (None, PID_UNBOOTED) and self.boot_in_flight(key):
+            return device, previous
+        device.enter(STATE_GONE, self.clock())
+        return device, previous
+
+    def mark_booting(self, key):
+        """Our camera has started on this device; its re-enumeration is expected from now on."""
+        device = self.devices.get(key)
+        if device is not None and device.state == STATE_UNBOOTED:
+            device.enter(STATE_BOOTING, self.clock())
+
+    def mark_stopped(self, key):
+        """Our camera has released the device; it stays booted until it resets to the unbooted PID."""
+        device = self.devices.get(key)
+        if device is not None and device.state in (STATE_BOOTING, STATE_STREAMING):
+            device.enter(STATE_BOOTED, self.clock())
+
+    def mark_exited(self, key):
+        """
+        Our camera process ended on its own. A device still on the unbooted PID (the boot never got
+        that far) can be started again; otherwise it is released as after a stop.
+        """
+        device = self.devices.get(key)
+        if device is not None and device.state == STATE_BOOTING and device.product_id == PID_UNBOOTED:
+            device.enter(STATE_UNBOOTED, self.clock())
+        else:
+            self.mark_stopped(key)
+
+    def boot_in_flight(self, key):
+        device = self.devices.get(key)
+        return device is not None and device.state == STATE_BOOTING and \
+            self.clock() - device.since < self.boot_timeout
+
+    def can_start(self, key):
+        """
+        Whether starting the camera for this device can succeed. Unknown devices are allowed (manual
+        start); booting, booted-by-someone-else and bootloader devices are not.
+        """
+        device = self.devices.get(key)
+        if device is None or device.state in (STATE_UNBOOTED, STATE_GONE):
+            return True
+        if device.state == STATE_BOOTING:
+            return not self.boot_in_flight(key) # a boot that timed out may be retried
+        return False
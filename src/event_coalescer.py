@@ -0,0 +1,156 @@
+import heapq
+import itertools
+import threading
+import time
+
+
+class CoalescedEvent:
+    """The net result of a burst of hot-plug events for one device."""
+    def __init__(self, key, state, payload, event_time):
+        self.key = key
+        self.state = state            # True = connected, False = disconnected
+        self.payload = payload        # payload of the latest event in the burst
+        self.first_time = event_time  # when the burst began (start timing runs from here)
+        self.last_time = event_time
+        self.events = 1
+        self.deadline = None          # monotonic time at which the settle window passes
+
+    def update(self, state, payload, event_time):
+        self.state = state
+        self.payload = payload
+        self.last_time = event_time
+        self.events += 1
+
+    def __str__(self):
+        return self.describe()
+
+    def describe(self):
+        state = "connected" if self.state else "disconnected"
+        return (f"{self.key}: {self.events} event(s) in {(self.last_time - self.first_time) * 1000:.0f} ms "
+                f"-> {state}")
+
+
+class EventCoalescer:
+    """
+    Collapses bursts of connect/disconnect events into one net state transition per device.
+
+    Every event (re)arms the device's settle window. Once the window passes without another
+    event, the device's final state is compared with the last state handed on: a change is
+    delivered once through on_transition(event); a burst that ends where it began (an OAK device
+    re-enumerating while it boots, a flaky cable) goes to on_refresh(event) instead, so the
+    caller can pick up the new service ID without restarting the camera.
+
+    Events are delivered on one scheduler thread, one at a time. It sleeps on a condition until the
+    earliest deadline in a heap with one entry per pending device; a new event only moves its device's
+    deadline, so a storm costs no thread or timer per event. A settle window of 0 disables
+    coalescing: every event is delivered immediately on the caller's thread.
+    """
+    def __init__(self, settle_window, on_transition, on_refresh=None, clock=time.monotonic):
+        self.settle_window = settle_window
+        self.on_transition = on_transition
+        self.on_refresh = on_refresh
+        self.clock = clock
+        self.received = 0
+        self.delivered = 0  # transitions handed to on_transition
+        self._lock = threading.Lock()            # guards _pending and _deadlines
+        self._wakeup = threading.Condition(self._lock)
+        self._deliver_lock = threading.RLock()   # serializes deliveries and guards _delivered
+        self._pending = {}   # key -> CoalescedEvent still inside its settle window
+        self._deadlines = [] # heap of (deadline, seq, key, event), one entry per pending burst
+        self._sequence = itertools.count() # tie-breaker for equal deadlines
+        self._delivered = {} # key -> last state handed on (devices start out disconnected)
+        self._thread = None
+
+    @property
+    def enabled(self):
+        return self.settle_window > 0
+
+    @property
+    def coalesced(self):
+        """Number of events absorbed without a transition of their own."""
+        with self._lock:
+            pending = sum(event.events for event in self._pending.values())
+        return self.received - pending - self.delivered
+
+    def submit(self, key, state, payload=None, event_time=None):
+        event_time = self.clock() if event_time is None else event_time
+        if not self.enabled:
+            with self._lock:
+                self.received += 1
+            self._deliver(CoalescedEvent(key, state, payload, event_time))
+            return
+
+        with self._lock:
+            self.received += 1
+            deadline = time.monotonic() + self.settle_window
+            event = self._pending.get(key)
+            if event is not None:
+                event.update(state, payload, event_time)
+                event.deadline = deadline # Its heap entry is moved when the scheduler reaches it
+                return
+            event = self._pending[key] = CoalescedEvent(key, state, payload, event_time)
+            event.deadline = deadline
+            heapq.heappush(self._deadlines, (deadline, next(self._sequence), key, event))
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="hotplug-coalescer", daemon=True)
+                self._thread.start()
+            elif self._deadlines[0][3] is event:
+                self._wakeup.notify() # Earlier than what the scheduler sleeps on
+
+    def pending(self):
+        with self._lock:
+            return list(self._pending)
+
+    def flush(self):
+        """Delivers every pending burst now instead of waiting for its settle window."""
+        with self._lock:
+            events = list(self._pending.values())
+            self._pending.clear()
+            self._deadlines.clear()
+        for event in events:
+            self._deliver(event)
+
+    def cancel(self):
+        """Drops every pending burst without delivering it (used on shutdown)."""
+        with self._lock:
+            events = list(self._pending.values())
+            self._pending.clear()
+            self._deadlines.clear()
+        return len(events)
+
+    def _run(self):
+        # Scheduler thread: delivers the bursts whose settle window has passed
+        while True:
+            with self._lock:
+                due = self._pop_due()
+                while not due:
+                    timeout = self._deadlines[0][0] - time.monotonic() if self._deadlines else None
+                    self._wakeup.wait(timeout)
+                    due = self._pop_due()
+            for event in due:
+                self._deliver(event)
+
+    def _pop_due(self):
+        # Called with the lock held. Entries of bursts that got a later deadline are pushed back.
+        due = []
+        now = time.monotonic()
+        while self._deadlines and self._deadlines[0][0] <= now:
+            _, _, key, event = heapq.heappop(self._deadlines)
+            if self._pending.get(key) is not event:
+                continue # Flushed or cancelled
+            if event.deadline > now:
+                heapq.heappush(self._deadlines, (event.deadline, next(self._sequence), key, event))
+                continue
+            del self._pending[key]
+            due.append(event)
+        return due
+
+    def _deliver(self, event):
+        with self._deliver_lock:
+            previous = self._delivered.get(event.key, False)
+            if not self.enabled or event.state != previous:
+                self._delivered[event.key] = event.state
+                self.delivered += 1
+                self.on_transition(event)
+            elif self.on_refresh is not None:
+                self.on_refresh(event)
@@ -0,0 +1,108 @@
+import os
+import selectors
+import signal
+import threading
+import time
+
+# Wake-up reasons reported by CameraEventLoop.wait()
+WAKE_SIGNAL = "signal"
+WAKE_COMMAND = "command"
+WAKE_TIMEOUT = "timeout"
+
+
+class CameraEventLoop:
+    """
+    Blocks the camera process until something happens instead of polling with time.sleep().
+
+    Wakes up immediately on:
+      * SIGINT/SIGTERM (through a self-pipe registered with signal.set_wakeup_fd),
+      * wake() calls from other threads (control commands),
+      * readable file objects registered with add_reader() (e.g. a command pipe on stdin).
+    wait() also returns after `timeout` seconds so callers can check state that has no
+    file descriptor to wait on, such as dai.Device.isClosed().
+    """
+    def __init__(self):
+        self._selector = selectors.DefaultSelector()
+        self._wake_r, self._wake_w = os.pipe()
+        os.set_blocking(self._wake_r, False)
+        os.set_blocking(self._wake_w, False)
+        self._selector.register(self._wake_r, selectors.EVENT_READ, None)
+        self._lock = threading.Lock()
+        self._commands = []
+        self._previous_handlers = {}
+        self._previous_wakeup_fd = None
+        self.received_signal = None
+        self.signal_time = None # time.monotonic() when the first stop signal arrived
+
+    def install_signal_handlers(self, signals=(signal.SIGINT, signal.SIGTERM)):
+        """Turns the given signals into wake-ups. Only possible from the main thread."""
+        if threading.current_thread() is not threading.main_thread():
+            return False
+        self._previous_wakeup_fd = signal.set_wakeup_fd(self._wake_w, warn_on_full_buffer=False)
+        for sig in signals:
+            self._previous_handlers[sig] = signal.signal(sig, self._on_signal)
+        return True
+
+    def _on_signal(self, signum, frame):
+        # The wakeup fd already got a byte from the C-level handler; just remember what arrived.
+        if self.received_signal is None:
+            self.received_signal = signum
+            self.signal_time = time.monotonic()
+
+    def add_reader(self, fileobj, callback):
+        """callback(fileobj) is called from wait() whenever fileobj becomes readable."""
+        self._selector.register(fileobj, selectors.EVENT_READ, callback)
+
+    def remove_reader(self, fileobj):
+        try:
+            self._selector.unregister(fileobj)
+        except (KeyError, ValueError):
+            pass
+
+    def wake(self, command=None):
+        """Thread-safe: wakes wait() and queues an optional command for it to return."""
+        if command is not None:
+            with self._lock:
+                self._commands.append(command)
+        try:
+            os.write(self._wake_w, b"\0")
+        except BlockingIOError:
+            pass # The pipe is full, so a wake-up is already pending
+
+    def _drain(self):
+        try:
+            while os.read(self._wake_r, 4096):
+                pass
+        except (BlockingIOError, InterruptedError):
+            pass
+
+    def wait(self, timeout=None):
+        """
+        Waits for the next event. Returns (reason, commands):
+        WAKE_SIGNAL once a stop signal was received, WAKE_COMMAND with the queued commands,
+        or WAKE_TIMEOUT if nothing happened within `timeout` seconds.
+        """
+        for key, _ in self._selector.select(timeout):
+            if key.fd == self._wake_r:
+                self._drain()
+            elif key.data is not None:
+                key.data(key.fileobj)
+
+        if self.received_signal is not None:
+            return WAKE_SIGNAL, []
+        with self._lock:
+            commands, self._commands = self._commands, []
+        if commands:
+            return WAKE_COMMAND, commands
+        return WAKE_TIMEOUT, []
+
+    def close(self):
+        for sig, handler in self._previous_handlers.items():
+            signal.signal(sig, handler)
+        self._previous_handlers = {}
+        if self._previous_wakeup_fd is not None:
+            signal.set_wakeup_fd(self._previous_wakeup_fd)
+            self._previous_wakeup_fd = None
+        self._selector.close()
+        os.close(self._wake_r)
+        os.close(self._wake_w)
@@ -3,18 +3,27 @@
 
 from libc.stdlib cimport malloc, free
 from libc.string cimport strlen, strcpy, memcpy
+from cpython.buffer cimport PyBuffer_FillInfo
+from posix.time cimport clock_gettime, timespec, CLOCK_MONOTONIC
+from posix.unistd cimport write as c_write
+import inspect
+import os
 import sys
 # Pythonのthreadingモジュールをインポート (GIL操作に必要)
 import threading
+import time
 
 # --- CoreFoundation の C API 宣言を先に ---
-cdef extern from "CoreFoundation/CoreFoundation.h":
+cdef extern from "CoreFoundation/CoreFoundation.h" nogil:
     ctypedef const void* CFTypeRef # void* から const void* へ (より正確)
     ctypedef CFTypeRef CFStringRef
     ctypedef CFTypeRef CFAllocatorRef
     ctypedef CFTypeRef CFDictionaryRef
     ctypedef CFTypeRef CFMutableDictionaryRef
     ctypedef CFTypeRef CFNumberRef
+    ctypedef CFTypeRef CFBooleanRef
+    ctypedef CFTypeRef CFArrayRef
+    ctypedef CFTypeRef CFDataRef
     ctypedef CFTypeRef CFRunLoopRef
     ctypedef CFTypeRef CFRunLoopSourceRef
     ctypedef long CFIndex
@@ -37,6 +46,8 @@ cdef extern from "CoreFoundation/CoreFoundation.h":
         unsigned int encoding # CFStringEncoding
     )
     CFIndex CFStringGetLength(CFStringRef theString)
+    const char* CFStringGetCStringPtr(CFStringRef theString, unsigned int encoding) # NULL unless stored as such
+    CFIndex CFStringGetMaximumSizeForEncoding(CFIndex length, unsigned int encoding)
 
     # メモリ管理
     void CFRelease(CFTypeRef cf)
@@ -60,6 +71,18 @@ cdef extern from "CoreFoundation/CoreFoundation.h":
     unsigned long CFStringGetTypeID() # CFTypeID
     unsigned long CFDictionaryGetTypeID() # CFTypeID
     unsigned long CFNumberGetTypeID() # CFTypeID
+    unsigned long CFBooleanGetTypeID() # CFTypeID
+    unsigned long CFArrayGetTypeID() # CFTypeID
+    unsigned long CFDataGetTypeID() # CFTypeID
+
+    # コンテナ・データ
+    CFIndex CFDictionaryGetCount(CFDictionaryRef theDict)
+    void CFDictionaryGetKeysAndValues(CFDictionaryRef theDict, const void** keys, const void** values)
+    CFIndex CFArrayGetCount(CFArrayRef theArray)
+    const void* CFArrayGetValueAtIndex(CFArrayRef theArray, CFIndex idx)
+    CFIndex CFDataGetLength(CFDataRef theData)
+    const unsigned char* CFDataGetBytePtr(CFDataRef theData)
+    Boolean CFBooleanGetValue(CFBooleanRef boolean)
 
     # 数値型
     ctypedef enum CFNumberType:
@@ -72,6 +95,7 @@ cdef extern from "CoreFoundation/CoreFoundation.h":
 
     CFNumberRef CFNumberCreate(CFAllocatorRef allocator, CFNumberType theType, const void* valuePtr)
     Boolean CFNumberGetValue(CFNumberRef number, CFNumberType theType, void* valuePtr)
+    Boolean CFNumberIsFloatType(CFNumberRef number)
 
 
     # RunLoop API
@@ -83,7 +107,7 @@ cdef extern from "CoreFoundation/CoreFoundation.h":
     void CFRunLoopStop(CFRunLoopRef rl)
 
 # --- IOKit の C API 宣言 ---
-cdef extern from "IOKit/IOKitLib.h":
+cdef extern from "IOKit/IOKitLib.h" nogil:
     ctypedef unsigned int io_object_t
     ctypedef io_object_t io_service_t
     ctypedef io_object_t io_iterator_t
@@ -113,6 +137,15 @@ cdef extern from "IOKit/IOKitLib.h":
         unsigned int options
     )
     kern_return_t IORegistryEntryGetRegistryEntryID(io_service_t entry, unsigned long long *entryID)
+    kern_return_t IOObjectGetClass(io_object_t object, char* className) # io_name_t: char[128]
+    kern_return_t IORegistryEntryGetName(io_service_t entry, char* name) # io_name_t: char[128]
+    kern_return_t IORegistryEntryGetParentEntry(io_service_t entry, const char* plane, io_service_t* parent)
+    kern_return_t IORegistryEntryCreateCFProperties( # All properties of the entry in one call
+        io_service_t entry,
+        CFMutableDictionaryRef* properties,
+        CFAllocatorRef allocator,
+        unsigned int options
+    )
 
 
     # --- 通知関連 API ---
@@ -157,7 +190,23 @@ cdef unsigned int kCFStringEncodingUTF8 = 0x08000100
 # The actual string values are "idVendor" and "idProduct".
 USB_VENDOR_ID_KEY = "idVendor"
 USB_PRODUCT_ID_KEY = "idProduct"
-IO_PLATFORM_SERIAL_NUMBER_KEY = "IOPlatformSerialNumber"
+USB_SERIAL_NUMBER_KEY = "USB Serial Number" # kUSBSerialNumberString (the Mac's IOPlatformSerialNumber is not the device's)
+USB_LOCATION_ID_KEY = "locationID" # Port path; stays the same while the device re-enumerates with another PID
+
+# --- Property keys as CFStrings, created once at module init and kept for the module's lifetime ---
+cdef CFStringRef g_vendor_id_key = NULL
+cdef CFStringRef g_product_id_key = NULL
+cdef CFStringRef g_serial_number_key = NULL
+cdef CFStringRef g_location_id_key = NULL
+
+cdef void _init_property_keys() except *:
+    global g_vendor_id_key, g_product_id_key, g_serial_number_key, g_location_id_key
+    g_vendor_id_key = _py_str_to_cfstring(USB_VENDOR_ID_KEY)
+    g_product_id_key = _py_str_to_cfstring(USB_PRODUCT_ID_KEY)
+    g_serial_number_key = _py_str_to_cfstring(USB_SERIAL_NUMBER_KEY)
+    g_location_id_key = _py_str_to_cfstring(USB_LOCATION_ID_KEY)
+
+_init_property_keys()
 
 # --- Notification types (as bytes for IOServiceAddMatchingNotification) ---
 # These are extern const char kIOMatchedNotification[];
@@ -176,8 +225,44 @@ cdef CFRunLoopRef g_event_loop_run_loop_ref = NULL # Store the RunLoop of the ev
 cdef io_iterator_t g_matched_iterator = 0
 cdef io_iterator_t g_terminated_iterator = 0
 cdef object g_python_callback_handler = None
+cdef object g_registry_observer = None # registry_index.RegistryIndex kept current by the notifications
 cdef bint g_monitoring_active = False
 
+# --- Tracing (levels as in tracing.py) ---
+# The hot paths record into tracing.py's ring buffer instead of printing. g_trace_level is a C int,
+# so a disabled level costs one comparison: the message and its arguments are only built after
+# _tracing() passed. Until tracing.attach_native() installs a sink, warnings and errors are printed.
+cdef enum:
+    TRACE_DEBUG = 10
+    TRACE_INFO = 20
+    TRACE_WARNING = 30
+    TRACE_ERROR = 40
+    TRACE_OFF = 100
+cdef int g_trace_level = TRACE_WARNING
+cdef object g_trace_sink = None
+
+def set_trace(object sink, int level):
+    """
+    Routes trace records to sink(level, source, message, args) for levels >= level
+    (message % args is left to the sink). sink None goes back to printing warnings and errors.
+    """
+    global g_trace_sink, g_trace_level
+    g_trace_sink = sink
+    g_trace_level = level if sink is not None else TRACE_WARNING
+
+cdef inline bint _tracing(int level) noexcept:
+    return level >= g_trace_level
+
+cdef void _trace(int level, str source, str message, tuple args=()) noexcept:
+    # Callers check _tracing(level) first. Never raises: it runs inside the IOKit callback.
+    try:
+        if g_trace_sink is not None:
+            g_trace_sink(level, source, message, args)
+        else:
+            print(f"[{source}] {message % args if args else message}")
+    except Exception:
+        pass
+
 
 # --- Helper function to get a long property from a service ---
 cdef long _get_long_property(io_service_t service, const char* key_c_str):
@@ -225,118 +310,552 @@ cdef unsigned long long _get_service_id(io_service_t service):
     IORegistryEntryGetRegistryEntryID(service, &entry_id)
     return entry_id
 
+# --- Properties of the devices seen by the matched notification, by registry entry ID ---
+# A terminated service is on its way out of the registry: reading its properties may fail or race the
+# driver teardown. Its entry ID stays valid, so disconnects are reported with the properties cached
+# when the device was matched; the terminated service itself is never queried.
+# It is seeded by the initial drain of the matched iterator in init_usb_monitoring, so devices that
+# were connected before monitoring started are known too.
+cdef dict g_known_devices = {}
+UNKNOWN_DEVICE_PROPERTIES = (-1, -1, "N/A", None) # (vid, pid, serial_number, location_id) of an unseen device
+
+# --- Bulk property snapshot ---
+# One IORegistryEntryCreateCFProperties round-trip per device, looked up with the cached keys into a
+# C struct without the GIL; Python objects are only built afterwards.
+cdef struct DeviceSnapshot:
+    long long vendor_id     # -1 if not reported
+    long long product_id
+    long long location_id
+    bint has_serial_number
+    char serial_number[128] # USB string descriptors are at most 126 UTF-16 code units
+
+cdef long long _dict_get_long(CFDictionaryRef properties, CFStringRef key) noexcept nogil:
+    cdef CFTypeRef value = CFDictionaryGetValue(properties, key)
+    cdef long long result = -1
+    if value != NULL and CFGetTypeID(value) == CFNumberGetTypeID():
+        CFNumberGetValue(<CFNumberRef>value, kCFNumberLongLongType, &result)
+    return result
+
+cdef kern_return_t _snapshot_device(io_service_t service, DeviceSnapshot* snapshot) noexcept nogil:
+    cdef CFMutableDictionaryRef properties = NULL
+    cdef CFTypeRef serial_number
+    cdef kern_return_t kr = IORegistryEntryCreateCFProperties(service, &properties, kCFAllocatorDefault, 0)
+    snapshot.vendor_id = snapshot.product_id = snapshot.location_id = -1
+    snapshot.has_serial_number = False
+    if kr != KERN_SUCCESS or properties == NULL:
+        return kr
+    snapshot.vendor_id = _dict_get_long(properties, g_vendor_id_key)
+    snapshot.product_id = _dict_get_long(properties, g_product_id_key)
+    snapshot.location_id = _dict_get_long(properties, g_location_id_key)
+    serial_number = CFDictionaryGetValue(properties, g_serial_number_key)
+    if serial_number != NULL and CFGetTypeID(serial_number) == CFStringGetTypeID():
+        snapshot.has_serial_number = CFStringGetCString(<CFStringRef>serial_number, snapshot.serial_number,
+                                                        sizeof(snapshot.serial_number), kCFStringEncodingUTF8)
+    CFRelease(properties)
+    return KERN_SUCCESS
+
+cdef tuple _read_device_properties(io_service_t usb_device):
+    """(vendor_id, product_id, serial_number, location_id) of a device, from one registry snapshot."""
+    cdef DeviceSnapshot snapshot
+    cdef kern_return_t kr
+    with nogil:
+        kr = _snapshot_device(usb_device, &snapshot)
+    if kr != KERN_SUCCESS and _tracing(TRACE_WARNING):
+        _trace(TRACE_WARNING, "iokit_wrapper", "IORegistryEntryCreateCFProperties failed: %d", (kr,))
+    return (
+        <int>snapshot.vendor_id,
+        <int>snapshot.product_id,
+        snapshot.serial_number.decode('utf-8', 'replace') if snapshot.has_serial_number else "N/A",
+        snapshot.location_id if snapshot.location_id >= 0 else None,
+    )
+
+cdef tuple _read_device_properties_per_key(io_service_t usb_device):
+    # The previous read path (a CFString key and an IOKit call per property, under the GIL).
+    # Only kept as the baseline of profile_property_reads().
+    cdef long location_id = _get_long_property(usb_device, USB_LOCATION_ID_KEY.encode('utf-8'))
+    return (
+        <int>_get_long_property(usb_device, USB_VENDOR_ID_KEY.encode('utf-8')),
+        <int>_get_long_property(usb_device, USB_PRODUCT_ID_KEY.encode('utf-8')),
+        _get_string_property(usb_device, USB_SERIAL_NUMBER_KEY.encode('utf-8')),
+        location_id if location_id >= 0 else None,
+    )
+
+# --- Structured registry records (see registry_index.RegistryRecord) ---
+MONITOR_MATCH_CLASS = "IOUSBDevice" # The class the USB monitor matches (IOUSBHostDevice entries match it too)
+
+cdef dict _registry_record(io_service_t entry, unsigned long long entry_id, tuple properties):
+    cdef char class_name[128]
+    cdef char name[128]
+    cdef io_service_t parent = 0
+    cdef object parent_id = None
+    class_name[0] = 0
+    name[0] = 0
+    IOObjectGetClass(entry, class_name)
+    IORegistryEntryGetName(entry, name)
+    if IORegistryEntryGetParentEntry(entry, b"IOService", &parent) == KERN_SUCCESS and parent != 0:
+        parent_id = _get_service_id(parent)
+        IOObjectRelease(parent)
+    vendor_id, product_id, serial_number, location_id = properties
+    return {
+        'entry_id': entry_id,
+        'class_name': class_name.decode('utf-8', 'replace'),
+        'name': name.decode('utf-8', 'replace'),
+        'parent_id': parent_id,
+        'vendor_id': vendor_id if vendor_id >= 0 else None,
+        'product_id': product_id if product_id >= 0 else None,
+        'serial_number': serial_number if serial_number != "N/A" else None,
+        'location_id': location_id,
+    }
+
+# --- Event queue between the IOKit callback and the Python handler ---
+# The notification callback runs on the main run loop. It only records each device's entry ID, the
+# time and the service reference into a compact C record and pushes it onto a bounded
+# single-producer/single-consumer ring, without the GIL, then wakes the event worker thread through a
+# pipe. The worker reads the device properties and runs the registry observer and the Python handler
+# (which may start or stop cameras), so the run loop returns within microseconds however slow the
+# registry read or the Python side is. When the ring is full the event is counted as dropped and the handler's
+# on_events_dropped(count) is called, so it can rescan.
+cdef extern from *:
+    """
+    static inline size_t oakd_load_acquire(size_t *p) { return __atomic_load_n(p, __ATOMIC_ACQUIRE); }
+    static inline void oakd_store_release(size_t *p, size_t v) { __atomic_store_n(p, v, __ATOMIC_RELEASE); }
+    static inline size_t oakd_fetch_add(size_t *p, size_t v) { return __atomic_fetch_add(p, v, __ATOMIC_RELEASE); }
+    """
+    size_t oakd_load_acquire(size_t* p) nogil
+    void oakd_store_release(size_t* p, size_t v) nogil
+    size_t oakd_fetch_add(size_t* p, size_t v) nogil
+
+cdef enum:
+    EVENT_QUEUE_CAPACITY = 256 # Power of two
+    EVENT_QUEUE_MASK = EVENT_QUEUE_CAPACITY - 1
+
+cdef struct UsbEventRecord:
+    bint connected
+    io_service_t service        # Reference from IOIteratorNext; whoever takes the record releases it
+    unsigned long long entry_id
+    double timestamp            # CLOCK_MONOTONIC, the clock of start_metrics.now()
+
+cdef UsbEventRecord g_event_ring[EVENT_QUEUE_CAPACITY]
+cdef size_t g_ring_head = 0      # Next slot to write; written by the callback only
+cdef size_t g_ring_tail = 0      # Next slot to read; written by the event worker only
+# Counters written by the callback only, read from other threads with oakd_load_acquire
+cdef size_t g_events_enqueued = 0
+cdef size_t g_events_dropped = 0
+cdef size_t g_ring_max_depth = 0
+cdef int g_wake_fd = -1          # Write end of the worker's wake pipe (non-blocking)
+
+# Worker side (Python objects, touched with the GIL held)
+EVENT_WORKER_JOIN_TIMEOUT = 2.0
+cdef object g_event_worker = None
+cdef int g_wake_read_fd = -1
+cdef bint g_worker_stopping = False
+cdef size_t g_events_processed = 0
+cdef size_t g_dropped_reported = 0
+cdef double g_max_queue_latency = 0.0
+cdef bint g_connected_takes_event_time = False
+cdef bint g_disconnected_takes_event_time = False
+
+cdef double _monotonic_now() noexcept nogil:
+    cdef timespec ts
+    clock_gettime(CLOCK_MONOTONIC, &ts)
+    return ts.tv_sec + ts.tv_nsec * 1e-9
+
+cdef void _capture_event(io_service_t service, bint connected, UsbEventRecord* record) noexcept nogil:
+    record.connected = connected
+    record.service = service
+    record.entry_id = 0
+    IORegistryEntryGetRegistryEntryID(service, &record.entry_id)
+    record.timestamp = _monotonic_now()
+
 # --- C Callback for USB Device Events ---
-cdef void _usb_device_event_callback(void* refCon, io_iterator_t iterator) noexcept with gil:
-    print(f"[iokit_wrapper_callback] _usb_device_event_callback called. refCon (addr): {<Py_ssize_t>refCon}")
-    # This callback must not propagate Python exceptions to C code.
-    # It runs with the GIL acquired, as we'll call Python code.
+cdef void _usb_device_event_callback(void* refCon, io_iterator_t iterator) noexcept nogil:
+    # Runs on the main run loop without the GIL: no Python objects here.
+    # refCon is 1 for the matched (connect) notification and 0 for the terminated (disconnect) one.
+    # The iterator must always be drained: IOKit re-arms a notification only once its iterator is empty.
+    global g_events_dropped, g_events_enqueued, g_ring_max_depth
+    cdef bint is_connected_event = <bint>(<Py_ssize_t>refCon)
     cdef io_service_t usb_device
-    cdef int vendor_id
-    cdef int product_id
-    cdef str serial_number
-    cdef unsigned long long service_id
-    
-    # Extract Python handler and event type from refCon
-    # This assumes refCon is a pointer to a Python tuple stored by Cython.
-    # A safer way is to pass a C struct pointer or manage refCon carefully.
-    # For simplicity, we assume g_python_callback_handler is set.
-    # A better approach for event type: pass a small int/bool as part of refCon.
-    # For now, we'll rely on separate iterators for matched/terminated.
-    # This callback will be used for BOTH matched and terminated.
-    # We need a way to know which event it is.
-    # One way: check which global iterator (g_matched_iterator or g_terminated_iterator) matches `iterator`.
-    # This is not robust. Better: use different refCon for different notifications.
-    # Let's assume refCon is a simple int: 1 for matched, 0 for terminated.
-
-    is_connected_event = <bint>(<Py_ssize_t>refCon) # Cast void* to Py_ssize_t then to bint
-    print(f"[iokit_wrapper_callback] is_connected_event: {is_connected_event}")
-
-    if g_python_callback_handler is None:
-        print("[iokit_wrapper_callback] Python callback handler is None in C callback.")
-        return
+    cdef size_t head, depth
+    cdef bint pushed = False
+    cdef char wake_byte = 1
 
-    # print(f"Debug: _usb_device_event_callback called. Event type: {'connect' if is_connected_event else 'disconnect'}")
-    print(f"[iokit_wrapper_callback] Processing devices in iterator...")
     while True:
         usb_device = IOIteratorNext(iterator)
         if usb_device == 0:
             break
+        head = g_ring_head
+        depth = head - oakd_load_acquire(&g_ring_tail)
+        if depth >= EVENT_QUEUE_CAPACITY:
+            oakd_fetch_add(&g_events_dropped, 1)
+            IOObjectRelease(usb_device)
+            continue
+        _capture_event(usb_device, is_connected_event, &g_event_ring[head & EVENT_QUEUE_MASK])
+        oakd_store_release(&g_ring_head, head + 1)
+        oakd_fetch_add(&g_events_enqueued, 1)
+        if depth + 1 > g_ring_max_depth:
+            oakd_store_release(&g_ring_max_depth, depth + 1)
+        pushed = True
+
+    if pushed and g_wake_fd >= 0:
+        c_write(g_wake_fd, &wake_byte, 1) # EAGAIN: a wake-up is already pending
+
+cdef void _dispatch_event(UsbEventRecord* record) noexcept:
+    # Runs with the GIL on the event worker (or on the caller of init_usb_monitoring for the devices
+    # already connected). Releases the record's service.
+    cdef unsigned long long service_id = record.entry_id
+    cdef bint is_connected_event = record.connected
+    cdef tuple properties
+    try:
+        if is_connected_event:
+            properties = _read_device_properties(record.service) # Off the run loop: one registry round-trip
+            g_known_devices[service_id] = properties
+        else:
+            properties = g_known_devices.pop(service_id, None)
+            if properties is None:
+                # Never matched (its connect was dropped): report it by entry ID only. The terminated
+                # service is not queried; the handler resolves the entry ID against what it has seen.
+                properties = UNKNOWN_DEVICE_PROPERTIES
+                if _tracing(TRACE_INFO):
+                    _trace(TRACE_INFO, "iokit_wrapper", "Terminated entry %d was never matched; reporting it by entry ID",
+                           (service_id,))
+        if g_registry_observer is not None:
+            try:
+                if is_connected_event:
+                    g_registry_observer.entry_matched(_registry_record(record.service, service_id, properties),
+                                                      MONITOR_MATCH_CLASS)
+                else:
+                    g_registry_observer.entry_terminated(service_id)
+            except Exception as e:
+                if _tracing(TRACE_ERROR):
+                    _trace(TRACE_ERROR, "iokit_wrapper_callback", "Exception in registry observer: %r", (e,))
+    finally:
+        IOObjectRelease(record.service)
+        record.service = 0
+
+    vendor_id, product_id, serial_number, location_id = properties
+    if _tracing(TRACE_INFO):
+        _trace(TRACE_INFO, "iokit_wrapper_callback",
+               "Device %s: VID=%04x, PID=%04x, SN='%s', ServiceID=%d, LocationID=%08x",
+               ("connected" if is_connected_event else "disconnected", vendor_id, product_id, serial_number,
+                service_id, location_id if location_id is not None else 0xffffffff))
+
+    handler = g_python_callback_handler
+    if handler is None:
+        return
+    try:
+        # location_id is passed last (None if unknown) so handlers taking the original four arguments keep
+        # working; handlers declaring event_time also get the time the callback saw the event.
+        if is_connected_event:
+            if hasattr(handler, 'on_device_connected'):
+                if g_connected_takes_event_time:
+                    handler.on_device_connected(vendor_id, product_id, serial_number, service_id, location_id,
+                                                event_time=record.timestamp)
+                else:
+                    handler.on_device_connected(vendor_id, product_id, serial_number, service_id, location_id)
+        else:
+            if hasattr(handler, 'on_device_disconnected'):
+                if g_disconnected_takes_event_time:
+                    handler.on_device_disconnected(vendor_id, product_id, serial_number, service_id, location_id,
+                                                   event_time=record.timestamp)
+                else:
+                    handler.on_device_disconnected(vendor_id, product_id, serial_number, service_id, location_id)
+    except Exception as e: # Catch any Python exception
+        if _tracing(TRACE_ERROR):
+            _trace(TRACE_ERROR, "iokit_wrapper_callback", "Exception in Python callback: %r", (e,))
+
+cdef void _dispatch_iterator_now(void* refCon, io_iterator_t iterator):
+    # Arms a notification and reports the devices already on its iterator on the calling thread,
+    # so init_usb_monitoring returns with the connected devices known (as the Linux monitor does).
+    # For the matched iterator this seeds g_known_devices, so their later disconnects need no query.
+    cdef UsbEventRecord record
+    cdef io_service_t usb_device
+    while True:
+        usb_device = IOIteratorNext(iterator)
+        if usb_device == 0:
+            break
+        with nogil:
+            _capture_event(usb_device, <bint>(<Py_ssize_t>refCon), &record)
+        _dispatch_event(&record)
+
+cdef size_t _drain_event_queue():
+    # Event worker only (the single consumer). Returns the number of events handled.
+    global g_events_processed, g_max_queue_latency, g_ring_tail
+    cdef UsbEventRecord record
+    cdef size_t tail = g_ring_tail
+    cdef size_t head = oakd_load_acquire(&g_ring_head)
+    cdef size_t handled = 0
+    cdef double latency
+    while tail != head:
+        record = g_event_ring[tail & EVENT_QUEUE_MASK] # Copy out, then hand the slot back to the callback
+        tail += 1
+        oakd_store_release(&g_ring_tail, tail)
+        latency = _monotonic_now() - record.timestamp
+        if latency > g_max_queue_latency:
+            g_max_queue_latency = latency
+        _dispatch_event(&record)
+        handled += 1
+        if tail == head:
+            head = oakd_load_acquire(&g_ring_head)
+    g_events_processed += handled
+    return handled
+
+cdef void _report_dropped_events():
+    global g_dropped_reported
+    cdef size_t dropped = oakd_load_acquire(&g_events_dropped)
+    if dropped == g_dropped_reported:
+        return
+    count = dropped - g_dropped_reported
+    g_dropped_reported = dropped
+    if _tracing(TRACE_WARNING):
+        _trace(TRACE_WARNING, "iokit_wrapper", "USB event queue full: %d event(s) dropped (%d in total)",
+               (count, dropped))
+    handler = g_python_callback_handler
+    if handler is not None and hasattr(handler, 'on_events_dropped'):
+        try:
+            handler.on_events_dropped(count)
+        except Exception as e:
+            if _tracing(TRACE_ERROR):
+                _trace(TRACE_ERROR, "iokit_wrapper", "Exception in on_events_dropped: %r", (e,))
 
-        vendor_id = _get_long_property(usb_device, USB_VENDOR_ID_KEY.encode('utf-8'))
-        product_id = _get_long_property(usb_device, USB_PRODUCT_ID_KEY.encode('utf-8'))
-        serial_number = _get_string_property(usb_device, IO_PLATFORM_SERIAL_NUMBER_KEY.encode('utf-8'))
-        service_id = _get_service_id(usb_device)
-        
-        print(f"[iokit_wrapper_callback] Device event: VID={vendor_id:04x}, PID={product_id:04x}, SN='{serial_number}', ServiceID={service_id}")
-
+def _event_worker_loop(int wake_read_fd):
+    while True:
         try:
-            if is_connected_event:
-                if hasattr(g_python_callback_handler, 'on_device_connected'):
-                    g_python_callback_handler.on_device_connected(vendor_id, product_id, serial_number, service_id)
-            else:
-                if hasattr(g_python_callback_handler, 'on_device_disconnected'):
-                    g_python_callback_handler.on_device_disconnected(vendor_id, product_id, serial_number, service_id)
-        except Exception as e: # Catch any Python exception
-            # In a real app, log this error properly
-            # print(f"Error in Python callback: {e!r}")
-            print(f"[iokit_wrapper_callback] Exception in Python callback: {e!r}")
-            pass # Do not let exceptions escape to C.
-
-        IOObjectRelease(usb_device)
-    print(f"[iokit_wrapper_callback] Finished processing devices in iterator.")
-    return # Explicit return for noexcept void function
+            os.read(wake_read_fd, 512)
+        except OSError:
+            return
+        _drain_event_queue()
+        _report_dropped_events()
+        if g_worker_stopping:
+            return
+
+cdef void _start_event_worker() except *:
+    global g_event_worker, g_wake_read_fd, g_wake_fd, g_worker_stopping
+    read_fd, write_fd = os.pipe()
+    os.set_blocking(write_fd, False)
+    g_wake_read_fd = read_fd
+    g_wake_fd = write_fd
+    g_worker_stopping = False
+    g_event_worker = threading.Thread(target=_event_worker_loop, args=(read_fd,), name="iokit-event-worker",
+                                      daemon=True)
+    g_event_worker.start()
+
+cdef void _stop_event_worker() except *:
+    # Called after the notifications are gone, so nothing is enqueued any more
+    global g_event_worker, g_wake_read_fd, g_wake_fd, g_worker_stopping, g_ring_tail
+    cdef int write_fd = g_wake_fd
+    cdef UsbEventRecord* record
+    if g_event_worker is None:
+        return
+    g_worker_stopping = True
+    g_wake_fd = -1
+    try:
+        os.write(write_fd, b"\x01")
+    except OSError:
+        pass
+    g_event_worker.join(EVENT_WORKER_JOIN_TIMEOUT)
+    if g_event_worker.is_alive():
+        # Still inside the handler; it exits after this batch. The ring stays with it.
+        if _tracing(TRACE_WARNING):
+            _trace(TRACE_WARNING, "iokit_wrapper", "Event worker did not stop within %.1f s", (EVENT_WORKER_JOIN_TIMEOUT,))
+    else:
+        while g_ring_tail != g_ring_head: # Release what the worker left behind
+            record = &g_event_ring[g_ring_tail & EVENT_QUEUE_MASK]
+            IOObjectRelease(record.service)
+            g_ring_tail += 1
+        os.close(g_wake_read_fd)
+    os.close(write_fd)
+    g_event_worker = None
+    g_wake_read_fd = -1
+
+cdef bint _accepts_event_time(object method):
+    try:
+        return "event_time" in inspect.signature(method).parameters
+    except (TypeError, ValueError):
+        return False
+
+def event_queue_stats():
+    """
+    Counters of the queue between the IOKit callback and the event worker: capacity, depth, enqueued,
+    dropped (the queue was full), max_depth, processed and max_latency_ms (callback to handler).
+    """
+    cdef size_t head = oakd_load_acquire(&g_ring_head)
+    cdef size_t tail = oakd_load_acquire(&g_ring_tail)
+    return {
+        'capacity': EVENT_QUEUE_CAPACITY,
+        'depth': head - tail,
+        'enqueued': oakd_load_acquire(&g_events_enqueued),
+        'dropped': oakd_load_acquire(&g_events_dropped),
+        'max_depth': oakd_load_acquire(&g_ring_max_depth),
+        'processed': g_events_processed,
+        'max_latency_ms': g_max_queue_latency * 1000,
+    }
+
+
+def set_registry_observer(object observer):
+    """
+    Registers an object with entry_matched(record, match_class) and entry_terminated(entry_id), called
+    from the USB monitor's notifications (e.g. a registry_index.RegistryIndex). Set it before
+    init_usb_monitoring to also receive the devices already connected. None unregisters it.
+    """
+    global g_registry_observer
+    g_registry_observer = observer
+
+
+def registry_snapshot(str class_name=MONITOR_MATCH_CLASS):
+    """
+    Structured records of every registry entry matching class_name, in one pass:
+    [{entry_id, class_name, name, parent_id, vendor_id, product_id, serial_number, location_id}, ...]
+    """
+    cdef io_iterator_t iterator = 0
+    cdef io_service_t service = 0
+    cdef unsigned long long entry_id
+    cdef kern_return_t kr
+    cdef CFMutableDictionaryRef matching_dict = <CFMutableDictionaryRef>IOServiceMatching(class_name.encode('utf-8'))
+    if matching_dict == NULL:
+        raise IOKitError(f"IOServiceMatching failed to create a dictionary for {class_name}")
+    kr = IOServiceGetMatchingServices(kIOMainPortDefault, matching_dict, &iterator) # Consumes matching_dict
+    if kr != KERN_SUCCESS:
+        raise IOKitError(f"IOServiceGetMatchingServices failed for {class_name}: {kr}")
+
+    records = []
+    try:
+        while True:
+            service = IOIteratorNext(iterator)
+            if service == 0:
+                break
+            entry_id = _get_service_id(service)
+            records.append(_registry_record(service, entry_id, _read_device_properties(service)))
+            IOObjectRelease(service)
+            service = 0
+    finally:
+        if service != 0: IOObjectRelease(service)
+        IOObjectRelease(iterator)
+    return records
+
+
+def get_known_devices():
+    """Devices currently matched by the monitor: {service_id: (vid, pid, serial_number, location_id)}."""
+    return dict(g_known_devices)
+
+
+def profile_property_reads(int vid, int pid=0, int iterations=1000):
+    """
+    Times the property read done for every device in _usb_device_event_callback, per connected device
+    matching vid (and pid if > 0): the per-key path (CFString key + IOKit call per property) against the
+    bulk snapshot. Returns [{service_id, properties, per_key_us, bulk_us}, ...] (mean microseconds per read).
+    Used by benchmarks/bench_iokit_properties.py.
+    """
+    cdef io_iterator_t iterator = 0
+    cdef io_service_t usb_device = 0
+    cdef kern_return_t kr
+    cdef long vendor_id_val = vid
+    cdef long product_id_val = pid
+    cdef CFNumberRef value_cf = NULL
+    cdef int i
+    cdef CFMutableDictionaryRef matching_dict = <CFMutableDictionaryRef>IOServiceMatching(b"IOUSBDevice")
+    if matching_dict == NULL:
+        raise IOKitError("IOServiceMatching failed to create a dictionary for IOUSBDevice")
+    value_cf = CFNumberCreate(kCFAllocatorDefault, kCFNumberLongType, &vendor_id_val)
+    CFDictionarySetValue(matching_dict, g_vendor_id_key, value_cf)
+    CFRelease(value_cf)
+    if pid > 0:
+        value_cf = CFNumberCreate(kCFAllocatorDefault, kCFNumberLongType, &product_id_val)
+        CFDictionarySetValue(matching_dict, g_product_id_key, value_cf)
+        CFRelease(value_cf)
+
+    # IOServiceGetMatchingServices consumes the dictionary
+    kr = IOServiceGetMatchingServices(kIOMainPortDefault, matching_dict, &iterator)
+    if kr != KERN_SUCCESS:
+        raise IOKitError(f"IOServiceGetMatchingServices failed: {kr}")
+
+    results = []
+    perf_counter_ns = time.perf_counter_ns
+    try:
+        while True:
+            usb_device = IOIteratorNext(iterator)
+            if usb_device == 0:
+                break
+            start = perf_counter_ns()
+            for i in range(iterations):
+                _read_device_properties_per_key(usb_device)
+            per_key_ns = perf_counter_ns() - start
+            start = perf_counter_ns()
+            for i in range(iterations):
+                properties = _read_device_properties(usb_device)
+            bulk_ns = perf_counter_ns() - start
+            results.append({
+                "service_id": _get_service_id(usb_device),
+                "properties": properties,
+                "per_key_us": per_key_ns / iterations / 1000,
+                "bulk_us": bulk_ns / iterations / 1000,
+            })
+            IOObjectRelease(usb_device)
+            usb_device = 0
+    finally:
+        if usb_device != 0: IOObjectRelease(usb_device)
+        IOObjectRelease(iterator)
+    return results
 
 
 # --- Python-callable functions for USB Monitoring ---
 def init_usb_monitoring(object callback_handler, int vid, int pid):
     global g_notify_port, g_run_loop_source, g_python_callback_handler
     global g_matched_iterator, g_terminated_iterator, g_monitoring_active
-    print("[iokit_wrapper] init_usb_monitoring: Start")
+    global g_connected_takes_event_time, g_disconnected_takes_event_time
+    if _tracing(TRACE_DEBUG):
+        _trace(TRACE_DEBUG, "iokit_wrapper", "init_usb_monitoring: Start")
 
     if g_monitoring_active:
-        print("[iokit_wrapper] USB monitoring is already active.")
+        if _tracing(TRACE_INFO):
+            _trace(TRACE_INFO, "iokit_wrapper", "USB monitoring is already active.")
         return True
 
     g_python_callback_handler = callback_handler
-    print(f"[iokit_wrapper] Python callback handler set: {g_python_callback_handler}") # This is a Python object, should be fine
+    g_connected_takes_event_time = _accepts_event_time(getattr(callback_handler, 'on_device_connected', None))
+    g_disconnected_takes_event_time = _accepts_event_time(getattr(callback_handler, 'on_device_disconnected', None))
+    if _tracing(TRACE_DEBUG):
+        _trace(TRACE_DEBUG, "iokit_wrapper", "Python callback handler set: %s", (g_python_callback_handler,))
 
     # Use kIOMainPortDefault if available (macOS 12+), otherwise kIOMasterPortDefault
     # For simplicity in this step, we'll try kIOMainPortDefault directly.
     # A more robust solution might involve checking macOS version or SDK capabilities.
     g_notify_port = IONotificationPortCreate(kIOMainPortDefault) 
-    print(f"[iokit_wrapper] IONotificationPortCreate with kIOMainPortDefault result (addr): {<Py_ssize_t>g_notify_port}")
+    if _tracing(TRACE_DEBUG):
+        _trace(TRACE_DEBUG, "iokit_wrapper", "IONotificationPortCreate with kIOMainPortDefault result (addr): %d", (<Py_ssize_t>g_notify_port,))
     if g_notify_port == NULL:
         # Fallback or error
-        print("[iokit_wrapper] IONotificationPortCreate with kIOMainPortDefault failed, trying kIOMasterPortDefault...")
+        if _tracing(TRACE_DEBUG):
+            _trace(TRACE_DEBUG, "iokit_wrapper", "IONotificationPortCreate with kIOMainPortDefault failed, trying kIOMasterPortDefault...")
         g_notify_port = IONotificationPortCreate(kIOMasterPortDefault)
-        print(f"[iokit_wrapper] IONotificationPortCreate with kIOMasterPortDefault result (addr): {<Py_ssize_t>g_notify_port}")
+        if _tracing(TRACE_DEBUG):
+            _trace(TRACE_DEBUG, "iokit_wrapper", "IONotificationPortCreate with kIOMasterPortDefault result (addr): %d", (<Py_ssize_t>g_notify_port,))
         if g_notify_port == NULL:
             raise IOKitError("Failed to create IONotificationPort with both kIOMainPortDefault and kIOMasterPortDefault")
 
-    # g_notify_port = IONotificationPortCreate(kIOMasterPortDefault) # Original line
-    # print(f"[iokit_wrapper] IONotificationPortCreate result (addr): {<Py_ssize_t>g_notify_port}")
-    # if g_notify_port == NULL:
-        raise IOKitError("Failed to create IONotificationPort")
 
     g_run_loop_source = IONotificationPortGetRunLoopSource(g_notify_port)
-    print(f"[iokit_wrapper] IONotificationPortGetRunLoopSource result (addr): {<Py_ssize_t>g_run_loop_source}")
+    if _tracing(TRACE_DEBUG):
+        _trace(TRACE_DEBUG, "iokit_wrapper", "IONotificationPortGetRunLoopSource result (addr): %d", (<Py_ssize_t>g_run_loop_source,))
     if g_run_loop_source == NULL:
         IONotificationPortDestroy(g_notify_port)
         g_notify_port = NULL
         raise IOKitError("Failed to get RunLoopSource from IONotificationPort")
 
     # --- Create Matching Dictionary ---
-    print("[iokit_wrapper] Creating matching dictionary...")
+    if _tracing(TRACE_DEBUG):
+        _trace(TRACE_DEBUG, "iokit_wrapper", "Creating matching dictionary...")
     # Match IOUSBDevice class (or IOUSBHostDevice on newer macOS for some devices)
     cdef CFMutableDictionaryRef matching_dict = IOServiceMatching(b"IOUSBDevice")
-    print(f"[iokit_wrapper] IOServiceMatching result (addr): {<Py_ssize_t>matching_dict}")
+    if _tracing(TRACE_DEBUG):
+        _trace(TRACE_DEBUG, "iokit_wrapper", "IOServiceMatching result (addr): %d", (<Py_ssize_t>matching_dict,))
     if matching_dict == NULL:
         IONotificationPortDestroy(g_notify_port)
         g_notify_port = NULL
         raise IOKitError("IOServiceMatching failed to create a dictionary for IOUSBDevice")
 
     # Add Vendor ID to matching dictionary
-    print(f"[iokit_wrapper] Adding VID {vid:04x} to matching dictionary...")
+    if _tracing(TRACE_DEBUG):
+        _trace(TRACE_DEBUG, "iokit_wrapper", "Adding VID %04x to matching dictionary...", (vid,))
     cdef long vendor_id_val = vid
     cdef CFNumberRef vid_cf = CFNumberCreate(kCFAllocatorDefault, kCFNumberLongType, &vendor_id_val)
     if vid_cf == NULL:
@@ -344,113 +863,92 @@ def init_usb_monitoring(object callback_handler, int vid, int pid):
         IONotificationPortDestroy(g_notify_port)
         g_notify_port = NULL
         raise IOKitError("CFNumberCreate failed for Vendor ID")
-    
-    # Use Python string for key, then convert to CFStringRef
-    cdef CFStringRef vid_key_cf = _py_str_to_cfstring(USB_VENDOR_ID_KEY)
-    if vid_key_cf == NULL:
-        CFRelease(vid_cf)
-        CFRelease(matching_dict)
-        IONotificationPortDestroy(g_notify_port)
-        g_notify_port = NULL
-        raise IOKitError("Failed to create CFString for Vendor ID key")
-    CFDictionarySetValue(matching_dict, vid_key_cf, vid_cf)
-    CFRelease(vid_key_cf)
+    CFDictionarySetValue(matching_dict, g_vendor_id_key, vid_cf) # Key cached at module init
     CFRelease(vid_cf)
 
-    # Add Product ID to matching dictionary
+    # Add Product ID to matching dictionary. pid <= 0 matches every product of the vendor, which is
+    # needed to follow an OAK device through its unbooted -> booted (-> bootloader) PID changes.
     cdef long product_id_val = pid
-    cdef CFNumberRef pid_cf = CFNumberCreate(kCFAllocatorDefault, kCFNumberLongType, &product_id_val)
-    if pid_cf == NULL:
-        CFRelease(matching_dict)
-        IONotificationPortDestroy(g_notify_port)
-        g_notify_port = NULL
-        raise IOKitError("CFNumberCreate failed for Product ID")
-
-    cdef CFStringRef pid_key_cf = _py_str_to_cfstring(USB_PRODUCT_ID_KEY)
-    if pid_key_cf == NULL:
+    cdef CFNumberRef pid_cf = NULL
+    if pid > 0:
+        pid_cf = CFNumberCreate(kCFAllocatorDefault, kCFNumberLongType, &product_id_val)
+        if pid_cf == NULL:
+            CFRelease(matching_dict)
+            IONotificationPortDestroy(g_notify_port)
+            g_notify_port = NULL
+            raise IOKitError("CFNumberCreate failed for Product ID")
+        CFDictionarySetValue(matching_dict, g_product_id_key, pid_cf)
         CFRelease(pid_cf)
-        CFRelease(matching_dict)
+        if _tracing(TRACE_DEBUG):
+            _trace(TRACE_DEBUG, "iokit_wrapper", "VID and PID added to matching dictionary.")
+    else:
+        if _tracing(TRACE_DEBUG):
+            _trace(TRACE_DEBUG, "iokit_wrapper", "VID added to matching dictionary (any PID).")
+    
+    # matching_dict is now fully populated. It is shared by the matched and terminated notifications:
+    # IOServiceAddMatchingNotification always consumes one reference, even when it fails, so one is
+    # retained per registration and our own reference is released exactly once (on success or failure).
+
+    # --- Register for Terminated (Disconnect) Notifications ---
+    # Registered first, so a device unplugged while the initial matches are processed is not missed.
+    if _tracing(TRACE_DEBUG):
+        _trace(TRACE_DEBUG, "iokit_wrapper", "Registering for Terminated (Disconnect) Notifications...")
+    CFRetain(matching_dict)
+    # Pass 0 (False) as refCon for disconnected events
+    cdef kern_return_t kr = IOServiceAddMatchingNotification(
+        g_notify_port,
+        K_IO_TERMINATED_NOTIFICATION,
+        matching_dict, # One reference consumed
+        _usb_device_event_callback,
+        <void*>0, # refCon for "disconnected"
+        &g_terminated_iterator
+    )
+    if _tracing(TRACE_DEBUG):
+        _trace(TRACE_DEBUG, "iokit_wrapper", "IOServiceAddMatchingNotification (disconnect) result: %s, iterator (addr): %d", (kr, <Py_ssize_t>g_terminated_iterator))
+    if kr != KERN_SUCCESS:
+        CFRelease(matching_dict) # Our own reference; the failed registration consumed the retained one
         IONotificationPortDestroy(g_notify_port)
         g_notify_port = NULL
-        raise IOKitError("Failed to create CFString for Product ID key")
-    CFDictionarySetValue(matching_dict, pid_key_cf, pid_cf)
-    CFRelease(pid_key_cf)
-    CFRelease(pid_cf)
-    print("[iokit_wrapper] VID and PID added to matching dictionary.")
-    
-    # matching_dict is now fully populated.
-    # IOServiceAddMatchingNotification consumes the dictionary, so we don't release it here.
+        g_run_loop_source = NULL
+        raise IOKitError(f"IOServiceAddMatchingNotification (disconnect) failed: {kr}")
+    # Arm the notification. Nothing has terminated yet, so this only drains the iterator.
+    _dispatch_iterator_now(<void*>0, g_terminated_iterator)
 
     # --- Register for Matched (Connect) Notifications ---
-    print("[iokit_wrapper] Registering for Matched (Connect) Notifications...")
+    if _tracing(TRACE_DEBUG):
+        _trace(TRACE_DEBUG, "iokit_wrapper", "Registering for Matched (Connect) Notifications...")
+    CFRetain(matching_dict)
     # Pass 1 (True) as refCon for connected events
-    cdef kern_return_t kr = IOServiceAddMatchingNotification(
+    kr = IOServiceAddMatchingNotification(
         g_notify_port,
         K_IO_MATCHED_NOTIFICATION,
-        matching_dict, # This matching_dict is consumed
+        matching_dict, # One reference consumed
         _usb_device_event_callback,
         <void*>1, # refCon for "connected"
         &g_matched_iterator
     )
-    print(f"[iokit_wrapper] IOServiceAddMatchingNotification (connect) result: {kr}, iterator (addr): {<Py_ssize_t>g_matched_iterator}")
+    if _tracing(TRACE_DEBUG):
+        _trace(TRACE_DEBUG, "iokit_wrapper", "IOServiceAddMatchingNotification (connect) result: %s, iterator (addr): %d", (kr, <Py_ssize_t>g_matched_iterator))
+    CFRelease(matching_dict) # Our own reference; the notifications hold theirs
     if kr != KERN_SUCCESS:
-        # If AddMatchingNotification fails, it does NOT consume the dictionary.
-        CFRelease(matching_dict) 
+        IOObjectRelease(g_terminated_iterator)
+        g_terminated_iterator = 0
         IONotificationPortDestroy(g_notify_port)
         g_notify_port = NULL
+        g_run_loop_source = NULL
         raise IOKitError(f"IOServiceAddMatchingNotification (connect) failed: {kr}")
 
-    # Process initially connected devices
-    print("[iokit_wrapper] Processing initially connected devices (connect)...")
-    _usb_device_event_callback(<void*>1, g_matched_iterator)
-    print("[iokit_wrapper] Finished processing initially connected devices (connect).")
+    # Process initially connected devices (this also arms the notification)
+    if _tracing(TRACE_DEBUG):
+        _trace(TRACE_DEBUG, "iokit_wrapper", "Processing initially connected devices (connect)...")
+    _dispatch_iterator_now(<void*>1, g_matched_iterator)
+    if _tracing(TRACE_DEBUG):
+        _trace(TRACE_DEBUG, "iokit_wrapper", "Finished processing initially connected devices (connect).")
+    _start_event_worker() # Later notifications are handled there
 
-    # --- Register for Terminated (Disconnect) Notifications ---
-    print("[iokit_wrapper] Terminated (Disconnect) Notifications are currently commented out.")
-    # Temporarily commented out to isolate the kIOReturnExclusiveAccess error
-    # matching_dict_term = IOServiceMatching(b"IOUSBDevice") # Match IOUSBDevice
-    # if matching_dict_term == NULL:
-    #     stop_usb_monitoring() # Attempt to clean up
-    #     raise IOKitError("IOServiceMatching failed for terminated notifications")
-
-    # # Populate with VID/PID again
-    # vid_cf_term = CFNumberCreate(kCFAllocatorDefault, kCFNumberLongType, &vendor_id_val) # Use different var names
-    # pid_cf_term = CFNumberCreate(kCFAllocatorDefault, kCFNumberLongType, &product_id_val)
-    # vid_key_cf_term = _py_str_to_cfstring(USB_VENDOR_ID_KEY)
-    # pid_key_cf_term = _py_str_to_cfstring(USB_PRODUCT_ID_KEY)
-
-    # if not (vid_cf_term and pid_cf_term and vid_key_cf_term and pid_key_cf_term):
-    #     if vid_cf_term: CFRelease(vid_cf_term)
-    #     if pid_cf_term: CFRelease(pid_cf_term)
-    #     if vid_key_cf_term: CFRelease(vid_key_cf_term)
-    #     if pid_key_cf_term: CFRelease(pid_key_cf_term)
-    #     CFRelease(matching_dict_term)
-    #     stop_usb_monitoring()
-    #     raise IOKitError("Failed to create CF objects for terminated matching dict (term)")
-
-    # CFDictionarySetValue(matching_dict_term, vid_key_cf_term, vid_cf_term)
-    # CFDictionarySetValue(matching_dict_term, pid_key_cf_term, pid_cf_term)
-    # CFRelease(vid_key_cf_term); CFRelease(pid_key_cf_term); CFRelease(vid_cf_term); CFRelease(pid_cf_term)
-    
-    # # Pass 0 (False) as refCon for disconnected events
-    # kr = IOServiceAddMatchingNotification(
-    #     g_notify_port,
-    #     K_IO_TERMINATED_NOTIFICATION,
-    #     matching_dict_term, # This matching_dict is consumed
-    #     _usb_device_event_callback,
-    #     <void*>0, # refCon for "disconnected"
-    #     &g_terminated_iterator
-    # )
-    # if kr != KERN_SUCCESS:
-    #     CFRelease(matching_dict_term) # Not consumed on failure
-    #     stop_usb_monitoring() # Attempt to clean up
-    #     raise IOKitError(f"IOServiceAddMatchingNotification (disconnect) failed: {kr}")
-
-    # # Process initially present devices that might have terminated (less common to iterate here)
-    # _usb_device_event_callback(<void*>0, g_terminated_iterator)
-    
     g_monitoring_active = True
-    print("[iokit_wrapper] init_usb_monitoring: End (connect only).")
+    if _tracing(TRACE_INFO):
+        _trace(TRACE_INFO, "iokit_wrapper", "init_usb_monitoring: End (connect and disconnect).")
     # Return the address of the run loop source so Python side can manage it
     return <Py_ssize_t>g_run_loop_source
 
@@ -478,11 +976,13 @@ def init_usb_monitoring(object callback_handler, int vid, int pid):
 
 def stop_usb_monitoring():
     global g_notify_port, g_run_loop_source, g_event_loop_run_loop_ref # g_event_loop_run_loop_ref might become obsolete
-    global g_matched_iterator, g_terminated_iterator, g_monitoring_active
-    print("[iokit_wrapper] stop_usb_monitoring: Start")
+    global g_matched_iterator, g_terminated_iterator, g_monitoring_active, g_registry_observer
+    if _tracing(TRACE_DEBUG):
+        _trace(TRACE_DEBUG, "iokit_wrapper", "stop_usb_monitoring: Start")
 
     if not g_monitoring_active:
-        print("[iokit_wrapper] USB monitoring is not active or already stopped.")
+        if _tracing(TRACE_INFO):
+            _trace(TRACE_INFO, "iokit_wrapper", "USB monitoring is not active or already stopped.")
         return
 
     # CFRunLoopStop and CFRunLoopRemoveSource will be handled differently
@@ -501,7 +1001,8 @@ def stop_usb_monitoring():
     #     pass
 
     # Clean up resources
-    print("[iokit_wrapper] Cleaning up IOKit resources (port, iterators)...")
+    if _tracing(TRACE_DEBUG):
+        _trace(TRACE_DEBUG, "iokit_wrapper", "Cleaning up IOKit resources (port, iterators)...")
     # If g_run_loop_source was added to the main loop, it needs to be removed from there first.
     # This function might be called when the app quits.
     # We'll assume for now that the main loop source removal is handled elsewhere or before this.
@@ -510,27 +1011,36 @@ def stop_usb_monitoring():
     #    print(f"[iokit_wrapper] Removing RunLoopSource (addr): {<Py_ssize_t>g_run_loop_source} from a RunLoop (TBD)")
     #    CFRunLoopRemoveSource(mainRunLoop, g_run_loop_source, kCFRunLoopDefaultMode)
 
-    if g_notify_port != NULL:
-        print(f"[iokit_wrapper] Destroying NotificationPort (addr): {<Py_ssize_t>g_notify_port}")
-        IONotificationPortDestroy(g_notify_port)
-        g_notify_port = NULL
-        g_run_loop_source = NULL # It's invalidated when port is destroyed
-
+    # Iterators first: they belong to notifications registered on the port
     if g_matched_iterator != 0:
-        print(f"[iokit_wrapper] Releasing matched_iterator (addr): {<Py_ssize_t>g_matched_iterator}")
+        if _tracing(TRACE_DEBUG):
+            _trace(TRACE_DEBUG, "iokit_wrapper", "Releasing matched_iterator (addr): %d", (<Py_ssize_t>g_matched_iterator,))
         IOObjectRelease(g_matched_iterator)
         g_matched_iterator = 0
     
     if g_terminated_iterator != 0:
-        print(f"[iokit_wrapper] Releasing terminated_iterator (addr): {<Py_ssize_t>g_terminated_iterator}")
+        if _tracing(TRACE_DEBUG):
+            _trace(TRACE_DEBUG, "iokit_wrapper", "Releasing terminated_iterator (addr): %d", (<Py_ssize_t>g_terminated_iterator,))
         IOObjectRelease(g_terminated_iterator)
         g_terminated_iterator = 0
 
+    if g_notify_port != NULL:
+        if _tracing(TRACE_DEBUG):
+            _trace(TRACE_DEBUG, "iokit_wrapper", "Destroying NotificationPort (addr): %d", (<Py_ssize_t>g_notify_port,))
+        IONotificationPortDestroy(g_notify_port)
+        g_notify_port = NULL
+        g_run_loop_source = NULL # It's invalidated when port is destroyed
+
+    _stop_event_worker()
+    g_known_devices.clear()
     g_python_callback_handler = None
-    print("[iokit_wrapper] Python callback handler cleared.")
+    g_registry_observer = None
+    if _tracing(TRACE_DEBUG):
+        _trace(TRACE_DEBUG, "iokit_wrapper", "Python callback handler cleared.")
     g_event_loop_run_loop_ref = NULL
     g_monitoring_active = False
-    print("[iokit_wrapper] stop_usb_monitoring: End. USB monitoring stopped and resources cleaned up.")
+    if _tracing(TRACE_INFO):
+        _trace(TRACE_INFO, "iokit_wrapper", "stop_usb_monitoring: End. USB monitoring stopped and resources cleaned up.")
 
 
 # --- Helper functions for adding/removing run loop source from Python ---
@@ -563,13 +1073,18 @@ def remove_run_loop_source_from_main_loop(Py_ssize_t source_addr):
 # --- Original functions (get_service_properties, list_services, etc.) ---
 # These are kept for now, but might need adjustments if types changed (e.g. CFDictionaryRef)
 
-def get_service_properties(service_name: str, property_name: str = None):
+def get_service_properties(service_name: str, property_name: str = None, bint all_properties=False):
+    """
+    Properties of the first service of the given class: property_name only, or (without it) a basic set
+    (serial number, model, ...), or with all_properties=True every property of the registry entry.
+    """
     cdef io_iterator_t iterator = 0
     cdef io_service_t service = 0
     cdef kern_return_t result
     cdef CFMutableDictionaryRef cf_matching_dict = NULL
     cdef CFStringRef cf_prop_name_cfstr = NULL
     cdef CFTypeRef cf_prop_value = NULL
+    cdef CFMutableDictionaryRef cf_all_properties = NULL
     
     service_name_bytes = service_name.encode('utf-8')
     properties = {}
@@ -580,17 +1095,18 @@ def get_service_properties(service_name: str, property_name: str = None):
             raise IOKitError(f"Failed to create matching dictionary for {service_name}")
         
         # Use kIOMainPortDefault if available
+        CFRetain(cf_matching_dict) # IOServiceGetMatchingServices always consumes one reference
         result = IOServiceGetMatchingServices(kIOMainPortDefault, cf_matching_dict, &iterator)
         if result != KERN_SUCCESS: # Fallback or handle error
             print(f"[iokit_wrapper] IOServiceGetMatchingServices with kIOMainPortDefault failed ({result}), trying kIOMasterPortDefault...")
+            CFRetain(cf_matching_dict) # IOServiceGetMatchingServices always consumes one reference
             result = IOServiceGetMatchingServices(kIOMasterPortDefault, cf_matching_dict, &iterator)
             if result != KERN_SUCCESS:
                  raise IOKitError(f"Failed to get matching services with both ports: {result}")
         
         # result = IOServiceGetMatchingServices(kIOMasterPortDefault, cf_matching_dict, &iterator) # Original
-        # IOServiceMatching creates a dict that we own.
-        # IOServiceGetMatchingServices does NOT consume it according to some sources/examples.
-        # So, we must release cf_matching_dict.
+        # IOServiceMatching creates a dict that we own. IOServiceGetMatchingServices consumes one
+        # reference per call (retained above), so our own reference is released in finally.
         
         if result != KERN_SUCCESS:
             raise IOKitError(f"Failed to get matching services: {result}")
@@ -608,16 +1124,20 @@ def get_service_properties(service_name: str, property_name: str = None):
                     properties[property_name] = _convert_cf_to_python(cf_prop_value)
                     CFRelease(cf_prop_value)
         else:
+            # One registry round-trip for every property, instead of a CFString key and a call per property
+            result = IORegistryEntryCreateCFProperties(service, &cf_all_properties, kCFAllocatorDefault, 0)
+            if result != KERN_SUCCESS:
+                raise IOKitError(f"Failed to read the properties of {service_name}: {result}")
+            try:
+                all_props = _cfdictionary_to_python(<CFDictionaryRef>cf_all_properties)
+            finally:
+                CFRelease(cf_all_properties)
+            if all_properties:
+                return all_props
             basic_props_list = ["IOPlatformSerialNumber", "model", "manufacturer", "product-name", "version"]
             for prop_str in basic_props_list:
-                prop_bytes = prop_str.encode('utf-8')
-                cf_prop_name_cfstr_loop = CFStringCreateWithCString(kCFAllocatorDefault, prop_bytes, kCFStringEncodingUTF8)
-                if cf_prop_name_cfstr_loop != NULL:
-                    cf_prop_value_loop = IORegistryEntryCreateCFProperty(service, cf_prop_name_cfstr_loop, kCFAllocatorDefault, 0)
-                    if cf_prop_value_loop != NULL:
-                        properties[prop_str] = _convert_cf_to_python(cf_prop_value_loop)
-                        CFRelease(cf_prop_value_loop)
-                    CFRelease(cf_prop_name_cfstr_loop)
+                if prop_str in all_props:
+                    properties[prop_str] = all_props[prop_str]
         return properties
     finally:
         if service != 0: IOObjectRelease(service)
@@ -626,75 +1146,112 @@ def get_service_properties(service_name: str, property_name: str = None):
         if cf_prop_name_cfstr != NULL: CFRelease(cf_prop_name_cfstr) # If single property was used
 
 def list_services(service_class_name: str = None):
-    cdef io_iterator_t iterator = 0
-    cdef io_service_t service = 0
-    cdef kern_return_t result
-    cdef CFMutableDictionaryRef cf_matching_dict = NULL
-    py_services_list = []
-
+    """Registry records (see registry_snapshot) of every service of the class (IOService if None)."""
+    return registry_snapshot(service_class_name or "IOService")
+
+
+# --- CF -> Python conversion ---
+# CFString -> str, CFNumber -> int/float, CFBoolean -> bool, CFArray -> list, CFDictionary -> dict,
+# CFData -> read-only memoryview over the CFData's own bytes (no copy; the CFData is retained by the view).
+cdef class CFDataBuffer:
+    """Buffer over the bytes of a retained CFData, released when the last view of it goes away."""
+    cdef CFDataRef data
+
+    def __cinit__(self):
+        self.data = NULL
+
+    def __dealloc__(self):
+        if self.data != NULL:
+            CFRelease(self.data)
+
+    def __len__(self):
+        return CFDataGetLength(self.data) if self.data != NULL else 0
+
+    def __getbuffer__(self, Py_buffer* buffer, int flags):
+        PyBuffer_FillInfo(buffer, self, <void*>CFDataGetBytePtr(self.data), CFDataGetLength(self.data), 1, flags)
+
+    def __releasebuffer__(self, Py_buffer* buffer):
+        pass
+
+cdef object _cfdata_to_python(CFDataRef cf_data):
+    cdef CFDataBuffer buffer = CFDataBuffer.__new__(CFDataBuffer)
+    buffer.data = <CFDataRef>CFRetain(cf_data)
+    return memoryview(buffer)
+
+cdef object _cfnumber_to_python(CFNumberRef cf_number):
+    cdef double float_value = 0
+    cdef long long int_value = 0
+    if CFNumberIsFloatType(cf_number):
+        CFNumberGetValue(cf_number, kCFNumberDoubleType, &float_value)
+        return float_value
+    CFNumberGetValue(cf_number, kCFNumberLongLongType, &int_value)
+    return int_value
+
+cdef list _cfarray_to_python(CFArrayRef cf_array):
+    cdef CFIndex count = CFArrayGetCount(cf_array)
+    cdef CFIndex i
+    return [_convert_cf_to_python(CFArrayGetValueAtIndex(cf_array, i)) for i in range(count)]
+
+cdef dict _cfdictionary_to_python(CFDictionaryRef cf_dict):
+    cdef CFIndex count = CFDictionaryGetCount(cf_dict)
+    cdef CFIndex i
+    cdef const void** entries # keys, then values: one allocation per dictionary
+    cdef dict result = {}
+    if count == 0:
+        return result
+    entries = <const void**>malloc(2 * count * sizeof(void*))
+    if entries == NULL:
+        raise MemoryError("Failed to allocate buffer for CFDictionary conversion")
     try:
-        if service_class_name:
-            service_class_bytes = service_class_name.encode('utf-8')
-            cf_matching_dict = <CFMutableDictionaryRef>IOServiceMatching(service_class_bytes)
-        else:
-            cf_matching_dict = <CFMutableDictionaryRef>IOServiceMatching(b"IOService") # Generic base class
-        
-        if cf_matching_dict == NULL:
-            raise IOKitError("Failed to create matching dictionary for list_services")
-
-        # Use kIOMainPortDefault if available
-        result = IOServiceGetMatchingServices(kIOMainPortDefault, cf_matching_dict, &iterator)
-        if result != KERN_SUCCESS: # Fallback or handle error
-            print(f"[iokit_wrapper] list_services: IOServiceGetMatchingServices with kIOMainPortDefault failed ({result}), trying kIOMasterPortDefault...")
-            result = IOServiceGetMatchingServices(kIOMasterPortDefault, cf_matching_dict, &iterator)
-            if result != KERN_SUCCESS:
-                 raise IOKitError(f"Failed to get matching services for list_services with both ports: {result}")
-
-        # result = IOServiceGetMatchingServices(kIOMasterPortDefault, cf_matching_dict, &iterator) # Original
-        if result != KERN_SUCCESS:
-            raise IOKitError(f"Failed to get matching services for list_services: {result}")
-        
-        while True:
-            service = IOIteratorNext(iterator)
-            if service == 0: break
-            # For now, just add a placeholder. Real implementation would get name.
-            py_services_list.append(f"Service_{_get_service_id(service)}")
-            IOObjectRelease(service)
-        return py_services_list
+        CFDictionaryGetKeysAndValues(cf_dict, entries, entries + count)
+        for i in range(count):
+            result[_convert_cf_to_python(entries[i])] = _convert_cf_to_python(entries[count + i])
     finally:
-        if iterator != 0: IOObjectRelease(iterator)
-        if cf_matching_dict != NULL: CFRelease(cf_matching_dict)
-
+        free(entries)
+    return result
 
-cdef _convert_cf_to_python(CFTypeRef cf_object):
+cdef object _convert_cf_to_python(CFTypeRef cf_object):
     if cf_object == NULL: return None
     cdef unsigned long type_id = CFGetTypeID(cf_object)
 
     if type_id == CFStringGetTypeID():
         return _cfstring_to_python(<CFStringRef>cf_object)
-    # Add more type conversions here (CFNumber, CFBoolean, CFData, CFDictionary, CFArray)
-    # For now, return a string representation for unknown types
+    if type_id == CFNumberGetTypeID():
+        return _cfnumber_to_python(<CFNumberRef>cf_object)
+    if type_id == CFBooleanGetTypeID():
+        return bool(CFBooleanGetValue(<CFBooleanRef>cf_object))
+    if type_id == CFDictionaryGetTypeID():
+        return _cfdictionary_to_python(<CFDictionaryRef>cf_object)
+    if type_id == CFArrayGetTypeID():
+        return _cfarray_to_python(<CFArrayRef>cf_object)
+    if type_id == CFDataGetTypeID():
+        return _cfdata_to_python(<CFDataRef>cf_object)
+    # Other types (CFDate, CFUUID, ...) do not appear in USB registry entries
     return f"Unsupported CFType: ID {type_id}"
 
 
-cdef _cfstring_to_python(CFStringRef cf_string): # Removed except? NULL
+cdef str _cfstring_to_python(CFStringRef cf_string):
     if cf_string == NULL: return None
-    
-    cdef CFIndex length = CFStringGetLength(cf_string)
-    cdef CFIndex buffer_size = length * 4 + 1 
-    cdef char* c_buffer = <char*>malloc(buffer_size)
-    if c_buffer == NULL:
-        raise MemoryError("Failed to allocate buffer for CFString conversion")
-    
+
+    # Fast path: most registry strings are stored in an encoding CF can hand out directly
+    cdef const char* c_string = CFStringGetCStringPtr(cf_string, kCFStringEncodingUTF8)
+    if c_string != NULL:
+        return c_string[:strlen(c_string)].decode('utf-8')
+
+    cdef char stack_buffer[256]
+    cdef char* c_buffer = stack_buffer
+    cdef CFIndex buffer_size = CFStringGetMaximumSizeForEncoding(CFStringGetLength(cf_string), kCFStringEncodingUTF8) + 1
+    if buffer_size > sizeof(stack_buffer):
+        c_buffer = <char*>malloc(buffer_size)
+        if c_buffer == NULL:
+            raise MemoryError("Failed to allocate buffer for CFString conversion")
     try:
-        if CFStringGetCString(cf_string, c_buffer, buffer_size, kCFStringEncodingUTF8):
-            return c_buffer.decode('utf-8')
-        else:
-            # This case should ideally raise an error or return a distinct value
-            # For now, returning an error string, but Python None or Exception is better
-            return "CFStringGetCString failed to convert string"
+        if not CFStringGetCString(cf_string, c_buffer, buffer_size, kCFStringEncodingUTF8):
+            raise IOKitError("CFStringGetCString failed to convert string")
+        return c_buffer[:strlen(c_buffer)].decode('utf-8')
     finally:
-        free(c_buffer)
+        if c_buffer != stack_buffer:
+            free(c_buffer)
 
 # Original convenience functions
 def get_system_serial():
@@ -703,17 +1260,28 @@ def get_system_serial():
 
 def get_system_model():
     props = get_service_properties("IOPlatformExpertDevice", "model")
-    return props.get("model", "Unknown")
+    model = props.get("model", "Unknown")
+    if isinstance(model, memoryview): # Stored as NUL-terminated CFData
+        model = bytes(model).rstrip(b"\0").decode('utf-8', 'replace')
+    return model
 
 
 # --- Test Helper Function: Synchronous Scan and Notify ---
-def trigger_device_scan_and_notify(object callback_handler, int vid, int pid):
+SCAN_TRACE_SOURCE = "iokit_wrapper_test_helper"
+
+
+def trigger_device_scan_and_notify(object callback_handler, int vid, int pid, bint verbose=True):
     """
     Synchronously scans for devices matching VID/PID and calls
     callback_handler.on_device_connected for each found device.
-    This is intended for testing purposes and does not rely on the async RunLoop.
+    This is intended for testing purposes and does not rely on the async RunLoop;
+    DeviceConnectionManager also uses it for its periodic rescan.
+    pid <= 0 matches every product of the vendor. on_device_connected receives the location ID
+    as a fifth argument. The step-by-step log is traced at debug level; verbose=False drops it.
     """
-    print("[iokit_wrapper_test_helper] trigger_device_scan_and_notify: Start")
+    cdef bint log_steps = verbose and _tracing(TRACE_DEBUG)
+    if log_steps:
+        _trace(TRACE_DEBUG, SCAN_TRACE_SOURCE, "trigger_device_scan_and_notify: Start")
     cdef io_iterator_t iterator = 0
     cdef io_service_t usb_device = 0 # Initialize
     cdef kern_return_t kr
@@ -722,10 +1290,8 @@ def trigger_device_scan_and_notify(object callback_handler, int vid, int pid):
     # Declare C variables at the top of the function scope
     cdef long vendor_id_val
     cdef CFNumberRef vid_cf = NULL
-    cdef CFStringRef vid_key_cf = NULL
     cdef long product_id_val
     cdef CFNumberRef pid_cf = NULL
-    cdef CFStringRef pid_key_cf = NULL
     cdef int current_vid
     cdef int current_pid
     cdef str serial_number # Python object, but good to declare intent
@@ -733,150 +1299,178 @@ def trigger_device_scan_and_notify(object callback_handler, int vid, int pid):
     cdef kern_return_t kr_debug # For storing return codes for logging
 
     if callback_handler is None:
-        print("[iokit_wrapper_test_helper] Error: callback_handler is None.")
+        if _tracing(TRACE_ERROR):
+            _trace(TRACE_ERROR, SCAN_TRACE_SOURCE, "Error: callback_handler is None.")
         return 0
 
     try:
-        print(f"[iokit_wrapper_test_helper] Initial state: iterator (addr): {<Py_ssize_t>iterator}, matching_dict (addr): {<Py_ssize_t>matching_dict}")
+        if log_steps:
+            _trace(TRACE_DEBUG, SCAN_TRACE_SOURCE, "Initial state: iterator (addr): %d, matching_dict (addr): %d", (<Py_ssize_t>iterator, <Py_ssize_t>matching_dict))
         # 1. Create matching dictionary
-        print("[iokit_wrapper_test_helper] Calling IOServiceMatching(b\"IOUSBDevice\")")
+        if log_steps:
+            _trace(TRACE_DEBUG, SCAN_TRACE_SOURCE, "Calling IOServiceMatching(b\"IOUSBDevice\")")
         matching_dict = <CFMutableDictionaryRef>IOServiceMatching(b"IOUSBDevice")
-        print(f"[iokit_wrapper_test_helper] IOServiceMatching result (matching_dict addr): {<Py_ssize_t>matching_dict}")
+        if log_steps:
+            _trace(TRACE_DEBUG, SCAN_TRACE_SOURCE, "IOServiceMatching result (matching_dict addr): %d", (<Py_ssize_t>matching_dict,))
         if matching_dict == NULL:
-            print("[iokit_wrapper_test_helper] IOServiceMatching failed!")
+            if _tracing(TRACE_ERROR):
+                _trace(TRACE_ERROR, SCAN_TRACE_SOURCE, "IOServiceMatching failed!")
             raise IOKitError("IOServiceMatching failed in trigger_device_scan_and_notify")
 
         # Add Vendor ID
-        print(f"[iokit_wrapper_test_helper] Adding VID {vid:04x} to matching_dict (addr): {<Py_ssize_t>matching_dict}")
+        if log_steps:
+            _trace(TRACE_DEBUG, SCAN_TRACE_SOURCE, "Adding VID %04x to matching_dict (addr): %d", (vid, <Py_ssize_t>matching_dict))
         vendor_id_val = vid
-        print("[iokit_wrapper_test_helper] Calling CFNumberCreate for VID")
+        if log_steps:
+            _trace(TRACE_DEBUG, SCAN_TRACE_SOURCE, "Calling CFNumberCreate for VID")
         vid_cf = CFNumberCreate(kCFAllocatorDefault, kCFNumberLongType, &vendor_id_val)
-        print(f"[iokit_wrapper_test_helper] CFNumberCreate for VID result (vid_cf addr): {<Py_ssize_t>vid_cf}")
+        if log_steps:
+            _trace(TRACE_DEBUG, SCAN_TRACE_SOURCE, "CFNumberCreate for VID result (vid_cf addr): %d", (<Py_ssize_t>vid_cf,))
         if vid_cf == NULL: raise IOKitError("CFNumberCreate for VID failed")
         
-        print("[iokit_wrapper_test_helper] Calling _py_str_to_cfstring for USB_VENDOR_ID_KEY")
-        vid_key_cf = _py_str_to_cfstring(USB_VENDOR_ID_KEY)
-        print(f"[iokit_wrapper_test_helper] _py_str_to_cfstring for VID key result (vid_key_cf addr): {<Py_ssize_t>vid_key_cf}")
-        if vid_key_cf == NULL: 
-            CFRelease(vid_cf); vid_cf = NULL # Clean up before raising
-            raise IOKitError("CFString for VID key failed")
+        if log_steps:
+            _trace(TRACE_DEBUG, SCAN_TRACE_SOURCE, "Calling CFDictionarySetValue for VID. matching_dict (addr): %d, vid_cf (addr): %d", (<Py_ssize_t>matching_dict, <Py_ssize_t>vid_cf))
+        CFDictionarySetValue(matching_dict, g_vendor_id_key, vid_cf) # Key cached at module init
+        if log_steps:
+            _trace(TRACE_DEBUG, SCAN_TRACE_SOURCE, "CFDictionarySetValue for VID successful.")
         
-        print(f"[iokit_wrapper_test_helper] Calling CFDictionarySetValue for VID. matching_dict (addr): {<Py_ssize_t>matching_dict}, vid_key_cf (addr): {<Py_ssize_t>vid_key_cf}, vid_cf (addr): {<Py_ssize_t>vid_cf}")
-        CFDictionarySetValue(matching_dict, vid_key_cf, vid_cf)
-        print("[iokit_wrapper_test_helper] CFDictionarySetValue for VID successful.")
-        
-        print(f"[iokit_wrapper_test_helper] Releasing vid_key_cf (addr): {<Py_ssize_t>vid_key_cf}")
-        CFRelease(vid_key_cf); vid_key_cf = NULL
-        print(f"[iokit_wrapper_test_helper] Releasing vid_cf (addr): {<Py_ssize_t>vid_cf}")
+        if log_steps:
+            _trace(TRACE_DEBUG, SCAN_TRACE_SOURCE, "Releasing vid_cf (addr): %d", (<Py_ssize_t>vid_cf,))
         CFRelease(vid_cf); vid_cf = NULL
 
-        # Add Product ID
-        print(f"[iokit_wrapper_test_helper] Adding PID {pid:04x} to matching_dict (addr): {<Py_ssize_t>matching_dict}")
-        product_id_val = pid
-        print("[iokit_wrapper_test_helper] Calling CFNumberCreate for PID")
-        pid_cf = CFNumberCreate(kCFAllocatorDefault, kCFNumberLongType, &product_id_val)
-        print(f"[iokit_wrapper_test_helper] CFNumberCreate for PID result (pid_cf addr): {<Py_ssize_t>pid_cf}")
-        if pid_cf == NULL: raise IOKitError("CFNumberCreate for PID failed")
-
-        print("[iokit_wrapper_test_helper] Calling _py_str_to_cfstring for USB_PRODUCT_ID_KEY")
-        pid_key_cf = _py_str_to_cfstring(USB_PRODUCT_ID_KEY)
-        print(f"[iokit_wrapper_test_helper] _py_str_to_cfstring for PID key result (pid_key_cf addr): {<Py_ssize_t>pid_key_cf}")
-        if pid_key_cf == NULL: 
-            CFRelease(pid_cf); pid_cf = NULL # Clean up before raising
-            raise IOKitError("CFString for PID key failed")
-
-        print(f"[iokit_wrapper_test_helper] Calling CFDictionarySetValue for PID. matching_dict (addr): {<Py_ssize_t>matching_dict}, pid_key_cf (addr): {<Py_ssize_t>pid_key_cf}, pid_cf (addr): {<Py_ssize_t>pid_cf}")
-        CFDictionarySetValue(matching_dict, pid_key_cf, pid_cf)
-        print("[iokit_wrapper_test_helper] CFDictionarySetValue for PID successful.")
-
-        print(f"[iokit_wrapper_test_helper] Releasing pid_key_cf (addr): {<Py_ssize_t>pid_key_cf}")
-        CFRelease(pid_key_cf); pid_key_cf = NULL
-        print(f"[iokit_wrapper_test_helper] Releasing pid_cf (addr): {<Py_ssize_t>pid_cf}")
-        CFRelease(pid_cf); pid_cf = NULL
+        # Add Product ID (0 = any product of the vendor)
+        if pid > 0:
+            if log_steps:
+                _trace(TRACE_DEBUG, SCAN_TRACE_SOURCE, "Adding PID %04x to matching_dict (addr): %d", (pid, <Py_ssize_t>matching_dict))
+            product_id_val = pid
+            if log_steps:
+                _trace(TRACE_DEBUG, SCAN_TRACE_SOURCE, "Calling CFNumberCreate for PID")
+            pid_cf = CFNumberCreate(kCFAllocatorDefault, kCFNumberLongType, &product_id_val)
+            if log_steps:
+                _trace(TRACE_DEBUG, SCAN_TRACE_SOURCE, "CFNumberCreate for PID result (pid_cf addr): %d", (<Py_ssize_t>pid_cf,))
+            if pid_cf == NULL: raise IOKitError("CFNumberCreate for PID failed")
+
+            if log_steps:
+                _trace(TRACE_DEBUG, SCAN_TRACE_SOURCE, "Calling CFDictionarySetValue for PID. matching_dict (addr): %d, pid_cf (addr): %d", (<Py_ssize_t>matching_dict, <Py_ssize_t>pid_cf))
+            CFDictionarySetValue(matching_dict, g_product_id_key, pid_cf)
+            if log_steps:
+                _trace(TRACE_DEBUG, SCAN_TRACE_SOURCE, "CFDictionarySetValue for PID successful.")
+
+            if log_steps:
+                _trace(TRACE_DEBUG, SCAN_TRACE_SOURCE, "Releasing pid_cf (addr): %d", (<Py_ssize_t>pid_cf,))
+            CFRelease(pid_cf); pid_cf = NULL
         
-        print(f"[iokit_wrapper_test_helper] Matching dictionary created for VID={vid:04x}, PID={pid:04x}. matching_dict (addr): {<Py_ssize_t>matching_dict}")
+        if log_steps:
+            _trace(TRACE_DEBUG, SCAN_TRACE_SOURCE, "Matching dictionary created for VID=%04x, PID=%04x. matching_dict (addr): %d", (vid, pid, <Py_ssize_t>matching_dict))
 
         # 2. Get currently matching services
-        print(f"[iokit_wrapper_test_helper] Calling IOServiceGetMatchingServices. matching_dict (addr): {<Py_ssize_t>matching_dict}, iterator (addr before call): {<Py_ssize_t>iterator}")
+        if log_steps:
+            _trace(TRACE_DEBUG, SCAN_TRACE_SOURCE, "Calling IOServiceGetMatchingServices. matching_dict (addr): %d, iterator (addr before call): %d", (<Py_ssize_t>matching_dict, <Py_ssize_t>iterator))
+        CFRetain(matching_dict) # IOServiceGetMatchingServices always consumes one reference
         kr_debug = IOServiceGetMatchingServices(kIOMainPortDefault, matching_dict, &iterator)
-        print(f"[iokit_wrapper_test_helper] IOServiceGetMatchingServices with kIOMainPortDefault result: {kr_debug}, iterator (addr after call): {<Py_ssize_t>iterator}")
+        if log_steps:
+            _trace(TRACE_DEBUG, SCAN_TRACE_SOURCE, "IOServiceGetMatchingServices with kIOMainPortDefault result: %s, iterator (addr after call): %d", (kr_debug, <Py_ssize_t>iterator))
         if kr_debug != KERN_SUCCESS:
-            print(f"[iokit_wrapper_test_helper] IOServiceGetMatchingServices with kIOMainPortDefault failed ({kr_debug}), trying kIOMasterPortDefault...")
+            if log_steps:
+                _trace(TRACE_DEBUG, SCAN_TRACE_SOURCE, "IOServiceGetMatchingServices with kIOMainPortDefault failed (%s), trying kIOMasterPortDefault...", (kr_debug,))
+            CFRetain(matching_dict) # IOServiceGetMatchingServices always consumes one reference
             kr_debug = IOServiceGetMatchingServices(kIOMasterPortDefault, matching_dict, &iterator)
-            print(f"[iokit_wrapper_test_helper] IOServiceGetMatchingServices with kIOMasterPortDefault result: {kr_debug}, iterator (addr after call): {<Py_ssize_t>iterator}")
+            if log_steps:
+                _trace(TRACE_DEBUG, SCAN_TRACE_SOURCE, "IOServiceGetMatchingServices with kIOMasterPortDefault result: %s, iterator (addr after call): %d", (kr_debug, <Py_ssize_t>iterator))
             if kr_debug != KERN_SUCCESS:
-                print(f"[iokit_wrapper_test_helper] IOServiceGetMatchingServices failed with both ports: {kr_debug}")
+                if _tracing(TRACE_ERROR):
+                    _trace(TRACE_ERROR, SCAN_TRACE_SOURCE, "IOServiceGetMatchingServices failed with both ports: %s", (kr_debug,))
                 raise IOKitError(f"IOServiceGetMatchingServices failed: {kr_debug}")
         
         # kr_debug = IOServiceGetMatchingServices(kIOMasterPortDefault, matching_dict, &iterator) # Original
-        print("[iokit_wrapper_test_helper] IOServiceGetMatchingServices successful.")
+        if log_steps:
+            _trace(TRACE_DEBUG, SCAN_TRACE_SOURCE, "IOServiceGetMatchingServices successful.")
 
         # 3. Iterate and notify
-        print(f"[iokit_wrapper_test_helper] Starting device iteration loop. iterator (addr): {<Py_ssize_t>iterator}")
+        if log_steps:
+            _trace(TRACE_DEBUG, SCAN_TRACE_SOURCE, "Starting device iteration loop. iterator (addr): %d", (<Py_ssize_t>iterator,))
         while True:
-            print(f"[iokit_wrapper_test_helper] Calling IOIteratorNext. iterator (addr): {<Py_ssize_t>iterator}")
+            if log_steps:
+                _trace(TRACE_DEBUG, SCAN_TRACE_SOURCE, "Calling IOIteratorNext. iterator (addr): %d", (<Py_ssize_t>iterator,))
             usb_device = IOIteratorNext(iterator)
-            print(f"[iokit_wrapper_test_helper] IOIteratorNext result (usb_device addr): {<Py_ssize_t>usb_device}")
+            if log_steps:
+                _trace(TRACE_DEBUG, SCAN_TRACE_SOURCE, "IOIteratorNext result (usb_device addr): %d", (<Py_ssize_t>usb_device,))
             if usb_device == 0:
-                print("[iokit_wrapper_test_helper] IOIteratorNext returned 0, breaking loop.")
+                if log_steps:
+                    _trace(TRACE_DEBUG, SCAN_TRACE_SOURCE, "IOIteratorNext returned 0, breaking loop.")
                 break
             
             devices_found += 1
-            print(f"[iokit_wrapper_test_helper] Device found (total: {devices_found}). usb_device (addr): {<Py_ssize_t>usb_device}. Getting properties...")
+            if log_steps:
+                _trace(TRACE_DEBUG, SCAN_TRACE_SOURCE, "Device found (total: %s). usb_device (addr): %d. Getting properties...", (devices_found, <Py_ssize_t>usb_device))
             
-            current_vid = _get_long_property(usb_device, USB_VENDOR_ID_KEY.encode('utf-8'))
-            current_pid = _get_long_property(usb_device, USB_PRODUCT_ID_KEY.encode('utf-8'))
-            serial_number = _get_string_property(usb_device, IO_PLATFORM_SERIAL_NUMBER_KEY.encode('utf-8'))
+            current_vid, current_pid, serial_number, location_id = _read_device_properties(usb_device)
             service_id = _get_service_id(usb_device)
             
-            print(f"[iokit_wrapper_test_helper] Device properties: VID={current_vid:04x}, PID={current_pid:04x}, SN='{serial_number}', ServiceID={service_id}")
+            if log_steps:
+                _trace(TRACE_DEBUG, SCAN_TRACE_SOURCE, "Device properties: VID=%04x, PID=%04x, SN='%s', ServiceID=%s", (current_vid, current_pid, serial_number, service_id))
 
             # Call Python callback handler's on_device_connected
             # This function is called from Python, so GIL is already held.
             # No need for 'with gil:' here.
             try:
                 if hasattr(callback_handler, 'on_device_connected'):
-                    print(f"[iokit_wrapper_test_helper] Calling callback_handler.on_device_connected for SN='{serial_number}'")
-                    callback_handler.on_device_connected(current_vid, current_pid, serial_number, service_id)
-                    print(f"[iokit_wrapper_test_helper] Returned from callback_handler.on_device_connected for SN='{serial_number}'")
+                    if log_steps:
+                        _trace(TRACE_DEBUG, SCAN_TRACE_SOURCE, "Calling callback_handler.on_device_connected for SN='%s'", (serial_number,))
+                    callback_handler.on_device_connected(current_vid, current_pid, serial_number, service_id, location_id)
+                    if log_steps:
+                        _trace(TRACE_DEBUG, SCAN_TRACE_SOURCE, "Returned from callback_handler.on_device_connected for SN='%s'", (serial_number,))
                 else:
-                    print("[iokit_wrapper_test_helper] Error: callback_handler has no on_device_connected method.")
+                    if _tracing(TRACE_ERROR):
+                        _trace(TRACE_ERROR, SCAN_TRACE_SOURCE, "Error: callback_handler has no on_device_connected method.")
             except Exception as e:
                 # Log Python exception
-                print(f"[iokit_wrapper_test_helper] Python exception in on_device_connected: {e!r}")
+                if _tracing(TRACE_ERROR):
+                    _trace(TRACE_ERROR, SCAN_TRACE_SOURCE, "Python exception in on_device_connected: %r", (e,))
             
-            print(f"[iokit_wrapper_test_helper] Releasing usb_device (addr): {<Py_ssize_t>usb_device}")
+            if log_steps:
+                _trace(TRACE_DEBUG, SCAN_TRACE_SOURCE, "Releasing usb_device (addr): %d", (<Py_ssize_t>usb_device,))
             IOObjectRelease(usb_device)
             usb_device = 0 # Mark as released
-            print(f"[iokit_wrapper_test_helper] Released usb_device.")
+            if log_steps:
+                _trace(TRACE_DEBUG, SCAN_TRACE_SOURCE, "Released usb_device.")
 
-        print(f"[iokit_wrapper_test_helper] Finished device iteration loop. Processed {devices_found} devices.")
+        if log_steps:
+            _trace(TRACE_DEBUG, SCAN_TRACE_SOURCE, "Finished device iteration loop. Processed %s devices.", (devices_found,))
 
     except Exception as e:
-        print(f"[iokit_wrapper_test_helper] Exception caught in trigger_device_scan_and_notify try block: {e!r}")
+        if _tracing(TRACE_ERROR):
+            _trace(TRACE_ERROR, SCAN_TRACE_SOURCE, "Exception caught in trigger_device_scan_and_notify try block: %r", (e,))
         # It's important to re-raise so the test fails, or handle appropriately.
         # For debugging, we might want to see the finally block execute.
         raise
 
     finally:
-        print(f"[iokit_wrapper_test_helper] In finally block. Current state: iterator (addr: {<Py_ssize_t>iterator}), matching_dict (addr: {<Py_ssize_t>matching_dict})")
+        if log_steps:
+            _trace(TRACE_DEBUG, SCAN_TRACE_SOURCE, "In finally block. Current state: iterator (addr: %d), matching_dict (addr: %d)", (<Py_ssize_t>iterator, <Py_ssize_t>matching_dict))
         if iterator != 0:
-            print(f"[iokit_wrapper_test_helper] Attempting to release iterator (addr: {<Py_ssize_t>iterator})")
+            if log_steps:
+                _trace(TRACE_DEBUG, SCAN_TRACE_SOURCE, "Attempting to release iterator (addr: %d)", (<Py_ssize_t>iterator,))
             IOObjectRelease(iterator)
-            print("[iokit_wrapper_test_helper] Released iterator.")
+            if log_steps:
+                _trace(TRACE_DEBUG, SCAN_TRACE_SOURCE, "Released iterator.")
             iterator = 0 
         else:
-            print("[iokit_wrapper_test_helper] Iterator is 0, not releasing.")
+            if log_steps:
+                _trace(TRACE_DEBUG, SCAN_TRACE_SOURCE, "Iterator is 0, not releasing.")
             
         if matching_dict != NULL:
-            print(f"[iokit_wrapper_test_helper] Attempting to release matching_dict (addr: {<Py_ssize_t>matching_dict})")
-            # IOServiceGetMatchingServices does not consume the dictionary.
-            # It is the caller's responsibility to release it.
+            if log_steps:
+                _trace(TRACE_DEBUG, SCAN_TRACE_SOURCE, "Attempting to release matching_dict (addr: %d)", (<Py_ssize_t>matching_dict,))
+            # Our own reference; the ones consumed by IOServiceGetMatchingServices were retained for it.
             CFRelease(matching_dict)
-            print("[iokit_wrapper_test_helper] Released matching_dict.")
+            if log_steps:
+                _trace(TRACE_DEBUG, SCAN_TRACE_SOURCE, "Released matching_dict.")
             matching_dict = NULL
         else:
-            print("[iokit_wrapper_test_helper] matching_dict is NULL, not releasing.")
+            if log_steps:
+                _trace(TRACE_DEBUG, SCAN_TRACE_SOURCE, "matching_dict is NULL, not releasing.")
             
-    print("[iokit_wrapper_test_helper] trigger_device_scan_and_notify: End")
+    if log_steps:
+        _trace(TRACE_DEBUG, SCAN_TRACE_SOURCE, "trigger_device_scan_and_notify: End")
     return devices_found
@@ -1,27 +1,34 @@
 import rumps
 import os
 import sys
+from PyObjCTools import AppHelper
 from .device_connection_manager import DeviceConnectionManager
+from .camera_supervisor import CameraSupervisor
 from src import iokit_wrapper # Import the Cython module
+from src import tracing
 
 
 class MenuBarApp(rumps.App):
     def __init__(self):
-        print("[MenuBarApp] __init__: Start")
+        tracing.debug("MenuBarApp", "__init__: Start")
         super(MenuBarApp, self).__init__("OAK-D UVC", title="OAK-D", quit_button=None)
-        print("[MenuBarApp] __init__: super().__init__ done")
+        tracing.debug("MenuBarApp", "__init__: super().__init__ done")
         
         self.status_label_item = rumps.MenuItem("Status: Initializing...")
-        print("[MenuBarApp] __init__: status_label_item created")
+        tracing.debug("MenuBarApp", "__init__: status_label_item created")
 
-        print("[MenuBarApp] __init__: Before DeviceConnectionManager instantiation")
+        tracing.debug("MenuBarApp", "__init__: Before DeviceConnectionManager instantiation")
         self.device_manager = DeviceConnectionManager(
             notify_ui_callback=self.show_notification,
             alert_ui_callback=self.show_alert,
             update_menu_callback=self.update_auto_mode_menu_state,
-            update_status_label_callback=self.update_status_label
+            update_status_label_callback=self.update_status_label,
+            start_mode=os.environ.get("OAKD_UVC_START_MODE", "standby"), # Keep a warm uvc_handler ready
+            hotplug_settle_window=float(os.environ.get("OAKD_HOTPLUG_SETTLE_MS", "500")) / 1000, # Ride out re-enumeration
+            supervisor=CameraSupervisor(), # Camera starts/stops never block the menu or the IOKit callback
+            device_rescan_interval=float(os.environ.get("OAKD_DEVICE_RESCAN_INTERVAL", "30")) # Catch missed events
         )
-        print("[MenuBarApp] __init__: After DeviceConnectionManager instantiation")
+        tracing.debug("MenuBarApp", "__init__: After DeviceConnectionManager instantiation")
 
         # print("[MenuBarApp] __init__: Attempting to proceed past DeviceConnectionManager...") # No longer needed
         # Restore MenuItem creation
@@ -29,63 +36,66 @@ class MenuBarApp(rumps.App):
             "Enable Auto Camera Control", 
             callback=self.callback_toggle_auto_mode
         )
-        print("[MenuBarApp] __init__: auto_mode_menu_item created")
+        tracing.debug("MenuBarApp", "__init__: auto_mode_menu_item created")
         # Initial state from DeviceConnectionManager
         self.auto_mode_menu_item.state = self.device_manager.get_auto_mode_status() 
-        print("[MenuBarApp] __init__: auto_mode_menu_item state set")
+        tracing.debug("MenuBarApp", "__init__: auto_mode_menu_item state set")
         
         self.disconnect_camera_menu_item = rumps.MenuItem(
             "Disconnect Camera",
             callback=self.callback_disconnect_camera
         )
-        print("[MenuBarApp] __init__: disconnect_camera_menu_item created")
+        tracing.debug("MenuBarApp", "__init__: disconnect_camera_menu_item created")
         
         self.menu = [self.auto_mode_menu_item, self.status_label_item, self.disconnect_camera_menu_item, rumps.separator]
-        print("[MenuBarApp] __init__: menu list populated")
+        tracing.debug("MenuBarApp", "__init__: menu list populated")
         
         # rumps automatically adds a "Quit" button
-        print("[MenuBarApp] __init__: End") # Restored original end log
+        tracing.debug("MenuBarApp", "__init__: End") # Restored original end log
 
         # Add the IOKit run loop source to the main run loop
         self._iokit_run_loop_source_addr = self.device_manager.get_run_loop_source_address()
         if self._iokit_run_loop_source_addr != 0:
-            print(f"[MenuBarApp] Attempting to add IOKit run loop source (addr: {self._iokit_run_loop_source_addr}) to main loop.")
+            tracing.debug("MenuBarApp", "Attempting to add IOKit run loop source (addr: %d) to main loop.",
+                          self._iokit_run_loop_source_addr)
             if not iokit_wrapper.add_run_loop_source_to_main_loop(self._iokit_run_loop_source_addr):
                 rumps.alert("IOKit Error", "Failed to add USB event listener to the main application loop.")
         else:
-            print("[MenuBarApp] No valid IOKit run loop source address obtained.")
+            tracing.error("MenuBarApp", "No valid IOKit run loop source address obtained.")
             rumps.alert("IOKit Error", "Failed to initialize USB event listener.")
 
 
     # --- Callback methods for DeviceConnectionManager ---
+    # These are called from the camera supervisor thread; AppKit must only be touched on the main thread.
     def show_notification(self, title, subtitle, message):
-        rumps.notification(title, subtitle, message)
+        AppHelper.callAfter(rumps.notification, title, subtitle, message)
 
     def show_alert(self, title, message):
-        rumps.alert(title, message)
+        AppHelper.callAfter(rumps.alert, title, message)
 
     def update_auto_mode_menu_state(self, is_enabled):
-        self.auto_mode_menu_item.state = is_enabled
+        AppHelper.callAfter(setattr, self.auto_mode_menu_item, "state", is_enabled)
     
     # --- Menu item callbacks that delegate to DeviceConnectionManager ---
     def callback_toggle_auto_mode(self, sender):
         # No need to pass sender, DeviceConnectionManager handles its own logic
-        self.device_manager.toggle_auto_mode()
+        self.device_manager.request_toggle_auto_mode() # Returns at once; runs on the camera supervisor
         # The menu item state will be updated via the update_menu_callback
 
     def callback_disconnect_camera(self, sender):
-        self.device_manager.disconnect_camera_explicitly()
+        self.device_manager.request_disconnect_camera()
 
     def update_status_label(self, status_text):
-        self.status_label_item.title = status_text
+        AppHelper.callAfter(setattr, self.status_label_item, "title", status_text)
 
     @rumps.clicked("Quit")
     def callback_quit_app(self, sender=None):
         print("[MenuBarApp] Quit callback initiated.")
         if hasattr(self, '_iokit_run_loop_source_addr') and self._iokit_run_loop_source_addr != 0:
-            print(f"[MenuBarApp] Attempting to remove IOKit run loop source (addr: {self._iokit_run_loop_source_addr}) from main loop.")
+            tracing.debug("MenuBarApp", "Attempting to remove IOKit run loop source (addr: %d) from main loop.",
+                          self._iokit_run_loop_source_addr)
             if not iokit_wrapper.remove_run_loop_source_from_main_loop(self._iokit_run_loop_source_addr):
-                print("[MenuBarApp] Warning: Failed to remove IOKit run loop source from main loop.")
+                tracing.warning("MenuBarApp", "Failed to remove IOKit run loop source from main loop.")
         
         self.device_manager.cleanup_on_quit()
         rumps.quit_application()
@@ -106,6 +116,8 @@ if __name__ == "__main__":
          print("This is a GUI application and cannot be run in this environment.")
          # sys.exit(1) # Or simply don't run the app
 
+    tracing.install_crash_dump() # An uncaught exception dumps the trace buffer
+    tracing.install_signal_dump() # So does SIGUSR1 (python3 src/tracing.py <pid>)
     try:
         app = MenuBarApp()
         print("[MenuBarApp] MenuBarApp instance created.")
@@ -121,3 +133,4 @@ if __name__ == "__main__":
     except Exception as e:
         # Catch all other exceptions during app setup or run
         print(f"An unexpected error occurred: {e}")
+        tracing.dump_to_configured(f"unexpected {type(e).__name__}")
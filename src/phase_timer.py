@@ -0,0 +1,43 @@
+import time
+from contextlib import contextmanager
+
+
+class PhaseTimer:
+    """
+    Records how long each phase of a multi-step operation (e.g. a camera shutdown) takes.
+    Phases are either timed with `with timer.phase("name"):` or closed with `timer.mark("name")`,
+    which measures from the previous mark (or from the timer's creation).
+    """
+    def __init__(self, name):
+        self.name = name
+        self.phases = [] # [(label, seconds), ...] in the order they finished
+        self._start = time.monotonic()
+        self._last_mark = self._start
+
+    @contextmanager
+    def phase(self, label):
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            end = time.monotonic()
+            self.phases.append((label, end - start))
+            self._last_mark = end
+
+    def mark(self, label, since=None):
+        # since: a time.monotonic() value to measure from instead of the previous mark
+        now = time.monotonic()
+        self.phases.append((label, now - (self._last_mark if since is None else since)))
+        self._last_mark = now
+
+    def total(self):
+        return self._last_mark - self._start
+
+    def as_dict(self):
+        result = {label: round(seconds * 1000, 1) for label, seconds in self.phases}
+        result["total"] = round(self.total() * 1000, 1)
+        return result
+
+    def summary(self):
+        parts = ", ".join(f"{label} {seconds * 1000:.1f} ms" for label, seconds in self.phases)
+        return f"{self.name}: {parts} (total {self.total() * 1000:.1f} ms)"
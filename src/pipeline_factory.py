@@ -0,0 +1,164 @@
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, asdict
+
+try:
+    from src import sim_depthai
+except ImportError:
+    import sim_depthai # Run as a script (python3 src/uvc_handler.py)
+
+
+# Output encodings of the UVC stream
+ENCODING_RAW = "raw"
+ENCODING_MJPEG = "mjpeg"
+ENCODINGS = (ENCODING_RAW, ENCODING_MJPEG)
+
+# XLinkIn stream that feeds dai.CameraControl messages to the color camera at runtime
+CONTROL_STREAM_NAME = "control"
+# XLinkOut stream with tiny, rate-limited preview frames; lets the host see when the camera produces frames
+FRAME_PROBE_STREAM_NAME = "frame_probe"
+FRAME_PROBE_SIZE = (64, 36)
+FRAME_PROBE_FPS = 1
+
+
+@dataclass(frozen=True)
+class CameraProfile:
+    """Everything that determines the UVC pipeline graph. Equal profiles build identical pipelines."""
+    sensor_resolution: str = "THE_1080_P"   # dai.ColorCameraProperties.SensorResolution member name
+    fps: float = 30
+    isp_scale: tuple = None                 # (numerator, denominator), e.g. (1, 2) to downscale 4K to 1080p
+    uvc_width: int = 1920
+    uvc_height: int = 1080
+    frame_type: str = "NV12"                # dai.ImgFrame.Type member name (of the raw camera output)
+    camera_name: str = "MinimalUVCCam_1080p"
+    encoding: str = ENCODING_RAW            # ENCODING_RAW: camera frames go straight to UVC, ENCODING_MJPEG: on-device VideoEncoder first
+    mjpeg_quality: int = 80                 # 1-100, only used with ENCODING_MJPEG
+    bitrate_kbps: int = None                # Optional bitrate target for the encoder (None: quality-driven)
+    control_input: bool = True              # XLinkIn CONTROL_STREAM_NAME -> camera, for runtime controls from the host
+    frame_probe: bool = True                # camera preview -> XLinkOut FRAME_PROBE_STREAM_NAME, for first-frame timing
+
+    def uvc_frame_type(self):
+        """dai.ImgFrame.Type member name the UVC node (and BoardConfig.UVC) expects."""
+        return "BITSTREAM" if self.encoding == ENCODING_MJPEG else self.frame_type
+
+    def profile_hash(self):
+        encoded = json.dumps(asdict(self), sort_keys=True).encode("utf-8")
+        return hashlib.sha1(encoded).hexdigest()
+
+
+def build_pipeline(profile):
+    """Builds a color camera -> UVC pipeline (with its BoardConfig) for the given profile."""
+    # Imported here so that profiles can be used (e.g. by the menu bar app) without loading depthai
+    dai = sim_depthai.import_depthai()
+
+    pipeline = dai.Pipeline()
+
+    cam_rgb = pipeline.createColorCamera()
+    cam_rgb.setBoardSocket(dai.CameraBoardSocket.CAM_A)
+    cam_rgb.setResolution(getattr(dai.ColorCameraProperties.SensorResolution, profile.sensor_resolution))
+    cam_rgb.setInterleaved(False)
+    if profile.isp_scale is not None:
+        cam_rgb.setIspScale(*profile.isp_scale)
+    cam_rgb.setFps(profile.fps)
+
+    if profile.control_input:
+        control_in = pipeline.createXLinkIn()
+        control_in.setStreamName(CONTROL_STREAM_NAME)
+        control_in.out.link(cam_rgb.inputControl)
+
+    if profile.frame_probe:
+        cam_rgb.setPreviewSize(*FRAME_PROBE_SIZE)
+        probe_out = pipeline.createXLinkOut()
+        probe_out.setStreamName(FRAME_PROBE_STREAM_NAME)
+        probe_out.setFpsLimit(FRAME_PROBE_FPS)
+        # Never let a slow (or absent) reader hold back the camera and with it the UVC stream
+        probe_out.input.setBlocking(False)
+        probe_out.input.setQueueSize(1)
+        cam_rgb.preview.link(probe_out.input)
+
+    uvc = pipeline.createUVC()
+    if profile.encoding == ENCODING_MJPEG:
+        # Compress on the device so only the JPEG bitstream crosses the USB link
+        encoder = pipeline.createVideoEncoder()
+        encoder.setDefaultProfilePreset(profile.fps, dai.VideoEncoderProperties.Profile.MJPEG)
+        encoder.setQuality(profile.mjpeg_quality)
+        if profile.bitrate_kbps:
+            encoder.setBitrateKbps(profile.bitrate_kbps)
+        cam_rgb.video.link(encoder.input)
+        encoder.bitstream.link(uvc.input)
+    else:
+        cam_rgb.video.link(uvc.input)
+
+    board_config = dai.BoardConfig()
+    uvc_board_settings = dai.BoardConfig.UVC(profile.uvc_width, profile.uvc_height)
+    uvc_board_settings.frameType = getattr(dai.ImgFrame.Type, profile.uvc_frame_type())
+    uvc_board_settings.cameraName = profile.camera_name
+    board_config.uvc = uvc_board_settings
+    pipeline.setBoardConfig(board_config)
+    return pipeline
+
+
+class PipelineFactory:
+    """
+    Builds pipelines per CameraProfile and keeps the most recently used ones (LRU).
+    A dai.Pipeline is only a host-side description, so the same object can be started
+    on a device or flashed any number of times.
+    """
+    def __init__(self, max_entries=8):
+        self.max_entries = max_entries
+        self._entries = OrderedDict() # profile hash -> {"pipeline": ..., "serialized": ...}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _entry(self, profile):
+        key = profile.profile_hash()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self.hits += 1
+                self._entries.move_to_end(key)
+                return entry
+            self.misses += 1
+
+        entry = {"pipeline": build_pipeline(profile), "serialized": None}
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+        return entry
+
+    def get_pipeline(self, profile):
+        return self._entry(profile)["pipeline"]
+
+    def get_serialized(self, profile):
+        """The pipeline's serialized (JSON) form, computed once per cached profile."""
+        entry = self._entry(profile)
+        if entry["serialized"] is None:
+            entry["serialized"] = entry["pipeline"].serializeToJson()
+        return entry["serialized"]
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "size": len(self._entries),
+                "max_entries": self.max_entries,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+            }
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+# Shared by everything in this process (uvc_handler, the in-process backend, ...)
+default_factory = PipelineFactory()
@@ -0,0 +1,37 @@
+import random
+from dataclasses import dataclass
+
+
+@dataclass(frozen=True)
+class ReconnectPolicy:
+    """Exponential backoff with jitter for reopening the device after it drops."""
+    initial_delay: float = 0.2    # seconds before the first attempt
+    max_delay: float = 5.0
+    multiplier: float = 2.0
+    jitter: float = 0.2           # +/- fraction applied to every delay, so cameras on one hub do not retry in lockstep
+    max_attempts: int = 10        # 0 disables reconnecting
+
+    def delay(self, attempt, rng=random):
+        """Delay before the given attempt (1-based)."""
+        base = min(self.max_delay, self.initial_delay * self.multiplier ** (attempt - 1))
+        if self.jitter:
+            base *= 1 + rng.uniform(-self.jitter, self.jitter)
+        return max(0.0, base)
+
+    def delays(self, rng=random):
+        for attempt in range(1, self.max_attempts + 1):
+            yield attempt, self.delay(attempt, rng)
+
+
+@dataclass(frozen=True)
+class ReconnectAttempt:
+    attempt: int
+    delay_s: float          # backoff waited before the attempt
+    latency_ms: float       # time spent reopening the device
+    ok: bool
+    error: str = None
+
+    def describe(self):
+        result = "ok" if self.ok else f"failed ({self.error})"
+        return (f"attempt {self.attempt} after {self.delay_s * 1000:.0f} ms backoff: "
+                f"{result} in {self.latency_ms:.1f} ms")
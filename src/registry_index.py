@@ -0,0 +1,156 @@
+import argparse
+import threading
+from dataclasses import dataclass
+
+
+@dataclass(frozen=True)
+class RegistryRecord:
+    """One IORegistry entry, as returned by iokit_wrapper.registry_snapshot()."""
+    entry_id: int
+    class_name: str
+    name: str
+    parent_id: int = None       # entry ID of the parent in the IOService plane
+    vendor_id: int = None       # USB properties; None for entries that do not report them
+    product_id: int = None
+    serial_number: str = None
+    location_id: int = None
+
+    @classmethod
+    def from_dict(cls, record):
+        return cls(**{field: record.get(field) for field in cls.__dataclass_fields__})
+
+    def describe(self):
+        usb = ""
+        if self.vendor_id is not None:
+            usb = f" {self.vendor_id:04x}:{self.product_id:04x} SN={self.serial_number}"
+            if self.location_id is not None:
+                usb += f" location={self.location_id:08x}"
+        return f"{self.entry_id} {self.class_name} '{self.name}'{usb}"
+
+
+class RegistryIndex:
+    """
+    In-memory index of IORegistry entries by entry ID, class and VID/PID.
+
+    The IOKit monitor keeps it current: iokit_wrapper calls entry_matched(record) and
+    entry_terminated(entry_id) from its match/terminate notifications (see set_registry_observer).
+    Classes the monitor does not watch are loaded with one registry_snapshot() scan the first time
+    they are queried and served from the index afterwards; refresh() rescans on demand.
+    """
+    def __init__(self, scanner=None):
+        self.scanner = scanner  # scanner(class_name) -> [record dict, ...]; None = index only
+        self.scans = 0          # registry scans done (one per class unless refreshed)
+        self.hits = 0           # queries answered from the index
+        self._lock = threading.Lock()
+        self._by_id = {}
+        self._by_class = {}     # class name -> {entry_id, ...}
+        self._by_vid_pid = {}   # (vendor_id, product_id) -> {entry_id, ...}
+        self._loaded_classes = set()
+
+    def __len__(self):
+        with self._lock:
+            return len(self._by_id)
+
+    def _add(self, record, match_class=None):
+        # An entry is indexed under its own class and under the class it was matched as
+        # (an IOUSBHostDevice matches "IOUSBDevice")
+        if not isinstance(record, RegistryRecord):
+            record = RegistryRecord.from_dict(record)
+        self._remove(record.entry_id)
+        self._by_id[record.entry_id] = record
+        for class_name in {record.class_name, match_class or record.class_name}:
+            self._by_class.setdefault(class_name, set()).add(record.entry_id)
+        if record.vendor_id is not None:
+            self._by_vid_pid.setdefault((record.vendor_id, record.product_id), set()).add(record.entry_id)
+        return record
+
+    def _remove(self, entry_id):
+        record = self._by_id.pop(entry_id, None)
+        if record is None:
+            return None
+        for entry_ids in self._by_class.values():
+            entry_ids.discard(entry_id)
+        if record.vendor_id is not None:
+            self._by_vid_pid.get((record.vendor_id, record.product_id), set()).discard(entry_id)
+        return record
+
+    # --- Notification updates (called from the IOKit callback) ---
+    def entry_matched(self, record, match_class=None):
+        with self._lock:
+            return self._add(record, match_class)
+
+    def entry_terminated(self, entry_id):
+        with self._lock:
+            return self._remove(entry_id)
+
+    # --- Snapshots ---
+    def load(self, class_name, records):
+        """Replaces every entry of class_name with the records of a fresh snapshot."""
+        with self._lock:
+            for entry_id in list(self._by_class.get(class_name, ())):
+                self._remove(entry_id)
+            for record in records:
+                self._add(record, class_name)
+            self._loaded_classes.add(class_name)
+
+    def refresh(self, class_name):
+        if self.scanner is None:
+            raise RuntimeError("RegistryIndex has no scanner")
+        records = self.scanner(class_name)
+        self.scans += 1
+        self.load(class_name, records)
+
+    def _ensure_loaded(self, class_name):
+        with self._lock:
+            if class_name in self._loaded_classes or self.scanner is None:
+                self.hits += 1
+                return
+        self.refresh(class_name)
+
+    # --- Queries ---
+    def get(self, entry_id):
+        with self._lock:
+            return self._by_id.get(entry_id)
+
+    def by_class(self, class_name):
+        self._ensure_loaded(class_name)
+        with self._lock:
+            return sorted((self._by_id[i] for i in self._by_class.get(class_name, ())), key=lambda r: r.entry_id)
+
+    def find(self, vendor_id, product_id=None):
+        """Entries with the given VID (and PID, if given), from notifications and loaded snapshots."""
+        with self._lock:
+            if product_id is not None:
+                ids = set(self._by_vid_pid.get((vendor_id, product_id), ()))
+            else:
+                ids = set().union(*(ids for (vid, _), ids in self._by_vid_pid.items() if vid == vendor_id))
+            self.hits += 1
+            return sorted((self._by_id[i] for i in ids), key=lambda r: r.entry_id)
+
+    def children(self, entry_id):
+        with self._lock:
+            return sorted((r for r in self._by_id.values() if r.parent_id == entry_id), key=lambda r: r.entry_id)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Lists IORegistry entries of a class (macOS)")
+    parser.add_argument('--class', dest='class_name', default="IOUSBDevice")
+    parser.add_argument('--vid', type=lambda v: int(v, 0), help="Only entries with this USB vendor ID")
+    args = parser.parse_args()
+
+    try:
+        from src import iokit_wrapper
+    except ImportError:
+        import iokit_wrapper
+    index = RegistryIndex(scanner=iokit_wrapper.registry_snapshot)
+    records = index.by_class(args.class_name)
+    if args.vid is not None:
+        records = [r for r in records if r.vendor_id == args.vid]
+    for record in records:
+        parent = index.get(record.parent_id)
+        print(record.describe() + (f" (parent: {parent.name})" if parent is not None else ""))
+    print(f"{len(records)} entries")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,430 @@
+"""
+Simulated depthai for hardware-free load testing.
+
+Implements the part of the depthai API that uvc_handler.py and pipeline_factory.py use (Device, Pipeline,
+BoardConfig, CameraControl, DeviceBootloader, ...) on top of simulated OAK devices that take time to be
+found, boot, take a pipeline and deliver a first frame, drop off the bus at random and report bootloader
+flashing progress. Select it with OAKD_DEPTHAI_BACKEND=sim; the variable is inherited by the camera
+processes the manager starts, so the whole start/stop path runs without a device.
+
+Timings and failure rates come from OAKD_SIM_* environment variables (see SimConfig) or configure().
+"""
+import itertools
+import os
+import random
+import sys
+import threading
+import time
+from dataclasses import dataclass, fields, replace
+
+# Selects the depthai implementation (see import_depthai)
+ENV_DEPTHAI_BACKEND = "OAKD_DEPTHAI_BACKEND"
+BACKEND_DEPTHAI = "depthai"
+BACKEND_SIM = "sim"
+
+# Flashing progress callbacks per flash
+FLASH_PROGRESS_STEPS = 20
+
+
+def import_depthai():
+    """The depthai module to use: the real one, or this module with OAKD_DEPTHAI_BACKEND=sim."""
+    if os.environ.get(ENV_DEPTHAI_BACKEND, BACKEND_DEPTHAI) == BACKEND_SIM:
+        return sys.modules[__name__]
+    import depthai
+    return depthai
+
+
+@dataclass(frozen=True)
+class SimConfig:
+    """Simulated device behaviour. Times are seconds and are multiplied by time_scale."""
+    devices: tuple = ("14442C10SIM0000001",) # MX IDs of the connected devices (OAKD_SIM_DEVICES, comma-separated)
+    search_delay: float = 0.05      # device discovery (OAKD_SIM_SEARCH_DELAY)
+    boot_delay: float = 1.5         # open + firmware boot (OAKD_SIM_BOOT_DELAY)
+    upload_delay: float = 0.3       # pipeline upload (OAKD_SIM_UPLOAD_DELAY)
+    first_frame_delay: float = 0.2  # pipeline start -> first frame (OAKD_SIM_FIRST_FRAME_DELAY)
+    close_delay: float = 0.1        # Device.close() (OAKD_SIM_CLOSE_DELAY)
+    flash_time: float = 2.0         # whole bootloader/application flash (OAKD_SIM_FLASH_TIME)
+    reenumerate_delay: float = 0.5  # a dropped device is back on the bus after this (OAKD_SIM_REENUMERATE_DELAY)
+    jitter: float = 0.1             # +/- fraction applied to every delay (OAKD_SIM_JITTER)
+    boot_failure_rate: float = 0.0  # probability that an open fails (OAKD_SIM_BOOT_FAILURE_RATE)
+    disconnect_rate: float = 0.0    # random disconnects per minute of streaming (OAKD_SIM_DISCONNECT_RATE)
+    time_scale: float = 1.0         # 0 runs everything instantly (OAKD_SIM_TIME_SCALE)
+    seed: int = None                # random seed for reproducible runs (OAKD_SIM_SEED)
+
+    @classmethod
+    def from_environment(cls, environ=None):
+        environ = os.environ if environ is None else environ
+        values = {}
+        for field in fields(cls):
+            raw = environ.get(f"OAKD_SIM_{field.name.upper()}")
+            if raw is None or raw == "":
+                continue
+            if field.name == "devices":
+                values["devices"] = tuple(mx_id.strip() for mx_id in raw.split(",") if mx_id.strip())
+            elif field.name == "seed":
+                values["seed"] = int(raw)
+            else:
+                values[field.name] = float(raw)
+        return cls(**values)
+
+
+class _Enum:
+    """Stand-in for a depthai enum: any member name resolves to "<Enum>.<member>"."""
+    def __init__(self, name):
+        self._name = name
+
+    def __getattr__(self, member):
+        if member.startswith("__"):
+            raise AttributeError(member)
+        return f"{self._name}.{member}"
+
+
+class _SimBus:
+    """The simulated devices of this process: which are on the bus, which are open, and counters."""
+    def __init__(self, config):
+        self.config = config
+        self.random = random.Random(config.seed)
+        self.lock = threading.Lock()
+        self.available_at = {mx_id: 0.0 for mx_id in config.devices} # monotonic time the device is back on the bus
+        self.open_devices = set()
+        self.counters = {"opens": 0, "boot_failures": 0, "disconnects": 0, "closes": 0, "flashes": 0}
+
+    def delay(self, seconds):
+        if seconds <= 0 or self.config.time_scale <= 0:
+            return
+        with self.lock:
+            jitter = self.random.uniform(-self.config.jitter, self.config.jitter)
+        time.sleep(max(0.0, seconds * (1 + jitter) * self.config.time_scale))
+
+    def scaled(self, seconds):
+        return seconds * self.config.time_scale
+
+    def count(self, counter):
+        with self.lock:
+            self.counters[counter] += 1
+
+    def available(self):
+        now = time.monotonic()
+        with self.lock:
+            return [mx_id for mx_id, at in self.available_at.items() if at <= now and mx_id not in self.open_devices]
+
+
+_bus = _SimBus(SimConfig.from_environment())
+
+
+def configure(**overrides):
+    """Resets the simulated devices with SimConfig values (defaults from the environment) and clears the counters."""
+    global _bus
+    _bus = _SimBus(replace(SimConfig.from_environment(), **overrides))
+    return _bus.config
+
+
+def stats():
+    """Counters of this process's simulated devices (opens, boot failures, disconnects, closes, flashes)."""
+    with _bus.lock:
+        return dict(_bus.counters)
+
+
+# --- Enums and configuration objects ---
+CameraBoardSocket = _Enum("CameraBoardSocket")
+ColorCameraProperties = type("ColorCameraProperties", (), {"SensorResolution": _Enum("SensorResolution")})
+VideoEncoderProperties = type("VideoEncoderProperties", (), {"Profile": _Enum("Profile")})
+ImgFrame = type("ImgFrame", (), {"Type": _Enum("ImgFrame.Type")})
+
+
+class BoardConfig:
+    class UVC:
+        def __init__(self, width=1920, height=1080):
+            self.width = width
+            self.height = height
+            self.frameType = None
+            self.cameraName = ""
+
+    def __init__(self):
+        self.uvc = None
+
+
+class DeviceInfo:
+    def __init__(self, mx_id):
+        self.mxid = mx_id
+        self.name = f"sim-{mx_id}"
+
+    def getMxId(self):
+        return self.mxid
+
+    def __repr__(self):
+        return f"DeviceInfo(sim, {self.mxid})"
+
+
+class CameraControl:
+    AutoWhiteBalanceMode = _Enum("AutoWhiteBalanceMode")
+    AutoFocusMode = _Enum("AutoFocusMode")
+
+    def __init__(self):
+        self.settings = {}
+
+    def __getattr__(self, name):
+        if not name.startswith("set"):
+            raise AttributeError(name)
+        # Every setter (setManualExposure, setBrightness, ...) just records its arguments
+        return lambda *args: self.settings.__setitem__(name, args)
+
+
+# --- Pipeline ---
+class _Output:
+    def __init__(self, node, name):
+        self.node = node
+        self.name = name
+        self.links = []
+
+    def link(self, target):
+        self.links.append(target)
+
+
+class _Input:
+    def __init__(self, node, name):
+        self.node = node
+        self.name = name
+        self.blocking = True
+        self.queue_size = None
+
+    def setBlocking(self, blocking):
+        self.blocking = blocking
+
+    def setQueueSize(self, size):
+        self.queue_size = size
+
+
+class _Node:
+    """A pipeline node: setX(...) calls are recorded, inputs/outputs are created on first access."""
+    INPUTS = ("input", "inputControl")
+
+    def __init__(self, kind):
+        self.kind = kind
+        self.properties = {}
+        self.stream_name = None
+        self._ports = {}
+
+    def setStreamName(self, name):
+        self.stream_name = name
+
+    def __getattr__(self, name):
+        if name.startswith("_"):
+            raise AttributeError(name)
+        if name.startswith("set"):
+            return lambda *args: self.properties.__setitem__(name, args)
+        ports = self.__dict__["_ports"]
+        if name not in ports:
+            ports[name] = _Input(self, name) if name in self.INPUTS else _Output(self, name)
+        return ports[name]
+
+
+class Pipeline:
+    def __init__(self):
+        self.nodes = []
+        self.board_config = None
+
+    def _create(self, kind):
+        node = _Node(kind)
+        self.nodes.append(node)
+        return node
+
+    def createColorCamera(self):
+        return self._create("ColorCamera")
+
+    def createXLinkIn(self):
+        return self._create("XLinkIn")
+
+    def createXLinkOut(self):
+        return self._create("XLinkOut")
+
+    def createUVC(self):
+        return self._create("UVC")
+
+    def createVideoEncoder(self):
+        return self._create("VideoEncoder")
+
+    def setBoardConfig(self, board_config):
+        self.board_config = board_config
+
+    def streams(self, kind):
+        return {node.stream_name for node in self.nodes if node.kind == kind and node.stream_name}
+
+    def serializeToJson(self):
+        return {"nodes": [{"kind": node.kind, "stream": node.stream_name,
+                           "properties": {k: list(v) for k, v in node.properties.items()}} for node in self.nodes]}
+
+
+# --- Device ---
+class _OutputQueue:
+    def __init__(self, device):
+        self._device = device
+        self._callbacks = {}
+        self._ids = itertools.count(1)
+
+    def has(self):
+        return self._device._first_frame_at is not None and time.monotonic() >= self._device._first_frame_at
+
+    def addCallback(self, callback):
+        callback_id = next(self._ids)
+        self._callbacks[callback_id] = callback
+        first_frame_at = self._device._first_frame_at
+        if first_frame_at is not None:
+            delay = max(0.0, first_frame_at - time.monotonic())
+            timer = threading.Timer(delay, self._deliver, args=(callback_id,))
+            timer.daemon = True
+            timer.start()
+        return callback_id
+
+    def removeCallback(self, callback_id):
+        self._callbacks.pop(callback_id, None)
+
+    def _deliver(self, callback_id):
+        callback = self._callbacks.get(callback_id)
+        if callback is not None and not self._device.isClosed():
+            callback("frame", None)
+
+
+class _InputQueue:
+    def __init__(self, device):
+        self._device = device
+        self.sent = []
+
+    def send(self, message):
+        if self._device.isClosed():
+            raise RuntimeError("Communication exception - possible device error/misconfiguration.")
+        self.sent.append(message)
+
+
+class Device:
+    """A simulated OAK: opening it takes the boot delay and may fail; a streaming device may drop off the bus."""
+    class Config:
+        def __init__(self):
+            self.board = BoardConfig()
+
+    def __init__(self, config=None, device_info_or_pipeline=None):
+        bus = _bus
+        self._bus = bus
+        self._closed = True
+        self._disconnect_at = None
+        self._first_frame_at = None
+        self._pipeline = None
+        device_info = device_info_or_pipeline if isinstance(device_info_or_pipeline, DeviceInfo) else None
+        if device_info is None:
+            found, device_info = Device.getAnyAvailableDevice()
+            if not found:
+                raise RuntimeError("No available devices")
+        with bus.lock:
+            if device_info.mxid in bus.open_devices:
+                raise RuntimeError(f"Device {device_info.mxid} is already in use")
+            bus.open_devices.add(device_info.mxid)
+            failed = bus.random.random() < bus.config.boot_failure_rate
+        self.mxid = device_info.mxid
+        bus.count("opens")
+        bus.delay(bus.config.boot_delay)
+        if failed:
+            with bus.lock:
+                bus.open_devices.discard(self.mxid)
+            bus.count("boot_failures")
+            raise RuntimeError(f"Failed to boot device {self.mxid} (simulated X_LINK_ERROR)")
+        self._closed = False
+        if isinstance(device_info_or_pipeline, Pipeline):
+            self.startPipeline(device_info_or_pipeline)
+
+    @staticmethod
+    def getAnyAvailableDevice(timeout=None):
+        _bus.delay(_bus.config.search_delay)
+        available = _bus.available()
+        return (True, DeviceInfo(available[0])) if available else (False, None)
+
+    @staticmethod
+    def getDeviceByMxId(mx_id):
+        return (True, DeviceInfo(mx_id)) if mx_id in _bus.available() else (False, None)
+
+    @staticmethod
+    def getAllAvailableDevices():
+        return [DeviceInfo(mx_id) for mx_id in _bus.available()]
+
+    def getMxId(self):
+        return self.mxid
+
+    def startPipeline(self, pipeline):
+        if self.isClosed():
+            raise RuntimeError("Device is closed")
+        self._bus.delay(self._bus.config.upload_delay)
+        self._pipeline = pipeline
+        now = time.monotonic()
+        self._first_frame_at = now + self._bus.scaled(self._bus.config.first_frame_delay)
+        rate = self._bus.config.disconnect_rate
+        if rate > 0:
+            with self._bus.lock:
+                lifetime = self._bus.random.expovariate(rate / 60.0)
+            self._disconnect_at = now + self._bus.scaled(lifetime)
+        return True
+
+    def _check_disconnect(self):
+        if self._closed or self._disconnect_at is None or time.monotonic() < self._disconnect_at:
+            return
+        # Dropped off the bus; it re-enumerates (and can be opened again) a little later
+        self._closed = True
+        with self._bus.lock:
+            self._bus.open_devices.discard(self.mxid)
+            self._bus.available_at[self.mxid] = time.monotonic() + self._bus.scaled(self._bus.config.reenumerate_delay)
+        self._bus.count("disconnects")
+
+    def isClosed(self):
+        self._check_disconnect()
+        return self._closed
+
+    def close(self):
+        if self._closed:
+            return
+        self._bus.delay(self._bus.config.close_delay)
+        self._closed = True
+        with self._bus.lock:
+            self._bus.open_devices.discard(self.mxid)
+        self._bus.count("closes")
+
+    def getOutputQueue(self, name, maxSize=None, blocking=None):
+        if self._pipeline is None or name not in self._pipeline.streams("XLinkOut"):
+            raise RuntimeError(f"Queue for stream name '{name}' doesn't exist")
+        return _OutputQueue(self)
+
+    def getInputQueue(self, name, maxSize=None, blocking=None):
+        if self._pipeline is None or name not in self._pipeline.streams("XLinkIn"):
+            raise RuntimeError(f"Queue for stream name '{name}' doesn't exist")
+        return _InputQueue(self)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+# --- Bootloader ---
+class DeviceBootloader:
+    def __init__(self, device_info, allow_flashing_bootloader=False):
+        self.device_info = device_info
+        self.allow_flashing_bootloader = allow_flashing_bootloader
+
+    @staticmethod
+    def getFirstAvailableDevice():
+        available = _bus.available()
+        return (True, DeviceInfo(available[0])) if available else (False, None)
+
+    def _flash(self, progress):
+        step = _bus.config.flash_time / FLASH_PROGRESS_STEPS
+        for i in range(1, FLASH_PROGRESS_STEPS + 1):
+            _bus.delay(step)
+            progress(i / FLASH_PROGRESS_STEPS)
+        _bus.count("flashes")
+        return True, ""
+
+    def flashBootloader(self, progress):
+        if not self.allow_flashing_bootloader:
+            raise RuntimeError("Flashing the bootloader is not allowed")
+        return self._flash(progress)
+
+    def flash(self, progress, pipeline):
+        return self._flash(progress)
@@ -0,0 +1,204 @@
+import json
+import os
+import time
+import uuid
+
+# A StartTrace travels from DeviceConnectionManager to the camera process in this environment
+# variable (cold spawn), on the standby worker's "attach" line, or as a forkserver argument.
+ENV_START_TRACE = "OAKD_START_TRACE"
+# Where finished starts are appended as JSON lines (override with OAKD_START_HISTORY)
+DEFAULT_HISTORY_PATH = os.environ.get(
+    "OAKD_START_HISTORY",
+    os.path.join(os.path.expanduser("~"), ".oakd_webcam", "start_history.jsonl"))
+
+# Marks of one camera start in the order they happen. Each phase runs from the previous
+# mark present in the trace to its own mark, so skipped steps (e.g. the depthai import on a
+# warm standby worker) simply fold into the next phase.
+MARKS = (
+    "event_received",    # USBEventHandler.on_device_connected (DCM)
+    "spawn",             # DCM hands the start to the camera backend (Popen / attach / fork / thread)
+    "process_start",     # camera process is running Python (or the standby worker got "attach")
+    "depthai_imported",
+    "device_discovered", # dai.Device.getAnyAvailableDevice()
+    "device_booted",     # dai.Device(config, info): firmware boot + connection
+    "pipeline_started",  # device.startPipeline(): pipeline upload
+    "first_frame",       # first frame from the camera (frame probe stream)
+)
+PHASE_NAMES = {
+    "spawn": "dispatch",
+    "process_start": "spawn",
+    "depthai_imported": "depthai_import",
+    "device_discovered": "device_discovery",
+    "device_booted": "device_boot",
+    "pipeline_started": "pipeline_upload",
+    "first_frame": "first_frame",
+}
+PERCENTILES = (50, 95, 99)
+
+
+def now():
+    """
+    Timestamp for marks. CLOCK_MONOTONIC is system-wide (time since boot on both macOS and Linux),
+    so marks taken in the manager and in the camera process can be subtracted from each other.
+    """
+    if hasattr(time, "clock_gettime"):
+        return time.clock_gettime(time.CLOCK_MONOTONIC)
+    return time.monotonic()
+
+
+class StartTrace:
+    """Timestamps of one camera start, shared by the manager and the camera process."""
+    def __init__(self, trace_id=None, marks=None, info=None):
+        self.trace_id = trace_id or uuid.uuid4().hex[:12]
+        self.marks = dict(marks or {})
+        self.info = dict(info or {}) # start_mode, backend, profile, ...
+
+    def mark(self, name, timestamp=None):
+        if name not in MARKS:
+            raise ValueError(f"Unknown start mark '{name}'")
+        self.marks.setdefault(name, now() if timestamp is None else timestamp)
+
+    def phases(self):
+        """{phase name: milliseconds} for the marks recorded so far."""
+        result = {}
+        previous = None
+        for name in MARKS:
+            if name not in self.marks:
+                continue
+            if previous is not None:
+                result[PHASE_NAMES[name]] = round((self.marks[name] - self.marks[previous]) * 1000, 2)
+            previous = name
+        return result
+
+    def total_ms(self):
+        if len(self.marks) < 2:
+            return 0.0
+        return round((max(self.marks.values()) - min(self.marks.values())) * 1000, 2)
+
+    def serialize(self):
+        return json.dumps({"trace_id": self.trace_id, "marks": self.marks, "info": self.info}, separators=(",", ":"))
+
+    @classmethod
+    def deserialize(cls, payload):
+        data = json.loads(payload)
+        return cls(data.get("trace_id"), data.get("marks"), data.get("info"))
+
+    @classmethod
+    def from_environment(cls, environ=os.environ):
+        payload = environ.get(ENV_START_TRACE)
+        if payload:
+            try:
+                return cls.deserialize(payload)
+            except ValueError:
+                print(f"start_metrics: Ignoring malformed {ENV_START_TRACE}")
+        return None
+
+    def record(self, ok=True, error=None):
+        return {
+            "trace_id": self.trace_id,
+            "wall_time": time.time(),
+            "ok": ok,
+            "error": error,
+            "info": self.info,
+            "marks": self.marks,
+            "phases": self.phases(),
+            "total_ms": self.total_ms(),
+        }
+
+    def describe(self):
+        parts = ", ".join(f"{phase} {ms:.1f} ms" for phase, ms in self.phases().items())
+        return f"start {self.trace_id}: {parts} (total {self.total_ms():.1f} ms)"
+
+
+def append_record(record, path=None):
+    """Appends one start record to the JSONL history. Failures are reported, never raised."""
+    path = path or DEFAULT_HISTORY_PATH
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "a") as f:
+            f.write(json.dumps(record, separators=(",", ":")) + "\n")
+    except OSError as e:
+        print(f"start_metrics: Could not append start record to {path}: {e}")
+
+
+def load_records(path=None):
+    path = path or DEFAULT_HISTORY_PATH
+    records = []
+    try:
+        with open(path) as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    records.append(json.loads(line))
+                except ValueError:
+                    continue # A partially written line (e.g. the process was killed mid-write)
+    except FileNotFoundError:
+        pass
+    return records
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of a non-empty list."""
+    ordered = sorted(values)
+    rank = max(1, -(-len(ordered) * pct // 100)) # ceil(n * pct / 100)
+    return ordered[int(rank) - 1]
+
+
+def summarize(records, ok_only=True):
+    """{phase: {"n", "p50", "p95", "p99"}} over the given records, phases in start order, plus "total"."""
+    samples = {}
+    for record in records:
+        if ok_only and not record.get("ok", True):
+            continue
+        for phase, ms in record.get("phases", {}).items():
+            samples.setdefault(phase, []).append(ms)
+        if "total_ms" in record:
+            samples.setdefault("total", []).append(record["total_ms"])
+
+    order = [PHASE_NAMES[mark] for mark in MARKS if mark in PHASE_NAMES] + ["total"]
+    summary = {}
+    for phase in sorted(samples, key=lambda p: order.index(p) if p in order else len(order)):
+        values = samples[phase]
+        summary[phase] = {"n": len(values), **{f"p{pct}": percentile(values, pct) for pct in PERCENTILES}}
+    return summary
+
+
+def format_summary(summary):
+    lines = [f"{'phase':<18}{'n':>5}" + "".join(f"{f'p{pct} ms':>12}" for pct in PERCENTILES)]
+    for phase, stats in summary.items():
+        lines.append(f"{phase:<18}{stats['n']:>5}" + "".join(f"{stats[f'p{pct}']:>12.1f}" for pct in PERCENTILES))
+    return "\n".join(lines)
+
+
+def main():
+    # Summarizes the start history, e.g. `python3 src/start_metrics.py --last 50`
+    import argparse
+    parser = argparse.ArgumentParser(description="Per-phase camera start latency (p50/p95/p99)")
+    parser.add_argument('--history', default=DEFAULT_HISTORY_PATH, help=f"JSONL history (default: {DEFAULT_HISTORY_PATH})")
+    parser.add_argument('--last', type=int, default=None, help="Only use the most recent N starts")
+    parser.add_argument('--mode', default=None, help="Only use starts with this start_mode (cold, standby, ...)")
+    parser.add_argument('--device', default=None, metavar="MXID", help="Only use starts of this device (multi-device mode)")
+    parser.add_argument('--include-failed', action='store_true')
+    parser.add_argument('--json', action='store_true', help="Print the summary as JSON")
+    args = parser.parse_args()
+
+    records = load_records(args.history)
+    if args.mode:
+        records = [r for r in records if r.get("info", {}).get("start_mode") == args.mode]
+    if args.device:
+        records = [r for r in records if r.get("info", {}).get("device_id") == args.device]
+    if args.last:
+        records = records[-args.last:]
+    summary = summarize(records, ok_only=not args.include_failed)
+    if args.json:
+        print(json.dumps(summary, indent=2))
+    elif not summary:
+        print(f"No start records in {args.history}")
+    else:
+        print(format_summary(summary))
+
+
+if __name__ == "__main__":
+    main()
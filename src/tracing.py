@@ -0,0 +1,253 @@
+import argparse
+import collections
+import itertools
+import os
+import signal
+import sys
+import threading
+import time
+
+# Levels (same numbers as the logging module). A record is kept when its level is at least the
+# trace level, and also printed to stdout when it is at least the echo level.
+DEBUG = 10
+INFO = 20
+WARNING = 30
+ERROR = 40
+OFF = 100
+LEVEL_NAMES = {DEBUG: "debug", INFO: "info", WARNING: "warning", ERROR: "error", OFF: "off"}
+
+ENV_TRACE_LEVEL = "OAKD_TRACE_LEVEL"     # default info
+ENV_TRACE_ECHO = "OAKD_TRACE_ECHO"       # default warning
+ENV_TRACE_SIZE = "OAKD_TRACE_SIZE"       # ring buffer capacity in records
+ENV_TRACE_DUMP = "OAKD_TRACE_DUMP"       # file the buffer is dumped to on a crash or SIGUSR1 (default stderr)
+DEFAULT_CAPACITY = 4096
+
+
+def parse_level(value):
+    """Level from a name ("debug") or a number ("10")."""
+    text = str(value).strip().lower()
+    for level, name in LEVEL_NAMES.items():
+        if text == name:
+            return level
+    try:
+        return int(text)
+    except ValueError:
+        raise ValueError(f"Unknown trace level '{value}'. Available: {', '.join(LEVEL_NAMES.values())}") from None
+
+
+class TraceBuffer:
+    """
+    Fixed-size ring of trace records: (wall time, thread id, level, source, message, args, fields).
+
+    Recording appends a tuple to a bounded deque, which is atomic under the GIL, so the USB callbacks
+    take no lock and do no I/O. The message is %-formatted with its args only when a record is
+    echoed or dumped. Once full, the oldest records are overwritten; dropped counts them.
+    """
+    def __init__(self, capacity=DEFAULT_CAPACITY):
+        self.capacity = capacity
+        self._records = collections.deque(maxlen=capacity)
+        self._counter = itertools.count()
+        self._recorded = 0
+
+    def append(self, record):
+        self._records.append(record)
+        self._recorded = next(self._counter) + 1
+
+    def records(self):
+        return list(self._records.copy())
+
+    @property
+    def dropped(self):
+        return max(0, self._recorded - len(self._records))
+
+    def clear(self):
+        self._records.clear()
+        self._counter = itertools.count()
+        self._recorded = 0
+
+
+def format_message(message, args, fields=None):
+    try:
+        text = message % args if args else message
+    except (TypeError, ValueError) as e:
+        text = f"{message} {args!r} (format error: {e})"
+    if fields:
+        text += " " + " ".join(f"{key}={value}" for key, value in fields.items())
+    return text
+
+
+def format_record(record):
+    wall_time, thread_id, level, source, message, args, fields = record
+    stamp = time.strftime("%H:%M:%S", time.localtime(wall_time)) + f".{int(wall_time % 1 * 1e6):06d}"
+    return (f"{stamp} {LEVEL_NAMES.get(level, level):7} [{source}] {format_message(message, args, fields)} "
+            f"(thread {thread_id})")
+
+
+_buffer = TraceBuffer()
+_level = INFO
+_echo_level = WARNING
+_native_modules = []  # extension modules (iokit_wrapper) that record through set_trace(sink, level)
+
+
+def enabled(level):
+    """True when records of this level are kept. Guard expensive argument building with it."""
+    return level >= _level
+
+
+def _record(level, source, message, args, fields=None):
+    record = (time.time(), threading.get_ident(), level, source, message, args, fields)
+    _buffer.append(record)
+    if level >= _echo_level:
+        print(f"[{source}] {format_message(message, args, fields)}")
+
+
+def record_native(level, source, message, args):
+    """Sink handed to extension modules; they have already checked the level."""
+    _record(level, source, message, args)
+
+
+def trace(level, source, message, *args, **fields):
+    """Records message % args (formatted lazily) with optional key=value fields."""
+    if level >= _level:
+        _record(level, source, message, args, fields)
+
+
+def debug(source, message, *args, **fields):
+    if DEBUG >= _level:
+        _record(DEBUG, source, message, args, fields)
+
+
+def info(source, message, *args, **fields):
+    if INFO >= _level:
+        _record(INFO, source, message, args, fields)
+
+
+def warning(source, message, *args, **fields):
+    if WARNING >= _level:
+        _record(WARNING, source, message, args, fields)
+
+
+def error(source, message, *args, **fields):
+    if ERROR >= _level:
+        _record(ERROR, source, message, args, fields)
+
+
+def configure(level=None, echo_level=None, capacity=None):
+    """Changes the trace/echo levels or the ring capacity (a new capacity starts an empty buffer)."""
+    global _level, _echo_level, _buffer
+    if level is not None:
+        _level = parse_level(level)
+    if echo_level is not None:
+        _echo_level = parse_level(echo_level)
+    if capacity is not None and capacity != _buffer.capacity:
+        _buffer = TraceBuffer(capacity)
+    # Records echoed to stdout must be recorded first
+    for module in _native_modules:
+        module.set_trace(record_native, min(_level, _echo_level))
+
+
+def configure_from_environment(environ=os.environ):
+    configure(level=environ.get(ENV_TRACE_LEVEL, LEVEL_NAMES[INFO]),
+              echo_level=environ.get(ENV_TRACE_ECHO, LEVEL_NAMES[WARNING]),
+              capacity=int(environ.get(ENV_TRACE_SIZE, DEFAULT_CAPACITY)))
+
+
+def attach_native(module):
+    """Routes an extension module's trace records (module.set_trace(sink, level)) into this buffer."""
+    if module not in _native_modules and hasattr(module, "set_trace"):
+        _native_modules.append(module)
+        module.set_trace(record_native, min(_level, _echo_level))
+
+
+def level():
+    return _level
+
+
+def records():
+    return _buffer.records()
+
+
+def stats():
+    return {"capacity": _buffer.capacity, "records": len(_buffer.records()), "dropped": _buffer.dropped,
+            "level": LEVEL_NAMES.get(_level, _level), "echo_level": LEVEL_NAMES.get(_echo_level, _echo_level)}
+
+
+def clear():
+    _buffer.clear()
+
+
+def dump(file=None, reason="on demand"):
+    """Writes the buffered records, oldest first, to file (default stderr). Returns the record count."""
+    file = file or sys.stderr
+    snapshot = _buffer.records()
+    file.write(f"=== trace dump ({reason}): {len(snapshot)} record(s), {_buffer.dropped} dropped ===\n")
+    for record in snapshot:
+        file.write(format_record(record) + "\n")
+    file.write("=== end of trace dump ===\n")
+    file.flush()
+    return len(snapshot)
+
+
+def dump_to_configured(reason, environ=os.environ):
+    """Dumps to the OAKD_TRACE_DUMP file (appending) or to stderr."""
+    path = environ.get(ENV_TRACE_DUMP)
+    if not path:
+        return dump(reason=reason)
+    with open(path, "a") as f:
+        return dump(f, reason=reason)
+
+
+_crash_dump_installed = False
+
+
+def install_crash_dump():
+    """Dumps the buffer when an exception escapes the main thread or any other thread."""
+    global _crash_dump_installed
+    if _crash_dump_installed:
+        return
+    _crash_dump_installed = True
+    previous_excepthook = sys.excepthook
+    previous_threading_excepthook = threading.excepthook
+
+    def excepthook(exc_type, exc_value, exc_traceback):
+        _dump_safely(f"uncaught {exc_type.__name__}")
+        previous_excepthook(exc_type, exc_value, exc_traceback)
+
+    def threading_excepthook(hook_args):
+        if hook_args.exc_type is not SystemExit:
+            thread_name = hook_args.thread.name if hook_args.thread is not None else "?"
+            _dump_safely(f"uncaught {hook_args.exc_type.__name__} in thread {thread_name}")
+        previous_threading_excepthook(hook_args)
+
+    sys.excepthook = excepthook
+    threading.excepthook = threading_excepthook
+
+
+def install_signal_dump(signum=getattr(signal, "SIGUSR1", None)):
+    """Dumps the buffer on a signal (default SIGUSR1; main thread only). Returns False if unavailable."""
+    if signum is None or threading.current_thread() is not threading.main_thread():
+        return False
+    signal.signal(signum, lambda *_: _dump_safely(f"signal {signum}"))
+    return True
+
+
+def _dump_safely(reason):
+    try:
+        dump_to_configured(reason)
+    except Exception as e:
+        print(f"[tracing] Trace dump failed: {e!r}")
+
+
+configure_from_environment()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sends the dump signal to a running process that traces.")
+    parser.add_argument("pid", type=int, help="Process ID of the menu bar app")
+    args = parser.parse_args()
+    os.kill(args.pid, signal.SIGUSR1)
+    print(f"Sent SIGUSR1 to {args.pid}; the trace is written to its stderr or ${ENV_TRACE_DUMP}.")
+
+
+if __name__ == "__main__":
+    main()
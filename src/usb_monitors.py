@@ -0,0 +1,414 @@
+import argparse
+import errno
+import os
+import selectors
+import socket
+import sys
+import threading
+
+try:
+    from src import tracing
+except ImportError:
+    import tracing # Run as a script (python3 src/usb_monitors.py)
+
+# Monitor names accepted by DeviceConnectionManager (or the OAKD_USB_MONITOR environment variable)
+MONITOR_IOKIT = "iokit"
+MONITOR_LINUX = "linux"
+
+# Linux: the kernel multicasts device uevents on this netlink protocol and group
+NETLINK_KOBJECT_UEVENT = 15
+UEVENT_KERNEL_GROUP = 1
+UEVENT_BUFFER_SIZE = 64 * 1024
+UEVENT_RECEIVE_BUFFER = 1024 * 1024 # Room for a hot-plug storm before the kernel drops events
+DEFAULT_SYS_ROOT = "/sys"
+LINUX_DEVICE_CLASS = "usb_device" # DEVTYPE of USB devices (interfaces are "usb_interface")
+STOP_JOIN_TIMEOUT = 2.0
+
+
+class USBMonitor:
+    """
+    Hot-plug source of DeviceConnectionManager. Reports the devices of a vendor to the handler's
+    on_device_connected / on_device_disconnected(vendor_id, product_id, serial_number, service_id, location_id),
+    first the devices already connected, then every change.
+    """
+    name = None
+    description = None # Used in log and error messages
+    error_title = "USB Monitor Initialization Error"
+
+    def start(self, handler, vendor_id, product_id):
+        """
+        Starts reporting devices (product_id 0 = any product of the vendor). Returns the address of the
+        CFRunLoopSource the main run loop has to schedule, or 0 when the monitor runs on a thread of its own.
+        """
+        raise NotImplementedError
+
+    def stop(self):
+        raise NotImplementedError
+
+    def scan(self, handler, vendor_id, product_id):
+        """Synchronously reports every matching device connected now to handler.on_device_connected."""
+        raise NotImplementedError
+
+    def set_registry_observer(self, observer):
+        """observer.entry_matched(record, match_class) / entry_terminated(entry_id) follow the monitored devices."""
+
+    def registry_snapshot(self, class_name):
+        return []
+
+    def stats(self):
+        """Counters of the monitor's event queue (enqueued, dropped, max_depth, capacity, ...), if it has one."""
+        return {}
+
+
+class IOKitUSBMonitor(USBMonitor):
+    """IOKit matched/terminated notifications, through the Cython iokit_wrapper (macOS)."""
+    name = MONITOR_IOKIT
+    description = "Cython IOKit"
+    error_title = "IOKit Initialization Error"
+
+    def __init__(self, iokit_module):
+        self.iokit = iokit_module
+        tracing.attach_native(iokit_module) # The callbacks record into the trace buffer instead of printing
+
+    def start(self, handler, vendor_id, product_id):
+        print("[usb_monitors] Calling iokit_wrapper.init_usb_monitoring...")
+        run_loop_source_addr = self.iokit.init_usb_monitoring(handler, vendor_id, product_id)
+        if run_loop_source_addr == 0 or run_loop_source_addr is None: # Check for null pointer / error
+            raise Exception("Failed to get a valid run_loop_source_addr from iokit_wrapper.")
+        return run_loop_source_addr
+
+    def stop(self):
+        self.iokit.stop_usb_monitoring()
+
+    def scan(self, handler, vendor_id, product_id):
+        return self.iokit.trigger_device_scan_and_notify(handler, vendor_id, product_id, verbose=False)
+
+    def set_registry_observer(self, observer):
+        self.iokit.set_registry_observer(observer)
+
+    def registry_snapshot(self, class_name):
+        return self.iokit.registry_snapshot(class_name)
+
+    def stats(self):
+        return self.iokit.event_queue_stats()
+
+
+def parse_uevent(data):
+    """Splits a kernel uevent ("action@devpath\\0KEY=value\\0...") into a dict of its KEY=value fields."""
+    event = {}
+    for field in data.split(b"\0"):
+        key, sep, value = field.partition(b"=")
+        if sep:
+            event[key.decode("ascii", "replace")] = value.decode("utf-8", "replace")
+    return event
+
+
+def location_id(busnum, port_path):
+    """IOKit-style location ID: the bus number in the top byte, then one nibble per hub port ("1.4.2")."""
+    location = (busnum & 0xff) << 24
+    shift = 20
+    for port in port_path.split("."):
+        if shift < 0 or not port.isdigit():
+            break
+        location |= (int(port) & 0xf) << shift
+        shift -= 4
+    return location
+
+
+def _port_path(device_name):
+    # sysfs names USB devices <bus>-<port>.<port>...; root hubs are usb<bus>
+    return device_name.split("-", 1)[1] if "-" in device_name else "0"
+
+
+class LinuxUSBMonitor(USBMonitor):
+    """
+    Kernel uevents from a NETLINK_KOBJECT_UEVENT socket, with a /sys/bus/usb/devices scan for the
+    devices connected at start. Events are read on a thread of its own. A removed device's sysfs
+    directory is already gone when "remove" arrives, so devices are reported from a cache filled on "add".
+    The service ID (bus and device number) changes on every enumeration, like an IOKit service ID.
+
+    sys_root and uevent_socket point the monitor at a fake sysfs tree and a socket the tests write uevents to.
+    """
+    name = MONITOR_LINUX
+    description = "netlink uevent"
+
+    def __init__(self, sys_root=DEFAULT_SYS_ROOT, uevent_socket=None):
+        self.sys_root = sys_root
+        self._socket = uevent_socket
+        self._owns_socket = uevent_socket is None
+        self._handler = None
+        self._vendor_id = None
+        self._product_id = 0
+        self._observer = None
+        self._lock = threading.Lock()
+        self._known = {} # DEVPATH -> device info of the matching devices reported as connected
+        self._thread = None
+        self._stop_r = self._stop_w = None
+
+    @property
+    def devices_dir(self):
+        return os.path.join(self.sys_root, "bus", "usb", "devices")
+
+    def _open_socket(self):
+        sock = socket.socket(socket.AF_NETLINK, socket.SOCK_DGRAM, NETLINK_KOBJECT_UEVENT)
+        try:
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, UEVENT_RECEIVE_BUFFER)
+        except OSError:
+            pass
+        sock.bind((0, UEVENT_KERNEL_GROUP))
+        return sock
+
+    def start(self, handler, vendor_id, product_id):
+        self._handler = handler
+        self._vendor_id = vendor_id
+        self._product_id = product_id
+        # Listen before the initial scan, so a device added in between is not missed (duplicates are dropped)
+        if self._socket is None:
+            self._socket = self._open_socket()
+        self._stop_r, self._stop_w = os.pipe()
+        for devpath, info in self._scan_sysfs():
+            self._device_added(devpath, info)
+        self._thread = threading.Thread(target=self._run, name="usb-uevent-monitor", daemon=True)
+        self._thread.start()
+        return 0
+
+    def stop(self):
+        if self._thread is not None:
+            os.write(self._stop_w, b"x")
+            self._thread.join(STOP_JOIN_TIMEOUT)
+            self._thread = None
+        for fd in (self._stop_r, self._stop_w):
+            if fd is not None:
+                os.close(fd)
+        self._stop_r = self._stop_w = None
+        if self._socket is not None and self._owns_socket:
+            self._socket.close()
+            self._socket = None
+        with self._lock:
+            self._known.clear()
+        self._handler = None
+        self._observer = None
+
+    def scan(self, handler, vendor_id, product_id):
+        found = 0
+        for _, info in self._scan_sysfs():
+            if self._matches(info, vendor_id, product_id):
+                found += 1
+                handler.on_device_connected(info['vendor_id'], info['product_id'], info['serial_number'],
+                                            info['service_id'], info['location_id'])
+        return found
+
+    def set_registry_observer(self, observer):
+        self._observer = observer
+
+    def registry_snapshot(self, class_name):
+        if class_name != LINUX_DEVICE_CLASS:
+            return []
+        return [self._record(info) for _, info in self._scan_sysfs()]
+
+    # --- sysfs ---
+    def _read_attribute(self, path, name):
+        try:
+            with open(os.path.join(path, name)) as f:
+                return f.read().strip()
+        except OSError:
+            return None
+
+    def _read_device(self, path):
+        vendor_id = self._read_attribute(path, "idVendor")
+        product_id = self._read_attribute(path, "idProduct")
+        if vendor_id is None or product_id is None:
+            return None
+        busnum = int(self._read_attribute(path, "busnum") or 0)
+        devnum = int(self._read_attribute(path, "devnum") or 0)
+        return {
+            'vendor_id': int(vendor_id, 16),
+            'product_id': int(product_id, 16),
+            'serial_number': self._read_attribute(path, "serial") or "N/A",
+            'service_id': (busnum << 16) | devnum,
+            'location_id': location_id(busnum, _port_path(os.path.basename(path))),
+            'name': self._read_attribute(path, "product"),
+        }
+
+    def _scan_sysfs(self):
+        """(DEVPATH, info) of every USB device in sysfs (interfaces, named <bus>-<port>:<config>.<if>, are skipped)."""
+        try:
+            names = sorted(os.listdir(self.devices_dir))
+        except OSError as e:
+            print(f"[usb_monitors] Cannot list {self.devices_dir}: {e}")
+            return []
+        devices = []
+        for name in names:
+            if ":" in name:
+                continue
+            path = os.path.realpath(os.path.join(self.devices_dir, name))
+            info = self._read_device(path)
+            if info is not None:
+                devices.append(("/" + os.path.relpath(path, os.path.realpath(self.sys_root)), info))
+        return devices
+
+    def _info_from_uevent(self, event):
+        # Used when the sysfs directory is already gone again; the uevent has no serial number
+        vendor_id, product_id, _ = (event.get('PRODUCT', "0/0/0").split("/") + ["", ""])[:3]
+        busnum = int(event.get('BUSNUM') or 0)
+        devnum = int(event.get('DEVNUM') or 0)
+        return {
+            'vendor_id': int(vendor_id or "0", 16),
+            'product_id': int(product_id or "0", 16),
+            'serial_number': "N/A",
+            'service_id': (busnum << 16) | devnum,
+            'location_id': location_id(busnum, _port_path(os.path.basename(event.get('DEVPATH', "")))),
+            'name': None,
+        }
+
+    @staticmethod
+    def _record(info):
+        return {
+            'entry_id': info['service_id'], 'class_name': LINUX_DEVICE_CLASS, 'name': info.get('name'),
+            'parent_id': None, 'vendor_id': info['vendor_id'], 'product_id': info['product_id'],
+            'serial_number': info['serial_number'], 'location_id': info['location_id'],
+        }
+
+    # --- Events ---
+    def _matches(self, info, vendor_id=None, product_id=None):
+        vendor_id = self._vendor_id if vendor_id is None else vendor_id
+        product_id = self._product_id if product_id is None else product_id
+        return info['vendor_id'] == vendor_id and (not product_id or info['product_id'] == product_id)
+
+    def handle_uevent(self, data):
+        """Applies one raw kernel uevent (what the netlink socket delivers)."""
+        event = parse_uevent(data)
+        if event.get('SUBSYSTEM') != "usb" or event.get('DEVTYPE') != LINUX_DEVICE_CLASS:
+            return
+        devpath = event.get('DEVPATH')
+        if not devpath:
+            return
+        action = event.get('ACTION')
+        if action == "add":
+            info = self._read_device(self.sys_root + devpath) or self._info_from_uevent(event)
+            self._device_added(devpath, info)
+        elif action == "remove":
+            self._device_removed(devpath)
+
+    def _device_added(self, devpath, info):
+        if not self._matches(info):
+            return
+        with self._lock:
+            previous = self._known.get(devpath)
+            if previous is not None and previous['service_id'] == info['service_id']:
+                return # Already reported by the initial scan
+            self._known[devpath] = info
+        if previous is not None:
+            # Re-enumerated without a "remove" we saw
+            self._notify(self._handler.on_device_disconnected, previous)
+        if self._observer is not None:
+            self._observer.entry_matched(self._record(info), LINUX_DEVICE_CLASS)
+        self._notify(self._handler.on_device_connected, info)
+
+    def _device_removed(self, devpath):
+        with self._lock:
+            info = self._known.pop(devpath, None)
+        if info is None:
+            return
+        if self._observer is not None:
+            self._observer.entry_terminated(info['service_id'])
+        self._notify(self._handler.on_device_disconnected, info)
+
+    def _notify(self, callback, info):
+        try:
+            callback(info['vendor_id'], info['product_id'], info['serial_number'], info['service_id'], info['location_id'])
+        except Exception as e:
+            tracing.error("usb_monitors", "Python exception in callback: %r", e)
+
+    def resync(self):
+        """Reconciles the reported devices with sysfs (after the kernel dropped uevents)."""
+        present = {devpath: info for devpath, info in self._scan_sysfs() if self._matches(info)}
+        with self._lock:
+            gone = [devpath for devpath in self._known if devpath not in present]
+        for devpath in gone:
+            self._device_removed(devpath)
+        for devpath, info in present.items():
+            self._device_added(devpath, info)
+
+    def _run(self):
+        selector = selectors.DefaultSelector()
+        selector.register(self._socket, selectors.EVENT_READ)
+        selector.register(self._stop_r, selectors.EVENT_READ)
+        try:
+            while True:
+                for key, _ in selector.select():
+                    if key.fileobj == self._stop_r:
+                        return
+                    try:
+                        data = self._socket.recv(UEVENT_BUFFER_SIZE)
+                    except OSError as e:
+                        if e.errno == errno.ENOBUFS:
+                            tracing.warning("usb_monitors", "uevent buffer overflowed; rescanning sysfs.")
+                            self.resync()
+                        else:
+                            print(f"[usb_monitors] Error reading uevents: {e}")
+                        continue
+                    self.handle_uevent(data)
+        finally:
+            selector.close()
+
+
+USB_MONITORS = {
+    MONITOR_IOKIT: IOKitUSBMonitor,
+    MONITOR_LINUX: LinuxUSBMonitor,
+}
+
+
+def default_monitor_name(iokit_module=None):
+    if iokit_module is None and sys.platform.startswith("linux"):
+        return MONITOR_LINUX
+    return MONITOR_IOKIT
+
+
+def create_usb_monitor(name=None, iokit_module=None):
+    """
+    Creates a monitor by name (OAKD_USB_MONITOR; by default IOKit, or the uevent monitor on Linux
+    hosts without the compiled iokit_wrapper).
+    """
+    name = name or os.environ.get("OAKD_USB_MONITOR") or default_monitor_name(iokit_module)
+    if name == MONITOR_IOKIT:
+        if iokit_module is None:
+            raise ValueError("The IOKit USB monitor needs the compiled iokit_wrapper (macOS)")
+        return IOKitUSBMonitor(iokit_module)
+    if name == MONITOR_LINUX:
+        return LinuxUSBMonitor()
+    raise ValueError(f"Unknown USB monitor '{name}'. Available: {', '.join(USB_MONITORS)}")
+
+
+class _PrintingHandler:
+    @staticmethod
+    def _location(location_id):
+        # Not every monitor knows the location (e.g. a disconnect of a device it never saw)
+        return f"{location_id:08x}" if location_id is not None else "-"
+
+    def on_device_connected(self, vendor_id, product_id, serial_number, service_id, location_id=None):
+        print(f"connected    {vendor_id:04x}:{product_id:04x} SN={serial_number} ServiceID={service_id} location={self._location(location_id)}")
+
+    def on_device_disconnected(self, vendor_id, product_id, serial_number, service_id, location_id=None):
+        print(f"disconnected {vendor_id:04x}:{product_id:04x} SN={serial_number} ServiceID={service_id} location={self._location(location_id)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Prints USB hot-plug events of a vendor (Linux uevent monitor)")
+    parser.add_argument('--vid', type=lambda v: int(v, 0), default=0x03e7)
+    parser.add_argument('--pid', type=lambda v: int(v, 0), default=0, help="0 matches every product of the vendor")
+    parser.add_argument('--sys-root', default=DEFAULT_SYS_ROOT)
+    args = parser.parse_args()
+
+    monitor = LinuxUSBMonitor(sys_root=args.sys_root)
+    monitor.start(_PrintingHandler(), args.vid, args.pid)
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        monitor.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -3,78 +3,123 @@
 import time
 import argparse
 import os
-import depthai as dai
-# import sys # For sys.exit and potentially more detailed error info
+from dataclasses import asdict, replace
+import signal
+import sys
+import threading
+from concurrent.futures import Future
+from datetime import timedelta
+try:
+    from src import pipeline_factory
+    from src import camera_profiles
+    from src.event_loop import CameraEventLoop, WAKE_SIGNAL
+    from src.phase_timer import PhaseTimer
+    from src.control_socket import ControlServer, ControlError, DEFAULT_CONTROL_SOCKET
+    from src.reconnect import ReconnectPolicy, ReconnectAttempt
+    from src import start_metrics
+    from src import sim_depthai
+except ImportError:
+    import pipeline_factory # Run as a script (python3 src/uvc_handler.py)
+    import camera_profiles
+    from event_loop import CameraEventLoop, WAKE_SIGNAL
+    from phase_timer import PhaseTimer
+    from control_socket import ControlServer, ControlError, DEFAULT_CONTROL_SOCKET
+    from reconnect import ReconnectPolicy, ReconnectAttempt
+    import start_metrics
+    import sim_depthai
+
+# When this process started running Python code (the end of the "spawn" start phase)
+PROCESS_START_TIME = start_metrics.now()
+
+# Device search timeout used by UVCCamera.start (dai.Device's default search time)
+DEVICE_SEARCH_TIMEOUT = 3
+# Poll interval while searching for one specific device (--device)
+DEVICE_SEARCH_POLL_INTERVAL = 0.1
+# How long to wait for the first frame before giving up on the first_frame mark (seconds)
+FIRST_FRAME_TIMEOUT = 5
+
+# depthai is imported on first use (see _load_depthai) so that --help, argument errors and
+# --list-profiles do not pay for it. OAKD_DEPTHAI_BACKEND=sim swaps in the simulated devices of sim_depthai.
+dai = None
+
+def _load_depthai():
+    global dai
+    if dai is None:
+        dai = sim_depthai.import_depthai()
+    return dai
+
+# Profiles of the two pipelines this script has always provided (see camera_profiles.PROFILES)
+MINIMAL_PROFILE = camera_profiles.get_profile("1080p30")
+FLASHED_PROFILE = camera_profiles.get_profile("4k-downscaled")
 
 def getMinimalPipeline():
-    pipeline = dai.Pipeline()
-    cam_rgb = pipeline.createColorCamera()
-    cam_rgb.setResolution(dai.ColorCameraProperties.SensorResolution.THE_1080_P)
-    cam_rgb.setBoardSocket(dai.CameraBoardSocket.CAM_A)
-    cam_rgb.setInterleaved(False)
-    cam_rgb.setFps(30)
-
-    uvc = pipeline.createUVC()
-    cam_rgb.video.link(uvc.input)
-
-    board_config = dai.BoardConfig()
-    uvc_board_settings = dai.BoardConfig.UVC(1920, 1080)
-    uvc_board_settings.frameType = dai.ImgFrame.Type.NV12
-    uvc_board_settings.cameraName = "MinimalUVCCam_1080p"
-    board_config.uvc = uvc_board_settings
-    pipeline.setBoardConfig(board_config)
-    return pipeline
+    # Built once per process and cached by profile (see pipeline_factory)
+    return pipeline_factory.default_factory.get_pipeline(MINIMAL_PROFILE)
 
 def getPipeline():
     enable_4k = True
 
-    pipeline = dai.Pipeline()
-
-    # Define a source - color camera
-    cam_rgb = pipeline.createColorCamera()
-    cam_rgb.setBoardSocket(dai.CameraBoardSocket.CAM_A)
-    cam_rgb.setInterleaved(False)
-
     if enable_4k:
-        cam_rgb.setResolution(dai.ColorCameraProperties.SensorResolution.THE_4_K)
-        cam_rgb.setIspScale(1, 2)
+        profile = FLASHED_PROFILE
     else:
-        cam_rgb.setResolution(dai.ColorCameraProperties.SensorResolution.THE_720_P)
-
-    # Create an UVC (USB Video Class) output node
-    uvc = pipeline.createUVC()
-    cam_rgb.video.link(uvc.input)
+        profile = pipeline_factory.CameraProfile(sensor_resolution="THE_720_P", camera_name="FlashedCam_1080p_NV12")
 
     # Note: if the pipeline is sent later to device (using startPipeline()),
     # it is important to pass the device config separately when creating the device
-    config = dai.Device.Config()
-
-    board_config = dai.BoardConfig()
-    uvc_board_settings = dai.BoardConfig.UVC(1920, 1080)
-    uvc_board_settings.frameType = dai.ImgFrame.Type.NV12
-    uvc_board_settings.cameraName = "FlashedCam_1080p_NV12"
-    board_config.uvc = uvc_board_settings
+    return pipeline_factory.default_factory.get_pipeline(profile)
 
-    # パイプラインにBoardConfigを設定
-    pipeline.setBoardConfig(board_config)
 
-    return pipeline
+def getUVCDeviceConfig(profile=MINIMAL_PROFILE):
+    # Device config used when the pipeline is started on an already-open device
+    _load_depthai()
+    device_config = dai.Device.Config()
+    device_config.board.uvc = dai.BoardConfig.UVC(profile.uvc_width, profile.uvc_height)
+    device_config.board.uvc.frameType = getattr(dai.ImgFrame.Type, profile.uvc_frame_type())
+    return device_config
 
 
 class UVCCamera:
-    def __init__(self, pipeline_func, device_config=None):
+    def __init__(self, pipeline_func=None, device_config=None, profile=None,
+                 encoding=None, mjpeg_quality=None, bitrate_kbps=None, device_id=None):
+        # Either pass pipeline_func (+ device_config), or a profile and optionally override its
+        # output encoding ("raw" or "mjpeg"), MJPEG quality (1-100) and encoder bitrate (kbps).
+        # device_id: MX ID (USB serial number) of the device to open; any available device if None.
+        self.profile = camera_profiles.with_encoding(profile or MINIMAL_PROFILE, encoding, mjpeg_quality, bitrate_kbps)
+        if pipeline_func is None:
+            pipeline_func = lambda: pipeline_factory.default_factory.get_pipeline(self.profile)
+            if device_config is None:
+                device_config = getUVCDeviceConfig(self.profile)
         self.pipeline_func = pipeline_func
         self.device_config = device_config
         self.device = None
         self.pipeline = None
+        self._control_queue = None
+        self.device_id = device_id
+        self.start_trace = None # start_metrics.StartTrace to record discovery/boot/upload marks in
 
     def start(self):
+        _load_depthai()
+        self._control_queue = None
         self.pipeline = self.pipeline_func()
+        trace = self.start_trace
         if self.device_config:
             # If a device_config is provided, use it for device initialization
             # This is typically used when specific UVC settings are needed before pipeline start
-            self.device = dai.Device(self.device_config)
+            # Discovery is done separately (same search timeout as dai.Device) so it can be timed on its own
+            if self.device_id:
+                device_info = find_device(self.device_id)
+            else:
+                found, device_info = dai.Device.getAnyAvailableDevice(timedelta(seconds=DEVICE_SEARCH_TIMEOUT))
+                if not found:
+                    raise RuntimeError("No available devices")
+            if trace is not None:
+                trace.mark("device_discovered")
+            self.device = dai.Device(self.device_config, device_info)
+            if trace is not None:
+                trace.mark("device_booted")
             self.device.startPipeline(self.pipeline)
+            if trace is not None:
+                trace.mark("pipeline_started")
         else:
             # If no device_config is provided, assume pipeline contains all config
             # or we are using default device settings.
@@ -86,12 +131,162 @@ class UVCCamera:
 
 
     def stop(self):
+        self._control_queue = None
         if self.device is not None and not self.device.isClosed():
             self.device.close()
             self.device = None
 
+    def wait_for_first_frame(self, timeout=FIRST_FRAME_TIMEOUT):
+        """
+        Waits until the pipeline's frame probe delivers a frame. Returns the start_metrics timestamp
+        of the first frame, or None on timeout or if the pipeline has no frame probe.
+        """
+        try:
+            queue = self.device.getOutputQueue(pipeline_factory.FRAME_PROBE_STREAM_NAME, maxSize=1, blocking=False)
+        except RuntimeError:
+            return None
+        arrived = threading.Event()
+        stamp = {}
+        def on_frame(*args): # Registered as the (queue name, message) overload; the arguments are not needed
+            stamp.setdefault("t", start_metrics.now())
+            arrived.set()
+        callback_id = queue.addCallback(on_frame)
+        try:
+            if queue.has():
+                on_frame()
+            arrived.wait(timeout)
+        finally:
+            queue.removeCallback(callback_id)
+        return stamp.get("t")
+
+    def restart(self):
+        # Reboots the device with the pipeline (a depthai pipeline cannot be restarted on an open device)
+        self.stop()
+        self.start()
+
+    def send_control(self, control):
+        """Sends a dai.CameraControl to the running camera (needs a profile with control_input)."""
+        if self.device is None or self.device.isClosed():
+            raise RuntimeError("Camera is not running.")
+        if self._control_queue is None:
+            self._control_queue = self.device.getInputQueue(pipeline_factory.CONTROL_STREAM_NAME, maxSize=4, blocking=False)
+        self._control_queue.send(control)
+
+
+# Settings accepted by build_camera_control (the set_controls command)
+CAMERA_CONTROL_KEYS = {
+    "exposure_us", "iso", "auto_exposure", "exposure_compensation",
+    "white_balance_k", "auto_white_balance", "focus", "autofocus",
+    "brightness", "contrast", "saturation", "sharpness",
+}
+
+def build_camera_control(controls):
+    """
+    Builds a dai.CameraControl from a dict of settings, e.g.
+    {"exposure_us": 10000, "iso": 400}, {"auto_exposure": true}, {"white_balance_k": 4500},
+    {"auto_white_balance": true}, {"focus": 130}, {"autofocus": true},
+    {"brightness": 0, "contrast": 0, "saturation": 0, "sharpness": 1}, {"exposure_compensation": -2}.
+    """
+    if not isinstance(controls, dict) or not controls:
+        raise ControlError("'controls' must be a non-empty object")
+    unknown = set(controls) - CAMERA_CONTROL_KEYS
+    if unknown:
+        raise ControlError(f"Unknown camera controls: {', '.join(sorted(unknown))}")
+
+    _load_depthai()
+    ctrl = dai.CameraControl()
+    if "exposure_us" in controls:
+        ctrl.setManualExposure(int(controls["exposure_us"]), int(controls.get("iso", 400)))
+    elif controls.get("auto_exposure"):
+        ctrl.setAutoExposureEnable()
+    if "exposure_compensation" in controls:
+        ctrl.setAutoExposureCompensation(int(controls["exposure_compensation"]))
+    if "white_balance_k" in controls:
+        ctrl.setManualWhiteBalance(int(controls["white_balance_k"]))
+    elif controls.get("auto_white_balance"):
+        ctrl.setAutoWhiteBalanceMode(dai.CameraControl.AutoWhiteBalanceMode.AUTO)
+    if "focus" in controls:
+        ctrl.setManualFocus(int(controls["focus"]))
+    elif controls.get("autofocus"):
+        ctrl.setAutoFocusMode(dai.CameraControl.AutoFocusMode.CONTINUOUS_VIDEO)
+    for key, setter in (("brightness", ctrl.setBrightness), ("contrast", ctrl.setContrast),
+                        ("saturation", ctrl.setSaturation), ("sharpness", ctrl.setSharpness)):
+        if key in controls:
+            setter(int(controls[key]))
+    return ctrl
+
+
+class CameraControlCommands:
+    """Control socket commands for a camera run by run_uvc_device (served on the control thread)."""
+    def __init__(self, camera, loop, profile):
+        self.camera = camera
+        self.loop = loop
+        self.profile = profile
+        self.started_at = time.monotonic()
+        self.controls = {} # Everything applied so far; re-applied after a pipeline restart
+        self.controls_applied = 0
+        self.restarts = 0
+        self.reconnects = [] # ReconnectAttempt records, most recent last
+        self._lock = threading.Lock()
+
+    def handlers(self):
+        return {
+            "status": self.status,
+            "set_controls": self.set_controls,
+            "restart_pipeline": self.restart_pipeline,
+        }
+
+    def status(self, request):
+        device = self.camera.device
+        return {
+            "pid": os.getpid(),
+            "profile": camera_profiles.profile_name_of(self.profile),
+            "streaming": device is not None and not device.isClosed(),
+            "uptime_s": round(time.monotonic() - self.started_at, 1),
+            "controls": self.controls,
+            "controls_applied": self.controls_applied,
+            "restarts": self.restarts,
+            "reconnect_attempts": len(self.reconnects),
+            "last_reconnect": asdict(self.reconnects[-1]) if self.reconnects else None,
+        }
+
+    def set_controls(self, request):
+        controls = request.get("controls")
+        ctrl = build_camera_control(controls)
+        start = time.monotonic()
+        with self._lock:
+            self.camera.send_control(ctrl)
+            self.controls.update(controls)
+            self.controls_applied += 1
+        return {"applied": sorted(controls), "latency_ms": round((time.monotonic() - start) * 1000, 2)}
+
+    def restart_pipeline(self, request):
+        # Device restarts must happen on the main loop, which otherwise treats the closed device as a disconnect
+        reply = Future()
+        self.loop.wake((COMMAND_RESTART_PIPELINE, reply))
+        return reply.result(timeout=RESTART_PIPELINE_TIMEOUT)
+
+    def do_restart(self):
+        # Called on the main loop thread
+        timer = PhaseTimer("uvc_handler.py: Pipeline restart")
+        with timer.phase("camera.restart"):
+            self.camera.restart()
+        self.restarts += 1
+        if self.controls:
+            with timer.phase("reapply controls"):
+                self.reapply_controls()
+        print(timer.summary(), flush=True)
+        return {"restart_ms": timer.as_dict()["total"]}
+
+    def reapply_controls(self):
+        # A rebooted device starts from default camera settings
+        if self.controls:
+            with self._lock:
+                self.camera.send_control(build_camera_control(self.controls))
+
 # Will flash the bootloader if no pipeline is provided as argument
 def flash(pipeline=None):
+    _load_depthai()
     (f, bl) = dai.DeviceBootloader.getFirstAvailableDevice()
     if bl is None:
         print("No DepthAI device found in bootloader mode. Please hold BOOT button and reset the device.")
@@ -117,18 +312,18 @@ def handle_flash_bootloader():
     flash()
     print("Flashing successful. Please power-cycle the device")
 
-def handle_flash_app():
-    flash(getMinimalPipeline)
+def handle_flash_app(profile=MINIMAL_PROFILE):
+    # A flashed app runs without a host, so it gets no control input or frame probe
+    flash(pipeline_factory.default_factory.get_pipeline(replace(profile, control_input=False, frame_probe=False)))
     print("Flashing successful. Please power-cycle the device")
 
-def handle_load_and_exit():
+def handle_load_and_exit(profile=None):
     os.environ["DEPTHAI_WATCHDOG"] = "0"
+    _load_depthai()
 
-    device_config = dai.Device.Config()
-    device_config.board.uvc = dai.BoardConfig.UVC(1920, 1080)
-    device_config.board.uvc.frameType = dai.ImgFrame.Type.NV12
-
-    device = dai.Device(device_config, getPipeline())
+    # This process exits right away, so nobody could send controls or read the frame probe
+    profile = replace(profile or FLASHED_PROFILE, control_input=False, frame_probe=False)
+    device = dai.Device(getUVCDeviceConfig(profile), pipeline_factory.default_factory.get_pipeline(profile))
 
     print("\nDevice started. Attempting to force-terminate this process...")
     print("Open an UVC viewer to check the camera stream.")
@@ -137,23 +332,232 @@ def handle_load_and_exit():
     os.kill(os.getpid(), signal.SIGTERM)
 
 
-def run_uvc_device():
+# Printed (and flushed) once the device is streaming; launchers and benchmarks wait for it.
+READY_MARKER = "uvc_handler.py: Device started"
+# Main loop command queued by the control socket's restart_pipeline
+COMMAND_RESTART_PIPELINE = "restart_pipeline"
+RESTART_PIPELINE_TIMEOUT = 30
+# Printed (and flushed) for every in-process reconnect attempt
+RECONNECT_MARKER = "uvc_handler.py: Reconnect"
+# How often the main loop checks dai.Device.isClosed() when nothing else wakes it (seconds)
+DEVICE_CHECK_INTERVAL = 0.5
+# Printed by --standby once depthai is imported and the pipeline is pre-built.
+STANDBY_READY_MARKER = "uvc_handler.py: Standby ready"
+
+def report_bandwidth(profile, link="usb3"):
+    estimate = camera_profiles.estimate_bandwidth(profile, link)
+    print(f"uvc_handler.py: Bandwidth estimate: {estimate.describe()}")
+    if not estimate.fits:
+        print(f"uvc_handler.py: Warning: profile '{estimate.profile_name}' may drop frames on a {link} link.")
+    return estimate
+
+class _LineReader:
+    # Reads newline-separated commands straight from a file descriptor with its own buffer.
+    # The standby loop and the streaming loop both read stdin through one of these, so no
+    # line can be stuck in a buffer the other reader does not see (as with `for line in sys.stdin`).
+    def __init__(self, fd):
+        self.fd = fd
+        self._buffer = b""
+        self.eof = False
+
+    def fileno(self):
+        return self.fd
+
+    def fill(self):
+        # One os.read(); False at EOF. Blocks unless the fd is readable.
+        data = os.read(self.fd, 4096)
+        if not data:
+            self.eof = True
+            return False
+        self._buffer += data
+        return True
+
+    def lines(self):
+        # Complete lines read so far (all of the rest once EOF was seen)
+        *complete, self._buffer = self._buffer.split(b"\n")
+        if self.eof and self._buffer:
+            complete.append(self._buffer)
+            self._buffer = b""
+        return [line.decode(errors="replace").strip() for line in complete]
+
+    def readline(self):
+        # Next line, blocking until it arrives; None at EOF
+        while True:
+            if b"\n" in self._buffer or (self.eof and self._buffer):
+                line, _, self._buffer = self._buffer.partition(b"\n")
+                return line.decode(errors="replace").strip()
+            if self.eof or not self.fill():
+                return None
+
+def _queue_stream_commands(stream, loop):
+    for line in stream.lines():
+        for command in line.split():
+            loop.wake(command)
+
+def _read_stream_commands(stream, loop):
+    # Reads newline-separated commands from a pipe (the standby worker's stdin) and queues them.
+    if not stream.fill():
+        _queue_stream_commands(stream, loop) # A last command without a newline still counts
+        loop.remove_reader(stream)
+        loop.wake("stop") # The manager closed the pipe (or went away); stop instead of streaming for nobody
+        return
+    _queue_stream_commands(stream, loop)
+
+def _finish_start_trace(camera, start_trace):
+    # Marks the first frame and appends the finished start to the history
+    first_frame = camera.wait_for_first_frame()
+    if first_frame is not None:
+        start_trace.mark("first_frame", first_frame)
+    print(f"uvc_handler.py: {start_trace.describe()}", flush=True)
+    start_metrics.append_record(start_trace.record(ok=first_frame is not None,
+                                                   error=None if first_frame is not None else "no first frame"))
+
+def find_device(device_id, timeout=DEVICE_SEARCH_TIMEOUT):
+    """dai.DeviceInfo of the device with this MX ID, waiting up to timeout seconds for it to become available."""
+    deadline = time.monotonic() + timeout
+    while True:
+        found, device_info = dai.Device.getDeviceByMxId(device_id)
+        if found:
+            return device_info
+        if time.monotonic() >= deadline:
+            raise RuntimeError(f"Device {device_id} not available")
+        time.sleep(DEVICE_SEARCH_POLL_INTERVAL)
+
+def reconnect_camera(camera, loop, policy, control_commands):
+    """
+    Reopens the device in this process (same pipeline, no re-import) with exponential backoff.
+    The backoff waits on the event loop, so a stop signal or command still ends it immediately.
+    Returns True once the camera streams again, False if it gave up or was asked to stop.
+    """
+    for attempt, delay in policy.delays():
+        reason, commands = loop.wait(delay)
+        for command in commands:
+            if isinstance(command, tuple) and command[0] == COMMAND_RESTART_PIPELINE:
+                command[1].set_exception(ControlError("Device is reconnecting"))
+        if reason == WAKE_SIGNAL or "stop" in commands:
+            print("uvc_handler.py: Reconnect cancelled by stop request.")
+            return False
+
+        start = time.monotonic()
+        try:
+            camera.stop() # Release the dead handle (no-op if it is already closed)
+            camera.start()
+            control_commands.reapply_controls()
+            record = ReconnectAttempt(attempt, delay, (time.monotonic() - start) * 1000, ok=True)
+        except RuntimeError as e:
+            record = ReconnectAttempt(attempt, delay, (time.monotonic() - start) * 1000, ok=False, error=str(e))
+        control_commands.reconnects.append(record)
+        print(f"{RECONNECT_MARKER} {record.describe()}", flush=True)
+        if record.ok:
+            return True
+    print(f"uvc_handler.py: Giving up after {policy.max_attempts} reconnect attempts.")
+    return False
+
+def run_uvc_device(pipeline=None, ready_conn=None, profile=MINIMAL_PROFILE, link=None, command_stream=None,
+                   control_socket_path=None, reconnect_policy=None, start_trace=None, device_id=None):
     # Standard UVC load with depthai (オプションなしの場合)
-    device_config_main = dai.Device.Config()
-    device_config_main = dai.Device.Config()
-    device_config_main.board.uvc = dai.BoardConfig.UVC(1920, 1080)
-    device_config_main.board.uvc.frameType = dai.ImgFrame.Type.NV12
-
-    camera = UVCCamera(pipeline_func=getMinimalPipeline, device_config=device_config_main)
+    # pipeline: a pre-built pipeline (warm standby / forkserver paths). Taken from the factory if None.
+    # ready_conn: optional multiprocessing Connection notified once the device is streaming.
+    # link: "usb2"/"usb3" to check the profile's bandwidth estimate before starting.
+    # command_stream: optional _LineReader to read commands ("stop") from while streaming.
+    # control_socket_path: serve the runtime control socket (status/set_controls/restart_pipeline) at this path.
+    # reconnect_policy: ReconnectPolicy for reopening a dropped device in this process (default: ReconnectPolicy()).
+    # start_trace: start_metrics.StartTrace begun by the manager (default: from OAKD_START_TRACE, or a new one).
+    #              The finished trace is appended to the start history.
+    # device_id: MX ID of the device to run on (several OAK devices on one host); any available device if None.
+    if start_trace is None:
+        start_trace = start_metrics.StartTrace.from_environment() or start_metrics.StartTrace()
+        start_trace.mark("process_start", PROCESS_START_TIME)
+    else:
+        start_trace.mark("process_start")
+    start_trace.info.setdefault("profile", camera_profiles.profile_name_of(profile))
+    if device_id:
+        start_trace.info.setdefault("device_id", device_id)
+    if dai is None:
+        _load_depthai()
+        start_trace.mark("depthai_imported")
+    if reconnect_policy is None:
+        reconnect_policy = ReconnectPolicy()
+    if link is not None:
+        report_bandwidth(profile, link)
+    device_config_main = getUVCDeviceConfig(profile)
 
+    if pipeline is None:
+        pipeline_func = lambda: pipeline_factory.default_factory.get_pipeline(profile)
+    else:
+        pipeline_func = lambda: pipeline
+    camera = UVCCamera(pipeline_func=pipeline_func, device_config=device_config_main, device_id=device_id)
+    loop = CameraEventLoop()
+    shutdown = None
+    control_server = None
+    control_commands = CameraControlCommands(camera, loop, profile)
+
+    camera.start_trace = start_trace
     try:
-        camera.start()
-        print("uvc_handler.py: Device started, please keep this process running") # Basic log
+        try:
+            camera.start()
+        except Exception as e:
+            start_metrics.append_record(start_trace.record(ok=False, error=str(e)))
+            raise
+        # Signals become wake-ups only now, so a Ctrl+C while the device boots still aborts the start.
+        loop.install_signal_handlers()
+        if command_stream is not None:
+            # Commands that arrived together with "attach" are already in the reader's buffer
+            _queue_stream_commands(command_stream, loop)
+            loop.add_reader(command_stream, lambda stream: _read_stream_commands(stream, loop))
+        if control_socket_path:
+            try:
+                control_server = ControlServer(control_socket_path, control_commands.handlers())
+                control_server.start()
+                print(f"uvc_handler.py: Control socket listening on {control_socket_path}")
+            except OSError as e:
+                control_server = None
+                print(f"uvc_handler.py: Control socket unavailable ({control_socket_path}): {e}")
+        print(f"{READY_MARKER}, please keep this process running", flush=True) # Basic log
+        if ready_conn is not None:
+            ready_conn.send("ready")
         print("uvc_handler.py: and open an UVC viewer to check the camera stream.")
         print("uvc_handler.py: To close: Ctrl+C")
+        camera.start_trace = None # Reconnects are reported separately
+        # The first frame is awaited off the main loop so a stop request is never held up by it
+        threading.Thread(target=_finish_start_trace, args=(camera, start_trace), name="start-metrics", daemon=True).start()
 
         while True:
-            time.sleep(0.1) # Simple loop, no diagnostic calls
+            # Sleeps until a signal or command arrives; the timeout only bounds how late a closed device is noticed.
+            reason, commands = loop.wait(DEVICE_CHECK_INTERVAL)
+            if reason == WAKE_SIGNAL:
+                shutdown = PhaseTimer("uvc_handler.py: Shutdown")
+                shutdown.mark("signal->wakeup", since=loop.signal_time)
+                print(f"uvc_handler.py: Interrupted by signal ({signal.Signals(loop.received_signal).name}).")
+                break
+            if "stop" in commands:
+                shutdown = PhaseTimer("uvc_handler.py: Shutdown")
+                print("uvc_handler.py: Stop command received.")
+                break
+            device_lost = False
+            for command in commands:
+                if isinstance(command, tuple) and command[0] == COMMAND_RESTART_PIPELINE:
+                    reply = command[1]
+                    try:
+                        reply.set_result(control_commands.do_restart())
+                    except Exception as e:
+                        print(f"uvc_handler.py: Pipeline restart failed: {e}")
+                        reply.set_exception(ControlError(f"Pipeline restart failed: {e}"))
+                        device_lost = True
+                else:
+                    print(f"uvc_handler.py: Unknown command: {command!r}")
+            try:
+                if camera.device is None or camera.device.isClosed():
+                    print("uvc_handler.py: Device closed (disconnected?).")
+                    device_lost = True
+            except RuntimeError as e:
+                print(f"uvc_handler.py: DepthAI runtime error: {e}")
+                device_lost = True
+            if device_lost:
+                # Transient USB glitches recover here instead of through a new process from the manager
+                if not reconnect_camera(camera, loop, reconnect_policy, control_commands):
+                    shutdown = PhaseTimer("uvc_handler.py: Shutdown")
+                    break
 
     except KeyboardInterrupt:
         print("uvc_handler.py: Interrupted by user (SIGINT).")
@@ -162,28 +566,101 @@ def run_uvc_device():
     except Exception as e:
         print(f"uvc_handler.py: An unexpected error: {e}") # Basic error log
     finally:
+        if shutdown is None:
+            shutdown = PhaseTimer("uvc_handler.py: Shutdown")
+        if control_server is not None:
+            with shutdown.phase("control socket"):
+                control_server.stop()
+        print(f"uvc_handler.py: Pipeline cache: {pipeline_factory.default_factory.stats()}")
         print("uvc_handler.py: Reached finally block.")
         print("uvc_handler.py: Attempting to stop camera...")
         try:
-            if camera: # Simplified check
-                camera.stop() # Call the simplified stop
-                print("uvc_handler.py: camera.stop() called.")
-            else:
-                print("uvc_handler.py: Camera object is None.")
+            with shutdown.phase("camera.stop"):
+                if camera: # Simplified check
+                    camera.stop() # Call the simplified stop
+                    print("uvc_handler.py: camera.stop() called.")
+                else:
+                    print("uvc_handler.py: Camera object is None.")
         except Exception as e_stop:
             print(f"uvc_handler.py: Error during camera.stop() in finally: {e_stop}")
-        
+        with shutdown.phase("loop.close"):
+            loop.close()
+        print(shutdown.summary(), flush=True)
+
         print("uvc_handler.py: Script finished.")
         # No explicit sys.exit() here, let Python handle exit code based on unhandled exceptions or normal termination.
 
+def run_standby_worker(profile=MINIMAL_PROFILE, link=None, control_socket_path=None, reconnect_policy=None,
+                       device_id=None):
+    # Warm standby: pay interpreter startup, `import depthai` and pipeline construction
+    # up front, then wait for the manager to tell us to attach to the device.
+    # Protocol (one command per line on stdin): "attach [start trace JSON]" -> run the camera, "exit" -> quit.
+    # EOF on stdin means the manager went away, so we exit as well.
+    _load_depthai()
+    pipeline = pipeline_factory.default_factory.get_pipeline(profile)
+    print(STANDBY_READY_MARKER, flush=True)
+
+    commands = _LineReader(sys.stdin.fileno())
+    while True:
+        line = commands.readline()
+        if line is None:
+            break
+        command, _, payload = line.partition(" ")
+        if command == "attach":
+            start_trace = start_metrics.StartTrace.deserialize(payload) if payload else start_metrics.StartTrace()
+            print("uvc_handler.py: Standby worker attaching to device.", flush=True)
+            # Keep listening on stdin while streaming: "stop" (or EOF) shuts the camera down without a signal
+            run_uvc_device(pipeline=pipeline, profile=profile, link=link, command_stream=commands,
+                           control_socket_path=control_socket_path, reconnect_policy=reconnect_policy,
+                           start_trace=start_trace, device_id=device_id)
+            return
+        if command == "exit":
+            break
+        if command:
+            print(f"uvc_handler.py: Unknown standby command: {command!r}", flush=True)
+    print("uvc_handler.py: Standby worker exiting without attaching.")
+
 def main():
     parser = argparse.ArgumentParser()
     parser.add_argument('-fb', '--flash-bootloader', default=False, action="store_true")
     parser.add_argument('-f',  '--flash-app',        default=False, action="store_true")
     parser.add_argument('-l',  '--load-and-exit',    default=False, action="store_true")
     parser.add_argument('--start-uvc', default=False, action="store_true", help="Start UVC camera mode (for menu bar app)")
+    parser.add_argument('--standby', default=False, action="store_true", help="Pre-load depthai and wait on stdin for an 'attach' command (for menu bar app)")
+    parser.add_argument('--profile', default=None, choices=camera_profiles.list_profiles(),
+                        help=f"Camera profile to use (default: {camera_profiles.DEFAULT_PROFILE_NAME})")
+    parser.add_argument('--link', default=None, choices=sorted(camera_profiles.LINK_CAPACITY),
+                        help="USB link type to check the profile's bandwidth against before starting")
+    parser.add_argument('--encoding', default=None, choices=pipeline_factory.ENCODINGS,
+                        help="Override the profile's UVC output encoding (mjpeg: encode on the device to save USB bandwidth)")
+    parser.add_argument('--mjpeg-quality', default=None, type=int, help="MJPEG quality 1-100 (with --encoding mjpeg)")
+    parser.add_argument('--bitrate-kbps', default=None, type=int, help="Encoder bitrate target in kbps (with --encoding mjpeg, 0: quality-driven)")
+    parser.add_argument('--control-socket', default=None, metavar="PATH",
+                        help=f"Unix socket for runtime control (default: {DEFAULT_CONTROL_SOCKET})")
+    parser.add_argument('--no-control-socket', default=False, action="store_true", help="Do not open the control socket")
+    parser.add_argument('--max-reconnects', default=None, type=int,
+                        help=f"Reopen a dropped device in-process up to N times with backoff (default: {ReconnectPolicy.max_attempts}, 0: exit instead)")
+    parser.add_argument('--device', default=None, metavar="MXID",
+                        help="MX ID (USB serial number) of the device to use when several are connected (default: any)")
+    parser.add_argument('--list-profiles', default=False, action="store_true", help="List camera profiles with their bandwidth estimates and exit")
     args = parser.parse_args()
 
+    if args.list_profiles:
+        for name in camera_profiles.list_profiles():
+            for link in sorted(camera_profiles.LINK_CAPACITY):
+                print(camera_profiles.estimate_bandwidth(name, link).describe())
+        return
+
+    profile = camera_profiles.get_profile(args.profile or camera_profiles.DEFAULT_PROFILE_NAME)
+    control_socket_path = None if args.no_control_socket else (args.control_socket or DEFAULT_CONTROL_SOCKET)
+    reconnect_policy = ReconnectPolicy() if args.max_reconnects is None else ReconnectPolicy(max_attempts=args.max_reconnects)
+    encoding_overridden = args.encoding is not None or args.mjpeg_quality is not None or args.bitrate_kbps is not None
+    if encoding_overridden:
+        try:
+            profile = camera_profiles.with_encoding(profile, args.encoding, args.mjpeg_quality, args.bitrate_kbps)
+        except ValueError as e:
+            parser.error(str(e))
+
     if args.flash_bootloader and args.flash_app:
         print("Error: Cannot flash bootloader and application simultaneously.")
         print("Please run with either -fb or -f.")
@@ -192,11 +669,15 @@ def main():
     if args.flash_bootloader:
         handle_flash_bootloader()
     elif args.flash_app:
-        handle_flash_app()
+        handle_flash_app(profile)
     elif args.load_and_exit:
-        handle_load_and_exit()
+        handle_load_and_exit(profile if args.profile or encoding_overridden else None)
     elif args.start_uvc:
-        run_uvc_device()
+        run_uvc_device(profile=profile, link=args.link, control_socket_path=control_socket_path,
+                       reconnect_policy=reconnect_policy, device_id=args.device)
+    elif args.standby:
+        run_standby_worker(profile=profile, link=args.link, control_socket_path=control_socket_path,
+                           reconnect_policy=reconnect_policy, device_id=args.device)
     else:
         # デフォルトの動作（引数なし、または他のフラグが指定されていない場合）
         # ここでは、引数なしの場合も run_uvc_device() を呼ぶか、
@@ -204,7 +685,12 @@ def main():
         # 既存の挙動を維持するため、run_uvc_device() を呼ぶ。
         # ただし、メニューバーアプリからは必ず --start-uvc をつける想定。
         if not any(vars(args).values()): # いずれのフラグもFalseの場合
-            run_uvc_device()
+            run_uvc_device(control_socket_path=control_socket_path)
+        elif args.profile or args.link or encoding_overridden or args.control_socket or args.no_control_socket \
+                or args.max_reconnects is not None or args.device:
+            # プロファイル系・制御ソケット系などのオプションだけが指定された場合も通常のUVCモード
+            run_uvc_device(profile=profile, link=args.link, control_socket_path=control_socket_path,
+                           reconnect_policy=reconnect_policy, device_id=args.device)
         # 他のフラグが指定されている場合は、その処理のみ実行される
 
 if __name__ == "__main__":
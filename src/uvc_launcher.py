@@ -0,0 +1,154 @@
+import multiprocessing
+import os
+import subprocess
+
+# Interpreter used to run uvc_handler.py (same as the original cold-spawn path)
+PYTHON_EXECUTABLE = 'python3'
+UVC_HANDLER_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'uvc_handler.py')
+
+# Camera start modes understood by DeviceConnectionManager
+START_MODE_COLD = "cold"              # spawn a fresh `uvc_handler.py --start-uvc` per start
+START_MODE_STANDBY = "standby"        # keep a pre-spawned `uvc_handler.py --standby` worker ready
+START_MODE_FORKSERVER = "forkserver"  # fork camera processes from a server that pre-imported depthai
+START_MODES = (START_MODE_COLD, START_MODE_STANDBY, START_MODE_FORKSERVER)
+
+
+def spawn_cold(extra_args=(), **popen_kwargs):
+    """Spawns a fresh uvc_handler.py process in UVC mode (interpreter + depthai import on every start)."""
+    return subprocess.Popen([PYTHON_EXECUTABLE, UVC_HANDLER_PATH, '--start-uvc', *extra_args], **popen_kwargs)
+
+
+class StandbyWorker:
+    """
+    A pre-spawned `uvc_handler.py --standby` process.
+    The worker has already started the interpreter, imported depthai and built the pipeline,
+    so attaching it to the device only costs the device boot and pipeline upload.
+    """
+    def __init__(self, extra_args=(), **popen_kwargs):
+        self.extra_args = tuple(extra_args)
+        self.popen_kwargs = popen_kwargs
+        self.process = None
+
+    def spawn(self):
+        if self.is_alive():
+            return self.process
+        self.process = subprocess.Popen(
+            [PYTHON_EXECUTABLE, UVC_HANDLER_PATH, '--standby', *self.extra_args],
+            stdin=subprocess.PIPE,
+            text=True,
+            **self.popen_kwargs
+        )
+        return self.process
+
+    def is_alive(self):
+        return self.process is not None and self.process.poll() is None
+
+    def attach(self, start_trace=None):
+        """
+        Tells the worker to start the camera and hands over its process handle (Popen).
+        start_trace: optional serialized start_metrics.StartTrace to continue in the worker.
+        """
+        if not self.is_alive():
+            raise RuntimeError("Standby worker is not running.")
+        process = self.process
+        self.process = None # The worker now belongs to the caller as a regular camera process
+        process.stdin.write(f"attach {start_trace}\n" if start_trace else "attach\n")
+        process.stdin.flush()
+        return process
+
+    def close(self, timeout=2):
+        if self.process is None:
+            return
+        process = self.process
+        self.process = None
+        try:
+            if process.poll() is None:
+                process.stdin.write("exit\n")
+                process.stdin.flush()
+                process.stdin.close()
+                process.wait(timeout=timeout)
+        except (OSError, subprocess.TimeoutExpired):
+            process.kill()
+            process.wait()
+
+
+def _forkserver_camera_entry(ready_conn=None, profile_name=None, control_socket_path=None, start_trace=None,
+                             device_id=None):
+    # Runs in a child forked from the forkserver. depthai and src.uvc_handler were
+    # preloaded by the server, so these imports are dict lookups.
+    from src import uvc_handler
+    from src import camera_profiles
+    from src import start_metrics
+    profile = camera_profiles.get_profile(profile_name or camera_profiles.DEFAULT_PROFILE_NAME)
+    trace = start_metrics.StartTrace.deserialize(start_trace) if start_trace else start_metrics.StartTrace()
+    uvc_handler.run_uvc_device(ready_conn=ready_conn, profile=profile, control_socket_path=control_socket_path,
+                               start_trace=trace, device_id=device_id)
+
+
+class ForkedCameraProcess:
+    """Popen-like handle (poll/send_signal/wait/terminate) for a camera process forked by the forkserver."""
+    def __init__(self, process):
+        self._process = process
+        self.pid = process.pid
+
+    @property
+    def returncode(self):
+        return self._process.exitcode
+
+    @property
+    def sentinel(self):
+        # Becomes readable when the process ends (child_watcher selects on it)
+        return self._process.sentinel
+
+    def poll(self):
+        return self._process.exitcode
+
+    def send_signal(self, sig):
+        # As Popen.send_signal: never signal a reaped child, whose pid may already belong to another process
+        if self._process.exitcode is not None:
+            return
+        try:
+            os.kill(self.pid, sig)
+        except ProcessLookupError:
+            pass # Exited after the check above
+
+    def terminate(self):
+        self._process.terminate()
+
+    def kill(self):
+        self._process.kill()
+
+    def wait(self, timeout=None):
+        self._process.join(timeout)
+        if self._process.exitcode is None:
+            raise subprocess.TimeoutExpired(f"forkserver-child:{self.pid}", timeout)
+        return self._process.exitcode
+
+
+class ForkserverLauncher:
+    """
+    Starts camera processes from a multiprocessing forkserver that preloads depthai and src.uvc_handler,
+    so every start reuses the already-imported depthai instead of paying for it again.
+    """
+    def __init__(self, preload=("depthai", "src.uvc_handler")):
+        self._context = multiprocessing.get_context("forkserver")
+        self._context.set_forkserver_preload(list(preload))
+
+    def warm_up(self):
+        # Starts the server process (and its preload) now rather than on the first camera start.
+        from multiprocessing import forkserver
+        forkserver.ensure_running()
+
+    def start_camera(self, ready_conn=None, profile_name=None, control_socket_path=None, start_trace=None,
+                     device_id=None):
+        # start_trace: optional serialized start_metrics.StartTrace to continue in the forked process
+        # device_id: MX ID of the device the forked camera should open (any available device if None)
+        process = self._context.Process(
+            target=_forkserver_camera_entry,
+            kwargs={"ready_conn": ready_conn, "profile_name": profile_name,
+                    "control_socket_path": control_socket_path, "start_trace": start_trace,
+                    "device_id": device_id},
+            name="uvc_handler-forked",
+        )
+        process.start()
+        return ForkedCameraProcess(process)
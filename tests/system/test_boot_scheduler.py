@@ -0,0 +1,135 @@
+import threading
+import time
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from src.boot_scheduler import BootScheduler, format_batch
+
+
+class TestBootScheduler:
+    """同時起動数を制限したブートスケジューラのテスト"""
+
+    def test_concurrency_cap(self):
+        """同時に実行されるブートが max_concurrent を超えず、全デバイスの記録が集計されること"""
+        running, peak = [0], [0]
+        lock = threading.Lock()
+        batches = []
+        done = threading.Event()
+
+        def boot():
+            with lock:
+                running[0] += 1
+                peak[0] = max(peak[0], running[0])
+            time.sleep(0.05)
+            with lock:
+                running[0] -= 1
+            return True
+
+        scheduler = BootScheduler(max_concurrent=2, on_batch_done=lambda s: (batches.append(s), done.set()))
+        futures = [scheduler.submit(f"dev{i}", boot) for i in range(5)]
+        records = [f.result(timeout=5) for f in futures]
+        assert done.wait(5)
+        scheduler.shutdown()
+
+        assert peak[0] == 2
+        assert all(r.ok for r in records)
+        assert max(r.queued_ms for r in records) >= 50 # 空きスロットを待ったデバイスがある
+        assert len(batches) == 1 and batches[0]["devices"] == 5 and batches[0]["ok"] == 5
+        assert "Booted 5/5 device(s)" in format_batch(batches[0])
+
+    def test_failed_boot_is_recorded(self):
+        def fail():
+            raise RuntimeError("Device 1844301011 not available")
+
+        scheduler = BootScheduler(max_concurrent=1)
+        ok = scheduler.submit("a", lambda: True).result(timeout=5)
+        failed = scheduler.submit("b", fail).result(timeout=5)
+        timed_out = scheduler.submit("c", lambda: False).result(timeout=5)
+        scheduler.shutdown()
+        assert ok.ok and not failed.ok and not timed_out.ok
+        assert failed.error == "Device 1844301011 not available"
+        assert timed_out.error == "device did not come up"
+
+    def test_invalid_cap(self):
+        with pytest.raises(ValueError):
+            BootScheduler(max_concurrent=0)
+
+
+class TestMultiDeviceManager:
+    """複数デバイスモードの DeviceConnectionManager のテスト"""
+
+    @pytest.fixture
+    def manager(self, tmp_path):
+        from src.device_connection_manager import DeviceConnectionManager
+        backends = {}
+        release = threading.Event()
+
+        def backend_factory(device_id):
+            backend = MagicMock(name=f"backend-{device_id}")
+            backend.last_stop_timing = None
+            backend.stop.return_value = True
+            backend.wait_until_booted.side_effect = lambda: release.wait(5)
+            backends[device_id] = backend
+            return backend
+
+        with patch('src.device_connection_manager.iokit_wrapper') as mock_iokit, \
+             patch('src.start_metrics.DEFAULT_HISTORY_PATH', str(tmp_path / "start_history.jsonl")):
+            mock_iokit.init_usb_monitoring.return_value = 12345
+            manager = DeviceConnectionManager(MagicMock(), MagicMock(), MagicMock(), MagicMock(),
+                                              camera_backend=MagicMock(name="unused"), multi_device=True,
+                                              max_concurrent_boots=2, camera_backend_factory=backend_factory)
+            manager.backends, manager.release_boots = backends, release
+            yield manager
+            release.set()
+            manager.cleanup_on_quit()
+
+    def test_devices_boot_with_capped_concurrency(self, manager):
+        """各デバイスが自身のシリアル番号に紐づいたバックエンドで起動され、同時起動数が制限されること"""
+        serials = ["1844301011", "1844301022", "1844301033"]
+        for i, serial in enumerate(serials):
+            manager._event_handler.on_device_connected(0x03e7, 0x2485, serial, 100 + i, 0x14100000 + i)
+
+        assert set(manager.backends) == set(serials)
+        deadline = time.monotonic() + 5
+        while sum(b.start.called for b in manager.backends.values()) < 2 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        time.sleep(0.05)
+        assert sum(b.start.called for b in manager.backends.values()) == 2 # 3台目は空きスロット待ち
+        assert manager.get_camera_running_status() is True
+
+        manager.release_boots.set()
+        futures = [s.boot_future for s in manager.sessions.values() if s.boot_future is not None]
+        for future in futures:
+            future.result(timeout=5)
+        deadline = time.monotonic() + 5
+        while manager.boot_scheduler.busy() and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert all(b.start.call_count == 1 for b in manager.backends.values())
+        assert manager.boot_scheduler.last_batch["devices"] == 3
+        started = [c for c in manager.notify_ui_callback.call_args_list if c.args[1] == "Cameras Started"]
+        assert len(started) == 1 and started[0].args[2].startswith("3/3 devices")
+
+        # 起動済みPIDで再列挙された後、1台だけ切断すると、そのデバイスのカメラだけが停止する
+        manager._event_handler.on_device_disconnected(0x03e7, 0x2485, serials[0], 100, 0x14100000)
+        manager._event_handler.on_device_connected(0x03e7, 0xf63b, serials[0], 200, 0x14100000)
+        manager.backends[serials[0]].stop.assert_not_called()
+        manager._event_handler.on_device_disconnected(0x03e7, 0xf63b, serials[0], 200, 0x14100000)
+        manager.backends[serials[0]].stop.assert_called_once()
+        manager.backends[serials[0]].close.assert_called_once()
+        manager.backends[serials[1]].stop.assert_not_called()
+        assert len(manager.sessions) == 2
+        assert manager.get_camera_running_status() is True
+
+    def test_queued_boot_is_cancelled_on_disconnect(self, manager):
+        """起動待ちのデバイスが切断された場合、ブートは実行されないこと"""
+        for i in range(3):
+            manager._event_handler.on_device_connected(0x03e7, 0x2485, f"18443010{i}", 100 + i, 0x14100000 + i)
+        manager._event_handler.on_device_disconnected(0x03e7, 0x2485, "184430102", 102, 0x14100002)
+        manager.release_boots.set()
+        deadline = time.monotonic() + 5
+        while manager.boot_scheduler.busy() and time.monotonic() < deadline:
+            time.sleep(0.01)
+        manager.backends["184430102"].start.assert_not_called()
+        manager.backends["184430102"].close.assert_called_once()
+        assert manager.backends["184430100"].start.call_count == 1
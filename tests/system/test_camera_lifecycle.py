@@ -10,12 +10,15 @@ import logging
 try:
     # CameraManager の代わりに DeviceConnectionManager をテスト対象とする
     from src.device_connection_manager import DeviceConnectionManager, OAK_D_LITE_VENDOR_ID, OAK_D_LITE_PRODUCT_ID
+    from src.camera_backends import SubprocessCameraBackend, InProcessCameraBackend
 except ImportError as e:
     logging.error(f"必要なモジュールのインポートに失敗しました: {e}")
     logging.error("プロジェクトルートが sys.path に正しく追加されているか、またはモジュールパスが正しいか確認してください。")
     DeviceConnectionManager = MagicMock(name="FallbackDeviceConnectionManager")
     OAK_D_LITE_VENDOR_ID = 0x03e7 # フォールバック値
     OAK_D_LITE_PRODUCT_ID = 0x2485 # フォールバック値
+    SubprocessCameraBackend = MagicMock(name="FallbackSubprocessCameraBackend")
+    InProcessCameraBackend = MagicMock(name="FallbackInProcessCameraBackend")
 
 
 # このテストファイル全体に 'camera_lifecycle' マーカーを適用
@@ -23,9 +26,36 @@ pytestmark = pytest.mark.camera_lifecycle
 
 class TestCameraLifecycle:
     """カメラの接続・切断ライフサイクルのシステムテスト"""
-    
+
+    @pytest.fixture(autouse=True)
+    def start_history(self, tmp_path):
+        """起動計測の履歴 (JSONL) をユーザーのホームではなく一時ディレクトリに書き込む"""
+        history_path = str(tmp_path / "start_history.jsonl")
+        with patch('src.start_metrics.DEFAULT_HISTORY_PATH', history_path):
+            yield history_path
+
+    @pytest.fixture(params=["subprocess", "inprocess"])
+    def camera_backend(self, request):
+        """カメラバックエンドのフィクスチャ。同じライフサイクルテストを両方のバックエンドで実行する。
+        サブプロセス起動と depthai デバイスはモックに差し替える。
+        """
+        if request.param == "subprocess":
+            mock_process = MagicMock(name="uvc_process")
+            mock_process.wait.return_value = 0
+            with patch('src.uvc_launcher.subprocess.Popen', return_value=mock_process) as mock_popen:
+                backend = SubprocessCameraBackend()
+                backend.mock_popen = mock_popen
+                yield backend
+        else:
+            mock_camera = MagicMock(name="UVCCamera")
+            mock_camera.wait_for_first_frame.return_value = None # 実機が無いので最初のフレームは届かない
+            backend = InProcessCameraBackend(camera_factory=lambda: mock_camera)
+            backend.mock_camera = mock_camera
+            yield backend
+            backend.close()
+
     @pytest.fixture
-    def dcm(self, mock_iokit_wrapper): # mock_iokit_wrapperをフィクスチャとして受け取る
+    def dcm(self, mock_iokit_wrapper, camera_backend): # mock_iokit_wrapperをフィクスチャとして受け取る
         """DeviceConnectionManagerのフィクスチャ"""
         mock_notify_ui = MagicMock()
         mock_alert_ui = MagicMock()
@@ -39,7 +69,8 @@ class TestCameraLifecycle:
                 notify_ui_callback=mock_notify_ui,
                 alert_ui_callback=mock_alert_ui,
                 update_menu_callback=mock_update_menu,
-                update_status_label_callback=mock_update_status_label
+                update_status_label_callback=mock_update_status_label,
+                camera_backend=camera_backend
             )
             # init_usb_monitoring が呼ばれたことを確認
             mock_iokit_wrapper.init_usb_monitoring.assert_called_once()
@@ -261,6 +292,109 @@ class TestCameraLifecycle:
         time.sleep(0.1) # 短い待機で状態が落ち着くのを待つ
         assert dcm.connected_target_device_info is None, "高速サイクル後、デバイス情報がクリアされていません。"
     
+    def test_dcm_hotplug_storm_is_coalesced(self, dcm):
+        """待機時間を設定すると、接続/切断のストームでカメラの起動と通知が1回にまとめられること"""
+        dcm.start_camera_action = MagicMock(side_effect=lambda: setattr(dcm, 'camera_running', True))
+        dcm.stop_camera_action = MagicMock(side_effect=lambda: setattr(dcm, 'camera_running', False))
+        handler = dcm._event_handler
+        handler.coalescer.settle_window = 10 # flush() で待機時間の経過を模擬する
+
+        for service_id in range(3000, 3005):
+            handler.on_device_connected(OAK_D_LITE_VENDOR_ID, OAK_D_LITE_PRODUCT_ID, 'test_sn_storm', service_id)
+            handler.on_device_disconnected(OAK_D_LITE_VENDOR_ID, OAK_D_LITE_PRODUCT_ID, 'test_sn_storm', service_id)
+        handler.on_device_connected(OAK_D_LITE_VENDOR_ID, OAK_D_LITE_PRODUCT_ID, 'test_sn_storm', 3005)
+        dcm.start_camera_action.assert_not_called()
+
+        handler.coalescer.flush()
+        dcm.start_camera_action.assert_called_once()
+        dcm.stop_camera_action.assert_not_called()
+        assert dcm.connected_target_device_info['service_id'] == 3005
+        connected_notices = [c for c in dcm.notify_ui_callback.call_args_list if c.args[1] == "Device Connected"]
+        assert len(connected_notices) == 1
+
+        # 再列挙 (切断→接続) ではカメラを止めず、新しい Service ID だけを記録する
+        handler.on_device_disconnected(OAK_D_LITE_VENDOR_ID, OAK_D_LITE_PRODUCT_ID, 'test_sn_storm', 3005)
+        handler.on_device_connected(OAK_D_LITE_VENDOR_ID, OAK_D_LITE_PRODUCT_ID, 'test_sn_storm', 3006)
+        handler.coalescer.flush()
+        dcm.stop_camera_action.assert_not_called()
+        assert dcm.connected_target_device_info['service_id'] == 3006
+
+        handler.on_device_disconnected(OAK_D_LITE_VENDOR_ID, OAK_D_LITE_PRODUCT_ID, 'test_sn_storm', 3006)
+        handler.coalescer.flush()
+        dcm.stop_camera_action.assert_called_once()
+        assert dcm.connected_target_device_info is None
+
+    def test_dcm_follows_device_through_boot(self, dcm, camera_backend):
+        """depthai による起動で PID が変わっても、同じデバイスとして追跡しカメラを止めたり二重起動したりしないこと"""
+        handler = dcm._event_handler
+        location_id = 0x14100000
+        handler.on_device_connected(OAK_D_LITE_VENDOR_ID, 0x2485, 'N/A', 1, location_id)
+        assert dcm.get_camera_running_status() is True
+        assert dcm.device_states.state_of(dcm._connected_device_key()) == "booting"
+
+        # 起動時の再列挙: 未起動PIDが消え、起動済みPID (0xf63b) で現れる
+        handler.on_device_disconnected(OAK_D_LITE_VENDOR_ID, 0x2485, 'N/A', 1, location_id)
+        assert dcm.get_camera_running_status() is True
+        dcm.start_camera_action() # 起動中の二重起動は行わない
+        handler.on_device_connected(OAK_D_LITE_VENDOR_ID, 0xf63b, '1844301011', 2, location_id)
+        assert dcm.get_camera_running_status() is True
+        assert dcm.connected_target_device_info['product_id'] == 0xf63b
+        assert dcm.device_states.state_of(dcm._connected_device_key()) == "streaming"
+        if camera_backend.name == "subprocess":
+            assert camera_backend.mock_popen.call_count == 1
+        else:
+            assert camera_backend.mock_camera.start.call_count == 1
+        connected_notices = [c for c in dcm.notify_ui_callback.call_args_list if c.args[1] == "Device Connected"]
+        assert len(connected_notices) == 1
+
+        handler.on_device_disconnected(OAK_D_LITE_VENDOR_ID, 0xf63b, '1844301011', 2, location_id)
+        assert dcm.get_camera_running_status() is False
+        assert dcm.connected_target_device_info is None
+
+    def test_dcm_backend_start_stop(self, dcm, camera_backend):
+        """カメラバックエンド経由の実際の start/stop テスト (start/stop_camera_action はモックしない)"""
+        # When: カメラを起動
+        dcm.start_camera_action()
+
+        # Then: バックエンドがカメラを保持し、camera_running が True になる
+        assert dcm.get_camera_running_status() is True
+        assert camera_backend.is_active() is True
+        if camera_backend.name == "subprocess":
+            camera_backend.mock_popen.assert_called_once()
+            assert '--start-uvc' in camera_backend.mock_popen.call_args[0][0]
+            assert dcm.uvc_process is not None
+        else:
+            camera_backend.mock_camera.start.assert_called_once()
+            assert dcm.uvc_process is None
+
+        # When: カメラを停止
+        dcm.stop_camera_action()
+
+        # Then: バックエンドが解放され、停止通知が出る
+        assert dcm.get_camera_running_status() is False
+        assert camera_backend.is_active() is False
+        if camera_backend.name == "subprocess":
+            import signal
+            mock_process = camera_backend.mock_popen.return_value
+            mock_process.send_signal.assert_called_once_with(signal.SIGINT)
+        else:
+            camera_backend.mock_camera.stop.assert_called_once()
+        dcm.notify_ui_callback.assert_any_call("OAK-D Camera", "Status", "Camera stopped.")
+
+    def test_dcm_backend_start_failure(self, dcm, camera_backend):
+        """カメラ起動に失敗した場合、アラートが出て camera_running が False のままであることのテスト"""
+        if camera_backend.name == "subprocess":
+            camera_backend.mock_popen.side_effect = OSError("Simulated spawn failure")
+        else:
+            camera_backend.mock_camera.start.side_effect = RuntimeError("Simulated device open failure")
+
+        dcm.start_camera_action()
+
+        assert dcm.get_camera_running_status() is False
+        assert camera_backend.is_active() is False
+        dcm.alert_ui_callback.assert_called_once()
+        assert dcm.alert_ui_callback.call_args[0][0] == "Error Starting Camera"
+
     # test_concurrent_device_operations (Phase 2以降で検討)
     # def test_concurrent_device_operations(self, camera_manager):
     #     pytest.skip("Phase 2以降で検討・実装予定")
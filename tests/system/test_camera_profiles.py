@@ -0,0 +1,62 @@
+import pytest
+
+from src import camera_profiles
+from src.camera_profiles import estimate_bandwidth, estimate_shared_link, get_profile
+
+
+class TestCameraProfiles:
+    """カメラプロファイルのレジストリとUSB帯域見積もりのテスト"""
+
+    def test_registered_profiles(self):
+        """既定のプロファイルが登録されており、未知の名前はエラーになること"""
+        assert camera_profiles.DEFAULT_PROFILE_NAME in camera_profiles.list_profiles()
+        assert get_profile("720p60").uvc_width == 1280
+        with pytest.raises(ValueError):
+            get_profile("8k120")
+
+    def test_1080p30_bandwidth(self):
+        """1080p30 NV12 の帯域が 1920x1080x1.5x30 バイト/秒と見積もられること"""
+        estimate = estimate_bandwidth("1080p30", link="usb3")
+        assert estimate.bytes_per_frame == 1920 * 1080 * 3 // 2
+        assert estimate.bytes_per_second == pytest.approx(1920 * 1080 * 1.5 * 30)
+        assert estimate.fits
+
+    def test_uncompressed_1080p_does_not_fit_usb2(self):
+        """非圧縮 1080p30 は USB2 に収まらないと判定されること"""
+        estimate = estimate_bandwidth(get_profile("1080p30"), link="usb2")
+        assert estimate.profile_name == "1080p30"
+        assert estimate.utilization > 1.0
+        assert not estimate.fits
+
+    def test_shared_link(self):
+        """同一リンクを共有する複数カメラの合計帯域が判定されること"""
+        estimates, total, fits = estimate_shared_link(["1080p30", "1080p30"], link="usb3")
+        assert len(estimates) == 2
+        assert total == pytest.approx(2 * estimates[0].bytes_per_second)
+        assert fits
+
+    def test_unknown_link(self):
+        """未知のリンク種別はエラーになること"""
+        with pytest.raises(ValueError):
+            estimate_bandwidth("1080p30", link="thunderbolt")
+
+    def test_mjpeg_reduces_bandwidth(self):
+        """MJPEG 出力では非圧縮より帯域が小さく、USB2 にも収まること"""
+        raw = estimate_bandwidth("1080p30", link="usb2")
+        mjpeg = estimate_bandwidth("1080p30-mjpeg", link="usb2")
+        assert mjpeg.bytes_per_second < raw.bytes_per_second / 5
+        assert mjpeg.fits
+        assert mjpeg.host_cpu_cores > raw.host_cpu_cores # ホスト側でデコードが必要
+
+    def test_with_encoding_overrides(self):
+        """with_encoding で品質とビットレートを上書きでき、ビットレート指定が見積もりに反映されること"""
+        profile = camera_profiles.with_encoding(get_profile("1080p30"), "mjpeg", mjpeg_quality=95)
+        assert profile.encoding == "mjpeg"
+        assert profile.uvc_frame_type() == "BITSTREAM"
+        assert estimate_bandwidth(profile).bytes_per_second > estimate_bandwidth("1080p30-mjpeg").bytes_per_second
+
+        capped = camera_profiles.with_encoding(profile, bitrate_kbps=16000)
+        assert estimate_bandwidth(capped).bytes_per_second == pytest.approx(16000 * 1000 / 8, rel=0.01)
+
+        with pytest.raises(ValueError):
+            camera_profiles.with_encoding(profile, mjpeg_quality=0)
@@ -0,0 +1,117 @@
+import threading
+import time
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from src.camera_supervisor import CameraSupervisor, InlineSupervisor
+
+
+class TestCameraSupervisor:
+    """カメラ操作を直列に実行するスーパーバイザ (アクタースレッド) のテスト"""
+
+    def test_submit_does_not_block_caller(self):
+        """遅いタスクを投入しても呼び出し元はすぐに戻り、Future で結果を受け取れること"""
+        supervisor = CameraSupervisor()
+        release = threading.Event()
+        started = time.monotonic()
+        future = supervisor.submit(lambda: release.wait(5) and "stopped")
+        assert time.monotonic() - started < 0.1
+        assert not future.done()
+        release.set()
+        assert future.result(timeout=5) == "stopped"
+        supervisor.close(timeout=5)
+
+    def test_tasks_run_in_order_on_one_thread(self):
+        """投入順に1つずつ、同じスレッドで実行されること"""
+        supervisor = CameraSupervisor()
+        order, threads = [], set()
+
+        def task(i):
+            threads.add(threading.current_thread().name)
+            order.append(i)
+
+        futures = [supervisor.submit(task, i) for i in range(20)]
+        for f in futures:
+            f.result(timeout=5)
+        supervisor.close(timeout=5)
+        assert order == list(range(20))
+        assert threads == {"camera-supervisor"}
+
+    def test_nested_submit_runs_inline(self):
+        """スーパーバイザ上から投入したタスクはその場で実行され、デッドロックしないこと"""
+        supervisor = CameraSupervisor()
+        order = []
+
+        def outer():
+            inner = supervisor.submit(order.append, "inner")
+            order.append("outer")
+            return inner.result(timeout=1)
+
+        supervisor.submit(outer).result(timeout=5)
+        supervisor.close(timeout=5)
+        assert order == ["inner", "outer"]
+
+    def test_exception_is_set_on_future(self):
+        """タスクの例外は Future に渡され、後続のタスクは実行されること"""
+        supervisor = CameraSupervisor()
+        failed = supervisor.submit(lambda: 1 / 0)
+        ok = supervisor.submit(lambda: "ok")
+        with pytest.raises(ZeroDivisionError):
+            failed.result(timeout=5)
+        assert ok.result(timeout=5) == "ok"
+        supervisor.close(timeout=5)
+
+    def test_close_runs_queued_tasks(self):
+        supervisor = CameraSupervisor()
+        results = []
+        for i in range(3):
+            supervisor.submit(results.append, i)
+        supervisor.close(timeout=5)
+        assert results == [0, 1, 2]
+        with pytest.raises(RuntimeError):
+            supervisor.submit(results.append, 3).result(timeout=1)
+
+    def test_inline_supervisor(self):
+        future = InlineSupervisor().submit(lambda x: x * 2, 21)
+        assert future.done() and future.result() == 42
+
+
+class TestManagerWithSupervisor:
+    """CameraSupervisor を使う DeviceConnectionManager のテスト"""
+
+    def test_usb_event_does_not_wait_for_camera_stop(self, tmp_path):
+        """カメラ停止に時間がかかっても、USB イベントのコールバックはすぐに戻ること"""
+        from src.device_connection_manager import DeviceConnectionManager
+        release = threading.Event()
+        backend = MagicMock(name="backend")
+        backend.name = "inprocess"
+        backend.last_stop_timing = None
+        backend.is_active.return_value = True
+        backend.stop.side_effect = lambda: release.wait(5)
+
+        supervisor = CameraSupervisor()
+        with patch('src.device_connection_manager.iokit_wrapper') as mock_iokit, \
+             patch('src.start_metrics.DEFAULT_HISTORY_PATH', str(tmp_path / "start_history.jsonl")):
+            mock_iokit.init_usb_monitoring.return_value = 12345
+            manager = DeviceConnectionManager(MagicMock(), MagicMock(), MagicMock(), MagicMock(),
+                                              camera_backend=backend, hotplug_settle_window=0,
+                                              supervisor=supervisor)
+            handler = manager._event_handler
+            handler.on_device_connected(0x03e7, 0x2485, "1844301011", 100, 0x14100000)
+            manager.supervisor.submit(lambda: None).result(timeout=5)
+            assert manager.camera_running and backend.start.call_count == 1
+            handler.on_device_connected(0x03e7, 0xf63b, "1844301011", 101, 0x14100000) # ブート完了
+
+            started = time.monotonic()
+            handler.on_device_disconnected(0x03e7, 0xf63b, "1844301011", 101, 0x14100000)
+            toggled = manager.request_toggle_auto_mode()
+            assert time.monotonic() - started < 0.5 # 停止 (最大15秒) を待たない
+            assert not toggled.done()
+
+            release.set()
+            toggled.result(timeout=5)
+            assert not manager.camera_running
+            assert backend.stop.call_count == 1
+            assert manager.auto_mode_enabled is False
+            manager.cleanup_on_quit()
@@ -0,0 +1,187 @@
+import multiprocessing
+import os
+import signal
+import subprocess
+import sys
+import threading
+from unittest.mock import MagicMock, patch
+
+from src import child_watcher
+from src.uvc_launcher import ForkedCameraProcess
+from src.camera_backends import SubprocessCameraBackend
+from src.device_connection_manager import DeviceConnectionManager
+
+EXIT_TIMEOUT = 10.0
+
+
+def _spawn(code):
+    return subprocess.Popen([sys.executable, "-c", code])
+
+
+class _Exits:
+    """コールバックで受け取った ChildExit を集める"""
+    def __init__(self):
+        self.exits = []
+        self.event = threading.Event()
+
+    def __call__(self, exit_info):
+        self.exits.append(exit_info)
+        self.event.set()
+
+
+class TestChildWatcher:
+    """子プロセス終了の検知 (child_watcher.py) のテスト"""
+
+    def test_reports_exit_status_and_runtime(self):
+        """終了コード・原因・実行時間が、ポーリングせずに通知されること"""
+        watcher = child_watcher.ChildWatcher()
+        exits = _Exits()
+        try:
+            process = _spawn("import time, sys; time.sleep(0.2); sys.exit(3)")
+            method = watcher.watch(process, exits, label="uvc_handler")
+            assert method in (child_watcher.METHOD_PIDFD, child_watcher.METHOD_KQUEUE, child_watcher.METHOD_WAIT)
+            assert exits.event.wait(EXIT_TIMEOUT)
+            exit_info = exits.exits[0]
+            assert exit_info.pid == process.pid and exit_info.returncode == 3
+            assert exit_info.cause == "exited with status 3"
+            assert exit_info.runtime > 0.1
+            assert "uvc_handler (pid" in exit_info.describe()
+            assert watcher.watched() == {}
+        finally:
+            watcher.close()
+
+    def test_reports_signal(self):
+        watcher = child_watcher.ChildWatcher()
+        exits = _Exits()
+        try:
+            process = _spawn("import time; time.sleep(30)")
+            watcher.watch(process, exits)
+            process.send_signal(signal.SIGKILL)
+            assert exits.event.wait(EXIT_TIMEOUT)
+            assert exits.exits[0].cause == "killed by SIGKILL"
+            assert exits.exits[0].to_dict()["returncode"] == -signal.SIGKILL
+        finally:
+            watcher.close()
+
+    def test_unwatched_process_is_not_reported(self):
+        """停止を要求して監視を外したプロセスの終了は通知されないこと"""
+        watcher = child_watcher.ChildWatcher()
+        exits = _Exits()
+        try:
+            process = _spawn("import time; time.sleep(30)")
+            watcher.watch(process, exits)
+            assert watcher.unwatch(process)
+            process.kill()
+            process.wait()
+            assert not exits.event.wait(0.3)
+            assert not watcher.unwatch(process)
+        finally:
+            watcher.close()
+
+    def test_already_exited_process_is_reported(self):
+        watcher = child_watcher.ChildWatcher()
+        exits = _Exits()
+        try:
+            process = _spawn("pass")
+            process.wait()
+            assert watcher.watch(process, exits) == child_watcher.METHOD_EXITED
+            assert exits.event.wait(EXIT_TIMEOUT)
+            assert exits.exits[0].cause == "exited normally"
+            assert exits.exits[0].method == child_watcher.METHOD_EXITED
+        finally:
+            watcher.close()
+
+    def test_rewatching_a_pid_replaces_the_watch(self):
+        """同じ pid を再び監視すると前の監視を解除し、pidfd をリークしないこと"""
+        watcher = child_watcher.ChildWatcher()
+        stale, exits = _Exits(), _Exits()
+        try:
+            process = _spawn("import time; time.sleep(30)")
+            watcher.watch(process, stale)
+            fds = len(os.listdir("/proc/self/fd")) if os.path.isdir("/proc/self/fd") else None
+            watcher.watch(process, exits)
+            if fds is not None:
+                assert len(os.listdir("/proc/self/fd")) == fds
+            assert list(watcher.watched()) == [process.pid]
+            process.kill()
+            assert exits.event.wait(EXIT_TIMEOUT)
+            assert stale.exits == []
+        finally:
+            watcher.close()
+
+    def test_describe_returncode(self):
+        assert child_watcher.describe_returncode(None) == "exited (status unknown)"
+        assert child_watcher.describe_returncode(-signal.SIGSEGV) == "killed by SIGSEGV"
+        assert child_watcher.describe_returncode(1) == "exited with status 1"
+
+
+class TestCameraProcessExit:
+    """カメラプロセスが異常終了したときの DeviceConnectionManager の状態更新のテスト"""
+
+    def test_crash_updates_state_and_ui(self, tmp_path):
+        """uvc_handler が落ちると、ただちに camera_running とステータス表示が更新されること"""
+        watcher = child_watcher.ChildWatcher()
+        notified = threading.Event()
+        notify_ui = MagicMock(side_effect=lambda title, subtitle, message:
+                              notified.set() if subtitle == "Camera Stopped" else None)
+        update_status_label = MagicMock()
+        crashing = lambda extra_args=(), env=None: _spawn("import time, sys; time.sleep(0.2); sys.exit(1)")
+        try:
+            with patch('src.device_connection_manager.iokit_wrapper') as mock_iokit, \
+                 patch('src.uvc_launcher.spawn_cold', side_effect=crashing), \
+                 patch('src.start_metrics.DEFAULT_HISTORY_PATH', str(tmp_path / "start_history.jsonl")):
+                mock_iokit.init_usb_monitoring.return_value = 12345
+                backend = SubprocessCameraBackend(exit_watcher=watcher)
+                manager = DeviceConnectionManager(notify_ui, MagicMock(), MagicMock(), update_status_label,
+                                                  camera_backend=backend, hotplug_settle_window=0,
+                                                  device_rescan_interval=0)
+                manager.start_camera_action()
+                assert manager.camera_running
+                assert notified.wait(EXIT_TIMEOUT)
+
+            assert not manager.camera_running and not backend.is_active()
+            update_status_label.assert_called_with("接続なし")
+            assert backend.last_exit.returncode == 1
+            assert [exit_info.cause for exit_info in manager.camera_exits] == ["exited with status 1"]
+            assert "exited with status 1" in notify_ui.call_args[0][2]
+        finally:
+            watcher.close()
+
+    def test_exit_is_handled_where_the_camera_is_started(self):
+        """監視スレッドは on_exit に渡すだけで、状態の更新は handle_exit で行い、古い終了は無視すること"""
+        watcher = child_watcher.ChildWatcher()
+        exits = _Exits()
+        sleeping = lambda extra_args=(), env=None: _spawn("import time; time.sleep(30)")
+        try:
+            with patch('src.uvc_launcher.spawn_cold', side_effect=sleeping):
+                backend = SubprocessCameraBackend(exit_watcher=watcher)
+                backend.on_exit = exits
+                backend.start()
+                first = backend.process
+                first.kill()
+                assert exits.event.wait(EXIT_TIMEOUT)
+                assert backend.process is first # 監視スレッドでは変更しない
+
+                # 終了の処理より先に再起動した場合、古い終了は無視される
+                backend.process = None
+                backend.start()
+                assert not backend.handle_exit(exits.exits[0])
+                assert backend.is_active() and backend.last_exit is None
+                backend.stop()
+        finally:
+            watcher.close()
+
+    def test_signal_to_reaped_forked_camera_is_ignored(self):
+        """終了・回収済みのフォークしたカメラプロセスには、停止時にシグナルを送らないこと"""
+        process = multiprocessing.get_context("fork").Process(target=int)
+        process.start()
+        process.join()
+        camera = ForkedCameraProcess(process)
+        with patch('src.uvc_launcher.os.kill') as kill:
+            camera.send_signal(signal.SIGINT)
+        kill.assert_not_called()
+        assert camera.wait(timeout=1) == 0
+
+        running = MagicMock(exitcode=None, pid=process.pid)
+        with patch('src.uvc_launcher.os.kill', side_effect=ProcessLookupError):
+            ForkedCameraProcess(running).send_signal(signal.SIGINT) # Exited between the check and the kill
@@ -0,0 +1,101 @@
+import json
+import os
+import socket
+import tempfile
+
+import pytest
+
+from src.control_socket import ControlError, ControlServer, ControlSocketInUse, send_request
+
+
+@pytest.fixture
+def socket_path():
+    # macOS の AF_UNIX パス長制限 (104 バイト) に収まるよう短いパスを使う
+    directory = tempfile.mkdtemp(prefix="oakd-", dir="/tmp")
+    path = os.path.join(directory, "ctl.sock")
+    yield path
+    if os.path.exists(path):
+        os.unlink(path)
+    os.rmdir(directory)
+
+
+class TestControlServer:
+    """uvc_handler の制御ソケット (ControlServer) のテスト"""
+
+    def _start(self, path, handlers):
+        server = ControlServer(path, handlers)
+        server.start()
+        return server
+
+    def test_ping_and_custom_command(self, socket_path):
+        """ping と登録したコマンドに応答し、停止後はソケットファイルが削除されること"""
+        server = self._start(socket_path, {"status": lambda request: {"streaming": True}})
+        try:
+            assert send_request(socket_path, "ping") == {"ok": True, "pong": True}
+            assert send_request(socket_path, "status") == {"ok": True, "streaming": True}
+        finally:
+            server.stop()
+        assert not os.path.exists(socket_path)
+
+    def test_errors_are_reported(self, socket_path):
+        """未知のコマンドやハンドラ内のエラーは ok=false で返り、サーバーは動作を続けること"""
+        def fail(request):
+            raise ControlError("camera is not running")
+
+        server = self._start(socket_path, {"set_controls": fail})
+        try:
+            unknown = send_request(socket_path, "reboot")
+            assert unknown["ok"] is False and "Unknown command" in unknown["error"]
+            assert send_request(socket_path, "set_controls") == {"ok": False, "error": "camera is not running"}
+            assert send_request(socket_path, "ping")["ok"] is True
+        finally:
+            server.stop()
+
+    def test_live_socket_is_not_taken_over(self, socket_path):
+        """別のプロセスが応答中のソケットは奪わず、残っただけのソケットは置き換えること"""
+        server = self._start(socket_path, {})
+        try:
+            with pytest.raises(ControlSocketInUse):
+                ControlServer(socket_path, {}).start()
+            assert send_request(socket_path, "ping")["ok"] is True
+        finally:
+            server.stop()
+
+        stale = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        stale.bind(socket_path) # listen() されずに残ったソケットファイル
+        stale.close()
+        server = self._start(socket_path, {})
+        try:
+            assert send_request(socket_path, "ping")["ok"] is True
+        finally:
+            server.stop()
+
+    def test_multiple_requests_per_connection(self, socket_path):
+        """1つの接続で複数のリクエストを順に処理できること (不正なJSONも含む)"""
+        server = self._start(socket_path, {"echo": lambda request: {"value": request.get("value")}})
+        try:
+            with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+                sock.settimeout(5)
+                sock.connect(socket_path)
+                sock.sendall(b'{"command": "echo", "value": 1}\nnot json\n{"command": "echo", "value": 2}\n')
+                with sock.makefile("rb") as stream:
+                    responses = [json.loads(stream.readline()) for _ in range(3)]
+            assert responses[0] == {"ok": True, "value": 1}
+            assert responses[1]["ok"] is False
+            assert responses[2] == {"ok": True, "value": 2}
+        finally:
+            server.stop()
+
+
+class TestBuildCameraControl:
+    """set_controls の設定値から dai.CameraControl を組み立てる処理のテスト"""
+
+    def test_unknown_and_empty_controls_are_rejected(self):
+        pytest.importorskip("depthai")
+        from src.uvc_handler import build_camera_control
+
+        assert build_camera_control({"exposure_us": 10000, "iso": 400, "white_balance_k": 4500}) is not None
+        with pytest.raises(ControlError):
+            build_camera_control({"zoom": 2})
+        with pytest.raises(ControlError):
+            build_camera_control({})
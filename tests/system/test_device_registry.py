@@ -0,0 +1,193 @@
+from unittest.mock import MagicMock, patch
+
+from src.device_registry import DeviceRegistry
+
+
+def _info(service_id, pid=0x2485, serial="1844301011", location=0x14100000):
+    return {'vendor_id': 0x03e7, 'product_id': pid, 'serial_number': serial,
+            'service_id': service_id, 'location_id': location}
+
+
+class _Clock:
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestDeviceRegistry:
+    """接続中デバイスのレジストリ (DeviceRegistry) のテスト"""
+
+    def test_lookup_by_service_id_serial_and_location(self):
+        """サービスID・シリアル番号・ロケーションIDで接続中のデバイスを引けること"""
+        registry = DeviceRegistry()
+        registry.connected("SN:A", _info(100, serial="A", location=0x14100000))
+        registry.connected("SN:B", _info(200, serial="B", location=0x14200000))
+
+        assert registry.by_service_id(200).key == "SN:B"
+        assert registry.by_serial("A").key == "SN:A"
+        assert registry.by_location(0x14200000).key == "SN:B"
+        assert registry.current().key == "SN:B"
+
+        # ブート後の再列挙 (PID・サービスIDの変化) で古いサービスIDは引けなくなる
+        registry.connected("SN:A", _info(101, pid=0xf63b, serial="A"), current=False)
+        assert registry.by_service_id(100) is None
+        assert registry.by_service_id(101).info['product_id'] == 0xf63b
+        assert registry.current().key == "SN:B"
+
+    def test_timestamps_and_fallback_on_disconnect(self):
+        """接続・切断の時刻が記録され、対象デバイスが外れると直前に接続したデバイスに戻ること"""
+        clock = _Clock()
+        registry = DeviceRegistry(clock=clock)
+        registry.connected("SN:A", _info(100, serial="A"))
+        clock.now = 105.0
+        registry.connected("SN:B", _info(200, serial="B", location=0x14200000))
+        clock.now = 110.0
+
+        removed = registry.disconnected("SN:B")
+        assert removed.connected_at == 105.0 and removed.disconnected_at == 110.0
+        assert registry.last_disconnected("SN:B") is removed
+        assert registry.current().key == "SN:A"
+        assert registry.disconnected("SN:B") is None
+        assert registry.by_serial("B") is None and len(registry) == 1
+
+    def test_diff_against_rescan(self):
+        """再スキャン結果との差分 (未検出の接続・取りこぼした切断・変化) を返すこと"""
+        clock = _Clock()
+        registry = DeviceRegistry(clock=clock)
+        registry.connected("SN:A", _info(100, serial="A"))
+        registry.connected("SN:B", _info(200, serial="B"))
+        clock.now = 130.0
+
+        appeared, vanished, changed = registry.diff({
+            "SN:A": _info(101, pid=0xf63b, serial="A"),
+            "SN:C": _info(300, serial="C"),
+        })
+        assert [key for key, _ in appeared] == ["SN:C"]
+        assert [key for key, _ in vanished] == ["SN:B"]
+        assert [(key, info['service_id']) for key, info in changed] == [("SN:A", 101)]
+        assert registry.get("SN:A").last_seen == 130.0
+        # diff は何も適用しない
+        assert "SN:B" in registry and "SN:C" not in registry
+
+
+class TestManagerDeviceRegistry:
+    """DeviceConnectionManager のデバイスレジストリと再スキャンのテスト"""
+
+    def _manager(self, mock_iokit):
+        from src.device_connection_manager import DeviceConnectionManager
+        backend = MagicMock(name="backend")
+        backend.name = "inprocess"
+        backend.last_stop_timing = None
+        backend.is_active.return_value = False
+        mock_iokit.init_usb_monitoring.return_value = 12345
+        manager = DeviceConnectionManager(MagicMock(), MagicMock(), MagicMock(), MagicMock(),
+                                          camera_backend=backend, hotplug_settle_window=0,
+                                          device_rescan_interval=0)
+        manager.auto_mode_enabled = False # ブートによる再列挙を起こさない
+        return manager
+
+    def test_events_update_registry(self, tmp_path):
+        """接続/切断イベントでレジストリと connected_target_device_info が更新されること"""
+        with patch('src.device_connection_manager.iokit_wrapper') as mock_iokit, \
+             patch('src.start_metrics.DEFAULT_HISTORY_PATH', str(tmp_path / "start_history.jsonl")):
+            manager = self._manager(mock_iokit)
+            handler = manager._event_handler
+            handler.on_device_connected(0x03e7, 0x2485, "1844301011", 100, 0x14100000)
+            assert manager.device_registry.by_service_id(100).serial_number == "1844301011"
+            assert manager.connected_target_device_info['service_id'] == 100
+
+            handler.on_device_disconnected(0x03e7, 0x2485, "1844301011", 100, 0x14100000)
+            assert manager.connected_target_device_info is None
+            assert len(manager.device_registry) == 0
+            manager.cleanup_on_quit()
+
+    def test_reconcile_feeds_missed_events(self, tmp_path):
+        """再スキャンで取りこぼした接続・切断がイベントとして反映されること"""
+        scanned = []
+
+        def scan(handler, vid, pid, verbose=True):
+            for info in scanned:
+                handler.on_device_connected(info['vendor_id'], info['product_id'], info['serial_number'],
+                                            info['service_id'], info['location_id'])
+            return len(scanned)
+
+        with patch('src.device_connection_manager.iokit_wrapper') as mock_iokit, \
+             patch('src.start_metrics.DEFAULT_HISTORY_PATH', str(tmp_path / "start_history.jsonl")):
+            mock_iokit.trigger_device_scan_and_notify.side_effect = scan
+            manager = self._manager(mock_iokit)
+
+            # 接続イベントを取りこぼしたデバイス
+            scanned.append(_info(100, serial="1844301011"))
+            appeared, vanished, changed = manager.reconcile_devices()
+            assert [key for key, _ in appeared] == ["location:14100000"]
+            assert manager.connected_target_device_info['service_id'] == 100
+            assert mock_iokit.trigger_device_scan_and_notify.call_args.args[1:] == (0x03e7, 0)
+
+            # 切断イベントを取りこぼしたデバイス
+            scanned.clear()
+            appeared, vanished, changed = manager.reconcile_devices()
+            assert [key for key, _ in vanished] == ["location:14100000"]
+            assert manager.connected_target_device_info is None
+            manager.cleanup_on_quit()
+
+    def test_dropped_events_trigger_rescan(self, tmp_path):
+        """USB イベントキューが溢れたと通知されると、再スキャンで接続中のデバイスを反映すること"""
+        def scan(handler, vid, pid, verbose=True):
+            handler.on_device_connected(0x03e7, 0xf63b, "1844301011", 101, 0x14100000)
+            return 1
+
+        with patch('src.device_connection_manager.iokit_wrapper') as mock_iokit, \
+             patch('src.start_metrics.DEFAULT_HISTORY_PATH', str(tmp_path / "start_history.jsonl")):
+            mock_iokit.trigger_device_scan_and_notify.side_effect = scan
+            manager = self._manager(mock_iokit)
+            manager._event_handler.on_events_dropped(3)
+            assert manager.device_registry.by_service_id(101).info['product_id'] == 0xf63b
+            manager.cleanup_on_quit()
+
+    def test_disconnect_of_other_device_keeps_camera(self, tmp_path):
+        """2台目のデバイスが外れてもカメラは止めず、カメラのデバイスが外れたときにそのデバイスの状態を更新すること"""
+        with patch('src.device_connection_manager.iokit_wrapper') as mock_iokit, \
+             patch('src.start_metrics.DEFAULT_HISTORY_PATH', str(tmp_path / "start_history.jsonl")):
+            manager = self._manager(mock_iokit)
+            manager.auto_mode_enabled = True
+            manager.camera_backend.is_active.return_value = True
+            handler = manager._event_handler
+            handler.on_device_connected(0x03e7, 0x2485, "N/A", 100, 0x14100000)
+            handler.on_device_connected(0x03e7, 0xf63b, "A", 101, 0x14100000) # ブート完了
+            assert manager.camera_running
+            assert manager.device_states.state_of("location:14100000") == "streaming"
+
+            # 2台目はカメラ起動中なので起動しない
+            handler.on_device_connected(0x03e7, 0xf63b, "B", 200, 0x14200000)
+            assert manager.device_states.state_of("location:14200000") == "booted"
+            assert manager.camera_backend.start.call_count == 1
+
+            handler.on_device_disconnected(0x03e7, 0xf63b, "B", 200, 0x14200000)
+            assert manager.camera_running
+            manager.camera_backend.stop.assert_not_called()
+            assert manager.device_states.state_of("location:14100000") == "streaming"
+
+            # カメラのデバイスが外れたら停止する (残ったデバイスの状態は変えない)
+            handler.on_device_connected(0x03e7, 0xf63b, "B", 201, 0x14200000)
+            handler.on_device_disconnected(0x03e7, 0xf63b, "A", 101, 0x14100000)
+            assert not manager.camera_running
+            manager.camera_backend.stop.assert_called_once()
+            assert manager.device_states.state_of("location:14100000") == "gone"
+            assert manager.device_states.state_of("location:14200000") == "booted"
+            manager.cleanup_on_quit()
+
+    def test_disconnect_reported_by_service_id_only(self, tmp_path):
+        """VID/PID 不明 (-1) でサービスIDだけが通知された切断も、レジストリから引いて反映すること"""
+        with patch('src.device_connection_manager.iokit_wrapper') as mock_iokit, \
+             patch('src.start_metrics.DEFAULT_HISTORY_PATH', str(tmp_path / "start_history.jsonl")):
+            manager = self._manager(mock_iokit)
+            handler = manager._event_handler
+            handler.on_device_connected(0x03e7, 0x2485, "1844301011", 100, 0x14100000)
+            handler.on_device_disconnected(-1, -1, "N/A", 100, None)
+            assert len(manager.device_registry) == 0
+            assert manager.device_states.state_of("location:14100000") == "gone"
+
+            handler.on_device_disconnected(-1, -1, "N/A", 999, None) # 見たことのないエントリは無視する
+            manager.cleanup_on_quit()
@@ -0,0 +1,71 @@
+from src import device_state
+from src.device_state import DeviceStateMachine
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestDeviceStateMachine:
+    """PID の変化 (未起動→起動済み) をまたいでデバイスを追跡する状態機械のテスト"""
+
+    KEY = device_state.device_key("N/A", 100, 0x14100000)
+
+    def test_key_prefers_location(self):
+        """ロケーションID → シリアル番号 → Service ID の順でデバイスを識別すること"""
+        assert device_state.device_key("N/A", 100, 0x14100000) == "location:14100000"
+        assert device_state.device_key("1844301011", 100) == "1844301011"
+        assert device_state.device_key("N/A", 100) == "service:100"
+
+    def test_boot_follows_pid_change(self):
+        """起動中は未起動PIDの消失を無視し、起動済みPIDの出現で streaming になること"""
+        states = DeviceStateMachine()
+        device, previous = states.device_appeared(self.KEY, device_state.PID_UNBOOTED, 100)
+        assert (previous, device.state) == (device_state.STATE_GONE, device_state.STATE_UNBOOTED)
+        assert states.can_start(self.KEY)
+
+        states.mark_booting(self.KEY)
+        assert not states.can_start(self.KEY) # 起動中の二重起動を防ぐ
+        device, _ = states.device_gone(self.KEY, device_state.PID_UNBOOTED)
+        assert device.state == device_state.STATE_BOOTING
+
+        device, previous = states.device_appeared(self.KEY, device_state.PID_BOOTED, 101, "1844301011")
+        assert (previous, device.state) == (device_state.STATE_BOOTING, device_state.STATE_STREAMING)
+        assert device.serial_number == "1844301011"
+
+        # 起動済みPIDになった後に届いた古いPIDの切断イベントは無視する
+        device, _ = states.device_gone(self.KEY, device_state.PID_UNBOOTED)
+        assert device.state == device_state.STATE_STREAMING
+
+        states.mark_stopped(self.KEY)
+        assert states.state_of(self.KEY) == device_state.STATE_BOOTED
+        assert not states.can_start(self.KEY) # リセットして未起動PIDに戻るまで待つ
+        states.device_gone(self.KEY, device_state.PID_BOOTED)
+        assert states.state_of(self.KEY) == device_state.STATE_GONE
+        assert [state for state, _ in device.history] == [
+            "unbooted", "booting", "streaming", "booted", "gone"]
+
+    def test_boot_timeout(self):
+        """起動が BOOT_TIMEOUT 以内に完了しなければ、再起動と切断を受け付けること"""
+        clock = FakeClock()
+        states = DeviceStateMachine(boot_timeout=10, clock=clock)
+        states.device_appeared(self.KEY, device_state.PID_UNBOOTED)
+        states.mark_booting(self.KEY)
+        clock.now = 11
+        assert states.can_start(self.KEY)
+        device, _ = states.device_gone(self.KEY, device_state.PID_UNBOOTED)
+        assert device.state == device_state.STATE_GONE
+
+    def test_devices_we_did_not_boot_are_not_started(self):
+        """他のプロセスが起動したデバイスやブートローダーのデバイスは起動対象にしないこと"""
+        states = DeviceStateMachine()
+        states.device_appeared("a", device_state.PID_BOOTED)
+        states.device_appeared("b", device_state.PID_BOOTLOADER)
+        states.device_appeared("c", device_state.PID_FLASH_BOOTED)
+        assert [states.state_of(k) for k in "abc"] == ["booted", "bootloader", "booted"]
+        assert not any(states.can_start(k) for k in "abc")
+        assert states.can_start("unknown")
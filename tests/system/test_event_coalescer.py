@@ -0,0 +1,97 @@
+import threading
+
+from src.event_coalescer import EventCoalescer
+
+
+class TestEventCoalescer:
+    """ホットプラグイベントの集約 (EventCoalescer) のテスト"""
+
+    def _coalescer(self, settle_window):
+        transitions, refreshes = [], []
+        coalescer = EventCoalescer(settle_window, transitions.append, refreshes.append)
+        return coalescer, transitions, refreshes
+
+    def test_burst_becomes_one_transition(self):
+        """接続/切断の連続 (ストーム) が最終状態への1回の遷移にまとめられること"""
+        coalescer, transitions, refreshes = self._coalescer(10)
+        for i in range(5):
+            coalescer.submit("sn1", True, {"service_id": i}, event_time=float(i))
+            coalescer.submit("sn1", False, {"service_id": i}, event_time=i + 0.5)
+        coalescer.submit("sn1", True, {"service_id": 99}, event_time=6.0)
+        assert transitions == [] # 待機時間中は何も通知しない
+
+        coalescer.flush()
+        assert len(transitions) == 1 and refreshes == []
+        event = transitions[0]
+        assert (event.key, event.state, event.payload) == ("sn1", True, {"service_id": 99})
+        assert (event.events, event.first_time) == (11, 0.0)
+        assert coalescer.coalesced == 10
+
+    def test_burst_ending_in_same_state_is_a_refresh(self):
+        """再列挙 (切断→接続) のように元の状態に戻ったバーストは遷移ではなく refresh になること"""
+        coalescer, transitions, refreshes = self._coalescer(10)
+        coalescer.submit("sn1", True, {"service_id": 1})
+        coalescer.flush()
+        coalescer.submit("sn1", False, {"service_id": 1})
+        coalescer.submit("sn1", True, {"service_id": 2})
+        coalescer.flush()
+
+        assert [e.state for e in transitions] == [True]
+        assert [e.payload for e in refreshes] == [{"service_id": 2}]
+
+        # 初めて見るデバイスの接続→切断は、未接続のまま何も起きない
+        coalescer.submit("sn2", True)
+        coalescer.submit("sn2", False)
+        coalescer.flush()
+        assert len(transitions) == 1
+
+    def test_devices_are_coalesced_independently(self):
+        coalescer, transitions, _ = self._coalescer(10)
+        coalescer.submit("sn1", True)
+        coalescer.submit("sn2", True)
+        coalescer.submit("sn2", False)
+        assert sorted(coalescer.pending()) == ["sn1", "sn2"]
+        coalescer.flush()
+        assert [(e.key, e.state) for e in transitions] == [("sn1", True)]
+
+    def test_settle_window_elapses_on_timer(self):
+        """最後のイベントから待機時間が経過するとタイマースレッドから通知されること"""
+        delivered = threading.Event()
+        transitions = []
+        coalescer = EventCoalescer(0.05, lambda event: (transitions.append(event), delivered.set()))
+        coalescer.submit("sn1", True)
+        coalescer.submit("sn1", False)
+        coalescer.submit("sn1", True)
+        assert delivered.wait(2)
+        assert len(transitions) == 1 and transitions[0].events == 3
+        assert coalescer.pending() == []
+
+    def test_storm_uses_one_scheduler_thread(self):
+        """大量のイベントでもイベントごとにスレッドを作らず、デバイスごとに1回だけ通知されること"""
+        delivered = threading.Event()
+        transitions = []
+        coalescer = EventCoalescer(0.05, lambda event: (transitions.append(event),
+                                                        len(transitions) == 4 and delivered.set()))
+        threads_before = threading.active_count()
+        for i in range(1000):
+            coalescer.submit(f"sn{i % 4}", i % 2 == 0 or i >= 996)
+        assert threading.active_count() <= threads_before + 1
+        assert delivered.wait(2)
+        assert sorted(e.key for e in transitions) == ["sn0", "sn1", "sn2", "sn3"]
+        assert sum(e.events for e in transitions) == 1000
+
+    def test_cancel_drops_pending_bursts(self):
+        coalescer, transitions, _ = self._coalescer(10)
+        coalescer.submit("sn1", True)
+        assert coalescer.cancel() == 1
+        coalescer.flush()
+        assert transitions == []
+
+    def test_zero_window_passes_every_event_through(self):
+        """待機時間 0 では集約せず、すべてのイベントが呼び出し元のスレッドで即座に通知されること"""
+        coalescer, transitions, _ = self._coalescer(0)
+        coalescer.submit("sn1", True)
+        coalescer.submit("sn1", True)
+        coalescer.submit("sn1", False)
+        assert [e.state for e in transitions] == [True, True, False]
+        assert coalescer.pending() == []
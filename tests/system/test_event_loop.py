@@ -0,0 +1,86 @@
+import os
+import signal
+import threading
+import time
+
+from src.event_loop import CameraEventLoop, WAKE_COMMAND, WAKE_SIGNAL, WAKE_TIMEOUT
+from src.phase_timer import PhaseTimer
+from src.uvc_handler import _LineReader, _queue_stream_commands, _read_stream_commands
+
+
+class TestCameraEventLoop:
+    """run_uvc_device のイベント駆動ループ (CameraEventLoop) のテスト"""
+
+    def test_signal_wakes_immediately(self):
+        """SIGINT を受けるとタイムアウトを待たずに WAKE_SIGNAL で復帰すること"""
+        loop = CameraEventLoop()
+        assert loop.install_signal_handlers() # pytest はメインスレッドで実行される
+        try:
+            timer = threading.Timer(0.1, lambda: os.kill(os.getpid(), signal.SIGINT))
+            timer.start()
+            start = time.monotonic()
+            reason, _ = loop.wait(timeout=5)
+            assert reason == WAKE_SIGNAL
+            assert loop.received_signal == signal.SIGINT
+            assert time.monotonic() - start < 2
+        finally:
+            loop.close()
+
+    def test_command_from_other_thread(self):
+        """別スレッドからの wake(command) がコマンドとして返ること"""
+        loop = CameraEventLoop()
+        try:
+            threading.Timer(0.05, lambda: loop.wake("stop")).start()
+            assert loop.wait(timeout=5) == (WAKE_COMMAND, ["stop"])
+            assert loop.wait(timeout=0.01) == (WAKE_TIMEOUT, [])
+        finally:
+            loop.close()
+
+    def test_reader_callback(self):
+        """add_reader で登録したパイプが読み込み可能になるとコールバックが呼ばれること"""
+        loop = CameraEventLoop()
+        r, w = os.pipe()
+        try:
+            loop.add_reader(r, lambda fd: loop.wake(os.read(fd, 64).decode().strip()))
+            os.write(w, b"stop\n")
+            assert loop.wait(timeout=5) == (WAKE_COMMAND, ["stop"])
+        finally:
+            loop.close()
+            os.close(r)
+            os.close(w)
+
+    def test_commands_sent_with_attach_are_not_lost(self):
+        """attach と同時に届いたコマンドも、待機ループとストリーミングで同じ読み込みを使うので失われないこと"""
+        loop = CameraEventLoop()
+        r, w = os.pipe()
+        try:
+            commands = _LineReader(r)
+            os.write(w, b"attach {}\nstop\nsta")
+            assert commands.readline() == "attach {}"
+            _queue_stream_commands(commands, loop)
+            loop.add_reader(commands, lambda stream: _read_stream_commands(stream, loop))
+            assert loop.wait(timeout=5) == (WAKE_COMMAND, ["stop"])
+            os.write(w, b"tus\n")
+            assert loop.wait(timeout=5) == (WAKE_COMMAND, ["status"])
+            os.close(w)
+            w = None
+            assert loop.wait(timeout=5) == (WAKE_COMMAND, ["stop"]) # EOF
+        finally:
+            loop.close()
+            os.close(r)
+            if w is not None:
+                os.close(w)
+
+
+class TestPhaseTimer:
+    """終了処理のフェーズ計測 (PhaseTimer) のテスト"""
+
+    def test_phases_are_recorded_in_order(self):
+        timer = PhaseTimer("shutdown")
+        with timer.phase("camera.stop"):
+            pass
+        timer.mark("cleanup")
+
+        assert [label for label, _ in timer.phases] == ["camera.stop", "cleanup"]
+        assert set(timer.as_dict()) == {"camera.stop", "cleanup", "total"}
+        assert timer.summary().startswith("shutdown: camera.stop")
@@ -0,0 +1,41 @@
+import importlib.util
+import os
+
+# benchmarks/ はパッケージではないため、ファイルパスから読み込む
+_BENCH_PATH = os.path.join(os.path.dirname(__file__), '..', '..', 'benchmarks', 'bench_hotplug_storm.py')
+_spec = importlib.util.spec_from_file_location("bench_hotplug_storm", _BENCH_PATH)
+bench_hotplug_storm = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(bench_hotplug_storm)
+
+
+class TestHotplugStormBenchmark:
+    """ホットプラグ・ストームのベンチマーク (bench_hotplug_storm.py) のテスト"""
+
+    def test_percentiles(self):
+        result = bench_hotplug_storm.percentiles(list(range(1, 101)))
+        assert result["p50"] == 50 and result["p99"] == 99 and result["max"] == 100
+        assert bench_hotplug_storm.percentiles([]) == {}
+
+    def test_generators(self):
+        """各シナリオのイベント数と、期待されるカメラ起動/停止回数が一致すること"""
+        events, expected = bench_hotplug_storm.build_events("steady", 40, 1000, 0.001, 1, seed=0)
+        assert len(events) == 40 and expected["starts"] == expected["stops"] == 10
+        events, expected = bench_hotplug_storm.build_events("burst", 200, 1000, 0.001, 1, seed=0)
+        assert expected["starts"] == 10 # チャタリングは起動回数に数えない
+        events, expected = bench_hotplug_storm.build_events("interleaved", 64, 1000, 0.001, 4, seed=0)
+        assert {e[2] for e in events} == {0, 1, 2, 3} and expected["starts"] == 16
+
+    def test_steady_scenario_without_spurious_starts(self):
+        """実時間を待たずに再生しても、接続ごとに一度だけ起動・停止すること"""
+        events, expected = bench_hotplug_storm.build_events("steady", 40, 1000, 0.001, 1, seed=0)
+        result = bench_hotplug_storm.run_scenario("steady", events, expected, realtime=False)
+        assert result["starts"] == result["expected_starts"] == 10
+        assert result["spurious_starts"] == result["spurious_stops"] == 0
+        assert result["callback_latency_us"]["max"] > 0
+        assert result["registered_devices_after"] == 0
+
+    def test_settle_window_longer_than_hold_is_not_compared(self):
+        """接続の保持時間がセトル時間より短い場合は期待回数を比較しないこと"""
+        events, expected = bench_hotplug_storm.build_events("steady", 8, 1000, 0.001, 1, seed=0)
+        result = bench_hotplug_storm.run_scenario("steady", events, expected, settle_window=0.02, realtime=False)
+        assert result["expected_starts"] is None and result["spurious_starts"] is None
@@ -0,0 +1,40 @@
+import importlib.util
+import os
+
+import pytest
+
+# benchmarks/ はパッケージではないため、ファイルパスから読み込む
+_BENCH_PATH = os.path.join(os.path.dirname(__file__), '..', '..', 'benchmarks', 'bench_import_time.py')
+_spec = importlib.util.spec_from_file_location("bench_import_time", _BENCH_PATH)
+bench_import_time = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(bench_import_time)
+
+
+class TestImportTimeReport:
+    """-X importtime の出力パーサーのテスト"""
+
+    def test_parse_importtime(self):
+        """モジュールごとの self/cumulative とネストの深さが読み取れること"""
+        stderr = (
+            "import time: self [us] | cumulative | imported package\n"
+            "import time:       120 |        120 |   _io\n"
+            "import time:       300 |        420 | io\n"
+            "some unrelated stderr line\n"
+            "import time:      5000 |       5500 | depthai\n"
+        )
+        entries = bench_import_time.parse_importtime(stderr)
+        assert [e["module"] for e in entries] == ["_io", "io", "depthai"]
+        assert entries[0]["depth"] == 1
+        assert entries[2] == {"module": "depthai", "self_us": 5000, "cumulative_us": 5500, "depth": 0}
+        assert bench_import_time.total_import_us(entries) == 420 + 5500
+
+
+@pytest.mark.slow
+class TestImportTimeBudget:
+    """uvc_handler.py の起動時インポート時間の予算 (リグレッション閾値) のテスト"""
+
+    @pytest.mark.parametrize("scenario", list(bench_import_time.SCENARIOS))
+    def test_scenario_within_budget(self, scenario):
+        """--help などデバイスを使わない経路で depthai を読み込まず、予算内で起動すること"""
+        report = bench_import_time.measure(scenario, runs=2)
+        assert bench_import_time.check_budget(report) == []
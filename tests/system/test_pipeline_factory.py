@@ -0,0 +1,73 @@
+import pytest
+
+# depthai が無い環境ではこのファイルのテストをスキップする
+pytest.importorskip("depthai")
+
+from src.pipeline_factory import CameraProfile, PipelineFactory
+
+
+class TestPipelineFactory:
+    """プロファイル単位のパイプラインキャッシュ (PipelineFactory) のテスト"""
+
+    def test_same_profile_is_built_once(self):
+        """同じプロファイルの2回目以降の取得ではパイプラインが再構築されないこと"""
+        factory = PipelineFactory()
+        profile = CameraProfile()
+
+        first = factory.get_pipeline(profile)
+        second = factory.get_pipeline(CameraProfile()) # 等価な別インスタンス
+
+        assert first is second
+        stats = factory.stats()
+        assert stats["misses"] == 1
+        assert stats["hits"] == 1
+        assert stats["size"] == 1
+
+    def test_different_profiles_are_cached_separately(self):
+        """プロファイルが異なれば別のパイプラインが構築されること"""
+        factory = PipelineFactory()
+        p1080 = CameraProfile()
+        p4k = CameraProfile(sensor_resolution="THE_4_K", isp_scale=(1, 2), camera_name="FlashedCam_1080p_NV12")
+
+        assert p1080.profile_hash() != p4k.profile_hash()
+        assert factory.get_pipeline(p1080) is not factory.get_pipeline(p4k)
+        assert factory.stats()["misses"] == 2
+
+    def test_lru_eviction(self):
+        """上限を超えると最も古く使われたプロファイルが追い出されること"""
+        factory = PipelineFactory(max_entries=2)
+        a = CameraProfile(fps=30)
+        b = CameraProfile(fps=25)
+        c = CameraProfile(fps=20)
+
+        factory.get_pipeline(a)
+        factory.get_pipeline(b)
+        factory.get_pipeline(a) # a を最近使用に更新
+        factory.get_pipeline(c) # b が追い出される
+
+        stats = factory.stats()
+        assert stats["size"] == 2
+        assert stats["evictions"] == 1
+
+        factory.get_pipeline(a) # まだキャッシュにある
+        assert factory.stats()["misses"] == 3
+        factory.get_pipeline(b) # 追い出されたので再構築
+        assert factory.stats()["misses"] == 4
+
+    def test_serialized_form_is_cached(self):
+        """シリアライズ結果もプロファイル単位でキャッシュされること"""
+        factory = PipelineFactory()
+        profile = CameraProfile()
+
+        serialized = factory.get_serialized(profile)
+        assert serialized is factory.get_serialized(profile)
+        assert factory.stats()["misses"] == 1
+
+    def test_mjpeg_profile_adds_encoder(self):
+        """MJPEG プロファイルでは UVC の前段に VideoEncoder が挿入されること"""
+        factory = PipelineFactory()
+        raw = factory.get_pipeline(CameraProfile())
+        mjpeg = factory.get_pipeline(CameraProfile(encoding="mjpeg", mjpeg_quality=70))
+
+        assert "VideoEncoder" not in [node.getName() for node in raw.getAllNodes()]
+        assert "VideoEncoder" in [node.getName() for node in mjpeg.getAllNodes()]
@@ -0,0 +1,31 @@
+import random
+
+from src.reconnect import ReconnectAttempt, ReconnectPolicy
+
+
+class TestReconnectPolicy:
+    """uvc_handler 内での再接続バックオフ (ReconnectPolicy) のテスト"""
+
+    def test_exponential_growth_is_capped(self):
+        """ジッタなしでは遅延が倍々に増え、max_delay で頭打ちになること"""
+        policy = ReconnectPolicy(initial_delay=0.2, max_delay=1.0, multiplier=2.0, jitter=0, max_attempts=5)
+        assert [delay for _, delay in policy.delays()] == [0.2, 0.4, 0.8, 1.0, 1.0]
+
+    def test_jitter_stays_within_bounds(self):
+        """ジッタ付きの遅延が ±jitter の範囲に収まり、毎回同じ値にはならないこと"""
+        policy = ReconnectPolicy(initial_delay=1.0, max_delay=1.0, jitter=0.2)
+        rng = random.Random(0)
+        delays = [policy.delay(1, rng) for _ in range(50)]
+        assert all(0.8 <= delay <= 1.2 for delay in delays)
+        assert len(set(delays)) > 1
+
+    def test_zero_attempts_disables_reconnect(self):
+        """max_attempts=0 では再接続を試みないこと"""
+        assert list(ReconnectPolicy(max_attempts=0).delays()) == []
+
+    def test_attempt_description(self):
+        """再接続の試行結果がレイテンシ付きで記述されること"""
+        ok = ReconnectAttempt(attempt=2, delay_s=0.4, latency_ms=812.5, ok=True)
+        failed = ReconnectAttempt(attempt=1, delay_s=0.2, latency_ms=3.0, ok=False, error="No available devices")
+        assert ok.describe() == "attempt 2 after 400 ms backoff: ok in 812.5 ms"
+        assert "failed (No available devices)" in failed.describe()
@@ -0,0 +1,57 @@
+from src.registry_index import RegistryIndex, RegistryRecord
+
+
+def _record(entry_id, pid=0x2485, class_name="IOUSBHostDevice", serial="1844301011", parent_id=None):
+    return {
+        'entry_id': entry_id, 'class_name': class_name, 'name': "Movidius MyriadX", 'parent_id': parent_id,
+        'vendor_id': 0x03e7, 'product_id': pid, 'serial_number': serial, 'location_id': 0x14100000,
+    }
+
+
+class TestRegistryIndex:
+    """IORegistry スナップショットのインデックス (RegistryIndex) のテスト"""
+
+    def test_notifications_update_index(self):
+        """マッチ/終了通知でエントリID・クラス・VID/PID の各インデックスが更新されること"""
+        index = RegistryIndex()
+        index.entry_matched(_record(100), "IOUSBDevice")
+        index.entry_matched(_record(101, pid=0xf63b), "IOUSBDevice")
+
+        assert index.get(100).serial_number == "1844301011"
+        assert [r.entry_id for r in index.find(0x03e7)] == [100, 101]
+        assert [r.entry_id for r in index.find(0x03e7, 0xf63b)] == [101]
+        # 実クラス (IOUSBHostDevice) でもマッチに使ったクラス (IOUSBDevice) でも引ける
+        assert [r.entry_id for r in index.by_class("IOUSBDevice")] == [100, 101]
+        assert [r.entry_id for r in index.by_class("IOUSBHostDevice")] == [100, 101]
+
+        assert index.entry_terminated(100).entry_id == 100
+        assert index.entry_terminated(100) is None
+        assert index.get(100) is None
+        assert [r.entry_id for r in index.find(0x03e7)] == [101]
+        assert [r.entry_id for r in index.by_class("IOUSBDevice")] == [101]
+
+    def test_scan_once_then_serve_from_index(self):
+        """未取得のクラスは最初の問い合わせで1回だけスキャンし、以降はインデックスから返すこと"""
+        scanned = []
+
+        def scanner(class_name):
+            scanned.append(class_name)
+            return [_record(1, class_name="IOUSBHostInterface", parent_id=None),
+                    _record(2, class_name="IOUSBHostInterface", parent_id=1)]
+
+        index = RegistryIndex(scanner=scanner)
+        for _ in range(5):
+            records = index.by_class("IOUSBHostInterface")
+        assert scanned == ["IOUSBHostInterface"]
+        assert index.scans == 1 and index.hits == 4
+        assert [r.entry_id for r in records] == [1, 2]
+        assert [r.entry_id for r in index.children(1)] == [2]
+
+        index.refresh("IOUSBHostInterface")
+        assert index.scans == 2 and len(index) == 2
+
+    def test_record_from_dict(self):
+        record = RegistryRecord.from_dict({'entry_id': 7, 'class_name': "IOService", 'name': "root", 'extra': 1})
+        assert record.vendor_id is None
+        assert record.describe() == "7 IOService 'root'"
+        assert "03e7:2485 SN=1844301011 location=14100000" in RegistryRecord.from_dict(_record(5)).describe()
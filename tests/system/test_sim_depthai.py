@@ -0,0 +1,101 @@
+import os
+import signal
+import subprocess
+import sys
+import time
+
+import pytest
+
+from src import pipeline_factory, sim_depthai, uvc_handler
+from src.reconnect import ReconnectPolicy
+
+
+@pytest.fixture
+def sim(monkeypatch):
+    """シミュレーションの depthai に切り替え、遅延なしのデバイスを用意する"""
+    monkeypatch.setenv(sim_depthai.ENV_DEPTHAI_BACKEND, sim_depthai.BACKEND_SIM)
+    monkeypatch.setattr(uvc_handler, "dai", None)
+    monkeypatch.setattr(pipeline_factory, "default_factory", pipeline_factory.PipelineFactory())
+    sim_depthai.configure(time_scale=0, seed=1)
+    yield sim_depthai
+    sim_depthai.configure()
+
+
+class TestSimDepthai:
+    """シミュレーションの depthai (sim_depthai) のテスト"""
+
+    def test_config_from_environment(self):
+        config = sim_depthai.SimConfig.from_environment({
+            "OAKD_SIM_DEVICES": "A, B", "OAKD_SIM_BOOT_DELAY": "0.5", "OAKD_SIM_SEED": "7"})
+        assert config.devices == ("A", "B") and config.boot_delay == 0.5 and config.seed == 7
+
+    def test_camera_start_first_frame_and_stop(self, sim):
+        """UVCCamera が実機なしで起動・初フレーム・停止まで進むこと"""
+        camera = uvc_handler.UVCCamera()
+        camera.start()
+        assert uvc_handler.dai is sim_depthai
+        assert camera.wait_for_first_frame(timeout=1) is not None
+        camera.send_control(uvc_handler.build_camera_control({"exposure_us": 10000}))
+        assert sim_depthai.Device.getAllAvailableDevices() == [] # 使用中のデバイスは見つからない
+        camera.stop()
+        assert sim.stats()["opens"] == 1 and sim.stats()["closes"] == 1
+
+    def test_boot_failure_and_device_selection(self, sim):
+        """起動失敗を注入でき、--device 相当の MX ID 指定で特定のデバイスを開けること"""
+        sim.configure(time_scale=0, boot_failure_rate=1.0)
+        with pytest.raises(RuntimeError):
+            uvc_handler.UVCCamera().start()
+        assert sim.stats()["boot_failures"] == 1
+
+        sim.configure(time_scale=0, devices=("MXID-A", "MXID-B"))
+        camera = uvc_handler.UVCCamera(device_id="MXID-B")
+        camera.start()
+        assert camera.device.getMxId() == "MXID-B"
+        camera.stop()
+
+    def test_random_disconnect_and_reconnect(self, sim):
+        """ストリーミング中の切断が isClosed() に現れ、プロセス内の再接続で復帰すること"""
+        sim.configure(time_scale=0, disconnect_rate=60.0)
+        camera = uvc_handler.UVCCamera()
+        camera.start()
+        assert camera.device.isClosed()
+        assert sim.stats()["disconnects"] == 1
+
+        sim.configure(time_scale=0) # 再列挙後は切断しないデバイス
+        loop = uvc_handler.CameraEventLoop()
+        commands = uvc_handler.CameraControlCommands(camera, loop, uvc_handler.MINIMAL_PROFILE)
+        try:
+            assert uvc_handler.reconnect_camera(camera, loop, ReconnectPolicy(initial_delay=0.0, max_attempts=2), commands)
+        finally:
+            loop.close()
+        assert not camera.device.isClosed() and commands.reconnects[-1].ok
+        camera.stop()
+
+    def test_flash_progress(self, sim, capsys):
+        uvc_handler.flash()
+        output = capsys.readouterr().out
+        assert "Flashing progress: 100.0%" in output
+        assert output.count("Flashing progress") == sim_depthai.FLASH_PROGRESS_STEPS
+        assert sim.stats()["flashes"] == 1
+
+    def test_uvc_handler_process_with_sim(self, tmp_path):
+        """OAKD_DEPTHAI_BACKEND=sim の uvc_handler.py が起動完了を出力し、SIGINT で終了すること"""
+        project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+        env = dict(os.environ, OAKD_DEPTHAI_BACKEND="sim", OAKD_SIM_TIME_SCALE="0", PYTHONUNBUFFERED="1",
+                   OAKD_START_HISTORY=str(tmp_path / "start_history.jsonl"))
+        process = subprocess.Popen([sys.executable, os.path.join(project_root, "src", "uvc_handler.py"),
+                                    "--start-uvc", "--no-control-socket"],
+                                   stdout=subprocess.PIPE, text=True, env=env)
+        try:
+            deadline = time.monotonic() + 20
+            for line in process.stdout:
+                if line.startswith(uvc_handler.READY_MARKER) or time.monotonic() > deadline:
+                    break
+            assert line.startswith(uvc_handler.READY_MARKER)
+            process.send_signal(signal.SIGINT)
+            assert process.wait(timeout=10) == 0
+        finally:
+            if process.poll() is None:
+                process.kill()
+                process.wait()
+            process.stdout.close()
@@ -0,0 +1,80 @@
+import json
+from unittest.mock import MagicMock, patch
+
+from src import start_metrics
+from src.camera_backends import SubprocessCameraBackend
+from src.start_metrics import StartTrace
+
+
+class TestStartTrace:
+    """カメラ起動のフェーズ計測 (StartTrace) のテスト"""
+
+    def test_phases_follow_recorded_marks(self):
+        """記録されたマーク間の差がフェーズ時間になり、欠けたマークは次のフェーズに含まれること"""
+        trace = StartTrace(marks={"event_received": 10.000, "spawn": 10.002, "process_start": 10.050})
+        trace.mark("device_discovered", 10.300) # depthai_imported は無し (待機ワーカー)
+        trace.mark("device_booted", 11.300)
+        trace.mark("pipeline_started", 11.500)
+        trace.mark("first_frame", 11.650)
+
+        assert trace.phases() == {
+            "dispatch": 2.0,
+            "spawn": 48.0,
+            "device_discovery": 250.0,
+            "device_boot": 1000.0,
+            "pipeline_upload": 200.0,
+            "first_frame": 150.0,
+        }
+        assert trace.total_ms() == 1650.0
+
+    def test_serialize_round_trip(self):
+        """プロセス間で受け渡すシリアライズ形式から同じトレースが復元できること"""
+        trace = StartTrace(info={"start_mode": "cold"})
+        trace.mark("event_received")
+        trace.mark("event_received", 0.0) # 2回目の記録は無視される
+        restored = StartTrace.deserialize(trace.serialize())
+        assert restored.trace_id == trace.trace_id
+        assert restored.marks == trace.marks
+        assert restored.info == {"start_mode": "cold"}
+
+    def test_cold_spawn_passes_trace_in_environment(self):
+        """コールド起動ではトレースが環境変数で uvc_handler に渡されること"""
+        trace = StartTrace()
+        trace.mark("event_received")
+        with patch('src.uvc_launcher.subprocess.Popen', return_value=MagicMock()) as mock_popen:
+            SubprocessCameraBackend().start(start_trace=trace)
+
+        env = mock_popen.call_args.kwargs["env"]
+        passed = StartTrace.deserialize(env[start_metrics.ENV_START_TRACE])
+        assert set(passed.marks) == {"event_received", "spawn"}
+        assert passed.info["start_mode"] == "cold"
+
+
+class TestStartHistory:
+    """起動履歴 (JSONL) と p50/p95/p99 集計のテスト"""
+
+    def test_append_and_summarize(self, tmp_path):
+        """履歴に追記した記録からフェーズごとのパーセンタイルが求められること (失敗した起動は除外)"""
+        path = str(tmp_path / "history" / "start_history.jsonl")
+        for i in range(1, 101):
+            trace = StartTrace(marks={"spawn": 0.0, "process_start": i / 1000})
+            start_metrics.append_record(trace.record(), path)
+        start_metrics.append_record(StartTrace(marks={"spawn": 0.0, "process_start": 9.0}).record(ok=False), path)
+        with open(path, "a") as f:
+            f.write('{"truncated": \n') # 書き込み途中で終了した行
+
+        records = start_metrics.load_records(path)
+        assert len(records) == 101
+        summary = start_metrics.summarize(records)
+        assert summary["spawn"] == {"n": 100, "p50": 50.0, "p95": 95.0, "p99": 99.0}
+        assert list(summary) == ["spawn", "total"]
+        assert "p99 ms" in start_metrics.format_summary(summary)
+
+    def test_percentile_nearest_rank(self):
+        assert start_metrics.percentile([5.0], 99) == 5.0
+        assert start_metrics.percentile([1, 2, 3, 4], 50) == 2
+        assert start_metrics.percentile([1, 2, 3, 4], 95) == 4
+
+    def test_missing_history(self, tmp_path):
+        assert start_metrics.load_records(str(tmp_path / "none.jsonl")) == []
+        assert json.loads(json.dumps(start_metrics.summarize([]))) == {}
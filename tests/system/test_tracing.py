@@ -0,0 +1,94 @@
+import io
+import sys
+import threading
+
+import pytest
+
+from src import tracing
+
+
+@pytest.fixture
+def trace(monkeypatch):
+    """空のバッファとデバッグレベルで記録し、終了時に環境変数の設定に戻す"""
+    tracing.configure(level=tracing.DEBUG, echo_level=tracing.OFF, capacity=8)
+    tracing.clear()
+    yield tracing
+    monkeypatch.setattr(tracing, "_native_modules", [])
+    tracing.configure_from_environment()
+    tracing.clear()
+
+
+class _Lazy:
+    """書式化されたかどうかを数えるオブジェクト"""
+    def __init__(self):
+        self.formatted = 0
+
+    def __str__(self):
+        self.formatted += 1
+        return "lazy"
+
+
+class TestTracing:
+    """リングバッファによるトレース (tracing.py) のテスト"""
+
+    def test_levels_and_lazy_formatting(self, trace):
+        """無効なレベルは記録せず、メッセージはダンプ時にだけ書式化されること"""
+        trace.configure(level="info")
+        value = _Lazy()
+        trace.debug("test", "dropped %s", value)
+        trace.info("test", "kept %s", value, device="location:14100000")
+        assert value.formatted == 0
+        assert [r[4] for r in trace.records()] == ["kept %s"]
+        output = io.StringIO()
+        assert trace.dump(output) == 1
+        assert "info    [test] kept lazy device=location:14100000" in output.getvalue()
+        assert value.formatted == 1
+        assert trace.parse_level("warning") == trace.WARNING
+        with pytest.raises(ValueError):
+            trace.parse_level("verbose")
+
+    def test_ring_buffer_overwrites_oldest(self, trace):
+        for i in range(20):
+            trace.debug("test", "event %d", i)
+        records = trace.records()
+        assert [r[5] for r in records] == [(i,) for i in range(12, 20)]
+        assert trace.stats()["dropped"] == 12
+
+    def test_echo_level_prints(self, trace, capsys):
+        trace.configure(echo_level="error")
+        trace.warning("test", "quiet")
+        trace.error("test", "loud %d", 1)
+        assert capsys.readouterr().out == "[test] loud 1\n"
+        assert len(trace.records()) == 2
+
+    def test_native_module_sink(self, trace):
+        """拡張モジュールに記録先と (記録・表示の低い方の) レベルが渡されること"""
+        class _Native:
+            def set_trace(self, sink, level):
+                self.sink, self.level = sink, level
+        native = _Native()
+        trace.configure(level="warning", echo_level="info")
+        trace.attach_native(native)
+        assert native.level == trace.INFO
+        native.sink(trace.INFO, "iokit_wrapper_callback", "Device %s: PID=%04x", ("connected", 0xf63b))
+        assert "Device connected: PID=f63b" in trace.format_record(trace.records()[0])
+        trace.configure(level="debug")
+        assert native.level == trace.DEBUG
+
+    def test_crash_dump_on_thread_exception(self, trace, tmp_path, monkeypatch):
+        """スレッドで捕捉されない例外が発生するとバッファが OAKD_TRACE_DUMP に書き出されること"""
+        dump_path = tmp_path / "trace.log"
+        monkeypatch.setenv(trace.ENV_TRACE_DUMP, str(dump_path))
+        monkeypatch.setattr(trace, "_crash_dump_installed", False)
+        monkeypatch.setattr(sys, "excepthook", sys.excepthook)
+        monkeypatch.setattr(threading, "excepthook", lambda args: None)
+        trace.install_crash_dump()
+        trace.info("test", "before the crash")
+
+        def crash():
+            raise RuntimeError("boom")
+        thread = threading.Thread(target=crash, name="crasher")
+        thread.start()
+        thread.join()
+        text = dump_path.read_text()
+        assert "uncaught RuntimeError in thread crasher" in text and "before the crash" in text
@@ -0,0 +1,158 @@
+import os
+import socket
+import threading
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from src.usb_monitors import LinuxUSBMonitor, _PrintingHandler, location_id, parse_uevent
+
+pytestmark = pytest.mark.skipif(not hasattr(socket, "AF_UNIX"), reason="AF_UNIX ソケットが必要")
+
+
+def _add_device(sys_root, name, vid, pid, busnum, devnum, serial=None):
+    """偽の sysfs ツリーに USB デバイスを作る (bus/usb/devices/<name> は devices/ 以下へのシンボリックリンク)"""
+    device_dir = sys_root / "devices" / "pci0000:00" / f"usb{busnum}" / name
+    device_dir.mkdir(parents=True)
+    attributes = {"idVendor": f"{vid:04x}", "idProduct": f"{pid:04x}", "busnum": str(busnum), "devnum": str(devnum)}
+    if serial:
+        attributes["serial"] = serial
+    for attribute, value in attributes.items():
+        (device_dir / attribute).write_text(value + "\n")
+    link = sys_root / "bus" / "usb" / "devices" / name
+    link.parent.mkdir(parents=True, exist_ok=True)
+    link.symlink_to(device_dir)
+    return "/" + os.path.relpath(device_dir, sys_root)
+
+
+def _remove_device(sys_root, name, devpath):
+    (sys_root / "bus" / "usb" / "devices" / name).unlink()
+    device_dir = sys_root / devpath.lstrip("/")
+    for attribute in device_dir.iterdir():
+        attribute.unlink()
+    device_dir.rmdir()
+
+
+def _uevent(action, devpath, vid=0x03e7, pid=0x2485, busnum=1, devnum=5, devtype="usb_device"):
+    fields = [f"{action}@{devpath}", f"ACTION={action}", f"DEVPATH={devpath}", "SUBSYSTEM=usb",
+              f"DEVTYPE={devtype}", f"PRODUCT={vid:x}/{pid:x}/100", f"BUSNUM={busnum:03d}", f"DEVNUM={devnum:03d}"]
+    return "\0".join(fields).encode() + b"\0"
+
+
+class _Handler:
+    def __init__(self):
+        self.events = []
+        self.changed = threading.Condition()
+
+    def _record(self, kind, vendor_id, product_id, serial_number, service_id, location_id):
+        with self.changed:
+            self.events.append((kind, product_id, serial_number, service_id, location_id))
+            self.changed.notify_all()
+
+    def on_device_connected(self, *args):
+        self._record("connected", *args)
+
+    def on_device_disconnected(self, *args):
+        self._record("disconnected", *args)
+
+    def wait_for(self, count, timeout=5):
+        with self.changed:
+            assert self.changed.wait_for(lambda: len(self.events) >= count, timeout)
+        return self.events
+
+
+class TestLinuxUSBMonitor:
+    """Linux の uevent/sysfs による USB 監視 (LinuxUSBMonitor) のテスト"""
+
+    def test_helpers(self):
+        assert location_id(1, "4.2") == 0x01420000
+        assert location_id(2, "0") == 0x02000000
+        event = parse_uevent(_uevent("add", "/devices/usb1/1-4"))
+        assert event["ACTION"] == "add" and event["PRODUCT"] == "3e7/2485/100"
+
+    def test_printing_handler_without_location(self, capsys):
+        """location_id が分からないイベントも表示できること"""
+        handler = _PrintingHandler()
+        handler.on_device_connected(0x03e7, 0x2485, "SN1", 1, 0x01420000)
+        handler.on_device_disconnected(0x03e7, 0x2485, "SN1", 1)
+        lines = capsys.readouterr().out.splitlines()
+        assert lines[0].endswith("location=01420000")
+        assert lines[1].endswith("location=-")
+
+    def test_initial_scan_and_uevents(self, tmp_path):
+        """起動時に sysfs の既存デバイスを通知し、その後は uevent で接続/切断を通知すること"""
+        _add_device(tmp_path, "1-1", 0x05ac, 0x1234, 1, 2)          # 対象外のベンダー
+        devpath = _add_device(tmp_path, "1-4", 0x03e7, 0x2485, 1, 3)
+        reader, writer = socket.socketpair(socket.AF_UNIX, socket.SOCK_DGRAM)
+        handler = _Handler()
+        monitor = LinuxUSBMonitor(sys_root=str(tmp_path), uevent_socket=reader)
+        observer = MagicMock()
+        monitor.set_registry_observer(observer)
+        try:
+            assert monitor.start(handler, 0x03e7, 0) == 0
+            assert handler.events == [("connected", 0x2485, "N/A", (1 << 16) | 3, 0x01400000)]
+            observer.entry_matched.assert_called_once()
+
+            # ブートによる再列挙: 切断 -> 新しいPID・デバイス番号で接続
+            _remove_device(tmp_path, "1-4", devpath)
+            writer.send(_uevent("remove", devpath, devnum=3))
+            writer.send(_uevent("add", devpath + ":1.0", devtype="usb_interface")) # インターフェースは無視
+            devpath = _add_device(tmp_path, "1-4", 0x03e7, 0xf63b, 1, 4, serial="1844301011")
+            writer.send(_uevent("add", devpath, pid=0xf63b, devnum=4))
+            events = handler.wait_for(3)
+            assert events[1] == ("disconnected", 0x2485, "N/A", (1 << 16) | 3, 0x01400000)
+            assert events[2] == ("connected", 0xf63b, "1844301011", (1 << 16) | 4, 0x01400000)
+            observer.entry_terminated.assert_called_once_with((1 << 16) | 3)
+        finally:
+            monitor.stop()
+            reader.close()
+            writer.close()
+
+    def test_add_event_without_sysfs_and_resync(self, tmp_path):
+        """sysfs が既に無い接続イベントは uevent の内容で通知し、resync で取りこぼしを補うこと"""
+        (tmp_path / "bus" / "usb" / "devices").mkdir(parents=True)
+        reader, writer = socket.socketpair(socket.AF_UNIX, socket.SOCK_DGRAM)
+        handler = _Handler()
+        monitor = LinuxUSBMonitor(sys_root=str(tmp_path), uevent_socket=reader)
+        try:
+            monitor.start(handler, 0x03e7, 0)
+            writer.send(_uevent("add", "/devices/pci0000:00/usb2/2-1", busnum=2, devnum=7))
+            assert handler.wait_for(1)[0] == ("connected", 0x2485, "N/A", (2 << 16) | 7, 0x02100000)
+
+            # remove を取りこぼし、別のデバイスが接続された状態
+            _add_device(tmp_path, "2-3", 0x03e7, 0xf63b, 2, 9, serial="1844301011")
+            monitor.resync()
+            events = handler.wait_for(3)
+            assert [e[0] for e in events[1:]] == ["disconnected", "connected"]
+            assert events[2][3] == (2 << 16) | 9
+
+            found = []
+            assert monitor.scan(MagicMock(on_device_connected=lambda *a: found.append(a)), 0x03e7, 0xf63b) == 1
+            assert found[0][2] == "1844301011"
+        finally:
+            monitor.stop()
+            reader.close()
+            writer.close()
+
+    def test_manager_with_linux_monitor(self, tmp_path):
+        """DeviceConnectionManager が Linux の監視から同じイベントハンドラで接続を受け取ること"""
+        from src.device_connection_manager import DeviceConnectionManager
+        _add_device(tmp_path, "1-4", 0x03e7, 0x2485, 1, 3)
+        reader, writer = socket.socketpair(socket.AF_UNIX, socket.SOCK_DGRAM)
+        monitor = LinuxUSBMonitor(sys_root=str(tmp_path), uevent_socket=reader)
+        backend = MagicMock(name="backend")
+        backend.name = "inprocess"
+        backend.last_stop_timing = None
+        backend.is_active.return_value = False
+        with patch('src.start_metrics.DEFAULT_HISTORY_PATH', str(tmp_path / "start_history.jsonl")):
+            manager = DeviceConnectionManager(MagicMock(), MagicMock(), MagicMock(), MagicMock(),
+                                              camera_backend=backend, hotplug_settle_window=0,
+                                              device_rescan_interval=0, usb_monitor=monitor)
+            try:
+                assert manager.get_run_loop_source_address() == 0
+                assert manager.connected_target_device_info['location_id'] == 0x01400000
+                assert [r.entry_id for r in manager.connected_oak_devices()] == [(1 << 16) | 3]
+            finally:
+                manager.cleanup_on_quit()
+                reader.close()
+                writer.close()